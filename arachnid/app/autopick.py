@@ -138,19 +138,19 @@ This is not a complete list of options available to this script, for additional
 .. Created on Dec 21, 2011
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
-from ..core.app import program
+from ..core.app import program, instrument
 from ..util import bench
 from ..core.image import ndimage_utility, ndimage_filter
 from ..core.learn import dimensionality_reduction
 from ..core.learn import unary_classification
+from ..core.learn import distance
 from ..core.metadata import format_utility, format, spider_utility, spider_params
 from ..core.parallel import mpi_utility
 from ..core.util import drawing
 from ..core.image import ndimage_file
+from ..core.util import lazy_import
 #import numpy # pylint: disable=W0611
 import numpy.linalg
-import scipy.spatial
-import scipy.stats
 import lfcpick
 import logging
 import os
@@ -158,6 +158,8 @@ import os
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
+scipy = lazy_import.lazy_module('scipy', 'spatial', 'stats')
+
 def process(filename, disk_mult_range, id_len=0, **extra):
     '''Concatenate files and write to a single output file
         
@@ -185,7 +187,8 @@ def process(filename, disk_mult_range, id_len=0, **extra):
         return filename, []
     _logger.debug("Read micrograph")
     try:
-        mic = lfcpick.read_micrograph(filename, **extra)
+        with instrument.timer('autopick.read'):
+            mic = lfcpick.read_micrograph(filename, **extra)
     except ndimage_file.InvalidHeaderException:
         _logger.warn("Skipping: %s - invalid header"%filename)
         return filename, []
@@ -198,10 +201,11 @@ def process(filename, disk_mult_range, id_len=0, **extra):
         
     _logger.debug("Search micrograph")
     try:
-        if len(disk_mult_range) > 0:
-            peaks = search_range(mic, disk_mult_range, **extra)
-        else:
-            peaks = search(mic, **extra)
+        with instrument.timer('autopick.search'):
+            if len(disk_mult_range) > 0:
+                peaks = search_range(mic, disk_mult_range, **extra)
+            else:
+                peaks = search(mic, **extra)
     except numpy.linalg.LinAlgError:
         _logger.info("Skipping: %s"%filename)
         return filename, []
@@ -210,9 +214,11 @@ def process(filename, disk_mult_range, id_len=0, **extra):
         _logger.warn("Skipping: %s - no particles found"%filename)
         return filename, []
         
+    instrument.count('autopick.particles', len(peaks))
     coords = format_utility.create_namedtuple_list(peaks, "Coord", "id,peak,x,y",numpy.arange(1, len(peaks)+1, dtype=numpy.int)) if peaks.shape[0] > 0 else []
-    write_example(mic, coords, filename, **extra)
-    format.write(extra['output'], coords, default_format=format.spiderdoc)
+    with instrument.timer('autopick.write'):
+        write_example(mic, coords, filename, **extra)
+        format.write(extra['output'], coords, default_format=format.spiderdoc)
     return filename, peaks
 
 def search(img, disable_prune=False, limit_template=0, limit=0, experimental=False, **extra):
@@ -327,14 +333,7 @@ def merge_coords(coords1, coords2, pixel_diameter, **extra):
     '''
     
     pixel_radius = pixel_diameter/2
-    pixel_radius = pixel_radius*pixel_radius
-    selected = []
-    for i, f in enumerate(coords2):
-        dist = f[1:3]-coords1[:, 1:3]
-        numpy.square(dist, dist)
-        dist = numpy.sum(dist, axis=1)
-        if not (dist.min() < pixel_radius):
-            selected.append(i)
+    selected = numpy.argwhere(~distance.any_within(coords2[:, 1:3], coords1[:, 1:3], pixel_radius)).ravel()
     coords3 = numpy.zeros((coords1.shape[0]+len(selected), coords1.shape[1]))
     coords3[:coords1.shape[0]]=coords1
     coords3[coords1.shape[0]:]=coords2[selected]
@@ -707,42 +707,54 @@ def initialize(files, param):
                 os.makedirs(os.path.dirname(param['pow_file']))
             except: pass
             _logger.info("Writing power spectra to %s"%param['pow_file'])
-        try:
-            defvals = format.read(param['output'], map_ids=True)
-        except:
+        if param.get('result_store') is not None:
             param['output_offset']=0
+            _logger.info("Restarting with %d saved results"%len(param['result_store']))
         else:
-            saved=[]
-            for filename in param['finished']:
-                fid = spider_utility.spider_id(filename)
-                if fid not in defvals: 
-                    files.append(filename)
-                    continue
-                saved.append(defvals[fid])
-            if len(saved) > 0: format.write(param['output'], saved)
-            param['output_offset']=len(saved)
+            try:
+                defvals = format.read(param['output'], map_ids=True)
+            except:
+                param['output_offset']=0
+            else:
+                saved=[]
+                for filename in param['finished']:
+                    fid = spider_utility.spider_id(filename)
+                    if fid not in defvals: 
+                        files.append(filename)
+                        continue
+                    saved.append(defvals[fid])
+                if len(saved) > 0: format.write(param['output'], saved)
+                param['output_offset']=len(saved)
         
         if param['cs'] == 0.0:
             _logger.info("Using CTF model appropriate for 0 CS")
         if param['selection_file'] != "":
             select = format.read(param['selection_file'], numeric=True)
             files = selection_utility.select_file_subset(files, select, param.get('id_len', 0), len(param['finished']) > 0)
-        param['defocus_header']="id,defocus_u,defocus_v,astig_ang,defocus_avg,astig_mag,error".split(",")
+        param['defocus_header']=result_header()
         param['defocus_arr'] = numpy.zeros((len(files), 7))
     return files
 
-def reduce_all(filename, file_completed, defocus_arr, output_offset, output, defocus_header, **extra):
+def result_header(**extra):
+    # Columns saved for each micrograph in the result store
+    
+    return "id,defocus_u,defocus_v,astig_ang,defocus_avg,astig_mag,error".split(",")
+
+def reduce_all(filename, file_completed, defocus_arr, output_offset, output, defocus_header, result_store=None, **extra):
     # Process each input file in the main thread (for multi-threaded code)
     
     filename, defocus_vals = filename
-    if len(defocus_vals) > 0:
+    if len(defocus_vals) > 0 and result_store is not None:
+        defocus_arr[file_completed-1, :len(defocus_vals)]=defocus_vals
+        result_store.append(int(defocus_vals[0]), defocus_vals)
+    elif len(defocus_vals) > 0:
         defocus_arr[file_completed-1, :len(defocus_vals)]=defocus_vals
         mode = 'a' if (file_completed+output_offset) > 1 else 'w'
         format.write(output, defocus_vals.reshape((1, defocus_vals.shape[0])), format=format.spiderdoc, 
                              header=defocus_header, mode=mode, write_offset=file_completed+output_offset)
     return filename
 
-def finalize(files, defocus_arr, output, dpi=300, **extra):
+def finalize(files, output, defocus_arr=None, dpi=300, result_store=None, **extra):
     ''' Write out plots summarizing CTF features of the input images
     
     These plots include
@@ -763,11 +775,17 @@ def finalize(files, defocus_arr, output, dpi=300, **extra):
                  Output filename 
         dpi : int
               Resolution of plot in dots per inch
+        result_store : ResultStore
+                       Results saved over every run, written to `output`
         extra : dict
                 Unused keyword arguments
     '''
     
-    if len(files) > 0:
+    if result_store is not None:
+        defocus_arr = result_store.values()
+        format.write(output, defocus_arr, format=format.spiderdoc, header=result_header())
+        _logger.info("Wrote %d results to %s"%(len(defocus_arr), output))
+    if defocus_arr is not None and len(defocus_arr) > 0:
         defocus = (defocus_arr[:, 1]+defocus_arr[:, 2])/2.0
         magnitude = numpy.abs((defocus_arr[:, 1]-defocus_arr[:, 2])/2.0)
         plot_histogram(output, defocus, 'Defocus', dpi=dpi)
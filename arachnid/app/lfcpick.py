@@ -14,6 +14,9 @@ Notes
  #. Decimation - Use the `--bin-factor` parameter to reduce the size of the micrograph for more efficient processing. Your coordinates will be on the full micrograph.
     
  #. Parallel Processing - Several micrographs can be run in parallel (assuming you have the memory and cores available). `-p 8` will run 8 micrographs in parallel. 
+ 
+ #. Cascade - Use the `--cascade-factor` parameter to propose candidates on a coarser micrograph (2-4 times smaller) and
+    refine only their neighborhoods at the working scale. This reduces the cost for large micrographs.
 
 Examples
 ========
@@ -27,6 +30,10 @@ Examples
     # Run with a disk as a template on a raw CCD micrograph
     
     $ ara-lfcpick mic_*.spi -o sndc_00001.spi -r 110 -w 312 --invert
+    
+    # Propose candidates at 4 times coarser scale, then refine at the working scale
+    
+    $ ara-lfcpick mic_*.spi -o sndc_00001.spi -r 110 -w 312 --cascade-factor 4
 
 Critical Options
 ================
@@ -96,6 +103,11 @@ selection.
     
     Number of windows to return
 
+.. option:: --cascade-factor <int>
+    
+    Search for candidates on a micrograph decimated by this factor, then refine each candidate
+    with the cross-correlation over its neighborhood at the working scale (0 disables)
+
 Other Options
 =============
 
@@ -148,7 +160,7 @@ def process(filename, id_len=0, **extra):
     format.write(extra['output'], coords, default_format=format.spiderdoc)
     return filename, peaks
 
-def search(img, use_spectrum=False, limit=0, bin_factor=1.0, mask=None, **extra):
+def search(img, use_spectrum=False, limit=0, bin_factor=1.0, mask=None, cascade_factor=0, **extra):
     ''' Search a micrograph for particles using a template
     
     :Parameters:
@@ -163,6 +175,8 @@ def search(img, use_spectrum=False, limit=0, bin_factor=1.0, mask=None, **extra)
                      Image downsampling factor
         mask : array
                Mask for 2D projection of the particle
+        cascade_factor : int
+                         Search for candidates at a coarser scale by this factor, then refine (0 disables)
         extra : dict
                 Unused key word arguments
     
@@ -172,10 +186,13 @@ def search(img, use_spectrum=False, limit=0, bin_factor=1.0, mask=None, **extra)
                 List of peaks and coordinates
     '''
     
-    template = create_template(bin_factor=bin_factor, **extra)
-    if use_spectrum: cc_map = scf_center(img, template, mask)
-    else: cc_map = lfc(img, template, mask)
-    peaks = search_peaks(cc_map, **extra)
+    if cascade_factor > 1 and not use_spectrum:
+        peaks = search_cascade(img, mask, cascade_factor, bin_factor=bin_factor, **extra)
+    else:
+        template = create_template(bin_factor=bin_factor, **extra)
+        if use_spectrum: cc_map = scf_center(img, template, mask)
+        else: cc_map = lfc(img, template, mask)
+        peaks = search_peaks(cc_map, **extra)
     peaks = numpy.asarray(peaks).squeeze()
     if peaks.shape[0] < 2: raise ValueError, "No peaks found"
     if peaks.ndim == 1: peaks = peaks.reshape((len(peaks)/3, 3))
@@ -222,6 +239,172 @@ def search_peaks(cc_map, pixel_diameter, overlap_mult, peak_last=None, fwidth=No
         peaks = ndimage_utility.find_peaks_fast(cc_map, radius*overlap_mult, fwidth)
     return peaks
 
+def search_cascade(img, mask, cascade_factor, pixel_diameter, overlap_mult, window, fwidth=None, bin_factor=1.0, **extra):
+    ''' Search a micrograph for particles from coarse to fine
+    
+    Candidates are the peaks of the locally normalized cross-correlation of
+    the micrograph decimated by `cascade_factor` (Fourier cropping). Each
+    candidate is then refined at the working scale over a neighborhood of
+    one coarse pixel, see :py:func:`refine_peaks`.
+    
+    :Parameters:
+        
+        img : array
+              Micrograph image
+        mask : array
+               Mask for 2D projection of the particle at the working scale
+        cascade_factor : int
+                         Decimation factor of the coarse search
+        pixel_diameter : int
+                         Diameter of particle in pixels
+        overlap_mult : float
+                       Amount of allowed overlap
+        window : int
+                 Size of the window in pixels
+        fwidth : float
+                 Experimental parameters
+        bin_factor : float
+                     Image downsampling factor
+        extra : dict
+                Unused key word arguments
+    
+    :Returns:
+        
+        peaks : array
+                List of peaks and coordinates
+    '''
+    
+    cascade_factor = int(cascade_factor)
+    shape = (img.shape[0]/cascade_factor, img.shape[1]/cascade_factor)
+    coarse = ndimage_interpolate.resample_fft(img, shape)
+    scale = numpy.asarray(img.shape, dtype=numpy.float)/shape
+    template = create_template(bin_factor=bin_factor, window=window, pixel_diameter=pixel_diameter, **extra)
+    extra.update(ds_kernel=None)
+    ctemplate = create_template(bin_factor=bin_factor*cascade_factor, window=float(window)/cascade_factor, pixel_diameter=float(pixel_diameter)/cascade_factor, **extra)
+    cmask = ndimage_utility.model_disk(int(pixel_diameter/2.0/cascade_factor), ctemplate.shape)
+    if fwidth is not None and fwidth > 0: fwidth = float(fwidth)/cascade_factor
+    peaks = search_peaks(lfc(coarse, ctemplate, cmask), float(pixel_diameter)/cascade_factor, overlap_mult, fwidth=fwidth)
+    _logger.debug("Refining %d candidates from the coarse search"%len(peaks))
+    peaks[:, 1] *= scale[1]
+    peaks[:, 2] *= scale[0]
+    return refine_peaks(img, template, mask, peaks, int(numpy.ceil(scale.max())))
+
+def refine_peaks(img, template, mask, peaks, search, batch_size=256):
+    ''' Refine peaks with the locally normalized cross-correlation of their neighborhood
+    
+    A window around each peak with a margin of half the template is cropped from
+    the micrograph, so the cross-correlation over the neighborhood equals the
+    one over the full micrograph. The windows are correlated in batches and the
+    maximum within `search` pixels of the peak is kept. Peaks that converge to
+    the same pixel are merged.
+    
+    :Parameters:
+        
+        img : array
+              Micrograph image
+        template : array
+                   Template
+        mask : array
+               Mask for variance map
+        peaks : array
+                List of peaks and coordinates (peak, x, y)
+        search : int
+                 Search radius around each peak in pixels
+        batch_size : int
+                     Number of windows correlated at once
+    
+    :Returns:
+        
+        peaks : array
+                List of refined peaks and coordinates (peak, x, y)
+    '''
+    
+    half = search + max(template.shape)/2 + 1
+    size = numpy.asarray([min(_fft_size(2*half, img.shape[i]%2), img.shape[i]) for i in xrange(2)])
+    center = numpy.round(peaks[:, 2:0:-1]).astype(numpy.int)
+    beg = numpy.clip(center-size/2, 0, numpy.asarray(img.shape)-size)
+    offset = numpy.arange(-search, search+1)
+    refined = numpy.zeros((len(peaks), 3))
+    for i in xrange(0, len(peaks), batch_size):
+        end = min(i+batch_size, len(peaks))
+        crops = numpy.asarray([img[y:y+size[0], x:x+size[1]] for y, x in beg[i:end]])
+        cc_map = lfc_stack(crops, template, mask)
+        rows = numpy.clip((center[i:end, 0]-beg[i:end, 0])[:, numpy.newaxis]+offset, 0, size[0]-1)
+        cols = numpy.clip((center[i:end, 1]-beg[i:end, 1])[:, numpy.newaxis]+offset, 0, size[1]-1)
+        cc_map = cc_map[numpy.arange(end-i)[:, numpy.newaxis, numpy.newaxis], rows[:, :, numpy.newaxis], cols[:, numpy.newaxis, :]].reshape((end-i, -1))
+        best = numpy.argmax(cc_map, axis=1)
+        refined[i:end, 0] = cc_map[numpy.arange(end-i), best]
+        refined[i:end, 1] = beg[i:end, 1]+cols[numpy.arange(end-i), best%len(offset)]
+        refined[i:end, 2] = beg[i:end, 0]+rows[numpy.arange(end-i), best/len(offset)]
+    refined = refined[numpy.argsort(-refined[:, 0], kind='mergesort')]
+    index = numpy.unique(refined[:, 2]*img.shape[1]+refined[:, 1], return_index=True)[1]
+    return refined[numpy.sort(index)]
+
+def lfc_stack(imgs, template, mask):
+    ''' Locally normalized fast cross-correlation of a stack of images
+    
+    This gives the same result as :py:func:`lfc` for each image.
+    
+    :Parameters:
+            
+        imgs : array
+               Stack of images (n, rows, columns)
+        template : array
+                   Template
+        mask : array
+               Mask for variance map
+    
+    :Returns:
+            
+        cc_map : array
+                 Stack of cross-correlation maps
+    '''
+    
+    shape = imgs.shape[1:]
+    tot = numpy.sum(mask>0)
+    mask = ndimage_utility.normalize_standard(mask.astype(numpy.float), mask, True)*(mask>0)
+    ftemplate = numpy.fft.rfft2(ndimage_utility.pad_image(template.astype(numpy.float), shape)).conj()
+    fmask = numpy.fft.rfft2(ndimage_utility.pad_image(mask, shape)).conj()
+    fimg = numpy.fft.rfft2(imgs)
+    cc_map = numpy.fft.irfft2(fimg*ftemplate, shape)
+    mean = numpy.fft.irfft2(fimg*fmask, shape)
+    del fimg
+    var = numpy.fft.irfft2(numpy.fft.rfft2(numpy.square(imgs))*fmask, shape)
+    mean /= tot
+    numpy.square(mean, mean)
+    numpy.subtract(var, mean, var)
+    del mean
+    var[var<=0]=9e20
+    numpy.sqrt(var, var)
+    cc_map /= var
+    return numpy.fft.fftshift(cc_map, axes=(1, 2))
+
+def _fft_size(n, parity=0):
+    ''' Find the smallest size for an efficient FFT
+    
+    :Parameters:
+            
+        n : int
+            Minimum size
+        parity : int
+                 Remainder of the size divided by 2
+    
+    :Returns:
+            
+        size : int
+               Smallest size not less than `n` with the given parity
+               and no prime factor greater than 5
+    '''
+    
+    n = int(n)
+    if (n%2) != parity: n += 1
+    while True:
+        m = n
+        for f in (2, 3, 5):
+            while (m%f) == 0: m /= f
+        if m == 1: return n
+        n += 2
+
 def scf_center(img, template, mask):
     ''' Variant of the spectrum correlation function
     
@@ -363,6 +546,7 @@ def initialize(files, param):
         if param['invert']: _logger.info("Inverting contrast of the micrograph")
         _logger.info("Disk Multiplier: %f"%param['disk_mult'])
         _logger.info("Overlap Multiplier: %f"%param['overlap_mult'])
+        if param['cascade_factor'] > 1: _logger.info("Cascade search at %d times coarser scale"%param['cascade_factor'])
     
     if 'selection_file' in param and param['selection_file'] != "":
         if os.path.exists(param['selection_file']):
@@ -418,6 +602,7 @@ def setup_options(parser, pgroup=None, main_option=False):
     group.add_option("",   disable_bin=False,   help="Disable micrograph decimation")
     group.add_option("",   invert=False,        help="Invert the contrast of CCD micrographs")
     group.add_option("",   fwidth=-1.0,          help="Experimental option for peak selection")
+    group.add_option("",   cascade_factor=0,    help="Search for candidates on a micrograph decimated by this factor, then refine at the working scale (0 disables)", gui=dict(minimum=0, maximum=8, singleStep=1))
     
     if main_option:
         pgroup.add_option("-i", input_files=[], help="List of filenames for the input micrographs", required_file=True, gui=dict(filetype="file-list"))
@@ -440,6 +625,7 @@ def check_options(options, main_option=False):
     
     from ..core.app.settings import OptionValueError
     if options.bin_factor == 0.0: raise OptionValueError, "Bin factor cannot be zero (--bin-factor)"
+    if options.cascade_factor < 0: raise OptionValueError, "Cascade factor cannot be negative (--cascade-factor)"
 
 def main():
     #Main entry point for this script
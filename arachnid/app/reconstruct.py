@@ -75,8 +75,8 @@ def batch(files, image_file, output, rand_subset=0, experimental=False, experime
         idx = numpy.argsort(label[:, 0]).squeeze()
         label = label[idx].copy()
         align = align[idx].copy()
-        iter_single_images1 = ndimage_file.iter_images(image_file, label[even])
-        iter_single_images2 = ndimage_file.iter_images(image_file, label[odd])
+        iter_single_images1 = ndimage_file.iter_images_prefetch(image_file, label[even])
+        iter_single_images2 = ndimage_file.iter_images_prefetch(image_file, label[odd])
         # todo support multiple spider prefixes
     else:
         _logger.debug("Supports stacks non-SPIDER filenames")
@@ -84,8 +84,8 @@ def batch(files, image_file, output, rand_subset=0, experimental=False, experime
             files = [files[i] for i in selection]
             align = align[selection].copy()
         
-        iter_single_images1 = ndimage_file.iter_images([files[i] for i in even])
-        iter_single_images2 = ndimage_file.iter_images([files[i] for i in odd])
+        iter_single_images1 = ndimage_file.iter_images_prefetch([files[i] for i in even])
+        iter_single_images2 = ndimage_file.iter_images_prefetch([files[i] for i in odd])
     align_curr = align[curr_slice].copy()
     if negate_trans:
         align_curr[:, 4:6] = -align_curr[:, 4:6]
@@ -116,6 +116,14 @@ Generally, these options do not need to be considered unless you are developing
 
     Angular search range
 
+.. option:: --feature-cache <DIRECTORY>
+
+    Directory for on-disk feature matrices, the PCA then streams blocks from disk rather than holding the matrix in memory (each matrix is removed once its view is embedded)
+
+.. option:: --pca-block-size <INT>
+
+    Number of rows in a block when streaming the feature matrix
+
 Other Options
 =============
 
@@ -152,11 +160,12 @@ from ..core.learn import dimensionality_reduction
 import logging
 import numpy
 import scipy
+import os
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
-def process(input_vals, output, **extra):#, neig=1, nstd=1.5
+def process(input_vals, output, feature_cache="", **extra):#, neig=1, nstd=1.5
     '''Concatenate files and write to a single output file
         
     :Parameters:
@@ -165,6 +174,9 @@ def process(input_vals, output, **extra):#, neig=1, nstd=1.5
                      Tuple(view id, image labels and alignment parameters)
         output : str
                  Filename for output file
+        feature_cache : str
+                        Directory for on-disk feature matrices, empty to hold them in memory (each
+                        matrix is removed once its view is embedded)
         extra : dict
                 Unused key word arguments
                 
@@ -180,13 +192,20 @@ def process(input_vals, output, **extra):#, neig=1, nstd=1.5
     filename = label[0] if isinstance(label, tuple) else label[0][0]
     mask = create_mask(filename, **extra)
     
+    cache_file = os.path.join(feature_cache, "feat_%d.cache"%int(input_vals[0])) if feature_cache != "" else None
     openmp.set_thread_count(1) # todo: move to process queue
-    data = ndimage_processor.create_matrix_from_file(label, image_transform, align=align, mask=mask, dtype=numpy.float32, **extra)
-    openmp.set_thread_count(extra['thread_count'])
-    assert(data.shape[0] == align.shape[0])
-    tst = data-data.mean(0)
-
-    feat = embed_sample(tst, **extra)
+    try:
+        data = ndimage_processor.create_matrix_from_file(label, image_transform, align=align, mask=mask, dtype=numpy.float32, cache_file=cache_file, **extra)
+        openmp.set_thread_count(extra['thread_count'])
+        assert(data.shape[0] == align.shape[0])
+        if cache_file is None:
+            tst = data-data.mean(0)
+            feat = embed_sample(tst, **extra)
+        else:
+            feat = embed_sample(data, centered=False, **extra)
+        del data
+    finally:
+        if cache_file is not None and os.path.exists(cache_file): os.remove(cache_file)
         
     rsel=None
     if feat is not None:
@@ -202,7 +221,7 @@ def process(input_vals, output, **extra):#, neig=1, nstd=1.5
     
     return input_vals, rsel
 
-def embed_sample(samp, neig, expected, niter=5, **extra):
+def embed_sample(samp, neig, expected, niter=5, centered=True, pca_block_size=4096, thread_count=1, **extra):
     ''' Embed the sample images into a lower dimensional factor space
     
     :Parameters:
@@ -213,6 +232,15 @@ def embed_sample(samp, neig, expected, niter=5, **extra):
                Number of Eigen vectors
         expected : float
                    Probability an image does not contain an outlier
+        niter : int
+                Number of iterations for cleaning
+        centered : bool
+                   If False, `samp` is not centered and is streamed in blocks (e.g. a memory mapped
+                   feature cache), see :py:func:`dimensionality_reduction.dhr_pca_incremental`
+        pca_block_size : int
+                         Number of rows in a block when streaming the samples
+        thread_count : int
+                       Number of threads accumulating blocks when streaming the samples
         extra : dict
                 Unused keyword arguments
     
@@ -222,7 +250,10 @@ def embed_sample(samp, neig, expected, niter=5, **extra):
                2D array where each row is a compressed image and each column a factor
     '''
     
-    eigv, feat=dimensionality_reduction.dhr_pca(samp, samp, neig, expected, True, niter)
+    if centered:
+        eigv, feat=dimensionality_reduction.dhr_pca(samp, samp, neig, expected, True, niter)
+    else:
+        eigv, feat=dimensionality_reduction.dhr_pca_incremental(samp, None, neig, expected, False, niter, pca_block_size, thread_count)
     _logger.info("Eigen: %s"%(",".join([str(v) for v in eigv[:10]])))
     tc=eigv.cumsum()
     _logger.info("Eigen-cum: %s"%(",".join([str(v) for v in tc[:10]])))
@@ -744,6 +775,8 @@ def setup_options(parser, pgroup=None, main_option=False):
     group.add_option("", niter=5,                   help="Number of iterations for cleaning")
     group.add_option("", diagnostic="",             help="Diagnosic view averages", gui=dict(filetype="save"), dependent=False)
     group.add_option("", class_index=0,             help="Select a specifc class within the alignment file")
+    group.add_option("", feature_cache="",          help="Directory for on-disk feature matrices, the PCA then streams blocks from disk rather than holding the matrix in memory (each matrix is removed once its view is embedded)", gui=dict(filetype="open"), dependent=False)
+    group.add_option("", pca_block_size=4096,       help="Number of rows in a block when streaming the feature matrix", dependent=False)
     pgroup.add_option_group(group)
     if main_option:
         pgroup.add_option("-i", input_files=[], help="List of filenames for the input particle stacks, e.g. cluster/win/win_*.dat ", required_file=True, gui=dict(filetype="open"))
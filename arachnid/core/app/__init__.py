@@ -12,4 +12,7 @@
     tracing
     file_processor
     progress
+    instrument
+    result_store
+    log_monitor
 '''
\ No newline at end of file
@@ -56,6 +56,16 @@ The target module may include any of the following functions:
    :param extra: Keyword arguments (Options from the command line or config file, plus additional options)
    :returns: A dictionary of keywords to add or update.
 
+.. py:function:: result_header(**extra)
+
+   Names of the numeric values saved for each processed file. If defined, the results are
+   saved in a crash-safe, append-only :py:class:`ResultStore <arachnid.core.app.result_store.ResultStore>`
+   that is passed to :py:func:`reduce_all` and :py:func:`finalize` as the `result_store` keyword argument.
+   The store replaces the restart file: a file with a record in the store is not processed again.
+
+   :param extra: Unused keyword arguments (Options from the command line or config file, plus additional options)
+   :returns: List of column names
+
 .. py:function:: init_root(files, extra)
 
    Initialize the input data before processing (first init to be called). During parallel processing this is invoked only
@@ -103,6 +113,14 @@ program architecture.
     
     Test if the program will restart
 
+.. option:: --profile-report <FILENAME>
+    
+    Write timers and counters collected over all workers and nodes to this file (.json or .csv)
+
+.. option:: --profile-workers <bool>
+    
+    Run each worker under cProfile, the statistics are written next to the profile report
+
 .. end-options
 
 ..todo:: 
@@ -119,6 +137,8 @@ program architecture.
         Program options parsing for command line and configuration file
     Module :py:mod:`arachnid.core.app.tracing`
         Logging controls
+    Module :py:mod:`arachnid.core.app.instrument`
+        Timers and counters for profiling a run
     Module :py:mod:`arachnid.core.parallel.mpi_utility`
         Handels parallizing both single node and multi-node processing
 
@@ -128,8 +148,14 @@ program architecture.
 from ..parallel import mpi_utility
 from ..metadata import spider_utility
 import tracing
+import instrument
+import result_store
 from progress import progress
 import multiprocessing
+import multiprocessing.util
+import cProfile
+import glob
+import time
 import os
 import logging
 import sys
@@ -180,91 +206,281 @@ def main(files, module, **extra):
     
     _logger.debug("File processer - begin")
     process, initialize, finalize, reduce_all, init_process, init_root = getattr(module, "process"), getattr(module, "initialize", None), getattr(module, "finalize", None), getattr(module, "reduce_all", None), getattr(module, "init_process", None), getattr(module, "init_root", None)
-    monitor=None
-    if mpi_utility.is_root(**extra):
-        if init_root is not None:
-            _logger.debug("Init-root")
-            f = init_root(files, extra)
-            if f is not None: files = f
-        _logger.debug("Test dependencies1: %d"%len(files))
-        files, finished = check_dependencies(files, restart_file, **extra)
-        extra['finished'] = finished
-        _logger.debug("Test dependencies2: %d"%len(files))
-    else: extra['finished']=None
-    _logger.debug("Start processing1")
-    tfiles = mpi_utility.broadcast(files, **extra)
-    
-    # Why?
-    if not mpi_utility.is_root(**extra):
-        tfiles = set([os.path.basename(f) for f in tfiles])
-        files = [f for f in files if f in tfiles]
-    _logger.debug("Start processing2")
-    
-    extra['finished'] = mpi_utility.broadcast(extra['finished'], **extra)
-    if initialize is not None:
-        _logger.debug("Init")
-        f = initialize(files, extra)
-        _logger.debug("Init-2")
-        if f is not None: files = f
-        #files = mpi_utility.broadcast(files, **extra)
-    _logger.debug("Start processing3")
-    if len(files) == 0:
+    profile_report = extra.get('profile_report', "")
+    if profile_report != "":
+        start_time = time.time()
+        rank = mpi_utility.get_rank(**extra)
+        for f in glob.glob(_profile_prefix(profile_report, rank)+".*.json"): os.unlink(f)
+        instrument.enable()
+        process = _instrumented_process(process, profile_report, rank, extra.get('profile_workers', False))
+    try:
+        result_header = getattr(module, "result_header", None)
+        monitor=None
+        store=None
         if mpi_utility.is_root(**extra):
-            _logger.debug("No files to process")
-            if finalize is not None: finalize(files, **extra)
-        return
-    
-    if mpi_utility.is_root(**extra):
-        _logger.debug("Setup progress monitor")
-        monitor = progress(len(files))
-    
-    if restart_file is not None: tracing.backup(restart_file)
-    restart_fout = open(restart_file, 'w') if restart_file is not None else None
-    if restart_fout is not None:
-        for f in finished:
-            fileid = spider_utility.spider_id(f) if spider_utility.is_spider_filename(f) else f
-            restart_fout.write(str(fileid)+'\n')
-    current = 0
-    _logger.debug("Start processing")
-    ignored_errors=[0]
-    for index, filename in mpi_utility.mpi_reduce(process, files, init_process=init_process, ignored_errors=ignored_errors, **extra):
+            if init_root is not None:
+                _logger.debug("Init-root")
+                f = init_root(files, extra)
+                if f is not None: files = f
+            if result_header is not None and restart_file is not None:
+                store = open_result_store(files, restart_file.replace('.restart.', '.results.'), result_header(**extra), **extra)
+            extra['result_store'] = store
+            _logger.debug("Test dependencies1: %d"%len(files))
+            files, finished = check_dependencies(files, restart_file, **extra)
+            extra['finished'] = finished
+            _logger.debug("Test dependencies2: %d"%len(files))
+        else: 
+            extra['finished']=None
+            extra['result_store']=None
+        _logger.debug("Start processing1")
+        tfiles = mpi_utility.broadcast(files, **extra)
+    
+        # Why?
+        if not mpi_utility.is_root(**extra):
+            tfiles = set([os.path.basename(f) for f in tfiles])
+            files = [f for f in files if f in tfiles]
+        _logger.debug("Start processing2")
+    
+        extra['finished'] = mpi_utility.broadcast(extra['finished'], **extra)
+        if initialize is not None:
+            _logger.debug("Init")
+            f = initialize(files, extra)
+            _logger.debug("Init-2")
+            if f is not None: files = f
+            #files = mpi_utility.broadcast(files, **extra)
+        _logger.debug("Start processing3")
+        if len(files) == 0:
+            if mpi_utility.is_root(**extra):
+                _logger.debug("No files to process")
+                if finalize is not None: finalize(files, **extra)
+            return
+    
         if mpi_utility.is_root(**extra):
-            try:
-                monitor.update()
-                if reduce_all is not None:
-                    current += 1
+            _logger.debug("Setup progress monitor")
+            monitor = progress(len(files))
+    
+        if store is not None: restart_file = None
+        if restart_file is not None: tracing.backup(restart_file)
+        restart_fout = open(restart_file, 'w') if restart_file is not None else None
+        if restart_fout is not None:
+            for f in finished:
+                fileid = spider_utility.spider_id(f) if spider_utility.is_spider_filename(f) else f
+                restart_fout.write(str(fileid)+'\n')
+        current = 0
+        # The keys are taken up front as an error in the root process clears files
+        keys = [_result_key(f) for f in files] if store is not None else None
+        _logger.debug("Start processing")
+        ignored_errors=[0]
+        listener = None
+        if extra.get('log_aggregate', False) and extra['worker_count'] > 1:
+            listener = tracing.start_log_listener()
+            extra['log_queue'] = listener.queue
+        try:
+            for index, filename in mpi_utility.mpi_reduce(process, files, init_process=init_process, ignored_errors=ignored_errors, **extra):
+                if mpi_utility.is_root(**extra):
                     try:
-                        filename = reduce_all(filename, file_index=index, file_count=len(files), file_completed=current, **extra)
-                    except:
-                        ignored_errors[0]+=1
-                        if _logger.getEffectiveLevel()==logging.DEBUG or 1 == 1:
-                            _logger.exception("Reduce to root failed")
+                        monitor.update()
+                        if reduce_all is not None:
+                            current += 1
+                            try:
+                                with instrument.timer('reduce'):
+                                    filename = reduce_all(filename, file_index=index, file_count=len(files), file_completed=current, **extra)
+                            except:
+                                ignored_errors[0]+=1
+                                if _logger.getEffectiveLevel()==logging.DEBUG or 1 == 1:
+                                    _logger.exception("Reduce to root failed")
+                                else:
+                                    _logger.warn("Reduce to root failed - report this problem to the developer")
+                            if isinstance(filename, tuple):
+                                filename, msg = filename
+                            else: msg=filename
+                            _logger.info("Finished: %d,%d - Time left: %s - %s"%(current, len(files), monitor.time_remaining(True), str(msg)))
                         else:
-                            _logger.warn("Reduce to root failed - report this problem to the developer")
-                    if isinstance(filename, tuple):
-                        filename, msg = filename
-                    else: msg=filename
-                    _logger.info("Finished: %d,%d - Time left: %s - %s"%(current, len(files), monitor.time_remaining(True), str(msg)))
-                else:
-                    _logger.info("Finished: %d,%d - Time left: %s"%(current, len(files), monitor.time_remaining(True)))
-            except:
-                _logger.exception("Error in root process")
-                del files[:]
-            else:
-                if restart_fout is not None:
-                    if spider_utility.is_spider_filename(filename): filename=spider_utility.spider_id(filename)
-                    restart_fout.write(str(filename)+'\n')
-                    restart_fout.flush()
-    if ignored_errors[0] > 0:
-        see_also="\n\nSee .%s.crash_report for more details"%os.path.basename(sys.argv[0])
-        _logger.warn("Errors occurred during run"+see_also)
-    if restart_fout is not None: restart_fout.close()
-    if len(files) == 0:
-        raise ValueError, "Error in root process"
-    if mpi_utility.is_root(**extra):
-        if finalize is not None: finalize(files, **extra)
-
-def check_dependencies(files, restart_file, infile_deps, outfile_deps=[], opt_changed=False, force=False, id_len=0, data_ext=None, restart_test=False, disable_restart_file=False, **extra):
+                            _logger.info("Finished: %d,%d - Time left: %s"%(current, len(files), monitor.time_remaining(True)))
+                    except:
+                        _logger.exception("Error in root process")
+                        del files[:]
+                    else:
+                        if store is not None and keys[index] not in store: store.append(keys[index])
+                        if restart_fout is not None:
+                            if spider_utility.is_spider_filename(filename): filename=spider_utility.spider_id(filename)
+                            restart_fout.write(str(filename)+'\n')
+                            restart_fout.flush()
+        finally:
+            if restart_fout is not None: restart_fout.close()
+            if store is not None: store.close()
+            if listener is not None:
+                listener.stop()
+                del extra['log_queue']
+        if ignored_errors[0] > 0:
+            see_also="\n\nSee .%s.crash_report for more details"%os.path.basename(sys.argv[0])
+            _logger.warn("Errors occurred during run"+see_also)
+        if len(files) == 0:
+            raise ValueError, "Error in root process"
+        if mpi_utility.is_root(**extra):
+            if finalize is not None: finalize(files, **extra)
+    finally:
+        if profile_report != "":
+            try:
+                process.dump_stats()
+                write_profile(time.time()-start_time, **extra)
+            finally: instrument.disable()
+
+def open_result_store(files, filename, header, opt_changed=False, force=False, **extra):
+    ''' Open the result store for a run
+    
+    :Parameters:
+        
+        files : list
+                List of input files
+        filename : str
+                   Base filename for the result store
+        header : list
+                 Names of the values saved for each file
+        opt_changed : bool
+                      If true, then options have changed; discard previous results
+        force : bool
+                  Discard previous results
+        extra : dict
+                Unused extra keyword arguments
+    
+    :Returns:
+        
+        store : ResultStore
+                Result store or None if the input files do not have a numeric ID
+    '''
+    
+    for f in files:
+        if _result_key(f) is None:
+            _logger.warn("Result store disabled, input does not have a SPIDER ID: %s"%str(f))
+            return None
+    return result_store.ResultStore(filename, header, truncate=opt_changed or force)
+
+def _result_key(filename):
+    ''' Get the key of an input file in the result store
+    
+    :Parameters:
+        
+        filename : str or tuple
+                   Input filename or group whose first element is an integer ID
+    
+    :Returns:
+        
+        key : int
+              SPIDER ID of the file or None
+    '''
+    
+    if isinstance(filename, tuple):
+        try: return int(filename[0])
+        except: return None
+    if not spider_utility.is_spider_filename(filename): return None
+    return spider_utility.spider_id(filename)
+
+def write_profile(elapsed, profile_report, **extra):
+    ''' Collect the timers and counters from every worker and node, then
+    write the profile report on the root node
+    
+    :Parameters:
+        
+        elapsed : float
+                  Wall time of the run in seconds
+        profile_report : str
+                         Output filename for the profile report (.json or .csv)
+        extra : dict
+                Unused extra keyword arguments
+    '''
+    
+    rank = mpi_utility.get_rank(**extra)
+    for p in multiprocessing.active_children(): p.join()
+    stats = [instrument.snapshot()]
+    for filename in glob.glob(_profile_prefix(profile_report, rank)+".*.json"):
+        try: stats.append(instrument.load(filename))
+        except:
+            _logger.warn("Failed to read worker profile: %s"%filename)
+            continue
+        os.unlink(filename)
+    stats = instrument.merge(*stats)
+    stats = mpi_utility.gather_object(stats, **extra)
+    if not mpi_utility.is_root(**extra): return
+    stats = instrument.merge(*stats)
+    stats['timers']['run'] = [1, elapsed, elapsed]
+    stats['nodes'] = max(1, mpi_utility.get_size(**extra))
+    instrument.write_report(profile_report, stats)
+    _logger.info("Profile: %s - written to %s"%(instrument.format_summary(stats, 5), profile_report))
+
+def _profile_prefix(profile_report, rank):
+    ''' Get the prefix for the statistics written by each worker
+    
+    :Parameters:
+        
+        profile_report : str
+                         Output filename for the profile report
+        rank : int
+               Rank of the current node
+    
+    :Returns:
+        
+        prefix : str
+                 Prefix for worker statistics files
+    '''
+    
+    return os.path.splitext(profile_report)[0]+".rank%d"%rank
+
+def _instrumented_process(process, profile_report, rank, profile_workers=False):
+    ''' Wrap the `process` function of a module to time each call and
+    save the statistics of each worker process
+    
+    The time a worker waits between two files is recorded as `worker.idle`. A worker
+    process writes its statistics once, when it exits, and the `dump_stats` attribute
+    of the wrapper writes the cProfile statistics of the main process.
+    
+    :Parameters:
+        
+        process : function
+                  Function that processes a single file
+        profile_report : str
+                         Output filename for the profile report
+        rank : int
+               Rank of the current node
+        profile_workers : bool
+                          Run each call under cProfile and write the statistics to
+                          `$prefix.rank$rank.$pid.prof`
+    
+    :Returns:
+        
+        wrapper : function
+                  Instrumented process function
+    '''
+    
+    main_pid = os.getpid()
+    state = dict(pid=None, last=None, profile=None)
+    
+    def wrapper(filename, **extra):
+        pid = os.getpid()
+        if state['pid'] != pid:
+            if pid != main_pid: instrument.enable()
+            state.update(pid=pid, last=None, profile=cProfile.Profile() if profile_workers else None)
+            if pid != main_pid: multiprocessing.util.Finalize(None, dump_stats, exitpriority=10)
+        beg = time.time()
+        if state['last'] is not None: instrument.add_time('worker.idle', beg-state['last'])
+        try:
+            with instrument.timer('process'):
+                if state['profile'] is not None: return state['profile'].runcall(process, filename, **extra)
+                return process(filename, **extra)
+        finally:
+            state['last'] = time.time()
+            instrument.count('files')
+    
+    def dump_stats():
+        pid = os.getpid()
+        if state['pid'] != pid: return
+        prefix = _profile_prefix(profile_report, rank)+".%d"%pid
+        if pid != main_pid: instrument.dump(prefix+".json")
+        if state['profile'] is not None: state['profile'].dump_stats(prefix+".prof")
+    wrapper.dump_stats = dump_stats
+    return wrapper
+
+def check_dependencies(files, restart_file, infile_deps, outfile_deps=[], opt_changed=False, force=False, id_len=0, data_ext=None, restart_test=False, disable_restart_file=False, result_store=None, **extra):
     ''' Generate a subset of files required to process based on changes to input and existing
     output files. Note that this dependency checking is similar to the program `make`.
     
@@ -294,6 +510,8 @@ def check_dependencies(files, restart_file, infile_deps, outfile_deps=[], opt_ch
                    If the dependent file does not have an extension, add this extension
         restart_test : bool
                        Test if program will restart
+        result_store : ResultStore
+                       Store whose keys replace the restart file
         extra : dict
                 Unused extra keyword arguments
             
@@ -305,7 +523,10 @@ def check_dependencies(files, restart_file, infile_deps, outfile_deps=[], opt_ch
                    List of input filenames that satisfy requirements and will not be processed.
     '''
     
-    restart_files = set([f.strip() for f in open(restart_file, 'r').readlines()]) if restart_file is not None and os.path.exists(restart_file) else None
+    if result_store is not None:
+        restart_files = set([str(key) for key in result_store.keys()])
+    else:
+        restart_files = set([f.strip() for f in open(restart_file, 'r').readlines()]) if restart_file is not None and os.path.exists(restart_file) else None
     restart_example = ",".join([v for v in list(restart_files)[:3]]) if restart_files is not None else ""
     if opt_changed or force:
         msg = "configuration file changed" if opt_changed else "--force option specified"
@@ -408,6 +629,8 @@ def setup_options(parser, pgroup=None):
     group.add_option("",   force=False,       help="Force the program to run from the start", dependent=False)
     group.add_option("",   restart_test=False,help="Test if the program will restart", dependent=False)
     group.add_option("",   disable_restart_file=False,help="Disable restart file checking", dependent=False)
+    group.add_option("",   profile_report="", help="Write timers and counters collected over all workers and nodes to this file (.json or .csv)", gui=dict(filetype="save"), dependent=False)
+    group.add_option("",   profile_workers=False, help="Run each worker under cProfile, the statistics are written next to the profile report", dependent=False)
     pgroup.add_option_group(group)
 
 def check_options(options):
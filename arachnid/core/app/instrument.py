@@ -0,0 +1,275 @@
+''' Lightweight timers and counters for profiling a run
+
+Instrumentation is disabled by default, in which case a timer is a shared
+no-op context manager and a counter is a single test, so hot paths can be
+instrumented unconditionally.
+
+.. beg-dev
+
+Timers and counters are identified by name and accumulated for the current
+process:
+
+.. sourcecode:: py
+
+    from arachnid.core.app import instrument
+
+    def process(filename, **extra):
+        with instrument.timer('autopick.search'):
+            coords = search(mic, **extra)
+        instrument.count('autopick.peaks', len(coords))
+
+The :py:mod:`file_processor <arachnid.core.app.file_processor>` enables the
+instrumentation with `--profile-report`, collects the statistics of every
+worker process and MPI node with :py:func:`merge` and writes the report with
+:py:func:`write_report`.
+
+.. end-dev
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+import logging
+import threading
+import json
+import time
+import os
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+_stats = None
+_lock = threading.Lock()
+
+class _null_timer(object):
+    ''' Timer used when instrumentation is disabled
+    '''
+
+    def __enter__(self): return self
+    def __exit__(self, *args): return False
+
+_disabled_timer = _null_timer()
+
+class _timer(object):
+    ''' Accumulate the elapsed time of a block under a name
+    '''
+
+    __slots__ = ('name', 'beg')
+
+    def __init__(self, name):
+        ''' Create a timer
+
+        :Parameters:
+
+            name : str
+                   Name of the timer
+        '''
+
+        self.name = name
+        self.beg = 0
+
+    def __enter__(self):
+        self.beg = time.time()
+        return self
+
+    def __exit__(self, *args):
+        add_time(self.name, time.time()-self.beg)
+        return False
+
+def enable():
+    ''' Enable instrumentation in the current process, clearing
+    any previous statistics
+    '''
+
+    global _stats
+    _stats = dict(timers={}, counters={}, processes=1)
+
+def disable():
+    ''' Disable instrumentation in the current process
+    '''
+
+    global _stats
+    _stats = None
+
+def is_enabled():
+    ''' Test if instrumentation is enabled
+
+    :Returns:
+
+        flag : bool
+               True if instrumentation is enabled
+    '''
+
+    return _stats is not None
+
+def timer(name):
+    ''' Context manager that adds the elapsed time of the block to the named timer
+
+    :Parameters:
+
+        name : str
+               Name of the timer
+
+    :Returns:
+
+        timer : object
+                Context manager
+    '''
+
+    if _stats is None: return _disabled_timer
+    return _timer(name)
+
+def add_time(name, seconds, count=1):
+    ''' Add elapsed time to the named timer
+
+    :Parameters:
+
+        name : str
+               Name of the timer
+        seconds : float
+                  Elapsed time in seconds
+        count : int
+                Number of timed events
+    '''
+
+    if _stats is None: return
+    with _lock:
+        val = _stats['timers'].get(name)
+        if val is None: val = _stats['timers'][name] = [0, 0.0, 0.0]
+        val[0] += count
+        val[1] += seconds
+        val[2] = max(val[2], seconds)
+
+def count(name, value=1):
+    ''' Increment the named counter
+
+    :Parameters:
+
+        name : str
+               Name of the counter
+        value : int or float
+                Value to add
+    '''
+
+    if _stats is None: return
+    with _lock:
+        _stats['counters'][name] = _stats['counters'].get(name, 0) + value
+
+def snapshot():
+    ''' Copy the statistics of the current process
+
+    :Returns:
+
+        stats : dict
+                Timers (`timers`: name -> [count, total, max]), counters (`counters`: name -> value)
+                and number of processes (`processes`), None if disabled
+    '''
+
+    if _stats is None: return None
+    with _lock:
+        return dict(timers=dict([(k, list(v)) for k, v in _stats['timers'].iteritems()]), counters=dict(_stats['counters']), processes=_stats['processes'])
+
+def merge(*stats):
+    ''' Merge the statistics of several processes
+
+    :Parameters:
+
+        stats : list
+                Statistics, see :py:func:`snapshot`, None values are skipped
+
+    :Returns:
+
+        out : dict
+              Merged statistics
+    '''
+
+    out = dict(timers={}, counters={}, processes=0)
+    for val in stats:
+        if val is None: continue
+        out['processes'] += val.get('processes', 1)
+        for name, t in val['timers'].iteritems():
+            cur = out['timers'].get(name)
+            if cur is None: out['timers'][name] = list(t)
+            else: out['timers'][name] = [cur[0]+t[0], cur[1]+t[1], max(cur[2], t[2])]
+        for name, c in val['counters'].iteritems():
+            out['counters'][name] = out['counters'].get(name, 0) + c
+    return out
+
+def dump(filename):
+    ''' Write the statistics of the current process to a JSON file
+
+    :Parameters:
+
+        filename : str
+                   Output filename
+    '''
+
+    stats = snapshot()
+    if stats is None: return
+    tmp = filename+".tmp"
+    fout = open(tmp, 'w')
+    try: json.dump(stats, fout)
+    finally: fout.close()
+    os.rename(tmp, filename)
+
+def load(filename):
+    ''' Read statistics written by :py:func:`dump`
+
+    :Parameters:
+
+        filename : str
+                   Input filename
+
+    :Returns:
+
+        stats : dict
+                Statistics
+    '''
+
+    fin = open(filename, 'r')
+    try: return json.load(fin)
+    finally: fin.close()
+
+def write_report(filename, stats):
+    ''' Write a profile report as JSON or CSV (chosen by the extension)
+
+    The CSV has one row per timer or counter: kind, name, count, total, mean and max,
+    where a counter reports its value as the total.
+
+    :Parameters:
+
+        filename : str
+                   Output filename (.json or .csv)
+        stats : dict
+                Statistics, see :py:func:`merge`
+    '''
+
+    fout = open(filename, 'w')
+    try:
+        if os.path.splitext(filename)[1].lower() == '.json':
+            json.dump(stats, fout, indent=2, sort_keys=True)
+            return
+        fout.write("kind,name,count,total,mean,max\n")
+        for name, (cnt, total, peak) in sorted(stats['timers'].items(), key=lambda v: -v[1][1]):
+            fout.write("timer,%s,%d,%f,%f,%f\n"%(name, cnt, total, total/cnt if cnt > 0 else 0.0, peak))
+        for name, val in sorted(stats['counters'].items()):
+            fout.write("counter,%s,,%s,,\n"%(name, str(val)))
+    finally: fout.close()
+
+def format_summary(stats, top=10):
+    ''' Format the most expensive timers as a short summary for the log
+
+    :Parameters:
+
+        stats : dict
+                Statistics, see :py:func:`merge`
+        top : int
+              Number of timers to list
+
+    :Returns:
+
+        msg : str
+              Summary
+    '''
+
+    timers = sorted(stats['timers'].items(), key=lambda v: -v[1][1])[:top]
+    return ", ".join(["%s=%.2fs/%d"%(name, val[1], val[0]) for name, val in timers])
@@ -0,0 +1,242 @@
+''' Incremental monitoring of the log file of a running program
+
+The state of a program (its PID, the current program of a workflow, the progress
+and whether it completed) is parsed from the tags written to its log file. A
+:py:class:`LogTail` remembers the byte offset it has read up to and only parses
+the lines appended since the last poll, so the cost of monitoring is proportional
+to the new output rather than the size of the log.
+
+.. sourcecode:: py
+
+    >>> from arachnid.core.app import log_monitor
+    >>> state = log_monitor.read_state('refine.log')
+    >>> state.progress, state.maximum, state.is_running()
+    (12, 40, True)
+
+    >>> tail = log_monitor.LogTail('refine.log')
+    >>> lines = tail.poll()     # all lines the first time
+    >>> lines = tail.poll()     # only the lines appended since
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+import logging
+import os
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+class LogState(object):
+    ''' Progress of a program parsed from its log file
+    '''
+
+    def __init__(self):
+        '''Create an empty state
+        '''
+
+        self.pid = None
+        self.created = None
+        self.program = None
+        self.started = 0
+        self.completed = 0
+        self.progress = None
+        self.maximum = None
+        self.workflow_ended = False
+
+    @property
+    def running(self):
+        ''' Number of programs started but not completed
+        '''
+
+        return self.started - self.completed
+
+    def is_complete(self):
+        ''' Test if a program logged its completion
+
+        :Returns:
+
+        val : bool
+              True if a program completed
+        '''
+
+        return self.completed > 0
+
+    def is_running(self):
+        ''' Test if the process that wrote the log is still alive
+
+        :Returns:
+
+        val : bool
+              True if the process with the logged PID and creation time exists
+        '''
+
+        if self.pid is None: return False
+        import psutil
+        try:
+            p = psutil.Process(self.pid)
+        except psutil.NoSuchProcess:
+            return False
+        return self.created == int(p.create_time())
+
+    def update(self, text):
+        ''' Update the state with a block of complete lines
+
+        Each tag is located with a string search over the whole block,
+        only the lines holding the last occurrence of a tag are split out.
+
+        :Parameters:
+
+        text : str
+               Block of complete lines from the log
+        '''
+
+        self.started += text.count('Program:')
+        self.completed += text.count('Completed')
+        if not self.workflow_ended and text.find('Workflow ended') != -1: self.workflow_ended = True
+        val = _last_value(text, 'Program:')
+        if val is not None: self.program = val
+        val = _last_value(text, 'PID:')
+        if val is not None: self.pid = _to_int(val, self.pid)
+        val = _last_value(text, 'Created:')
+        if val is not None: self.created = _to_int(val, self.created)
+        val = _last_value(text, 'Finished: ')
+        if val is not None:
+            idx = val.find(' -')
+            if idx != -1: val = val[:idx]
+            try: self.progress, self.maximum = tuple([int(v) for v in val.split(',')])
+            except: pass
+
+class LogTail(object):
+    ''' Read the lines appended to a log file since the last poll
+    '''
+
+    def __init__(self, filename, state=None):
+        ''' Create a tail reader at the start of the log file
+
+        :Parameters:
+
+        filename : str
+                   Log file to follow
+        state : LogState, optional
+                State updated with each new line
+        '''
+
+        self.filename = filename
+        self.state = state if state is not None else LogState()
+        self.offset = 0
+        self.bytes_read = 0
+        self.partial = ""
+
+    def reset(self):
+        ''' Restart at the beginning of the log file with an empty state
+        '''
+
+        self.state = LogState()
+        self.offset = 0
+        self.partial = ""
+
+    def poll(self, max_bytes=0, return_lines=True, chunk_size=1048576):
+        ''' Parse the complete lines appended since the last poll
+
+        If the file shrank (e.g. overwritten by a new run), then reading restarts
+        at the beginning with a new state.
+
+        :Parameters:
+
+        max_bytes : int
+                    Maximum number of bytes to read, 0 means read to the end
+        return_lines : bool
+                       Return the new lines, otherwise only update the state
+        chunk_size : int
+                     Number of bytes read at a time
+
+        :Returns:
+
+        lines : list
+                New complete lines (with end of line)
+        '''
+
+        lines = []
+        try: size = os.path.getsize(self.filename)
+        except OSError: return lines
+        if size < self.offset: self.reset()
+        if size == self.offset: return lines
+        end = size if max_bytes <= 0 else min(size, self.offset+max_bytes)
+        fin = open(self.filename, 'rb')
+        try:
+            fin.seek(self.offset)
+            while self.offset < end:
+                data = fin.read(min(chunk_size, end-self.offset))
+                if len(data) == 0: break
+                self.offset += len(data)
+                self.bytes_read += len(data)
+                idx = data.rfind('\n')
+                if idx == -1:
+                    self.partial += data
+                    continue
+                text = self.partial+data[:idx+1]
+                self.partial = data[idx+1:]
+                self.state.update(text)
+                if return_lines: lines.extend(text.splitlines(True))
+        finally:
+            fin.close()
+        return lines
+
+def read_state(filename):
+    ''' Read the state of a program from its log file
+
+    :Parameters:
+
+    filename : str
+               Log file of the program
+
+    :Returns:
+
+    state : LogState
+            Progress of the program
+    '''
+
+    tail = LogTail(filename)
+    tail.poll(return_lines=False)
+    return tail.state
+
+def _last_value(text, tag):
+    ''' Find the text following the last occurrence of a tag on its line
+
+    :Parameters:
+
+    text : str
+           Block of lines
+    tag : str
+          Tag to find
+
+    :Returns:
+
+    val : str
+          Stripped remainder of the line or None if the tag is not found
+    '''
+
+    idx = text.rfind(tag)
+    if idx == -1: return None
+    end = text.find('\n', idx)
+    if end == -1: end = len(text)
+    return text[idx+len(tag):end].strip()
+
+def _to_int(val, default):
+    ''' Convert a logged value to an integer
+
+    :Parameters:
+
+    val : str
+          Logged value
+    default : int
+              Value returned if the conversion fails
+
+    :Returns:
+
+    val : int
+          Converted value
+    '''
+
+    try: return int(val)
+    except ValueError: return default
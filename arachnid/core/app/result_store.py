@@ -0,0 +1,262 @@
+''' Crash-safe, append-only store for the results of a file processor run
+
+Each processed file is represented by a fixed-width binary record: an integer
+key (the SPIDER ID of the file) followed by a fixed number of floating point
+values. Records are buffered in memory and committed in batches by appending
+to the data file, flushing it to disk, then atomically replacing a small index
+file that holds the column names and the number of committed records. A record
+beyond the committed count (e.g. from a crash during a commit) is discarded
+when the store is reopened.
+
+.. beg-dev
+
+The :py:mod:`file_processor <arachnid.core.app.file_processor>` opens the store
+when the script module defines `result_header`. The store is passed to
+`reduce_all` and `finalize` as the `result_store` keyword argument, and the
+keys it holds are used to restart an interrupted run:
+
+.. sourcecode:: py
+
+    def result_header(**extra): return "id,defocus,error".split(',')
+
+    def reduce_all(filename, result_store=None, **extra):
+        filename, vals = filename
+        result_store.append(spider_utility.spider_id(filename), vals)
+        return filename
+
+    def finalize(files, output, result_store=None, **extra):
+        format.write(output, result_store.values(), header=result_header())
+
+.. end-dev
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+import logging
+import numpy
+import json
+import os
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+class ResultStore(object):
+    ''' Append-only store of fixed-width result records
+    '''
+
+    def __init__(self, filename, header, batch_size=32, truncate=False):
+        ''' Open or create a result store
+
+        :Parameters:
+
+            filename : str
+                       Base filename of the store, the records are written to
+                       `$filename.dat` and the index to `$filename.idx`
+            header : list
+                     Name of each value in a record
+            batch_size : int
+                         Number of records buffered before a commit
+            truncate : bool
+                       Discard any existing records
+        '''
+
+        self.filename = filename
+        self.header = list(header)
+        self.batch_size = max(1, batch_size)
+        self.dtype = numpy.dtype([('key', '<i8')]+[('v%d'%i, '<f8') for i in xrange(len(self.header))])
+        self.pending = []
+        self.index = {}
+        self.count = 0
+        if not truncate and os.path.exists(self.index_file) and os.path.exists(self.data_file):
+            self._recover()
+        else:
+            self._reset()
+
+    @property
+    def data_file(self): return self.filename+".dat"
+
+    @property
+    def index_file(self): return self.filename+".idx"
+
+    def _reset(self):
+        ''' Create an empty store
+        '''
+
+        open(self.data_file, 'wb').close()
+        self.count = 0
+        self.index = {}
+        self._write_index()
+
+    def _recover(self):
+        ''' Load the committed records and discard any uncommitted tail
+        '''
+
+        fin = open(self.index_file, 'r')
+        try: info = json.load(fin)
+        except ValueError: info = None
+        finally: fin.close()
+        if info is None or info.get('header') != self.header:
+            _logger.warn("Result store %s does not match the current run - starting a new store"%self.filename)
+            self._reset()
+            return
+        count = min(int(info['count']), os.path.getsize(self.data_file)/self.dtype.itemsize)
+        if os.path.getsize(self.data_file) != count*self.dtype.itemsize:
+            fout = open(self.data_file, 'r+b')
+            try: fout.truncate(count*self.dtype.itemsize)
+            finally: fout.close()
+        self.count = count
+        keys = numpy.fromfile(self.data_file, dtype=self.dtype, count=count)['key']
+        self.index = dict(zip(keys.tolist(), xrange(count)))
+        if count != int(info['count']): self._write_index()
+
+    def _write_index(self):
+        ''' Atomically replace the index with the current committed count
+        '''
+
+        tmp = self.index_file+".tmp"
+        fout = open(tmp, 'w')
+        try:
+            json.dump(dict(header=self.header, count=self.count, itemsize=self.dtype.itemsize), fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        finally: fout.close()
+        os.rename(tmp, self.index_file)
+
+    def append(self, key, values=None):
+        ''' Add a record for the given key, committing the batch when full
+
+        A key appended more than once keeps the last record.
+
+        :Parameters:
+
+            key : int
+                  Key of the record (e.g. SPIDER ID of the processed file)
+            values : array, optional
+                     Values for each column, None marks the key as processed
+                     without a result
+        '''
+
+        rec = numpy.zeros(1, dtype=self.dtype)
+        rec['key'] = key
+        vals = numpy.empty(len(self.header))
+        vals[:] = numpy.nan
+        if values is not None:
+            values = numpy.asarray(values, dtype=numpy.float64).ravel()
+            vals[:min(len(values), len(vals))] = values[:len(vals)]
+        rec.view(numpy.float64).reshape((1, -1))[0, 1:] = vals
+        self.pending.append(rec)
+        if len(self.pending) >= self.batch_size: self.commit()
+
+    def commit(self):
+        ''' Write the pending records to disk
+        '''
+
+        if len(self.pending) == 0: return
+        recs = numpy.concatenate(self.pending)
+        fout = open(self.data_file, 'ab')
+        try:
+            recs.tofile(fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        finally: fout.close()
+        for i, key in enumerate(recs['key'].tolist()): self.index[key] = self.count+i
+        self.count += len(recs)
+        self.pending = []
+        self._write_index()
+
+    def close(self):
+        ''' Commit the pending records
+        '''
+
+        self.commit()
+
+    def __enter__(self):
+        ''' Use the store as a context manager, which commits the pending records on exit
+
+        :Returns:
+
+            store : ResultStore
+                    This store
+        '''
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ''' Commit the pending records, even when an exception is raised
+        '''
+
+        self.close()
+        return False
+
+    def __contains__(self, key):
+        ''' Test if a record exists for the key (committed or pending)
+
+        :Parameters:
+
+            key : int
+                  Key of the record
+
+        :Returns:
+
+            flag : bool
+                   True if a record exists
+        '''
+
+        if key in self.index: return True
+        for rec in self.pending:
+            if rec['key'][0] == key: return True
+        return False
+
+    def __len__(self):
+        ''' Number of unique keys committed
+
+        :Returns:
+
+            count : int
+                    Number of unique keys
+        '''
+
+        return len(self.index)
+
+    def keys(self):
+        ''' Keys of the committed records
+
+        :Returns:
+
+            keys : list
+                   List of keys
+        '''
+
+        return self.index.keys()
+
+    def read(self):
+        ''' Read the committed records, keeping the last record for each key
+
+        :Returns:
+
+            recs : array
+                   Structured array with a `key` field followed by one field for each column
+        '''
+
+        recs = numpy.fromfile(self.data_file, dtype=self.dtype, count=self.count)
+        rows = numpy.asarray(sorted(self.index.itervalues()), dtype=numpy.int)
+        return recs[rows]
+
+    def values(self, skip_empty=True):
+        ''' Get the committed values as a 2D array, ordered by commit
+
+        :Parameters:
+
+            skip_empty : bool
+                         Skip records added without values
+
+        :Returns:
+
+            vals : array
+                   2D array of values, one row for each key
+        '''
+
+        recs = self.read()
+        vals = recs.view(numpy.float64).reshape((len(recs), -1))[:, 1:]
+        if skip_empty and len(vals) > 0: vals = vals[~numpy.all(numpy.isnan(vals), axis=1)]
+        return vals
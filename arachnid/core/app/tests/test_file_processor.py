@@ -0,0 +1,181 @@
+'''
+.. Created on Oct 19, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import file_processor, result_store, instrument
+import tempfile, shutil, os, sys, json, glob
+
+class _script(object):
+    ''' Script that saves one result for each file
+    '''
+
+    def result_header(self, **extra):
+        return ['value']
+
+    def process(self, filename, **extra):
+        return filename, float(filename[-8:-4])
+
+    def reduce_all(self, val, result_store=None, **extra):
+        filename, value = val
+        result_store.append(int(value), [value])
+        return filename
+
+def _crash_after(mpi_reduce, count):
+    ''' Wrap the reduce generator so it fails like a crashed node after `count` results
+    '''
+
+    def wrapper(*args, **kwargs):
+        for i, val in enumerate(mpi_reduce(*args, **kwargs)):
+            if i == count: raise StandardError, "Some MPI process crashed"
+            yield val
+    return wrapper
+
+def test_main_result_store_interrupted():
+    '''
+    '''
+
+    path = tempfile.mkdtemp()
+    argv = sys.argv
+    mpi_reduce = file_processor.mpi_utility.mpi_reduce
+    try:
+        sys.argv = ['ara-test']
+        files = [os.path.join(path, 'mic_%04d.spi'%i) for i in xrange(1, 6)]
+        script = _script()
+        file_processor.mpi_utility.mpi_reduce = _crash_after(mpi_reduce, 4)
+        try:
+            file_processor.main(files, script, output=os.path.join(path, 'out.dat'), worker_count=1, infile_deps=[], profile_report=os.path.join(path, 'profile.json'))
+        except StandardError: pass
+        else: assert False, "expected the run to crash"
+        assert not instrument.is_enabled()
+        assert os.path.exists(os.path.join(path, 'profile.json'))
+        store = result_store.ResultStore(os.path.join(path, '.results.test'), script.result_header())
+        assert sorted(store.keys()) == [1, 2, 3, 4]
+        assert sorted(store.values().ravel().tolist()) == [1.0, 2.0, 3.0, 4.0]
+    finally:
+        file_processor.mpi_utility.mpi_reduce = mpi_reduce
+        sys.argv = argv
+        shutil.rmtree(path)
+
+def test_result_store_context():
+    '''
+    '''
+
+    path = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(path, 'results')
+        try:
+            with result_store.ResultStore(filename, ['a', 'b'], batch_size=10) as store:
+                store.append(3, [1.0, 2.0])
+                store.append(5, [3.0, 4.0])
+                raise ValueError
+        except ValueError: pass
+        store = result_store.ResultStore(filename, ['a', 'b'])
+        assert sorted(store.keys()) == [3, 5]
+        assert store.values().tolist() == [[1.0, 2.0], [3.0, 4.0]]
+    finally:
+        shutil.rmtree(path)
+
+def _counted_dump(dump, logfile):
+    ''' Wrap instrument.dump to log each call
+    '''
+
+    def wrapper(filename):
+        fout = open(logfile, 'a')
+        try: fout.write(filename+"\n")
+        finally: fout.close()
+        return dump(filename)
+    return wrapper
+
+def test_main_profile_workers():
+    '''
+    '''
+
+    path = tempfile.mkdtemp()
+    argv = sys.argv
+    dump = instrument.dump
+    try:
+        sys.argv = ['ara-test']
+        files = [os.path.join(path, 'mic_%04d.spi'%i) for i in xrange(1, 9)]
+        report = os.path.join(path, 'profile.json')
+        instrument.dump = _counted_dump(dump, os.path.join(path, 'dump.log'))
+        file_processor.main(files, _script(), output=os.path.join(path, 'out.dat'), worker_count=2, infile_deps=[], profile_report=report)
+        assert not instrument.is_enabled()
+        stats = json.load(open(report))
+        assert stats['counters']['files'] == len(files)
+        # A worker that never received a file has no statistics
+        assert stats['processes'] in (2, 3)
+        assert len(open(os.path.join(path, 'dump.log')).readlines()) == stats['processes']-1
+        assert glob.glob(os.path.join(path, 'profile.rank0.*.json')) == []
+    finally:
+        instrument.dump = dump
+        sys.argv = argv
+        shutil.rmtree(path)
+
+def test_main_profile_nothing_to_process():
+    '''
+    '''
+
+    path = tempfile.mkdtemp()
+    argv = sys.argv
+    try:
+        sys.argv = ['ara-test']
+        files = [os.path.join(path, 'mic_%04d.spi'%i) for i in xrange(1, 4)]
+        output = os.path.join(path, 'out_0000.dat')
+        for i in xrange(1, 4): open(os.path.join(path, 'out_%04d.dat'%i), 'w').close()
+        file_processor.main(files, _script(), output=output, worker_count=1, infile_deps=[], outfile_deps=['output'])
+        report = os.path.join(path, 'profile.json')
+        file_processor.main(files, _script(), output=output, worker_count=1, infile_deps=[], outfile_deps=['output'], profile_report=report)
+        assert not instrument.is_enabled()
+        stats = json.load(open(report))
+        assert 'run' in stats['timers']
+        assert stats['counters'].get('files', 0) == 0
+    finally:
+        sys.argv = argv
+        shutil.rmtree(path)
+
+class _unprintable(object):
+    ''' Message that fails when logged
+    '''
+
+    def __str__(self): raise ValueError, "Cannot print message"
+
+class _failing_script(_script):
+    ''' Script whose first result fails in the root process
+    '''
+
+    def reduce_all(self, val, result_store=None, file_completed=0, **extra):
+        filename = _script.reduce_all(self, val, result_store)
+        if file_completed == 1: return filename, _unprintable()
+        return filename
+
+def _remote_results(mpi_reduce):
+    ''' Wrap the reduce generator so results keep arriving when the root clears its
+    list of files, as they do from the other nodes of an MPI run
+    '''
+
+    def wrapper(process, vals, *args, **kwargs):
+        return mpi_reduce(process, list(vals), *args, **kwargs)
+    return wrapper
+
+def test_main_root_error_then_success():
+    '''
+    '''
+
+    path = tempfile.mkdtemp()
+    argv = sys.argv
+    mpi_reduce = file_processor.mpi_utility.mpi_reduce
+    try:
+        sys.argv = ['ara-test']
+        files = [os.path.join(path, 'mic_%04d.spi'%i) for i in xrange(1, 3)]
+        script = _failing_script()
+        file_processor.mpi_utility.mpi_reduce = _remote_results(mpi_reduce)
+        try:
+            file_processor.main(files, script, output=os.path.join(path, 'out.dat'), worker_count=1, infile_deps=[])
+        except ValueError, exp: assert str(exp) == "Error in root process"
+        else: assert False, "expected the root error to be reported"
+        store = result_store.ResultStore(os.path.join(path, '.results.test'), script.result_header())
+        assert sorted(store.keys()) == [1, 2]
+    finally:
+        file_processor.mpi_utility.mpi_reduce = mpi_reduce
+        sys.argv = argv
+        shutil.rmtree(path)
@@ -0,0 +1,67 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import log_monitor
+import tempfile, os, shutil, time
+
+full_test=False
+
+def _write_log(filename, size, total=40):
+    fout = open(filename, 'w')
+    fout.write("2026-10-18 12:00:00 INFO Program: arachnid.app.autopick\n")
+    fout.write("2026-10-18 12:00:00 INFO PID: %d\n"%os.getpid())
+    fout.write("2026-10-18 12:00:00 INFO Created: 1234\n")
+    block = "".join(["2026-10-18 12:00:01:123:arachnid.core.app.file_processor:DEBUG - Processing micrograph %08d\n"%i for i in xrange(10000)])
+    written, finished = 0, 0
+    while written < size:
+        fout.write(block)
+        written += len(block)
+        if finished < total-1:
+            fout.write("2026-10-18 12:00:02 INFO Finished: %d,%d - Time left: 1:00:00 - mic.spi\n"%(finished, total))
+            finished += 1
+    fout.close()
+    return finished
+
+def test_log_tail():
+    '''
+    '''
+    
+    path = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(path, 'test.log')
+        size = 1<<30 if full_test else 1<<22
+        finished = _write_log(filename, size)
+        tail = log_monitor.LogTail(filename)
+        beg = time.time()
+        tail.poll(return_lines=False)
+        elapsed = time.time()-beg
+        state = tail.state
+        assert state.pid == os.getpid()
+        assert state.created == 1234
+        assert state.program == 'arachnid.app.autopick'
+        assert state.progress == finished-1 and state.maximum == 40
+        assert state.running == 1 and not state.is_complete()
+        assert tail.bytes_read == os.path.getsize(filename)
+        
+        fout = open(filename, 'a')
+        fout.write("2026-10-18 12:10:00 INFO Finished: 39,40 - Time left: 0:00:00 - mic.spi\n2026-10-18 12:10:00 INFO Completed")
+        fout.close()
+        read = tail.bytes_read
+        beg = time.time()
+        lines = tail.poll()
+        assert time.time()-beg < max(elapsed, 0.5)
+        assert tail.bytes_read-read == os.path.getsize(filename)-read
+        assert len(lines) == 1 and state.progress == 39 and not state.is_complete()
+        fout = open(filename, 'a')
+        fout.write("\n")
+        fout.close()
+        assert len(tail.poll()) == 1
+        assert state.is_complete() and state.running == 0
+        assert not log_monitor.read_state(filename).workflow_ended
+        
+        open(filename, 'w').write("2026-10-18 12:20:00 INFO Program: arachnid.app.lfcpick\n")
+        tail.poll()
+        assert tail.state.program == 'arachnid.app.lfcpick' and tail.state.progress is None
+    finally:
+        shutil.rmtree(path)
@@ -0,0 +1,40 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import tracing
+import multiprocessing, logging, StringIO, re
+
+def _worker(log_queue, process_number, count):
+    tracing.configure_mp_logging(process_number=process_number, log_queue=log_queue, rank=0)
+    logger = logging.getLogger('arachnid.test_tracing')
+    for i in xrange(count):
+        tracing.set_log_context(file_index=i)
+        logger.debug("message %d %d", process_number, i)
+
+def test_log_listener():
+    '''
+    '''
+    
+    workers, count = 16, 200
+    stream = StringIO.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setLevel(logging.DEBUG)
+    listener = tracing.start_log_listener([handler], batch_size=64)
+    processes = [multiprocessing.Process(target=_worker, args=(listener.queue, i, count)) for i in xrange(workers)]
+    for p in processes: p.start()
+    for p in processes: p.join()
+    listener.stop()
+    
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == workers*count
+    last = [-1 for i in xrange(workers)]
+    pattern = re.compile(r"rank=0 worker=(\d+) pid=\d+ file=(\d+) - message (\d+) (\d+)$")
+    for line in lines:
+        match = pattern.search(line)
+        assert match is not None, line
+        worker, index, worker2, message = [int(v) for v in match.groups()]
+        assert worker == worker2 and index == message
+        assert message == last[worker]+1
+        last[worker] = message
+    assert last == [count-1 for i in xrange(workers)]
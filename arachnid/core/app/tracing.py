@@ -58,6 +58,11 @@ crash report will be called::
 This file contains any exceptions that are thrown during the execution of the script and is useful for reporting
 bugs. Please attach this file when you submit an issue.
 
+With `--log-aggregate`, worker processes do not write their own log files. Each
+record is sent over a queue to a single listener thread in the parent process, which
+writes the records in batches to the handlers of the parent, tagged with the MPI rank,
+worker number, process id and current file index of the worker.
+
 Colors
 ------
 
@@ -204,6 +209,9 @@ This generates a list of failed imports of optional modules, which will be logge
 '''
 
 import logging.config
+import multiprocessing
+import threading
+import Queue
 import os
 import socket
 import time
@@ -247,6 +255,9 @@ _log_formats = { 'critical': "%(asctime)s %(message)s",
                 'debug':    "%(asctime)s:%(lineno)d:%(name)s:%(levelname)s - %(message)s",
                 'debug_more':    "%(asctime)s:%(lineno)d:%(name)s:%(levelname)s - %(message)s" }
 
+_mp_log_format = "%(asctime)s %(levelname)s rank=%(rank)s worker=%(worker)s pid=%(process)d file=%(file_index)s - %(message)s"
+_log_context = dict(rank=0, worker=-1, file_index=-1)
+
 _log_import_errors = []
 
 def log_import_error(message, logger=None):
@@ -279,6 +290,7 @@ def setup_options(parser, pgroup=None):
     group.add_option("",   log_file="",         help="Set file to log messages", gui=dict(filetype="save"), archive=True, dependent=False)
     group.add_option("",   log_config="",       help="File containing the configuration of the application logging", gui=dict(filetype="open"), dependent=False)
     group.add_option("",   enable_stderr=False, help="Enable logging to stderr along with --log-file", dependent=False)
+    group.add_option("",   log_aggregate=False, help="Send the log messages of worker processes through the parent to a single log", dependent=False)
     if pgroup is not None:
         pgroup.add_option_group(group)
     else:
@@ -393,9 +405,10 @@ def configure_logging(rank=0, log_level=3, log_file="", log_config="", enable_st
     
     if rank == 0: print_import_warnings()
     
-def configure_mp_logging(filename, level=logging.DEBUG, process_number=None, **extra):
-    ''' Create a log file with given name for each process. It appends process number to end of 
-    log file name.
+def configure_mp_logging(filename=None, level=logging.DEBUG, process_number=None, log_queue=None, rank=0, **extra):
+    ''' Configure the logging of a worker process. If `log_queue` is given, then every
+    record is sent to the listener of the parent (see :py:func:`start_log_listener`),
+    otherwise a log file is created with the process number appended to the given name.
     
     :Parameters:
         
@@ -405,17 +418,75 @@ def configure_mp_logging(filename, level=logging.DEBUG, process_number=None, **e
                 Level for logging, default logging.DEBUG
         process_number : int
                          Process number passed by API
+        log_queue : multiprocessing.Queue
+                    Queue of the log listener in the parent process
+        rank : int
+               MPI rank of the process
         extra : dict
                 Unused keyword arguments
     '''
     
     if process_number is None: return
+    if log_queue is not None:
+        set_log_context(rank=rank, worker=process_number)
+        root = logging.getLogger()
+        while len(root.handlers) > 0: root.removeHandler(root.handlers[0])
+        ch = QueueHandler(log_queue)
+        ch.setLevel(level)
+        ch.addFilter(ContextFilter())
+        root.addHandler(ch)
+        return
+    if filename is None: return
     filename, ext = os.path.splitext(filename)
     filename += "_%7d"%process_number+ext
     ch = logging.FileHandler(filename, mode='w')
     ch.setLevel(level)
     logging.getLogger().addHandler(ch)
+
+def set_log_context(**fields):
+    ''' Set the structured fields added to each record sent to the log listener,
+    e.g. the index of the file currently processed by a worker
+    
+    :Parameters:
+        
+        fields : dict
+                 Values of the fields: rank, worker, file_index
+    '''
+    
+    _log_context.update(fields)
+
+def start_log_listener(handlers=None, batch_size=256, fmt=_mp_log_format, **extra):
+    ''' Start a thread that writes the log records sent by worker processes
+    
+    .. sourcecode:: py
+    
+        >>> from arachnid.core.app import tracing
+        >>> listener = tracing.start_log_listener()
+        >>> # start workers, each calling tracing.configure_mp_logging(process_number=i, log_queue=listener.queue)
+        >>> listener.stop()
+    
+    :Parameters:
+        
+        handlers : list, optional
+                   Handlers that write the records, default the handlers of the root logger
+        batch_size : int
+                     Maximum number of records written with a single write
+        fmt : str
+              Format of a worker record
+        extra : dict
+                Unused keyword arguments
     
+    :Returns:
+        
+        listener : LogListener
+                   Running log listener, its `queue` is passed to the workers
+    '''
+    
+    if handlers is None: handlers = list(logging.getLogger().handlers)
+    listener = LogListener(multiprocessing.Queue(), handlers, batch_size, fmt)
+    listener.start()
+    return listener
+
 def print_import_warnings():
     ''' Log failed imports being tracked as warnings
     '''
@@ -565,6 +636,148 @@ class ColoredFormatter(logging.Formatter):
             record.levelname = levelname_color
         return logging.Formatter.format(self, record)
 
+class ContextFilter(logging.Filter):
+    '''Adds the structured fields of the process to each record
+    '''
+
+    def filter(self, record):
+        ''' Add the rank, worker and file index to the record
+        
+        :Parameters:
+            
+            record : LogRecord
+                     Current log record
+        
+        :Returns:
+                
+            val : bool
+                  Always True
+        '''
+        
+        for key, val in _log_context.iteritems(): setattr(record, key, val)
+        return True
+
+class QueueHandler(logging.Handler):
+    '''Sends each log record to the listener of the parent process
+    '''
+    
+    def __init__(self, queue):
+        ''' Create a queue handler
+        
+        :Parameters:
+            
+            queue : multiprocessing.Queue
+                    Queue read by the log listener
+        '''
+        
+        logging.Handler.__init__(self)
+        self.queue = queue
+    
+    def emit(self, record):
+        ''' Merge the arguments and exception into the record, so it can be pickled,
+        and send it to the listener
+        
+        :Parameters:
+            
+            record : LogRecord
+                     Current log record
+        '''
+        
+        try:
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging._defaultFormatter.formatException(record.exc_info)
+                record.exc_info = None
+            self.queue.put_nowait(record)
+        except (KeyboardInterrupt, SystemExit): raise
+        except: self.handleError(record)
+
+class LogListener(object):
+    '''Writes the log records of the worker processes from a single thread
+    
+    Records are taken from the queue in batches, ordered by creation time, and each
+    stream handler receives the whole batch in one write.
+    '''
+    
+    def __init__(self, queue, handlers, batch_size=256, fmt=_mp_log_format):
+        ''' Create a log listener
+        
+        :Parameters:
+            
+            queue : multiprocessing.Queue
+                    Queue of records sent by the workers
+            handlers : list
+                       Handlers that write the records
+            batch_size : int
+                         Maximum number of records written with a single write
+            fmt : str
+                  Format of a worker record, if None use the format of each handler
+        '''
+        
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = max(1, batch_size)
+        self.formatter = logging.Formatter(fmt) if fmt is not None else None
+        self.thread = None
+    
+    def start(self):
+        ''' Start the listener thread
+        '''
+        
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def stop(self):
+        ''' Write the remaining records and stop the listener thread
+        '''
+        
+        if self.thread is None: return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+    
+    def run(self):
+        ''' Write batches of records until the stop sentinel is received
+        '''
+        
+        done = False
+        while not done:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try: batch.append(self.queue.get_nowait())
+                except Queue.Empty: break
+            if batch[-1] is None or None in batch:
+                done = True
+                batch = [record for record in batch if record is not None]
+            batch.sort(key=lambda record: record.created)
+            self.handle(batch)
+    
+    def handle(self, batch):
+        ''' Write a batch of records with each handler
+        
+        :Parameters:
+            
+            batch : list
+                    List of log records
+        '''
+        
+        for h in self.handlers:
+            records = [record for record in batch if record.levelno >= h.level and h.filter(record)]
+            if len(records) == 0: continue
+            if isinstance(h, logging.StreamHandler) and getattr(h, 'stream', None) is not None:
+                fmt = self.formatter if self.formatter is not None else h
+                text = "".join([fmt.format(record)+"\n" for record in records])
+                h.acquire()
+                try:
+                    h.stream.write(text)
+                    h.flush()
+                except: h.handleError(records[0])
+                finally: h.release()
+            else:
+                for record in records: h.handle(record)
+
 class ExceptionFilter(logging.Filter):
     '''Disallows exceptions to be logged
     '''
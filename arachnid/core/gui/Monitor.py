@@ -8,7 +8,7 @@
 '''
 from util.qt4_loader import QtCore, QtGui, qtSignal, qtSlot
 from pyui.Monitor import Ui_Form
-from ..app import tracing
+from ..app import tracing, log_monitor
 import logging, os, psutil
 import multiprocessing
 
@@ -52,7 +52,7 @@ class Widget(QtGui.QWidget):
         self.ui.crashReportToolButton.setEnabled(False)
         #self.text_cursor = QtGui.QTextCursor(self.ui.logTextEdit.document())
         self.current_pid = None
-        self.fin = None
+        self.tail = None
         self.log_file = None
         self.created = None
         self.log_text=""
@@ -116,17 +116,16 @@ class Widget(QtGui.QWidget):
         '''
         
         self.log_file = filename
+        self.tail = None
         if not os.path.exists(self.log_file): return
         
-        lines = self.readLogFile(True)
-        if len(lines) == 0: return
-        self.current_pid = self.parsePID(lines)
+        state = log_monitor.read_state(self.log_file)
+        self.current_pid = state.pid
         if self.current_pid is not None:
-            created = self.parsePID(lines, 'Created:')
+            created = state.created
             if self.isRunning(created):
                 self.current_pid = None
                 self.created = None
-                self.fin = None
                 self.monitorProgram.emit()
                 self.ui.pushButton.setChecked(QtCore.Qt.Checked)
                 model = self.ui.jobListView.model()
@@ -134,17 +133,16 @@ class Widget(QtGui.QWidget):
                 self.programStarted.emit(model.item(0).text())
                 self.ui.crashReportToolButton.setEnabled(False)
             else:
-                self.testCompletion(lines)
+                self.testCompletion(state)
                 self.current_pid = None
-                self.fin = None
     
-    def testCompletion(self, lines, offset=0):
+    def testCompletion(self, state, offset=0):
         '''
         '''
         
         model = self.ui.jobListView.model()
         if model.rowCount() == 0: return
-        if self.isComplete(lines):
+        if state.is_complete():
             model.item(0).setIcon(self.job_status_icons[2])
             self.ui.crashReportToolButton.setEnabled(False)
         else:
@@ -177,20 +175,16 @@ class Widget(QtGui.QWidget):
             self.run_program()
             self.current_pid = None
             self.created = None
-            self.fin = None
+            self.tail = None
             self.ui.logTextEdit.setPlainText("")
             self.ui.jobUpdateTimer.setInterval(2000)
             self.ui.jobUpdateTimer.start()
         else:
             self.ui.jobUpdateTimer.stop()
             self.ui.jobProgressBar.setMaximum(1)
-            if self.fin is not None:
-                try: self.fin.close()
-                except: pass
-                self.fin = None
+            self.tail = None
             self.current_pid = None
             self.created = None
-            self.fin = None
     
     def run_program(self):
         '''
@@ -242,17 +236,18 @@ class Widget(QtGui.QWidget):
                 self.ui.pushButton.setChecked(QtCore.Qt.Unchecked)
                 return
         
-        lines = self.readLogFile() # handel missing newline at end!
+        lines = self.readLogFile()
 
         if len(lines) == 0: 
             return
+        state = self.tail.state
         
         if self.current_pid is None:
-            self.current_pid = self.parsePID(lines)
+            self.current_pid = state.pid
             if self.current_pid is not None:
-                self.created = self.parsePID(lines, 'Created:')
+                self.created = state.created
             if not self.isRunning(self.created):
-                self.testCompletion(lines)
+                self.testCompletion(state)
                 self.ui.pushButton.setChecked(QtCore.Qt.Unchecked)
                 return
         
@@ -262,25 +257,25 @@ class Widget(QtGui.QWidget):
             text_cursor.insertText(line)
         self.ui.logTextEdit.setTextCursor(text_cursor)
         
-        self.updateListIcon(lines)
+        self.updateListIcon(state)
         '''
         self.text_cursor.movePosition(QtGui.QTextCursor.Start)
         for line in lines:
             self.text_cursor.insertText(line)
         '''
-        self.updateProgress(lines)
-        self.updateRunning(lines)
+        self.updateProgress(state)
+        self.updateRunning(state)
         
-        if self.parseName(lines, 'Workflow ended') is not None:
+        if state.workflow_ended:
             no_error = self.total_running == 0
             self.updateListIconFromOffset(None, not no_error)
             self.ui.pushButton.setChecked(QtCore.Qt.Unchecked)
       
-    def updateListIcon(self, lines):
+    def updateListIcon(self, state):
         '''
         '''
         
-        program = self.parseName(lines)
+        program = state.program
         if program is None: return
         program = program.strip()
         model = self.ui.jobListView.model()
@@ -319,9 +314,9 @@ class Widget(QtGui.QWidget):
         '''
         '''
         if created is None:
-            lines = self.readLogFile(True)
-            self.current_pid = self.parsePID(lines)
-            created = self.parsePID(lines, 'Created:')
+            state = self.tail.state if self.tail is not None else log_monitor.read_state(self.log_file)
+            self.current_pid = state.pid
+            created = state.created
         
         if self.workflowProcess is not None:
             if not self.workflowProcess.is_alive(): 
@@ -333,95 +328,31 @@ class Widget(QtGui.QWidget):
             return False
         return created == int(p.create_time())
     
-    def isComplete(self, lines):
+    def updateRunning(self, state):
         '''
         '''
         
-        for i in xrange(len(lines)):
-            idx = lines[i].find('Completed')
-            if idx != -1: return True
-        return None
-    
-    def parseName(self, lines, tag='Program:'):
-        '''
-        '''
-        
-        for i in xrange(len(lines)):
-            idx = lines[i].find(tag)
-            if idx != -1:
-                line = lines[i][idx+len(tag):]
-                return line
-        return None
-    
-    def parseNames(self, lines, tag='Program:'):
-        '''
-        '''
+        self.total_running = state.running
         
-        names = []
-        for i in xrange(len(lines)):
-            idx = lines[i].find(tag)
-            if idx != -1:
-                line = lines[i][idx+len(tag):]
-                names.append(line.strip())
-        return names
-    
-    def parsePID(self, lines, tag='PID:'):
+    def updateProgress(self, state):
         '''
         '''
         
-        val = self.parseName(lines, tag)
-        if val is not None: return int(val)
-        return None
+        if state.progress is None: return
+        progress, maximum = state.progress, state.maximum
+        if self.ui.jobProgressBar.maximum() != (maximum+1):
+            self.ui.jobProgressBar.setMaximum(maximum+1)
+        self.ui.jobProgressBar.setValue(progress+1)
     
-    def updateRunning(self, lines):
-        '''
+    def readLogFile(self):
+        ''' Read at most 1 MB of the lines appended to the log file, the most recent first
         '''
         
-        self.total_running += len(self.parseNames(lines))
-        self.total_running -= len(self.parseNames(lines, 'Completed'))
-        
-    def updateProgress(self, lines, tag='Finished: '):
-        '''
-        '''
-        
-        progress, maximum = None, None
-        for i in xrange(len(lines)):
-            line = lines[i]
-            idx = line.find(tag)
-            if idx != -1:
-                line = line[idx+len(tag):]
-                idx = line.find(' -')
-                if idx != -1: line = line[:idx]
-                progress, maximum = tuple([int(v) for v in line.split(',')])
-                if self.ui.jobProgressBar.maximum() != (maximum+1):
-                    self.ui.jobProgressBar.setMaximum(maximum+1)
-                self.ui.jobProgressBar.setValue(progress+1)
-                #QtGui.QApplication.processEvents()
-                return
-    
-    def readLogFile(self, once=False):
-        '''
-        '''
-        
-        if self.fin is None:
-            if not os.path.exists(self.log_file): 
-                return []
-            try:
-                self.fin = open(self.log_file, 'rb')
-            except: 
-                self.fin = None
-                return []
+        if self.tail is None: self.tail = log_monitor.LogTail(self.log_file)
         try:
-            lines = self.fin.readlines(1048576)
-            lines.reverse()
-            if once:
-                try:self.fin.close()
-                except: pass
-                self.fin = None
-            return lines
+            lines = self.tail.poll(1048576)
         except:
+            _logger.exception("Failed to read log file")
             return []
-        
-    
-        
-        
+        lines.reverse()
+        return lines
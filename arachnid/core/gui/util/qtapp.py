@@ -4,11 +4,9 @@
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
 
-try: 
-    from qt4_loader import QtGui, QtCore
-    QtGui;
-except:
-    QtGui=None
+from ...util import lazy_import
+
+qt4_loader = lazy_import.lazy_module('arachnid.core.gui.util.qt4_loader', optional=True, message='Failed to load PySide or PyQt4')
 
 def create_app():
     ''' Create an instance of application with the appropriate 
@@ -20,7 +18,8 @@ def create_app():
           Instance of QApplication
     '''
     import arachnid
-    if QtGui is None: return None
+    if not lazy_import.is_available(qt4_loader): return None
+    QtGui, QtCore = qt4_loader.QtGui, qt4_loader.QtCore
     #QtGui.QApplication.setStyle('cde')
     app = QtGui.QApplication([])
     QtCore.QCoreApplication.setOrganizationName("Arachnid")
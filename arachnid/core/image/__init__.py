@@ -20,11 +20,14 @@
     ndimage_utility
     ndimage_file
     ndimage_filter
+    ndimage_stats
+    ndimage_slab
     ndimage_interpolate
     reconstruct
     reproject
     rotate
     alignment
+    projection_align
     affine_transform
     enhance
 
@@ -3,6 +3,7 @@
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
 import scipy.fftpack
+import collections
 import numpy
 import logging
 import math
@@ -193,3 +194,124 @@ def transfer_function(out, defocus, cs, ampcont, envelope_half_width=10000, volt
 
 
 
+_transfer_function_cache = collections.OrderedDict()
+
+def cached_phase_flip_transfer_function(shape, defocus, cache_size=64, **extra):
+    ''' Get a phase flipping transfer function from a bounded least-recently-used cache
+    
+    :Parameters:
+    
+    shape : tuple
+            Number of rows and columns in the image
+    defocus : float
+              Amount of defocus, in Angstroems
+    cache_size : int
+                 Maximum number of transfer functions held in the cache
+    extra : dict
+            Parameters of the transfer function, see :py:func:`phase_flip_transfer_function`
+    
+    :Returns:
+    
+    out : array
+          Transfer function in the layout of numpy.fft.rfft2 (rows, columns/2+1)
+    '''
+    
+    key = (tuple(shape), float(defocus))+tuple([extra.get(name) for name in _transfer_function_keys])
+    out = _transfer_function_cache.pop(key, None)
+    if out is None:
+        out = phase_flip_transfer_function((shape[1], shape[0]), defocus, **extra)
+        while len(_transfer_function_cache) >= max(1, cache_size): _transfer_function_cache.popitem(last=False)
+    _transfer_function_cache[key] = out
+    return out
+
+_transfer_function_keys = ('cs', 'ampcont', 'voltage', 'elambda', 'apix', 'maximum_spatial_freq', 'source', 'defocus_spread', 'astigmatism', 'azimuth', 'ctf_sign')
+
+def phase_flip_stack(stack, defocus, out=None, defocus_bin=10.0, batch_size=64, **extra):
+    ''' Phase flip a stack of images each with its own defocus
+    
+    The defocus values are quantized into bins of width `defocus_bin` and
+    the particles are processed grouped by bin, so the transfer function of
+    each bin is built once (see :py:func:`cached_phase_flip_transfer_function`)
+    and applied with a single precision real FFT per image (see :py:func:`filter_stack_rfft`).
+    
+    .. sourcecode:: py
+    
+        >>> from arachnid.core.image.ctf import correct
+        >>> flipped = correct.phase_flip_stack(stack, align[:, 17], defocus_bin=20.0, **param)
+    
+    :Parameters:
+    
+    stack : array
+            Stack of images (n, rows, columns)
+    defocus : array
+              Amount of defocus for each image, in Angstroems
+    out : array, optional
+          Output stack of images, float32 (may be the input stack)
+    defocus_bin : float
+                  Width of a defocus bin in Angstroems, 0 disables binning
+    batch_size : int
+                 Maximum number of images transformed together
+    extra : dict
+            Parameters of the transfer function, see :py:func:`phase_flip_transfer_function`,
+            and `cache_size`, the maximum number of cached transfer functions
+    
+    :Returns:
+    
+    out : array
+          Phase flipped stack of images
+    '''
+    
+    defocus = numpy.asarray(defocus, dtype=numpy.float64).ravel()
+    if len(defocus) != len(stack): raise ValueError, "Requires a defocus value for each image: %d != %d"%(len(defocus), len(stack))
+    if out is None: out = numpy.empty(stack.shape, dtype=numpy.float32)
+    shape = stack.shape[1:]
+    if defocus_bin > 0: defocus = numpy.round(defocus/defocus_bin)*defocus_bin
+    order = numpy.argsort(defocus, kind='mergesort')
+    bins, start = numpy.unique(defocus[order], return_index=True)
+    start = numpy.append(start, len(order))
+    for i in xrange(len(bins)):
+        ctfimg = cached_phase_flip_transfer_function(shape, bins[i], **extra)
+        for beg in xrange(start[i], start[i+1], batch_size):
+            index = order[beg:min(beg+batch_size, start[i+1])]
+            out[index] = filter_stack_rfft(stack[index], ctfimg)
+    return out
+
+def filter_stack_rfft(stack, ctfimg):
+    ''' Multiply the Fourier transform of each image in a stack by a filter in
+    the layout of numpy.fft.rfft2, in single precision
+    
+    numpy.fft always transforms in double precision, so the stack is transformed
+    with the float32 real FFT of scipy.fftpack along the columns and the complex64
+    FFT along the rows. The real FFT packs the coefficients as (Re0, Re1, Im1, ...),
+    the interior coefficients are filtered as complex values while the first and
+    (for an even width) last coefficient are filtered as real columns. This gives
+    the same result as numpy.fft.irfft2(numpy.fft.rfft2(stack)*ctfimg).
+    
+    :Parameters:
+    
+    stack : array
+            Stack of images (n, rows, columns)
+    ctfimg : array
+             Filter (rows, columns/2+1)
+    
+    :Returns:
+    
+    out : array
+          Filtered stack of images, float32
+    '''
+    
+    cols = stack.shape[2]
+    m = (cols-1)/2
+    fimg = scipy.fftpack.rfft(numpy.asarray(stack, dtype=numpy.float32), axis=2)
+    inner = numpy.ascontiguousarray(fimg[:, :, 1:1+2*m]).view(numpy.complex64)
+    inner = scipy.fftpack.fft(inner, axis=1, overwrite_x=True)
+    inner *= ctfimg[:, 1:1+m]
+    inner = scipy.fftpack.ifft(inner, axis=1, overwrite_x=True)
+    fimg[:, :, 1:1+2*m:2] = inner.real
+    fimg[:, :, 2:2+2*m:2] = inner.imag
+    edges = [(0, 0)] if (cols%2) == 1 else [(0, 0), (cols-1, cols/2)]
+    for i, j in edges:
+        col = scipy.fftpack.fft(fimg[:, :, i], axis=1)
+        col *= ctfimg[:, j]
+        fimg[:, :, i] = scipy.fftpack.ifft(col, axis=1, overwrite_x=True).real
+    return scipy.fftpack.irfft(fimg, axis=2, overwrite_x=True)
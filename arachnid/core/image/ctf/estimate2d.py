@@ -5,9 +5,11 @@
 '''
 
 from arachnid.core.app import tracing
+from ...util import lazy_import
 #from .. import ndimage_interpolate
 import numpy
-import scipy.optimize
+
+scipy = lazy_import.lazy_module('scipy', 'optimize')
 
 
 import logging
@@ -25,8 +27,55 @@ except:
 # CTF FIND3
 ######################################################################
 
-def search_model_2d(powspec, dfmin, dfmax, fstep, rmin, rmax, ampcont, cs, voltage, pad=1.0, apix=None, xmag=None, res=None, **extra):
-    '''
+def search_model_2d(powspec, dfmin, dfmax, fstep, rmin, rmax, ampcont, cs, voltage, pad=1.0, apix=None, xmag=None, res=None, coarse_factor=1, **extra):
+    ''' Search for the defocus and astigmatism that best fits a 2D power spectrum
+    
+    The (df1, df2, angast) grid is scored in blocks with :py:func:`eval_model_2d_batch`. If
+    `coarse_factor` is greater than one, the grid is first sampled every `coarse_factor*fstep`
+    and then refined every `fstep` (and every degree of angast) around the best point, before
+    the final simplex optimization.
+    
+    :Parameters:
+    
+    powspec : array
+              2D power spectrum
+    dfmin : float
+            Minimum defocus
+    dfmax : float
+            Maximum defocus
+    fstep : float
+            Defocus step of the grid search
+    rmin : float
+           Minimum resolution
+    rmax : float
+           Maximum resolution
+    ampcont : float
+              Amplitude contrast
+    cs : float
+         Spherical aberration
+    voltage : float
+              Voltage of the microscope
+    pad : float
+          Padding of the power spectrum
+    apix : float
+           Pixel size
+    xmag : float
+           Magnification (used if apix is None)
+    res : float
+          Scanning resolution (used if apix is None)
+    coarse_factor : int
+                    Step multiplier for the coarse grid, 1 searches the full grid at `fstep`
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    df1 : float
+          Defocus along the first axis
+    df2 : float
+          Defocus along the second axis
+    angast : float
+             Angle of astigmatism in radians
     '''
     
     if rmin < rmax: rmin, rmax = rmax, rmin
@@ -41,7 +90,6 @@ def search_model_2d(powspec, dfmin, dfmax, fstep, rmin, rmax, ampcont, cs, volta
     hw = -1.0/rmax2
     print 'Searching CTF Parameters...'
     print '      DFMID1      DFMID2      ANGAST          CC'
-    best=(-1e20, None, None, None)
     i1 = int(dfmin/fstep)
     i2 = int(dfmax/fstep)
     cs *= 10**7.0
@@ -56,19 +104,18 @@ def search_model_2d(powspec, dfmin, dfmax, fstep, rmin, rmax, ampcont, cs, volta
     pow_sm = pow_sm.T.copy()
     smooth_2d(pow_sm, rmin)
     
-    p=0
-    for k in xrange(0, 18):
-        for i in xrange(i1, i2+1):
-            for j in xrange(i1, i2+1):
-                df1, df2, ang = fstep*i, fstep*j, numpy.deg2rad(5.0*k)
-                val = eval_model_2d(df1, df2, ang, pow_sm, cs, wl, ampcont, thetatr, rmin2, rmax2, hw)
-                #model[:, :]=0
-                #val = eval_model_2d_test(df1, df2, ang, powspec, model, cs, wl, ampcont, thetatr, rmin2, rmax2, hw)
-                if val > best[0]:  
-                    print "%f\t%f\t%f\t%f"%(df1, df2, numpy.rad2deg(ang), val)
-                    best=(val, df1, df2, ang)
-                p+=1
-                
+    points = prepare_model_2d(pow_sm, thetatr, rmin2, rmax2, hw)
+    coarse_factor = max(1, int(coarse_factor))
+    angles = numpy.deg2rad(numpy.arange(0, 18)*5.0)
+    defocus = numpy.arange(i1, i2+1, coarse_factor)*fstep
+    best = grid_search_2d(points, defocus, defocus, angles, cs, wl, ampcont)
+    _logger.debug("Grid: %f\t%f\t%f\t%f"%(best[1], best[2], numpy.rad2deg(best[3]), best[0]))
+    if coarse_factor > 1:
+        window = numpy.arange(-coarse_factor, coarse_factor+1)*fstep
+        angles = best[3]+numpy.deg2rad(numpy.arange(-5, 6)*1.0)
+        best = grid_search_2d(points, best[1]+window, best[2]+window, angles, cs, wl, ampcont)
+        _logger.debug("Refined grid: %f\t%f\t%f\t%f"%(best[1], best[2], numpy.rad2deg(best[3]), best[0]))
+    
     powspec = pow_sm
     
     def error_func(p0):
@@ -95,4 +142,131 @@ def eval_model_2d(dfmid1, dfmid2, angast, pow, cs, wl, wgh, thetatr, rmin2, rmax
     n = max(pow.shape)
     return _ctf.evalctf(float(cs), float(wl), float(numpy.sqrt(1.0-wgh*wgh)), float(wgh), float(dfmid1), float(dfmid2), float(angast), float(thetatr), float(hw), pow.T, numpy.asarray((n, n, 0), dtype=numpy.int32), float(rmin2), float(rmax2), 0.0)
 
+def prepare_model_2d(pow, thetatr, rmin2, rmax2, hw):
+    ''' Gather the power spectrum samples within the resolution range for :py:func:`eval_model_2d_batch`
+    
+    The samples and layout follow :py:func:`eval_model_2d`: `pow` holds the smoothed
+    half power spectrum, indexed by (row, column) where the column is the positive
+    frequency and the row wraps around.
+    
+    :Parameters:
+    
+    pow : array
+          Smoothed half power spectrum
+    thetatr : float
+              Angular increment of a pixel
+    rmin2 : float
+            Squared low resolution limit
+    rmax2 : float
+            Squared high resolution limit
+    hw : float
+         Width of the B-factor like weight on the power spectrum (0 disables the weight)
+    
+    :Returns:
+    
+    points : tuple
+             Scaled squared radius, cosine and sine of twice the angle, weighted power
+             and the normalization of the power for each sample
+    '''
+    
+    n = max(pow.shape)
+    mm = numpy.arange(n, dtype=numpy.float64)
+    mm[mm > n/2] -= n
+    ll = numpy.arange(n/2, dtype=numpy.float64)
+    mm, ll = numpy.meshgrid(mm, ll, indexing='ij')
+    res2 = (ll/n)**2 + (mm/n)**2
+    sel = numpy.logical_and(res2 <= rmax2, res2 > rmin2)
+    ll, mm, res2 = ll[sel], mm[sel], res2[sel]
+    ain = numpy.asarray(pow, dtype=numpy.float64).ravel()[:n*(n/2)].reshape((n, n/2))[sel]
+    if hw != 0.0: ain = ain*numpy.exp(hw*res2)
+    angspt = numpy.arctan2(mm, ll)
+    hangle2 = (ll*ll+mm*mm)*(0.5*thetatr*thetatr)
+    return (hangle2, numpy.cos(2.0*angspt), numpy.sin(2.0*angspt), ain, numpy.sqrt(numpy.dot(ain, ain)))
+
+def eval_model_2d_batch(params, points, cs, wl, wgh, dast=0.0, block_size=0):
+    ''' Score a set of (df1, df2, angast) candidates against the power spectrum
+    
+    This evaluates the same score as :py:func:`eval_model_2d` for every candidate
+    with matrix operations over blocks of candidates.
+    
+    :Parameters:
+    
+    params : array
+             Candidates, one (df1, df2, angast) triple per row
+    points : tuple
+             Power spectrum samples, see :py:func:`prepare_model_2d`
+    cs : float
+         Spherical aberration (in Angstroems)
+    wl : float
+         Wavelength of the electrons
+    wgh : float
+          Amplitude contrast
+    dast : float
+           Expected astigmatism, restrains the difference between df1 and df2 (0 disables)
+    block_size : int
+                 Number of candidates scored at once, 0 chooses a size that bounds the memory
+    
+    :Returns:
+    
+    vals : array
+           Score for each candidate
+    '''
+    
+    hangle2, ccos, csin, ain, norm = points
+    params = numpy.asarray(params, dtype=numpy.float64).reshape((-1, 3))
+    vals = numpy.zeros(len(params))
+    if len(hangle2) == 0: return vals
+    wgh1, wgh2 = numpy.sqrt(1.0-wgh*wgh), wgh
+    c1 = (2.0*numpy.pi/wl)*hangle2
+    c2 = -c1*cs*hangle2
+    if block_size <= 0: block_size = max(1, 2**22/len(hangle2))
+    for beg in xrange(0, len(params), block_size):
+        p = params[beg:beg+block_size]
+        dsum, ddif = p[:, 0]+p[:, 1], p[:, 0]-p[:, 1]
+        chi = numpy.outer(numpy.cos(2.0*p[:, 2])*ddif, ccos)
+        chi += numpy.outer(numpy.sin(2.0*p[:, 2])*ddif, csin)
+        chi += dsum[:, numpy.newaxis]
+        chi *= 0.5*c1
+        chi += c2
+        ctfv = -wgh1*numpy.sin(chi)
+        ctfv -= wgh2*numpy.cos(chi)
+        numpy.square(ctfv, ctfv)
+        num = numpy.dot(ctfv, ain)
+        numpy.square(ctfv, ctfv)
+        vals[beg:beg+len(p)] = num/numpy.sqrt(ctfv.sum(axis=1))/norm
+        if dast > 0.0: vals[beg:beg+len(p)] -= ddif**2/2.0/dast**2/len(hangle2)
+    return vals
 
+def grid_search_2d(points, defocus1, defocus2, angles, cs, wl, wgh, **extra):
+    ''' Find the best scoring point on a (df1, df2, angast) grid
+    
+    :Parameters:
+    
+    points : tuple
+             Power spectrum samples, see :py:func:`prepare_model_2d`
+    defocus1 : array
+               Values of df1 to test
+    defocus2 : array
+               Values of df2 to test
+    angles : array
+             Values of angast to test, in radians
+    cs : float
+         Spherical aberration (in Angstroems)
+    wl : float
+         Wavelength of the electrons
+    wgh : float
+          Amplitude contrast
+    extra : dict
+            Keyword arguments for :py:func:`eval_model_2d_batch`
+    
+    :Returns:
+    
+    best : tuple
+           Score, df1, df2 and angast of the best point
+    '''
+    
+    ang, df1, df2 = numpy.meshgrid(angles, defocus1, defocus2, indexing='ij')
+    params = numpy.column_stack((df1.ravel(), df2.ravel(), ang.ravel()))
+    vals = eval_model_2d_batch(params, points, cs, wl, wgh, **extra)
+    idx = numpy.argmax(vals)
+    return (vals[idx], params[idx, 0], params[idx, 1], params[idx, 2])
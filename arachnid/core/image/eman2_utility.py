@@ -7,24 +7,14 @@ numpy arrays.
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
 
-from ..app import tracing
+from ..util import lazy_import
 import logging
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
-
-try:
-    import EMAN2
-    import utilities
-    import fundamentals
-    EMAN2;
-    fundamentals;
-    utilities;
-except:
-    tracing.log_import_error('Failed to load EMAN2 module', _logger)
-    EMAN2 = None
-    fundamentals = None 
-    utilities = None
+EMAN2 = lazy_import.lazy_module('EMAN2', optional=True, message='Failed to load EMAN2 module')
+utilities = lazy_import.lazy_module('utilities', optional=True, message='Failed to load EMAN2 module')
+fundamentals = lazy_import.lazy_module('fundamentals', optional=True, message='Failed to load EMAN2 module')
 import numpy
 
 
@@ -37,7 +27,7 @@ def is_avaliable():
           True if the EMAN2 library is available
     '''
     
-    return EMAN2 is not None
+    return lazy_import.is_available(EMAN2, utilities, fundamentals)
 
 
 def fshift(img, x, y, z=0, out=None):
@@ -64,7 +54,7 @@ def fshift(img, x, y, z=0, out=None):
           Transformed image
     '''
     
-    if fundamentals is None: raise ImportError, "EMAN2/Sparx library not available, fshift requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, fshift requires EMAN2/Sparx"
     if out is None: out = img.copy()
     emdata = numpy2em(img)
     emdata = fundamentals.fshift(emdata, x, y, z)
@@ -91,7 +81,7 @@ def normalize_mask(img, mask, no_std=0, out=None):
           Transformed image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, normalize_mask requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, normalize_mask requires EMAN2/Sparx"
     if out is None: out = img.copy()
     emdata = numpy2em(img)
     emdata.process_inplace("normalize.mask", {"mask": numpy2em(mask), "no_sigma": no_std})
@@ -116,7 +106,7 @@ def mirror(img, out=None):
           Transformed image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, mirror requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, mirror requires EMAN2/Sparx"
     if out is None: out = img.copy()
     emdata = numpy2em(img)
     emdata.process_inplace("mirror", {"axis":'x'})
@@ -150,7 +140,7 @@ def rot_shift2D(img, psi, tx=None, ty=None, m=None, out=None):
           Transformed image
     '''
     
-    if fundamentals is None: raise ImportError, "EMAN2/Sparx library not available, rot_shift2D requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, rot_shift2D requires EMAN2/Sparx"
     if tx is None:
         #m = psi[1] > 179.9
         tx = psi[6]
@@ -182,7 +172,7 @@ def model_circle(rad, x, y):
             Image with disk of radius `rad`
     '''
     
-    if utilities is None: raise ImportError, "EMAN2/Sparx library not available, model_circle requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, model_circle requires EMAN2/Sparx"
     emdata =  utilities.model_circle(rad, x, y)
     return em2numpy(emdata).copy()
 
@@ -220,7 +210,7 @@ def em2numpy2em(fn):
               Image
         '''
         
-        if EMAN2 is None: return fn(img, *args, **kwargs)
+        if not lazy_import.is_loaded(EMAN2): return fn(img, *args, **kwargs)
         orig = img
         if is_em(img): img = em2numpy(img)
         res = fn(img, *args, **kwargs)
@@ -262,7 +252,7 @@ def em2numpy2res(fn):
               Image
         '''
         
-        if EMAN2 is None: return fn(img, *args, **kwargs)
+        if not lazy_import.is_loaded(EMAN2): return fn(img, *args, **kwargs)
         orig = img
         orig;
         if is_em(img): img = em2numpy(img)
@@ -348,7 +338,7 @@ def em2numpy(im):
                 An numpy.ndarray holding image data
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, numpy2em requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, numpy2em requires EMAN2/Sparx"
     return EMAN2.EMNumPy.em2numpy(im)
 
 def numpy2em(im, e=None):
@@ -374,7 +364,7 @@ def numpy2em(im, e=None):
                 An EMAN2 image object
     '''
         
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, numpy2em requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, numpy2em requires EMAN2/Sparx"
     try:
         im = numpy.require(im, numpy.float32)
         if e is None: e = EMAN2.EMData()
@@ -401,7 +391,7 @@ def fsc(img1, img2, complex=False):
           Fourier shell correlation curve: (0) spatial frequency (1) FSC
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, fsc requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, fsc requires EMAN2/Sparx"
     if not is_em(img1): img1 = numpy2em(img1)
     if not is_em(img2): img2 = numpy2em(img2)
     if complex:
@@ -430,7 +420,7 @@ def ramp(img, inplace=True):
           Ramped Image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, ramp requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, ramp requires EMAN2/Sparx"
     orig = img
     if not is_em(img): img = numpy2em(img)
     if inplace: img.process_inplace("filter.ramp")
@@ -461,7 +451,7 @@ def histfit(img, mask, noise, debug=False):
           Enhanced image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, histfit requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, histfit requires EMAN2/Sparx"
     if debug:
         info, tag, img = utilities.ce_fit(img, noise, mask)
         print info, tag
@@ -489,7 +479,7 @@ def decimate(img, bin_factor=0, force_even=False, **extra):
           Decimated image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, decimate requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, decimate requires EMAN2/Sparx"
     orig = img
     if not is_em(img): img = numpy2em(img)
     
@@ -531,7 +521,7 @@ def butterworth_low_pass(img, bw_lo, bw_falloff, pad=False, **extra):
           Filtered image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, butterworth_low_pass requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, butterworth_low_pass requires EMAN2/Sparx"
     orig = img
     if not is_em(img): img = numpy2em(img)
     img = EMAN2.Processor.EMFourierFilter(img, {"filter_type" : EMAN2.Processor.fourier_filter_types.BUTTERWORTH_LOW_PASS,    "low_cutoff_frequency": bw_lo, "high_cutoff_frequency": bw_lo+bw_falloff, "dopad" : pad})
@@ -558,7 +548,7 @@ def butterworth_high_pass(img, bw_hi, bw_falloff, pad=False, **extra):
           Filtered image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, butterworth_high_pass requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, butterworth_high_pass requires EMAN2/Sparx"
     orig = img
     if not is_em(img): img = numpy2em(img)
     img = EMAN2.Processor.EMFourierFilter(img, {"filter_type" : EMAN2.Processor.fourier_filter_types.BUTTERWORTH_HIGH_PASS,   "low_cutoff_frequency": bw_hi+bw_falloff, "high_cutoff_frequency": bw_hi, "dopad" : pad})
@@ -585,7 +575,7 @@ def butterworth_band_pass(img, bw_lo, bw_hi, bw_falloff, pad=False, **extra):
           Filtered image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, butterworth_band_pass requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, butterworth_band_pass requires EMAN2/Sparx"
     orig = img
     if not is_em(img): img = numpy2em(img)
     img = EMAN2.Processor.EMFourierFilter(img, {"filter_type" : EMAN2.Processor.fourier_filter_types.BUTTERWORTH_HIGH_PASS,   "low_cutoff_frequency": bw_hi+bw_falloff, "high_cutoff_frequency": bw_hi, "dopad" : pad})
@@ -613,7 +603,7 @@ def gaussian_high_pass(img, ghp_sigma=0.1, pad=False, **extra):
           Filtered image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, gaussian_high_pass requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, gaussian_high_pass requires EMAN2/Sparx"
     if ghp_sigma == 0.0: return img
     orig = img
     if not is_em(img): img = numpy2em(img)
@@ -641,7 +631,7 @@ def gaussian_low_pass(img, glp_sigma=0.1, pad=False, **extra):
           Filtered image
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, gaussian_low_pass requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, gaussian_low_pass requires EMAN2/Sparx"
     if glp_sigma == 0.0: return img
     orig = img
     if not is_em(img): img = numpy2em(img)
@@ -669,7 +659,7 @@ def setup_nn4(image_size, npad=2, sym='c1', weighting=1, **extra):
             Reconstructor, Fourier volume, Weight Volume, and numpy versions
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, setup_nn4 requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, setup_nn4 requires EMAN2/Sparx"
     fftvol = EMAN2.EMData()
     weight = EMAN2.EMData()
     param = {"size":image_size, "npad":npad, "symmetry":sym, "weighting":weighting, "fftvol": fftvol, "weight": weight}
@@ -698,7 +688,7 @@ def backproject_nn4_queue(qin, qout, shmem, shape, process_limit, process_number
             Reconstructor, Fourier volume, Weight Volume, and numpy versions
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, backproject_nn4_queue requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, backproject_nn4_queue requires EMAN2/Sparx"
     npad, sym, weighting = extra.get('npad', 2), extra.get('sym', 'c1'), extra.get('weighting', 1)
     e = EMAN2.EMData()
     recon=None
@@ -738,7 +728,7 @@ def backproject_nn4_new(img, align=None, recon=None, **extra):
             Reconstructor, Fourier volume, Weight Volume, and numpy versions
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, backproject_nn4_new requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, backproject_nn4_new requires EMAN2/Sparx"
     npad, sym, weighting = extra.get('npad', 2), extra.get('sym', 'c1'), extra.get('weighting', 1)
     e = EMAN2.EMData()
     if not hasattr(img, 'ndim'):
@@ -783,7 +773,7 @@ def backproject_nn4(img, align=None, recon=None, **extra):
             Reconstructor, Fourier volume, Weight Volume, and numpy versions
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, backproject_nn4 requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, backproject_nn4 requires EMAN2/Sparx"
     npad, sym, weighting = extra.get('npad', 2), extra.get('sym', 'c1'), extra.get('weighting', 1)
     if not hasattr(img, 'ndim'):
         for i, val in enumerate(img):
@@ -814,7 +804,7 @@ def finalize_nn4(recon, recon2=None, npad=2, sym='c1', weighting=1):
           Volume as a numpy array
     '''
     
-    if EMAN2 is None: raise ImportError, "EMAN2/Sparx library not available, finalize_nn4 requires EMAN2/Sparx"
+    if not is_avaliable(): raise ImportError, "EMAN2/Sparx library not available, finalize_nn4 requires EMAN2/Sparx"
     if recon2 is not None:
         fftvol = recon[1]+recon2[1]
         weight = recon[2]+recon2[2]
@@ -38,6 +38,14 @@ using the following:
 
     imfile.write_image('image.mrc', image)
 
+When the images are processed as they are read, the reads can be overlapped
+with the computation using a background reader thread:
+
+.. sourcecode:: py
+
+    for img in imfile.iter_images_prefetch('stack.spi', readahead=32):
+        process(img)
+
 .. end-dev
 
 .. Created on Aug 11, 2012
@@ -49,9 +57,15 @@ from formats import eman_format
 from ..metadata import spider_utility
 from ..metadata import format_utility
 from ..parallel import mpi_utility
+from ..app import instrument
 import ndimage_utility
 import numpy
 import logging
+import threading
+import Queue
+import ctypes
+import time
+import sys
 import os
 from formats.util import InvalidHeaderException
 InvalidHeaderException;
@@ -59,6 +73,9 @@ InvalidHeaderException;
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
+_POSIX_FADV_WILLNEED = 3
+_libc = False
+
 def copy_local(filename, selection, local_file, **extra):
     ''' Copy a stack or set of stacks to a single stack on a remote drive.
     MPI only
@@ -182,13 +199,16 @@ def read_image(filename, index=None, **extra):
         if key not in extra: continue
         param[key] = extra[key]
     try:
-        return read_format.read_image(filename, index, **param)
+        with instrument.timer('image.read'):
+            img = read_format.read_image(filename, index, **param)
     except:
         if index is not None:
             _logger.error("Error reading: %d@%s"%(index, filename))
         else:
             _logger.error("Error reading: %s"%filename)
         raise
+    instrument.count('image.read.bytes', img.nbytes)
+    return img
 
 def read_stack(filename):
     ''' Read an entire stack into a multi-dimensional array
@@ -287,8 +307,244 @@ def iter_images(filename, index=None, header=None):
     if index is not None and hasattr(index, '__iter__') and not hasattr(index, 'ndim'): index = numpy.asarray(index)
     filename = readlinkabs(filename)
     format = get_read_format_except(filename)
+    if not instrument.is_enabled():
+        for img in format.iter_images(filename, index, header):
+            yield img
+        return
+    beg = time.time()
     for img in format.iter_images(filename, index, header):
+        instrument.add_time('image.read', time.time()-beg)
+        instrument.count('image.read.bytes', img.nbytes)
         yield img
+        beg = time.time()
+
+def iter_images_prefetch(filename, index=None, readahead=16, max_bytes=0, advise=True):
+    ''' Read a set of images from the given file(s) using a background
+    reader thread
+    
+    The images are decoded ahead of the consumer into a bounded queue, so
+    the I/O overlaps with the processing of the previous images. When the
+    requested images span multiple stacks, each block of `readahead` images
+    is read grouped by stack (and sorted by index within a stack), then
+    returned in the requested order.
+    
+    .. sourcecode:: py
+        
+        for img in ndimage_file.iter_images_prefetch(files, readahead=32, max_bytes=256*2**20):
+            process(img)
+    
+    :Parameters:
+        
+        filename : str
+                   Input filename to read, see :py:func:`iter_images`
+        index : int or array, optional
+                Image index, see :py:func:`iter_images`
+        readahead : int
+                    Maximum number of decoded images held in the queue, if less
+                    than one, then images are read synchronously
+        max_bytes : int
+                    Maximum number of bytes held in the queue, 0 means no limit
+        advise : bool
+                 Hint the operating system to read ahead the next block of each stack
+                 (`posix_fadvise`), if supported
+    
+    :Returns:
+            
+        out : array
+              Image in the requested order
+    '''
+    
+    if readahead < 1:
+        for img in iter_images(filename, index):
+            yield img
+        return
+    plan = _prefetch_plan(filename, index)
+    if plan is None: source = iter_images(filename, index)
+    else: source = _iter_planned(plan, readahead, max_bytes, advise)
+    queue = Queue.Queue(readahead)
+    budget = threading.Condition()
+    state = dict(bytes=0, stop=False)
+    
+    def reader():
+        try:
+            for img in source:
+                with budget:
+                    while max_bytes > 0 and state['bytes'] > 0 and state['bytes']+img.nbytes > max_bytes and not state['stop']:
+                        budget.wait(0.1)
+                    if state['stop']: return
+                    state['bytes'] += img.nbytes
+                while not state['stop']:
+                    try: queue.put((img, None), timeout=0.1)
+                    except Queue.Full: continue
+                    break
+                if state['stop']: return
+            queue.put((None, None))
+        except:
+            queue.put((None, sys.exc_info()))
+    
+    thread = threading.Thread(target=reader, name="ImagePrefetch")
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            img, exc_info = queue.get()
+            if exc_info is not None: raise exc_info[0], exc_info[1], exc_info[2]
+            if img is None: break
+            with budget:
+                state['bytes'] -= img.nbytes
+                budget.notify()
+            yield img
+    finally:
+        state['stop'] = True
+        with budget: budget.notify()
+
+def _prefetch_plan(filename, index):
+    ''' Expand the input into a list of (filename, index) pairs, when this
+    can be done without reading the images
+    
+    :Parameters:
+        
+        filename : str
+                   Input filename to read, see :py:func:`iter_images`
+        index : int or array, optional
+                Image index, see :py:func:`iter_images`
+    
+    :Returns:
+            
+        plan : list
+               List of (filename, index) pairs or None if the input cannot be planned
+    '''
+    
+    if isinstance(filename, tuple): filename, index = filename
+    if isinstance(filename, list) and index is None:
+        if len(filename) > 0 and isinstance(filename[0], tuple):
+            return [(readlinkabs(f), int(id)-1) for f, id in filename]
+        plan = []
+        for f in filename:
+            f = readlinkabs(f)
+            plan.extend([(f, i) for i in xrange(count_images(f))])
+        return plan
+    if not hasattr(filename, 'find'): return None
+    filename = readlinkabs(filename)
+    if index is None: index = xrange(count_images(filename))
+    elif isinstance(index, int): index = xrange(index, count_images(filename))
+    else:
+        index = numpy.asarray(index)
+        if index.ndim != 1 or count_images(filename) == 1: return None
+    return [(filename, int(i)) for i in index]
+
+def _iter_planned(plan, readahead, max_bytes, advise):
+    ''' Read the planned images in blocks, grouping the reads by stack
+    
+    :Parameters:
+        
+        plan : list
+               List of (filename, index) pairs
+        readahead : int
+                    Maximum number of images in a block
+        max_bytes : int
+                    Maximum number of bytes in a block, 0 means no limit
+        advise : bool
+                 Hint the operating system to read ahead the next block
+    
+    :Returns:
+            
+        out : array
+              Image in the planned order
+    '''
+    
+    counts = {}
+    block = readahead
+    beg = 0
+    while beg < len(plan):
+        end = min(beg+block, len(plan))
+        order = sorted(xrange(beg, end), key=lambda i: plan[i])
+        if advise: _advise_block(plan[end:min(end+block, len(plan))], counts)
+        out = [None]*(end-beg)
+        i = 0
+        while i < len(order):
+            f = plan[order[i]][0]
+            j = i
+            while j < len(order) and plan[order[j]][0] == f: j += 1
+            if f not in counts: counts[f] = count_images(f)
+            if counts[f] == 1 or (j-i) == 1:
+                for k in xrange(i, j): out[order[k]-beg] = read_image(f, plan[order[k]][1])
+            else:
+                for k, img in zip(xrange(i, j), iter_images(f, numpy.asarray([plan[order[k]][1] for k in xrange(i, j)]))):
+                    out[order[k]-beg] = img
+            i = j
+        if max_bytes > 0 and out[0] is not None:
+            block = max(1, min(readahead, max_bytes/max(1, out[0].nbytes)))
+        for img in out: yield img
+        beg = end
+
+def _advise_block(block, counts):
+    ''' Hint the operating system to read the given images
+    
+    The images are assumed to be equally sized and stored contiguously
+    at the end of each stack.
+    
+    :Parameters:
+        
+        block : list
+                List of (filename, index) pairs
+        counts : dict
+                 Cache of the number of images in each file
+    '''
+    
+    files = {}
+    for f, i in block: files.setdefault(f, []).append(i)
+    for f, idx in files.iteritems():
+        try:
+            if f not in counts: counts[f] = count_images(f)
+            size = os.path.getsize(f)
+            nbytes = size/max(1, counts[f])
+            header = size-nbytes*counts[f]
+            _posix_fadvise(f, header+min(idx)*nbytes, (max(idx)-min(idx)+1)*nbytes, _POSIX_FADV_WILLNEED)
+        except (OSError, IOError): pass
+
+def _posix_fadvise(filename, offset, length, advice):
+    ''' Call `posix_fadvise` on a file if supported by the platform
+    
+    :Parameters:
+        
+        filename : str
+                   Input filename
+        offset : int
+                 Start of the region in bytes
+        length : int
+                 Length of the region in bytes
+        advice : int
+                 Type of advice
+    '''
+    
+    fadvise = getattr(os, 'posix_fadvise', None)
+    if fadvise is None:
+        libc = _load_libc()
+        if libc is None: return
+        fadvise = lambda fd, o, l, a: libc.posix_fadvise(fd, ctypes.c_int64(o), ctypes.c_int64(l), a)
+    fd = os.open(filename, os.O_RDONLY)
+    try: fadvise(fd, int(offset), int(length), advice)
+    finally: os.close(fd)
+
+def _load_libc():
+    ''' Load the C library for `posix_fadvise`
+    
+    :Returns:
+            
+        libc : CDLL
+               C library or None if `posix_fadvise` is not available
+    '''
+    
+    global _libc
+    if _libc is False:
+        _libc = None
+        try:
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            if hasattr(libc, 'posix_fadvise'): _libc = libc
+        except: pass
+    return _libc
 
 def count_images(filename):
     ''' Count the number of images in the file
@@ -377,7 +633,9 @@ def write_image(filename, img, index=None, header=None, inplace=False):
     format = get_write_format(filename)
     if format is None: 
         raise IOError, "Could not find format for extension of %s"%filename
-    format.write_image(filename, img, index, header, inplace)
+    with instrument.timer('image.write'):
+        format.write_image(filename, img, index, header, inplace)
+    instrument.count('image.write.bytes', img.nbytes)
     
 def write_stack(filename, imgs):
     ''' Write the given image to the given filename using a format
@@ -417,7 +675,7 @@ def get_write_format(filename):
         if mrc.is_writable(filename):
             return mrc
     except: pass
-    for f in _formats:
+    for f in _load():
         if f.is_writable(filename): return f
     return _default_write_format
 
@@ -461,7 +719,7 @@ def get_read_format(filename):
     
     if not os.path.exists(filename): raise IOError, "Cannot find file: %s"%(filename)
     
-    for f in _formats:
+    for f in _load():
         if f.is_readable(filename): return f
     return None
 
@@ -475,7 +733,7 @@ def cache_data():
     '''
     
     extra={}
-    for f in _formats:
+    for f in _load():
         if not hasattr(f, 'cache_data'): continue
         extra.update(f.cache_data())
     return extra
@@ -505,12 +763,24 @@ def readlinkabs(link):
 
 def _load():
     ''' Import available formats
+    
+    The test for EMAN2 is deferred until the first time a format
+    is requested.
+    
+    :Returns:
+        
+        formats : list
+                  List of available image formats
     '''
     
-    image_formats = [mrc, spider]
-    default_format=spider
-    if eman_format.is_avaliable(): image_formats.append(eman_format)
-    return image_formats, default_format
+    global _formats
+    
+    if _formats is None:
+        image_formats = [mrc, spider]
+        if eman_format.is_avaliable(): image_formats.append(eman_format)
+        _formats = image_formats
+    return _formats
 
-_formats, _default_write_format = _load()
+_formats = None
+_default_write_format = spider
 
@@ -10,12 +10,14 @@ SPIDER: http://www.wadsworth.org/spider_doc/spider/docs/spider.html
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
 from ..app import tracing
+from ..util import lazy_import
 import logging, numpy
-import scipy.fftpack
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
+scipy = lazy_import.lazy_module('scipy', 'fftpack')
+
 try: 
     from spi import _spider_filter
     _spider_filter;
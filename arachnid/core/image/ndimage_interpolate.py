@@ -13,9 +13,10 @@ SPIDER: http://www.wadsworth.org/spider_doc/spider/docs/spider.html
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
 from ..app import tracing
+from ..util import lazy_import
 import ndimage_filter
+import multiprocessing.pool
 import logging, numpy
-import scipy.fftpack
 import sys
 
 _ndinter = sys.modules[__name__]
@@ -23,6 +24,8 @@ _ndinter = sys.modules[__name__]
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
+scipy = lazy_import.lazy_module('scipy', 'fftpack')
+
 
 
 try:
@@ -152,6 +155,209 @@ def resample_fft_fast(img, out, is_fft=False):
         return out
     return fout
     
+def resample_fft_stack(stack, out, pad=None, batch_size=32, thread_count=0):
+    ''' Resample a stack of images by Fourier cropping or padding
+    
+    This gives the same result as calling :py:func:`resample_fft` on each image, but
+    transforms the images in batches along the first axis with a single precision
+    real FFT, reuses the pad buffer of each batch and optionally processes the
+    batches on a pool of threads.
+    
+    .. sourcecode:: py
+    
+        >>> from arachnid.core.image import ndimage_file, ndimage_interpolate
+        >>> stack = ndimage_file.read_image_mat('stack.spi')
+        >>> small = ndimage_interpolate.resample_fft_stack(stack, 2.0, thread_count=4)
+    
+    :Parameters:
+    
+    stack : array
+            Stack of images (n, rows, columns), may be a memory-mapped array
+    out : array, tuple or float
+          Output stack (n, rows, columns), shape of an output image or down sampling factor
+    pad : float, optional
+          Amount of padding, the pad is filled with the average of the image border
+    batch_size : int
+                 Number of images transformed together
+    thread_count : int
+                   Number of threads, 0 or 1 processes the stack in the calling thread
+    
+    :Returns:
+    
+    out : array
+          Resampled stack of images (float32 unless an output array is given)
+    '''
+    
+    if stack.ndim != 3: raise ValueError, "Requires a stack of 2D images, not a %d-D array"%stack.ndim
+    shape = stack.shape[1:]
+    if not hasattr(out, 'ndim'):
+        if hasattr(out, '__len__'): oshape = (int(out[0]), int(out[1]))
+        else:
+            assert(out > 1.0)
+            oshape = (int(shape[0]/out), int(shape[1]/out))
+        out = numpy.zeros((len(stack), )+oshape, dtype=numpy.float32)
+    elif len(out) != len(stack): raise ValueError, "Requires output stack with the same number of images: %d != %d"%(len(out), len(stack))
+    oshape = out.shape[1:]
+    ishape, fshape = shape, oshape
+    if pad is not None and pad > 1:
+        ishape = (int(shape[0]*pad), int(shape[1]*pad))
+        fshape = (int(oshape[0]*pad), int(oshape[1]*pad))
+    gain = float(fshape[0]*fshape[1])/float(ishape[0]*ishape[1])
+    terms = _rfft_resample_index(ishape, fshape)
+    batch_size = max(1, batch_size)
+    
+    def resample_range(rng):
+        beg, end = rng
+        buf = numpy.zeros((min(batch_size, end-beg), )+ishape, dtype=numpy.float32) if ishape != shape else None
+        for b in xrange(beg, end, batch_size):
+            e = min(b+batch_size, end)
+            if buf is not None:
+                imgs = buf[:e-b]
+                _pad_edge_mean(numpy.asarray(stack[b:e], dtype=numpy.float32), imgs)
+            else: imgs = numpy.asarray(stack[b:e], dtype=numpy.float32)
+            fimg = _rfft2_single(imgs).reshape((e-b, -1))
+            fout = None
+            for index, sign, weight in terms:
+                val = fimg[:, index]
+                val.imag *= sign
+                val *= weight
+                if fout is None: fout = val
+                else: fout += val
+            fout = _irfft2_single(fout.reshape((e-b, fshape[0], fshape[1]/2+1)), fshape[1])
+            fout *= gain
+            if fshape != oshape:
+                y, x = (fshape[0]-oshape[0])/2, (fshape[1]-oshape[1])/2
+                fout = fout[:, y:y+oshape[0], x:x+oshape[1]]
+            out[b:e] = fout
+    
+    thread_count = max(1, min(thread_count, (len(stack)+batch_size-1)/batch_size))
+    if thread_count > 1:
+        bounds = numpy.linspace(0, len(stack), thread_count+1).astype(numpy.int)
+        pool = multiprocessing.pool.ThreadPool(thread_count)
+        try: pool.map(resample_range, zip(bounds[:-1], bounds[1:]))
+        finally:
+            pool.close()
+            pool.join()
+    else: resample_range((0, len(stack)))
+    return out
+
+def _rfft2_single(imgs):
+    ''' Real 2D FFT of a stack of images in single precision, in the layout of numpy.fft.rfft2
+    
+    numpy.fft always transforms in double precision, so each row is transformed
+    with the float32 real FFT of scipy.fftpack, which packs the coefficients as
+    (Re0, Re1, Im1, ...), and the columns with the complex64 FFT.
+    
+    :Parameters:
+    
+    imgs : array
+           Stack of images (n, rows, columns), float32
+    
+    :Returns:
+    
+    fimg : array
+           Half spectrum of each image (n, rows, columns/2+1), complex64
+    '''
+    
+    cols = imgs.shape[2]
+    m = (cols-1)/2
+    packed = scipy.fftpack.rfft(imgs, axis=2)
+    fimg = numpy.zeros(imgs.shape[:2]+(cols/2+1, ), dtype=numpy.complex64)
+    fimg[:, :, 0] = packed[:, :, 0]
+    fimg.real[:, :, 1:1+m] = packed[:, :, 1:1+2*m:2]
+    fimg.imag[:, :, 1:1+m] = packed[:, :, 2:2+2*m:2]
+    if (cols%2) == 0: fimg[:, :, cols/2] = packed[:, :, cols-1]
+    return scipy.fftpack.fft(fimg, axis=1, overwrite_x=True)
+
+def _irfft2_single(fimg, cols):
+    ''' Inverse of :py:func:`_rfft2_single`, in the layout of numpy.fft.irfft2
+    
+    As with numpy.fft.irfft2, the imaginary part of the first and (for an even
+    width) last column of the spectrum is ignored after the transform along the rows.
+    
+    :Parameters:
+    
+    fimg : array
+           Half spectrum of each image (n, rows, cols/2+1), complex64
+    cols : int
+           Number of columns in the output images
+    
+    :Returns:
+    
+    imgs : array
+           Stack of images (n, rows, cols), float32
+    '''
+    
+    m = (cols-1)/2
+    fimg = scipy.fftpack.ifft(fimg, axis=1)
+    packed = numpy.empty(fimg.shape[:2]+(cols, ), dtype=numpy.float32)
+    packed[:, :, 0] = fimg.real[:, :, 0]
+    packed[:, :, 1:1+2*m:2] = fimg.real[:, :, 1:1+m]
+    packed[:, :, 2:2+2*m:2] = fimg.imag[:, :, 1:1+m]
+    if (cols%2) == 0: packed[:, :, cols-1] = fimg.real[:, :, cols/2]
+    return scipy.fftpack.irfft(packed, axis=2, overwrite_x=True)
+
+def _pad_edge_mean(imgs, out):
+    ''' Center each image in the output and fill the border with the average of the image
+    edge (see :py:func:`ndimage_filter.pad_image` with fill='e')
+    
+    :Parameters:
+    
+    imgs : array
+           Stack of images
+    out : array
+          Stack of padded images
+    '''
+    
+    fact = 2.0*(imgs.shape[1]+imgs.shape[2])-4
+    avg = imgs[:, 0, :].sum(axis=1)+imgs[:, :, 0].sum(axis=1)+imgs[:, -1, :].sum(axis=1)+imgs[:, :, -1].sum(axis=1)
+    out[:] = (avg/fact)[:, numpy.newaxis, numpy.newaxis]
+    y, x = (out.shape[1]-imgs.shape[1])/2, (out.shape[2]-imgs.shape[2])/2
+    out[:, y:y+imgs.shape[1], x:x+imgs.shape[2]] = imgs
+
+def _rfft_resample_index(ishape, oshape):
+    ''' Map the half spectrum of the resampled image to the half spectrum of the input
+    
+    :py:func:`resample_fft` copies the centered frequencies shared by both sizes and keeps the
+    real part of the inverse transform. The equivalent Hermitian spectrum is the average of
+    two gathers from the input half spectrum, which only differ on the Nyquist frequencies.
+    
+    :Parameters:
+    
+    ishape : tuple
+             Shape of the input image
+    oshape : tuple
+             Shape of the output image
+    
+    :Returns:
+    
+    terms : list
+            Two tuples (flat index, sign of the imaginary part, weight) over the output half spectrum
+    '''
+    
+    def freq_map(isize, osize, count):
+        k = numpy.arange(count)
+        k[k > (osize-1)/2] -= osize
+        neg = -k
+        neg[neg > (osize-1)/2] -= osize
+        neg[neg < -(osize/2)] += osize
+        valid = lambda f: numpy.logical_and(f >= -(isize/2), f <= (isize-1)/2)
+        return [(k, valid(k)), (-neg, valid(neg))]
+    
+    rows = freq_map(ishape[0], oshape[0], oshape[0])
+    cols = freq_map(ishape[1], oshape[1], oshape[1]/2+1)
+    ncol = ishape[1]/2+1
+    terms = []
+    for (a, va), (b, vb) in zip(rows, cols):
+        a, b = numpy.meshgrid(a, b, indexing='ij')
+        conj = b < 0
+        a = numpy.where(conj, -a, a) % ishape[0]
+        b = numpy.abs(b)
+        weight = 0.5*numpy.outer(va, vb)
+        index = numpy.where(weight > 0, a*ncol+b, 0)
+        terms.append((index.ravel(), numpy.where(conj, -1.0, 1.0).ravel(), weight.ravel()))
+    return terms
+
 def sincblackman(bin_factor, template_min = 15, kernel_size=2002, dtype=numpy.float32):
     '''
     '''
@@ -189,6 +395,52 @@ def downsample(img, out, kernel=None):
     return out
 
 interpolate_sblack=downsample
+
+def downsample_stack(stack, out, kernel=None, thread_count=0):
+    ''' Downsample a stack of images with the sinc-blackman kernel
+    
+    The kernel and the output are allocated once for the stack, see :py:func:`downsample`.
+    
+    :Parameters:
+    
+    stack : array
+            Stack of images (n, rows, columns), may be a memory-mapped array
+    out : array or float
+          Output stack (n, rows, columns) or down sampling factor
+    kernel : array, optional
+             Sinc-blackman kernel, see :py:func:`sincblackman`
+    thread_count : int
+                   Number of threads, 0 or 1 processes the stack in the calling thread
+    
+    :Returns:
+    
+    out : array
+          Downsampled stack of images (float32 unless an output array is given)
+    '''
+    
+    if stack.ndim != 3: raise ValueError, "Requires a stack of 2D images, not a %d-D array"%stack.ndim
+    if not hasattr(out, 'ndim'):
+        assert(out > 1.0)
+        out = numpy.zeros((len(stack), int(stack.shape[1]/out), int(stack.shape[2]/out)), dtype=numpy.float32)
+    if kernel is None: kernel=sincblackman(float(stack.shape[1])/float(out.shape[1]), dtype=out.dtype)
+    
+    def downsample_range(rng):
+        img = numpy.empty(stack.shape[1:], dtype=out.dtype)
+        res = numpy.empty(out.shape[1:], dtype=out.dtype)
+        for i in xrange(rng[0], rng[1]):
+            img[:] = stack[i]
+            out[i] = downsample(img, res, kernel)
+    
+    thread_count = max(1, min(thread_count, len(stack)))
+    if thread_count > 1:
+        bounds = numpy.linspace(0, len(stack), thread_count+1).astype(numpy.int)
+        pool = multiprocessing.pool.ThreadPool(thread_count)
+        try: pool.map(downsample_range, zip(bounds[:-1], bounds[1:]))
+        finally:
+            pool.close()
+            pool.join()
+    else: downsample_range((0, len(stack)))
+    return out
     
 def interpolate(img, out, method='bilinear'):
     ''' Interpolate the size of the input image
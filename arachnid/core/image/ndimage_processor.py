@@ -15,7 +15,7 @@ import os
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
-def create_matrix_from_file(images, image_processor, dtype=numpy.float, **extra):
+def create_matrix_from_file(images, image_processor, dtype=numpy.float, cache_file=None, **extra):
     '''Create a matrix where each row is an image
     
     :Parameters:
@@ -26,6 +26,9 @@ def create_matrix_from_file(images, image_processor, dtype=numpy.float, **extra)
                 Array of selected indicies
         image_processor : function
                           Extract features from the image 
+        cache_file : str, optional
+                     Write the rows to this cache file (see :py:func:`write_matrix_to_cache`)
+                     and return it memory mapped rather than holding the matrix in memory
         extra : dict
                 Unused keyword arguments
             
@@ -40,9 +43,13 @@ def create_matrix_from_file(images, image_processor, dtype=numpy.float, **extra)
     
     img = image_processor(img1, 0, **extra).ravel()
     total = len(images[1]) if isinstance(images, tuple) else len(images)
-    mat = numpy.zeros((total, img.shape[0]), dtype=dtype)
-    for row, data in process_tasks.for_process_mp(ndimage_file.iter_images(images), image_processor, img1.shape, queue_limit=100, **extra):
+    if cache_file is not None:
+        mat = create_matrix_cache(cache_file, (total, img.shape[0]), dtype)
+    else:
+        mat = numpy.zeros((total, img.shape[0]), dtype=dtype)
+    for row, data in process_tasks.for_process_mp(ndimage_file.iter_images_prefetch(images), image_processor, img1.shape, queue_limit=100, **extra):
         mat[row, :] = data.ravel()[:img.shape[0]]
+    if cache_file is not None: mat.flush()
     openmp.set_thread_count(extra.get('thread_count', 1))
     return mat
 
@@ -71,13 +78,13 @@ def image_array_from_file(images, image_processor, dtype=numpy.float, **extra):
     img = image_processor(img1, 0, **extra)
     total = len(images[1]) if isinstance(images, tuple) else len(images)
     mat = numpy.zeros((total, img.shape[0], img.shape[1]), dtype=dtype)
-    for row, data in process_tasks.for_process_mp(ndimage_file.iter_images(images), image_processor, img1.shape, queue_limit=100, **extra):
+    for row, data in process_tasks.for_process_mp(ndimage_file.iter_images_prefetch(images), image_processor, img1.shape, queue_limit=100, **extra):
         mat[row, :] = data
     return mat
 
 _cache_header = numpy.dtype([('magic', 'S10'), ('dtype', 'S3'), ('byte_num', numpy.int16), ('ndim', numpy.int32), ])
 
-def read_matrix_from_cache(cache_file):
+def read_matrix_from_cache(cache_file, mmap=False):
     ''' Read a cached matrix from a file
     
     The cache file has the following format:
@@ -93,6 +100,8 @@ def read_matrix_from_cache(cache_file):
         
         cache_file : str
                      Filename for cached matrix
+        mmap : bool
+               Memory map the matrix rather than reading it
                  
     :Returns:
         
@@ -108,6 +117,7 @@ def read_matrix_from_cache(cache_file):
         dtype = numpy.dtype(h['dtype'][0]+str(h['byte_num'][0]))
         ndim = h['ndim'][0]
         shape = tuple(numpy.fromfile(fin, dtype=numpy.int, count=ndim))
+        if mmap: return numpy.memmap(cache_file, dtype=dtype, mode='r', offset=fin.tell(), shape=shape)
         return numpy.fromfile(fin, dtype=dtype, count=numpy.prod(shape)).reshape(shape, order='C')
     finally:
         fin.close()
@@ -149,6 +159,44 @@ def write_matrix_to_cache(cache_file, mat):
     finally:
         fout.close()
 
+def create_matrix_cache(cache_file, shape, dtype):
+    ''' Create a memory mapped cache file for a matrix
+    
+    The cache file has the format described in :py:func:`write_matrix_to_cache`.
+    
+    :Parameters:
+        
+        cache_file : str
+                     Filename for cached matrix
+        shape : tuple
+                Shape of the matrix
+        dtype : dtype
+                Data type of the matrix
+    
+    :Returns:
+        
+        mat : array
+              Writable memory mapped matrix
+    '''
+    
+    pathname = os.path.dirname(cache_file)
+    if pathname != "" and pathname != "." and not os.path.exists(pathname):
+        os.makedirs(pathname)
+    dtype = numpy.dtype(dtype)
+    h = numpy.zeros(1, _cache_header)
+    h['magic'] = 'CACHEFORM'
+    h['dtype']=dtype.str[:2]
+    h['byte_num']=int(dtype.str[2:])
+    h['ndim']=len(shape)
+    fout = open(cache_file, 'wb')
+    try:
+        h.tofile(fout)
+        numpy.asarray(shape, dtype=numpy.int).tofile(fout)
+        offset = fout.tell()
+    finally:
+        fout.close()
+    return numpy.memmap(cache_file, dtype=dtype, mode='r+', offset=offset, shape=tuple(shape))
+
 def process_images(input_file, output_file, transform_func, index=None, **extra):
     ''' Apply functor to each image in the list
     
@@ -0,0 +1,315 @@
+''' Threaded 3D operations on slabs of a volume
+
+Each operation splits the volume into slabs along one axis and processes
+the slabs on a pool of threads (the scipy.ndimage and numpy kernels release
+the GIL). Operations that look at neighboring voxels either split the volume
+along an axis they do not filter (separable Gaussian smoothing) or extend each
+slab with a halo of the neighboring planes (binary dilation), so the result is
+the same as the single threaded operation.
+
+The functions take an optional `buffers` dictionary holding the float32 and
+binary scratch volumes, which are reused by later calls on volumes of the same
+shape.
+
+.. sourcecode:: py
+
+    >>> from arachnid.core.image import ndimage_slab
+    >>> buffers = {}
+    >>> mask, th = ndimage_slab.tight_mask(vol, None, 2, 3, 3.0, thread_count=8, buffers=buffers)
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from ..learn import unary_classification
+import ndimage_utility
+import multiprocessing.pool
+import scipy.ndimage
+import logging
+import numpy
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+def run_slabs(func, length, thread_count=0):
+    ''' Run a function over ranges of planes on a pool of threads
+
+    :Parameters:
+
+    func : function
+           Function taking a tuple (first, last+1) of planes
+    length : int
+             Number of planes
+    thread_count : int
+                   Number of threads, 0 means use the number of cores
+    '''
+
+    if thread_count < 1: thread_count = multiprocessing.cpu_count()
+    thread_count = max(1, min(thread_count, length))
+    if thread_count > 1:
+        bounds = numpy.linspace(0, length, thread_count+1).astype(numpy.int)
+        pool = multiprocessing.pool.ThreadPool(thread_count)
+        try: pool.map(func, zip(bounds[:-1], bounds[1:]))
+        finally:
+            pool.close()
+            pool.join()
+    else: func((0, length))
+
+def scratch(buffers, name, shape, dtype=numpy.float32):
+    ''' Get a scratch volume from a dictionary of buffers
+
+    :Parameters:
+
+    buffers : dict
+              Dictionary of scratch volumes, None creates a new volume
+    name : str
+           Name of the scratch volume
+    shape : tuple
+            Shape of the volume
+    dtype : dtype
+            Data type of the volume
+
+    :Returns:
+
+    buf : array
+          Scratch volume (uninitialized)
+    '''
+
+    if buffers is None: return numpy.empty(shape, dtype=dtype)
+    buf = buffers.get(name)
+    if buf is None or buf.shape != tuple(shape) or buf.dtype != numpy.dtype(dtype):
+        buf = numpy.empty(shape, dtype=dtype)
+        buffers[name] = buf
+    return buf
+
+def copy(img, out, thread_count=0):
+    ''' Copy a volume with a pool of threads
+
+    :Parameters:
+
+    img : array
+          Input volume
+    out : array
+          Output volume
+    thread_count : int
+                   Number of threads, 0 means use the number of cores
+
+    :Returns:
+
+    out : array
+          Output volume
+    '''
+
+    def copy_slab(rng):
+        out[rng[0]:rng[1]] = img[rng[0]:rng[1]]
+    run_slabs(copy_slab, len(img), thread_count)
+    return out
+
+def binarize(img, th, out=None, thread_count=0):
+    ''' Binarize a volume with a pool of threads
+
+    :Parameters:
+
+    img : array
+          Input volume
+    th : float
+         Threshold, voxels greater than the threshold are set
+    out : array, optional
+          Output binary volume
+    thread_count : int
+                   Number of threads, 0 means use the number of cores
+
+    :Returns:
+
+    out : array
+          Binary volume
+    '''
+
+    if out is None: out = numpy.empty(img.shape, dtype=numpy.bool)
+    def binarize_slab(rng):
+        numpy.greater(img[rng[0]:rng[1]], th, out[rng[0]:rng[1]])
+    run_slabs(binarize_slab, len(img), thread_count)
+    return out
+
+def binary_dilation(img, iterations=1, out=None, thread_count=0):
+    ''' Dilate a binary volume with a pool of threads
+
+    This gives the same result as scipy.ndimage.binary_dilation with the
+    structure of connectivity 2 (as used by :py:func:`ndimage_utility.tight_mask`).
+    Each slab is extended by `iterations` planes on either side.
+
+    :Parameters:
+
+    img : array
+          Input binary volume
+    iterations : int
+                 Number of times to dilate
+    out : array, optional
+          Output binary volume (must not be the input)
+    thread_count : int
+                   Number of threads, 0 means use the number of cores
+
+    :Returns:
+
+    out : array
+          Dilated binary volume
+    '''
+
+    if out is None: out = numpy.empty(img.shape, dtype=numpy.bool)
+    if out is img: raise ValueError, "Dilation cannot be done in place"
+    elem = scipy.ndimage.generate_binary_structure(img.ndim, 2)
+    if iterations < 1:
+        out[:] = img
+        return out
+    def dilate_slab(rng):
+        beg, end = max(0, rng[0]-iterations), min(len(img), rng[1]+iterations)
+        slab = scipy.ndimage.binary_dilation(img[beg:end], elem, iterations)
+        out[rng[0]:rng[1]] = slab[rng[0]-beg:rng[1]-beg]
+    run_slabs(dilate_slab, len(img), thread_count)
+    return out
+
+def gaussian_smooth(img, gk_size=3, gk_sigma=3.0, out=None, thread_count=0, buffers=None, work=None):
+    ''' Smooth a volume with a Gaussian kernel using a pool of threads
+
+    This gives the same result as :py:func:`ndimage_utility.gaussian_smooth` (within
+    float32 precision) by applying the separable kernel as one 1D filter along
+    each axis. The filter along the first axis splits the volume along the second.
+
+    :Parameters:
+
+    img : array
+          Input volume
+    gk_size : int
+              Size of Gaussian kernel (odd)
+    gk_sigma : float
+               Width of the Gaussian kernel
+    out : array, optional
+          Output float32 volume (may be the input)
+    thread_count : int
+                   Number of threads, 0 means use the number of cores
+    buffers : dict, optional
+              Dictionary of scratch volumes
+    work : array, optional
+           Scratch float32 volume used in place of a buffer
+
+    :Returns:
+
+    out : array
+          Smoothed volume
+    '''
+
+    if img.ndim != 3 or (gk_size%2) == 0: return ndimage_utility.gaussian_smooth(img, gk_size, gk_sigma, out)
+    if out is None: out = numpy.empty(img.shape, dtype=numpy.float32)
+    kernel = numpy.exp(-(numpy.arange(gk_size, dtype=numpy.float)-gk_size//2)**2/(2*gk_sigma*gk_sigma))
+    kernel /= kernel.sum()
+    tmp = work if work is not None else scratch(buffers, 'smooth', img.shape)
+
+    def smooth_axis(src, dst, axis):
+        if axis == 0:
+            def smooth_slab(rng):
+                scipy.ndimage.correlate1d(src[:, rng[0]:rng[1]], kernel, 0, dst[:, rng[0]:rng[1]], mode='mirror')
+            run_slabs(smooth_slab, src.shape[1], thread_count)
+        else:
+            def smooth_slab(rng):
+                scipy.ndimage.correlate1d(src[rng[0]:rng[1]], kernel, axis, dst[rng[0]:rng[1]], mode='mirror')
+            run_slabs(smooth_slab, len(src), thread_count)
+
+    smooth_axis(img, tmp, 2)
+    smooth_axis(tmp, out, 1)
+    smooth_axis(out, tmp, 0)
+    return copy(tmp, out, thread_count)
+
+def tight_mask(img, threshold=None, ndilate=1, gk_size=3, gk_sigma=3.0, out=None, thread_count=0, buffers=None):
+    ''' Create a tight mask from the given volume using a pool of threads
+
+    This gives the same result as :py:func:`ndimage_utility.tight_mask` (within
+    float32 precision), only the selection of the biggest object runs on a
+    single thread.
+
+    :Parameters:
+
+    img : array
+          Input volume
+    threshold : float, optional
+                Threshold for binarization, if not specified use Otsu's method to find
+    ndilate : int, optional
+              Number of times to dilate the binary volume
+    gk_size : int, optional
+              Size of Gaussian kernel used for real space smoothing
+    gk_sigma : float, optional
+               Sigma value for Gaussian kernel
+    out : array, optional
+          Output float32 volume
+    thread_count : int
+                   Number of threads, 0 means use the number of cores
+    buffers : dict, optional
+              Dictionary of scratch volumes
+
+    :Returns:
+
+    out : array
+          Output volume
+    threshold : float
+                Threshold used to create binary mask
+    '''
+
+    if img.ndim != 3:
+        return ndimage_utility.tight_mask(img, threshold, ndilate, gk_size, gk_sigma, out=out)
+    if threshold is None or threshold == 'A': threshold = unary_classification.otsu(img.ravel())
+    else: threshold=float(threshold)
+    if out is None: out = numpy.empty(img.shape, dtype=numpy.float32)
+    binary = binarize(img, threshold, scratch(buffers, 'binary', img.shape, numpy.bool), thread_count)
+    label = scratch(buffers, 'label', img.shape, numpy.int32)
+    num_label = scipy.ndimage.label(binary, None, label)
+    biggest = numpy.argmax(numpy.bincount(label.ravel(), minlength=num_label+1)[1:])+1
+    def select_slab(rng):
+        numpy.equal(label[rng[0]:rng[1]], biggest, binary[rng[0]:rng[1]])
+    run_slabs(select_slab, len(img), thread_count)
+    if ndilate > 0:
+        binary = binary_dilation(binary, ndilate, scratch(buffers, 'dilate', img.shape, numpy.bool), thread_count)
+    copy(binary, out, thread_count)
+    if gk_size > 0 and gk_sigma > 0:
+        gaussian_smooth(out, gk_size, gk_sigma, out, thread_count, work=label.view(numpy.float32))
+    return out, threshold
+
+def soft_sphere_mask(shape, radius, gk_size=3, gk_sigma=3.0, out=None, thread_count=0, buffers=None):
+    ''' Create a spherical mask smoothed with a Gaussian kernel
+
+    The sphere is centered at size/2 and includes the voxels within `radius`,
+    as :py:func:`ndimage_utility.model_soft_ball` with a hard edge.
+
+    :Parameters:
+
+    shape : tuple
+            Shape of the volume
+    radius : float
+             Radius of the sphere
+    gk_size : int, optional
+              Size of Gaussian kernel used for real space smoothing
+    gk_sigma : float, optional
+               Sigma value for Gaussian kernel
+    out : array, optional
+          Output float32 volume
+    thread_count : int
+                   Number of threads, 0 means use the number of cores
+    buffers : dict, optional
+              Dictionary of scratch volumes
+
+    :Returns:
+
+    out : array
+          Spherical mask
+    '''
+
+    if out is None: out = numpy.empty(shape, dtype=numpy.float32)
+    center = numpy.asarray(shape, dtype=numpy.int)/2
+    radius2 = radius**2
+    z2 = (numpy.arange(shape[0])-center[0])**2
+    yx2 = numpy.add.outer((numpy.arange(shape[1])-center[1])**2, (numpy.arange(shape[2])-center[2])**2)
+    def ball_slab(rng):
+        for k in xrange(rng[0], rng[1]):
+            numpy.less_equal(yx2, radius2-z2[k], out[k])
+    run_slabs(ball_slab, shape[0], thread_count)
+    if gk_size > 0 and gk_sigma > 0:
+        gaussian_smooth(out, gk_size, gk_sigma, out, thread_count, buffers)
+    return out
+
@@ -0,0 +1,385 @@
+''' Streaming statistics over large stacks of images
+
+The statistics of a set of image stacks are accumulated image by image in a
+:py:class:`RunningStats`, which holds the moments (count, mean and sum of squared
+deviations) along with the minimum, maximum, number of NaN and Inf values and a
+uniform sample of the finite values used to estimate quantiles. Two accumulators
+are merged with the pairwise update of Chan et al., so each stack can be split
+into ranges of images processed by separate worker processes and the result
+is the same as the serial computation (within floating point error).
+
+.. sourcecode:: py
+
+    >>> from arachnid.core.image import ndimage_stats
+    >>> rows, summary = ndimage_stats.stack_statistics(['stack01.spi', 'stack02.spi'], worker_count=8, quantiles=(1, 50, 99))
+    >>> summary['stack01.spi'].mean, summary['stack01.spi'].std
+    (0.0012, 1.0003)
+    >>> summary[None].quantile([1, 50, 99])
+    array([-2.32, 0.001, 2.33])
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from ..parallel import process_tasks
+import ndimage_file
+import itertools
+import logging
+import numpy
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+class RunningStats(object):
+    ''' Mergeable running statistics of a set of pixel values
+
+    The quantiles are estimated from a sample where each finite value is kept
+    with probability 1/stride. When the sample exceeds `sample_size` values, it is
+    thinned by half and the stride doubled, so the memory stays bounded. The
+    quantiles are exact while the stride is 1.
+    '''
+
+    def __init__(self, sample_size=100000, seed=0):
+        ''' Create an empty accumulator
+
+        :Parameters:
+
+        sample_size : int
+                      Maximum number of values held to estimate the quantiles, 0 disables the sample
+        seed : int
+               Seed of the random number generator used to sample the values
+        '''
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = numpy.inf
+        self.maximum = -numpy.inf
+        self.nan = 0
+        self.inf = 0
+        self.sample_size = sample_size
+        self.stride = 1
+        self.samples = []
+        self.sample_count = 0
+        self.random_state = numpy.random.RandomState(seed)
+
+    @property
+    def variance(self):
+        ''' Population variance of the finite values
+        '''
+
+        return self.m2/self.count if self.count > 0 else numpy.nan
+
+    @property
+    def std(self):
+        ''' Population standard deviation of the finite values
+        '''
+
+        return numpy.sqrt(self.variance)
+
+    def add(self, img):
+        ''' Add the values of an image to the statistics
+
+        :Parameters:
+
+        img : array
+              Image or volume
+
+        :Returns:
+
+        stats : tuple
+                Statistics of the image: count, mean, std, min, max, nan, inf
+        '''
+
+        data = numpy.asarray(img).ravel()
+        nan = inf = 0
+        finite = numpy.isfinite(data)
+        if not finite.all():
+            nan = int(numpy.isnan(data).sum())
+            inf = len(data)-int(finite.sum())-nan
+            data = data[finite]
+        count = len(data)
+        if count > 0:
+            mean = float(data.mean(dtype=numpy.float64))
+            diff = numpy.subtract(data, mean, dtype=numpy.float64)
+            m2 = float(numpy.dot(diff, diff))
+            minimum, maximum = float(data.min()), float(data.max())
+        else:
+            mean = m2 = minimum = maximum = numpy.nan
+        self.merge_moments(count, mean, m2, minimum, maximum, nan, inf)
+        if self.sample_size > 0 and count > 0:
+            self.samples.append(numpy.array(data[self.random_state.randint(self.stride)::self.stride], dtype=numpy.float64))
+            self.sample_count += len(self.samples[-1])
+            self._compact()
+        std = numpy.sqrt(m2/count) if count > 0 else numpy.nan
+        return (count, mean, std, minimum, maximum, nan, inf)
+
+    def merge_moments(self, count, mean, m2, minimum, maximum, nan=0, inf=0):
+        ''' Merge the moments of another set of values
+
+        :Parameters:
+
+        count : int
+                Number of finite values
+        mean : float
+               Mean of the finite values
+        m2 : float
+             Sum of squared deviations from the mean
+        minimum : float
+                  Minimum finite value
+        maximum : float
+                  Maximum finite value
+        nan : int
+              Number of NaN values
+        inf : int
+              Number of infinite values
+        '''
+
+        self.nan += nan
+        self.inf += inf
+        if count == 0: return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta*count/total
+        self.m2 += m2 + delta*delta*self.count*count/total
+        self.count = total
+        if minimum < self.minimum: self.minimum = minimum
+        if maximum > self.maximum: self.maximum = maximum
+
+    def merge(self, other):
+        ''' Merge the statistics of another accumulator
+
+        :Parameters:
+
+        other : RunningStats
+                Statistics of another set of values
+
+        :Returns:
+
+        self : RunningStats
+               Merged statistics
+        '''
+
+        self.merge_moments(other.count, other.mean, other.m2, other.minimum, other.maximum, other.nan, other.inf)
+        if self.sample_size > 0 and other.sample_count > 0:
+            sample = other.sample()
+            if other.stride > self.stride:
+                self.samples = [_thin(self.sample(), other.stride/self.stride, self.random_state)]
+                self.sample_count = len(self.samples[0])
+                self.stride = other.stride
+            elif other.stride < self.stride:
+                sample = _thin(sample, self.stride/other.stride, self.random_state)
+            self.samples.append(sample)
+            self.sample_count += len(sample)
+            self._compact()
+        return self
+
+    def sample(self):
+        ''' Get the sample of finite values
+
+        :Returns:
+
+        sample : array
+                 Sampled values
+        '''
+
+        if len(self.samples) != 1:
+            self.samples = [numpy.concatenate(self.samples) if len(self.samples) > 0 else numpy.zeros(0)]
+        return self.samples[0]
+
+    def quantile(self, q):
+        ''' Estimate the quantiles of the finite values
+
+        :Parameters:
+
+        q : float or list
+            Percentile or list of percentiles between 0 and 100
+
+        :Returns:
+
+        val : float or array
+              Estimated quantiles, NaN if there are no values
+        '''
+
+        sample = self.sample()
+        if len(sample) == 0: return numpy.nan if numpy.isscalar(q) else numpy.repeat(numpy.nan, len(q))
+        return numpy.percentile(sample, q)
+
+    def _compact(self):
+        ''' Thin the sample until it fits in `sample_size`
+        '''
+
+        if self.sample_count <= self.sample_size: return
+        sample = self.sample()
+        while len(sample) > self.sample_size:
+            sample = _thin(sample, 2, self.random_state)
+            self.stride *= 2
+        self.samples = [sample]
+        self.sample_count = len(sample)
+
+def _thin(sample, factor, random_state):
+    ''' Keep one out of every `factor` values starting at a random offset
+
+    :Parameters:
+
+    sample : array
+             Sampled values
+    factor : int
+             Thinning factor
+    random_state : RandomState
+                   Random number generator
+
+    :Returns:
+
+    sample : array
+             Thinned sample
+    '''
+
+    return sample[random_state.randint(factor)::factor].copy()
+
+def stack_ranges(filenames, chunk_size=1000):
+    ''' Split a set of stacks into ranges of images
+
+    :Parameters:
+
+    filenames : list
+                List of stack filenames
+    chunk_size : int
+                 Maximum number of images in a range
+
+    :Returns:
+
+    ranges : list
+             List of tuples (filename, first, last+1)
+    '''
+
+    if isinstance(filenames, str): filenames = [filenames]
+    chunk_size = max(1, chunk_size)
+    ranges = []
+    for filename in filenames:
+        total = ndimage_file.count_images(filename)
+        for beg in xrange(0, total, chunk_size):
+            ranges.append((filename, beg, min(beg+chunk_size, total)))
+    return ranges
+
+def range_statistics(task, quantiles=(), sample_size=100000, count_unique=False, seed=0, **extra):
+    ''' Calculate the statistics of a range of images in a stack
+
+    :Parameters:
+
+    task : tuple
+           Index of the range, filename, first image and last+1 image
+    quantiles : list
+                Percentiles calculated for each image
+    sample_size : int
+                  Maximum number of values held to estimate the quantiles
+    count_unique : bool
+                   Count the number of unique values in each image
+    seed : int
+           Seed of the random number generator, offset by the index of the range
+    extra : dict
+            Unused keyword arguments
+
+    :Returns:
+
+    rows : array
+           Statistics of each image: id, count, mean, std, min, max, nan, inf, unique (optional), quantiles
+    stats : RunningStats
+            Statistics of the range of images
+    '''
+
+    index, filename, beg, end = task
+    stats = RunningStats(sample_size, seed+index)
+    rows = numpy.zeros((end-beg, 8+int(count_unique)+len(quantiles)))
+    for i, img in enumerate(itertools.islice(ndimage_file.iter_images(filename, beg), end-beg)):
+        rows[i, 0] = beg+i+1
+        rows[i, 1:8] = stats.add(img)
+        col = 8
+        if count_unique:
+            rows[i, col] = len(numpy.unique(img))
+            col += 1
+        if len(quantiles) > 0:
+            data = img.ravel()
+            if rows[i, 6] > 0 or rows[i, 7] > 0: data = data[numpy.isfinite(data)]
+            rows[i, col:] = numpy.percentile(data, quantiles) if len(data) > 0 else numpy.nan
+    return rows, stats
+
+def stack_statistics(filenames, worker_count=0, chunk_size=1000, quantiles=(), sample_size=100000, count_unique=False, seed=0, **extra):
+    ''' Calculate the statistics of each image and each stack in parallel
+
+    Each stack is split into ranges of `chunk_size` images, which are distributed
+    over the worker processes. The statistics of the ranges are merged in order, so
+    the result does not depend on the number of workers.
+
+    :Parameters:
+
+    filenames : list
+                List of stack filenames
+    worker_count : int
+                   Number of worker processes, less than 2 runs in serial
+    chunk_size : int
+                 Number of images in each range processed by a worker
+    quantiles : list
+                Percentiles calculated for each image
+    sample_size : int
+                  Maximum number of values held to estimate the quantiles of each stack
+    count_unique : bool
+                   Count the number of unique values in each image
+    seed : int
+           Seed of the random number generator
+    extra : dict
+            Unused keyword arguments
+
+    :Returns:
+
+    rows : dict
+           Statistics of each image (see :py:func:`range_statistics`) mapped to the stack filename
+    summary : dict
+              :py:class:`RunningStats` of each stack mapped to the filename and of all stacks mapped to None
+    '''
+
+    if isinstance(filenames, str): filenames = [filenames]
+    tasks = [(i, )+task for i, task in enumerate(stack_ranges(filenames, chunk_size))]
+    summary = dict([(filename, RunningStats(sample_size, seed)) for filename in filenames])
+    summary[None] = RunningStats(sample_size, seed)
+    rows = dict([(filename, []) for filename in filenames])
+    ignored_errors=[0]
+    pending = {}
+    current = 0
+    for index, result in process_tasks.process_mp(range_statistics, tasks, worker_count, quantiles=tuple(quantiles), sample_size=sample_size, count_unique=count_unique, seed=seed, ignored_errors=ignored_errors, **extra):
+        if len(result) != 2 or not isinstance(result[1], RunningStats):
+            raise ValueError, "Failed to calculate statistics for %s (%d-%d)"%tasks[index][1:]
+        pending[index] = result
+        while current in pending:
+            range_rows, stats = pending.pop(current)
+            filename = tasks[current][1]
+            rows[filename].append(range_rows)
+            summary[filename].merge(stats)
+            summary[None].merge(stats)
+            current += 1
+    for filename in filenames:
+        rows[filename] = numpy.vstack(rows[filename]) if len(rows[filename]) > 0 else numpy.zeros((0, 8+int(count_unique)+len(quantiles)))
+    return rows, summary
+
+def summary_row(stats, quantiles=()):
+    ''' Get the statistics of an accumulator as a row of values
+
+    :Parameters:
+
+    stats : RunningStats
+            Statistics of a set of values
+    quantiles : list
+                Percentiles to estimate
+
+    :Returns:
+
+    row : list
+          count, mean, std, min, max, nan, inf followed by the quantiles
+    '''
+
+    if stats.count > 0:
+        row = [stats.count, stats.mean, stats.std, stats.minimum, stats.maximum]
+    else: row = [0]+[numpy.nan]*4
+    row.extend([stats.nan, stats.inf])
+    if len(quantiles) > 0: row.extend(numpy.atleast_1d(stats.quantile(list(quantiles))))
+    return row
+
@@ -12,13 +12,8 @@ from ..app import tracing
 from eman2_utility import em2numpy2em as _em2numpy2em, em2numpy2res as _em2numpy2res
 #import eman2_utility
 from ..learn import unary_classification
+from ..util import lazy_import
 import numpy.fft
-import scipy.fftpack, scipy.signal
-import scipy.linalg
-import scipy.ndimage.filters
-import scipy.ndimage.morphology
-import scipy.sparse
-import scipy.special
 import ndimage_filter
 import logging
 import math
@@ -26,6 +21,8 @@ import math
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
+scipy = lazy_import.lazy_module('scipy', 'fftpack', 'signal', 'linalg', 'ndimage.filters', 'ndimage.morphology', 'sparse', 'special')
+
 try: 
     from util import _image_utility
     _image_utility;
@@ -444,11 +441,7 @@ def find_peaks_fast(cc, width, fwidth=None):
     
     if fwidth is None or fwidth < 0: fwidth = width/2.0
     if fwidth > 0.0: cc=scipy.ndimage.filters.gaussian_filter(cc, sigma=fwidth, mode='constant')
-    neighborhood = numpy.ones((int(width),int(width)))
-    cc_peaks = (scipy.ndimage.filters.maximum_filter(cc, footprint=neighborhood)==cc) - \
-                scipy.ndimage.morphology.binary_erosion((cc==0), structure=neighborhood, border_value=1)
-    cc_peaks = cc_peaks.ravel()
-    offsets, = numpy.nonzero(cc_peaks)
+    offsets = _local_maxima(cc, int(width))
     x,y = numpy.unravel_index(offsets, cc.shape)
     sel = x>=width
     sel = numpy.logical_and(sel, x <= cc.shape[0]-width)
@@ -459,6 +452,91 @@ def find_peaks_fast(cc, width, fwidth=None):
     cc = cc.ravel()[offsets].copy().squeeze()
     return numpy.hstack((cc[:, numpy.newaxis], x[:, numpy.newaxis], y[:, numpy.newaxis]))
 
+def find_peaks_suppress(cc, width, fwidth=None, distance=None):
+    ''' Find peaks in a cross-correlation map, suppressing peaks closer than a given distance
+    
+    The candidates are the local maxima of :py:func:`find_peaks_fast`. They are visited in order
+    of decreasing height, and a candidate is kept only if no kept peak lies within `distance`,
+    which is the same as repeatedly zeroing a disc around the current maximum. The kept peaks
+    are looked up in a grid of cells with the width of the disc, so the cost grows with the number
+    of candidates rather than the area of the disc.
+    
+    :Parameters:
+    
+    cc : array
+         Cross-correlation image
+    width : float
+            Expected width of the peaks
+    fwidth : float, optional
+             Width of the Gaussian smoothing, default half the width, 0 disables
+    distance : float, optional
+               Minimum distance between two peaks, default `width`
+    
+    :Returns:
+    
+    peaks : array (Nx3)
+            Array of peaks (peak, x, y) sorted by decreasing height
+    '''
+    
+    peaks = find_peaks_fast(cc, width, fwidth)
+    if distance is None: distance = width
+    if len(peaks) == 0 or distance <= 0: return peaks[numpy.argsort(peaks[:, 0], kind='mergesort')[::-1]]
+    peaks = peaks[numpy.argsort(-peaks[:, 0], kind='mergesort')]
+    cell = numpy.floor(peaks[:, 1:]/distance).astype(numpy.int)
+    dist2 = distance*distance
+    grid = {}
+    selected = []
+    for i in xrange(len(peaks)):
+        cx, cy = cell[i]
+        x, y = peaks[i, 1], peaks[i, 2]
+        keep = True
+        for gx in (cx-1, cx, cx+1):
+            for gy in (cy-1, cy, cy+1):
+                for j in grid.get((gx, gy), ()):
+                    if (peaks[j, 1]-x)**2+(peaks[j, 2]-y)**2 < dist2:
+                        keep = False
+                        break
+                if not keep: break
+            if not keep: break
+        if keep:
+            grid.setdefault((cx, cy), []).append(i)
+            selected.append(i)
+    return peaks[selected]
+
+def _local_maxima(cc, width):
+    ''' Find the local maxima of an image over a square neighborhood
+    
+    The maximum filter over a square neighborhood is computed as two 1D sliding
+    window passes. Flat regions of zeros (e.g. a masked border) are excluded, and
+    the test is only run when a local maximum has a value of zero.
+    
+    :Parameters:
+    
+    cc : array
+         Image
+    width : int
+            Width of the square neighborhood
+    
+    :Returns:
+    
+    offsets : array
+              Flat index of each local maximum
+    '''
+    
+    width = max(1, int(width))
+    peaks = scipy.ndimage.filters.maximum_filter1d(cc, width, axis=1)
+    scipy.ndimage.filters.maximum_filter1d(peaks, width, axis=0, output=peaks)
+    peaks = peaks == cc
+    offsets, = numpy.nonzero(peaks.ravel())
+    zero = cc.ravel()[offsets] == 0
+    if numpy.any(zero):
+        flat = (cc != 0).view(numpy.uint8)
+        flat = scipy.ndimage.filters.maximum_filter1d(flat, width, axis=1, mode='constant', cval=0)
+        scipy.ndimage.filters.maximum_filter1d(flat, width, axis=0, output=flat, mode='constant', cval=0)
+        zero[zero] = flat.ravel()[offsets[zero]] == 0
+        offsets = offsets[~zero]
+    return offsets
+
 def grid_array(shape, center=None):
     '''
     '''
@@ -507,6 +585,46 @@ def model_ball(radius, shape, center=None, dtype=numpy.int, order='C'):
     a[irad <= radius**2]=1
     return a
 
+def model_soft_ball(radius, shape, width, edge='C', center=None, dtype=numpy.float32):
+    ''' Create a ball (or disk) of given radius with a soft edge, following the
+    SPIDER `MA` operation
+    
+    :Parameters:
+    
+        radius : float
+                 Radius where the edge begins
+        shape : sequence of ints
+                Shape of the new array, 2D or 3D
+        width : float
+                Width of the cosine edge (C) or half-width of the Gaussian edge (G), hard edge if not positive
+        edge : str
+               Type of edge: (C)osine falls to zero at `radius+width`, (G)aussian falls off as exp(-(d-radius)^2/width^2),
+               otherwise a hard edge
+        center : sequence of ints, optional
+                 Center of the ball, if not specified then use the center of the image (size/2)
+        dtype : data-type, optional
+                The desired data-type for the array
+        
+    :Returns:
+    
+        img : numpy.ndarray
+              Weight of each pixel, one inside the radius
+    '''
+    
+    if center is None: center = [s/2 for s in shape]
+    dist = numpy.zeros(shape[1:], dtype=numpy.float32)
+    for axis in xrange(1, len(shape)):
+        dist += numpy.square(numpy.arange(shape[axis], dtype=numpy.float32)-center[axis]).reshape([-1 if i == axis else 1 for i in xrange(1, len(shape))])
+    out = numpy.empty(shape, dtype=dtype)
+    for i in xrange(shape[0]):
+        d = numpy.sqrt(dist+(i-center[0])**2)-radius
+        numpy.maximum(d, 0, d)
+        if width <= 0: out[i] = d <= 0
+        elif edge == 'C': out[i] = numpy.where(d < width, 0.5*(1.0+numpy.cos(numpy.pi*d/width)), 0.0)
+        elif edge == 'G': out[i] = numpy.exp(-numpy.square(d/width))
+        else: out[i] = d <= 0
+    return out
+
 def grid_image(shape, center=None):
     '''
     '''
@@ -2696,6 +2814,417 @@ def fourier_shell_correlation(img1, img2, center=None, pad=1, out=None):
     else:
         return mean_azimuthal_3d(out, center)
 
+_rotational_average_cache = {}
+
+def rotational_average_index(shape, cache_size=4):
+    ''' Ring index and interpolation weight of each pixel for the rotational average
+    of a 2D image following the SPIDER `RO` operation, cached for each shape
+    
+    :Parameters:
+    
+    shape : tuple
+            Number of rows and columns in the image
+    cache_size : int
+                 Maximum number of shapes held in the cache
+    
+    :Returns:
+    
+    index : array
+            Inner ring of each pixel (flattened)
+    weight : array
+             Weight of the outer ring for each pixel (flattened)
+    norm : array
+           Total weight of each ring
+    '''
+    
+    shape = tuple(shape)
+    if shape in _rotational_average_cache: return _rotational_average_cache[shape]
+    count = min(shape)/2+1
+    i, j = numpy.arange(shape[0])[:, numpy.newaxis]-shape[0]/2, numpy.arange(shape[1])[numpy.newaxis, :]-shape[1]/2
+    dist = numpy.sqrt(numpy.square(i)+numpy.square(j)).ravel()
+    index = dist.astype(numpy.int)
+    weight = dist-index
+    weight[index >= count-1] = 0.0
+    index = numpy.minimum(index, count)
+    norm = numpy.bincount(index, 1.0-weight, count+1)+numpy.bincount(index+1, weight, count+2)[:count+1]
+    norm = norm[:count]
+    norm[norm == 0] = 1.0
+    if len(_rotational_average_cache) >= max(1, cache_size): _rotational_average_cache.clear()
+    _rotational_average_cache[shape] = (index, weight, norm)
+    return index, weight, norm
+
+def rotational_average(img):
+    ''' Rotational average of a 2D image about the center (rows/2, columns/2),
+    where each pixel is linearly shared between its two nearest rings
+    following the SPIDER `RO` operation
+    
+    :Parameters:
+    
+    img : array
+          2D image (e.g. power spectrum)
+    
+    :Returns:
+    
+    avg : array
+          Rotational average of length min(rows, columns)/2+1
+    '''
+    
+    img = numpy.asarray(img)
+    if img.ndim != 2: raise ValueError, "Input array must be 2D: %s"%str(img.shape)
+    index, weight, norm = rotational_average_index(img.shape)
+    count = len(norm)
+    vals = img.ravel().astype(numpy.float64)
+    avg = numpy.bincount(index, vals*(1.0-weight), count+1)[:count]
+    avg += numpy.bincount(index+1, vals*weight, count+2)[:count]
+    return avg/norm
+
+def dedust(img, nstd=3, du_type=3, bins=128, out=None):
+    ''' Clamp pixels more than a given multiple of the standard deviation away
+    from the mode of the histogram to the boundary of the range, following
+    the SPIDER `DU` operation
+    
+    :Parameters:
+    
+    img : array
+          Input image
+    nstd : float
+           Number of standard deviations
+    du_type : int
+              Dedusting type: (1) BOTTOM, (2) TOP, (3) BOTH SIDES
+    bins : int
+           Number of histogram bins used to find the mode
+    out : array, optional
+          Output image (may be the input image)
+    
+    :Returns:
+    
+    out : array
+          Dedusted image
+    '''
+    
+    if du_type not in (1, 2, 3): raise ValueError, "du_type must be 1, 2 or 3"
+    hist, edges = numpy.histogram(img, bins)
+    mode = (edges[hist.argmax()]+edges[hist.argmax()+1])/2.0
+    std = numpy.std(img)
+    lower = mode-nstd*std if du_type in (1, 3) else None
+    upper = mode+nstd*std if du_type in (2, 3) else None
+    if out is None: out = numpy.empty_like(img)
+    if lower is None: lower = img.min()
+    if upper is None: upper = img.max()
+    return numpy.clip(img, lower, upper, out)
+
+_fsc_shell_cache = {}
+
+def fsc_shell_index(shape, cache_size=4):
+    ''' Shell index of each coefficient of a real FFT, cached for each shape
+    
+    The shells have a width of one Fourier pixel of the smallest dimension
+    and coefficients beyond the last shell (in the corners) are assigned to
+    an overflow shell.
+    
+    :Parameters:
+    
+    shape : tuple
+            Shape of the real space image or volume
+    cache_size : int
+                 Maximum number of shapes held in the cache
+    
+    :Returns:
+    
+    index : array
+            Shell index for each coefficient in the layout of numpy.fft.rfftn
+    count : int
+            Number of shells (excluding the overflow shell)
+    '''
+    
+    shape = tuple(shape)
+    if shape in _fsc_shell_cache: return _fsc_shell_cache[shape]
+    n = min(shape)
+    count = n/2+1
+    fshape = shape[:-1]+(shape[-1]/2+1, )
+    index = numpy.empty(fshape, dtype=numpy.int16 if count < numpy.iinfo(numpy.int16).max else numpy.int32)
+    dist = numpy.zeros(fshape[1:])
+    for axis in xrange(1, len(shape)):
+        freq = numpy.fft.rfftfreq(shape[axis]) if axis == len(shape)-1 else numpy.fft.fftfreq(shape[axis])
+        dist += numpy.square(freq*n).reshape([-1 if i == axis else 1 for i in xrange(1, len(shape))])
+    freq = numpy.square(numpy.fft.fftfreq(shape[0])*n)
+    for i in xrange(shape[0]):
+        index[i] = numpy.minimum(numpy.rint(numpy.sqrt(dist+freq[i])), count)
+    if len(_fsc_shell_cache) >= max(1, cache_size): _fsc_shell_cache.clear()
+    _fsc_shell_cache[shape] = (index, count)
+    return index, count
+
+def _rfftn_inplace(img, out, mask=None, batch_size=16):
+    ''' Real FFT of an image or volume into a single precision buffer
+    
+    The transform is computed in slabs along the first axis, then along the
+    first axis in slabs of the second, so the only map-sized buffer is `out`,
+    which may share memory with `img` (see :py:func:`_irfftn_inplace`).
+    
+    :Parameters:
+    
+    img : array
+          Image or volume
+    out : array
+          Output complex64 buffer in the layout of numpy.fft.rfftn
+    mask : array, optional
+           Real space mask applied to the image
+    batch_size : int
+                 Number of planes transformed together
+    
+    :Returns:
+    
+    out : array
+          Output complex64 buffer
+    '''
+    
+    axes = range(1, img.ndim)
+    for beg in xrange(0, img.shape[0], batch_size):
+        end = min(beg+batch_size, img.shape[0])
+        slab = numpy.asarray(img[beg:end], dtype=numpy.float32)
+        if mask is not None: slab = slab*mask[beg:end]
+        out[beg:end] = numpy.fft.rfftn(slab, axes=axes)
+    for beg in xrange(0, out.shape[1], batch_size):
+        end = min(beg+batch_size, out.shape[1])
+        out[:, beg:end] = numpy.fft.fft(out[:, beg:end], axis=0)
+    return out
+
+def _irfftn_inplace(fimg, shape, batch_size=16):
+    ''' Inverse real FFT of a single precision buffer, in place
+    
+    :Parameters:
+    
+    fimg : array
+           Complex64 buffer in the layout of numpy.fft.rfftn, overwritten
+    shape : tuple
+            Shape of the real space image or volume
+    batch_size : int
+                 Number of planes transformed together
+    
+    :Returns:
+    
+    img : array
+          Real space float32 image or volume, a view of `fimg`
+    '''
+    
+    for beg in xrange(0, fimg.shape[1], batch_size):
+        end = min(beg+batch_size, fimg.shape[1])
+        fimg[:, beg:end] = numpy.fft.ifft(fimg[:, beg:end], axis=0)
+    img = fimg.view(numpy.float32)[..., :shape[-1]]
+    axes = range(1, len(shape))
+    for beg in xrange(0, shape[0], batch_size):
+        end = min(beg+batch_size, shape[0])
+        img[beg:end] = numpy.fft.irfftn(fimg[beg:end], s=shape[1:], axes=axes)
+    return img
+
+def _fsc_accumulate(fimg1, fimg2, shape, index, count, phase_residual=False, batch_size=16):
+    ''' Sum the cross and auto power of two real FFTs over each shell
+    
+    :Parameters:
+    
+    fimg1 : array
+            Real FFT of the first image or volume
+    fimg2 : array
+            Real FFT of the second image or volume
+    shape : tuple
+            Shape of the real space image or volume
+    index : array
+            Shell index of each coefficient
+    count : int
+            Number of shells
+    phase_residual : bool
+                     Sum the amplitude weighted squared phase difference
+    batch_size : int
+                 Number of planes processed together
+    
+    :Returns:
+    
+    sums : array
+           Cross power, auto power of each, number of voxels and the amplitude weighted
+           squared phase difference and weight (zero unless `phase_residual`) for each shell
+    '''
+    
+    sums = numpy.zeros((6, count+1))
+    width = numpy.ones(fimg1.shape[-1], dtype=numpy.float32)
+    width[1:] = 2.0 # Account for the conjugate symmetric half of the transform
+    if (shape[-1]%2) == 0: width[-1] = 1.0
+    for beg in xrange(0, fimg1.shape[0], batch_size):
+        end = min(beg+batch_size, fimg1.shape[0])
+        a, b = fimg1[beg:end], fimg2[beg:end]
+        shell = index[beg:end].ravel()
+        cross = a.real*b.real
+        cross += a.imag*b.imag
+        pow1 = numpy.square(a.real)+numpy.square(a.imag)
+        pow2 = numpy.square(b.real)+numpy.square(b.imag)
+        sums[0] += numpy.bincount(shell, (cross*width).ravel(), count+1)
+        sums[1] += numpy.bincount(shell, (pow1*width).ravel(), count+1)
+        sums[2] += numpy.bincount(shell, (pow2*width).ravel(), count+1)
+        sums[3] += numpy.bincount(shell, numpy.broadcast_to(width, a.shape).ravel(), count+1)
+        if phase_residual:
+            weight = (numpy.sqrt(pow1)+numpy.sqrt(pow2))*width
+            phase = numpy.arctan2(a.imag*b.real-a.real*b.imag, cross)
+            sums[4] += numpy.bincount(shell, (weight*numpy.square(phase)).ravel(), count+1)
+            sums[5] += numpy.bincount(shell, weight.ravel(), count+1)
+    return sums[:, :count]
+
+def fourier_shell_correlation_fast(img1, img2, mask=None, randomize_shell=0, full_output=False, batch_size=16, rng=None):
+    ''' Estimate the Fourier shell (or ring) correlation between two volumes (or images)
+    
+    The maps are transformed with a single precision real FFT computed in slabs,
+    so no more than two map-sized complex64 buffers are allocated, and the sums
+    over each shell are accumulated with `numpy.bincount` using a shell index
+    cached for each box size (see :py:func:`fsc_shell_index`).
+    
+    If `randomize_shell` is set with a `mask`, the FSC is corrected for the
+    correlation introduced by the mask: the phases of both unmasked maps are
+    randomized beyond the given shell, the FSC of the masked randomized maps,
+    :math:`FSC_n`, is estimated and the corrected curve is
+    :math:`(FSC_t-FSC_n)/(1-FSC_n)` beyond the shell (Chen et al. 2013).
+    
+    .. sourcecode:: py
+    
+        >>> from arachnid.core.image import ndimage_utility
+        >>> fsc = ndimage_utility.fourier_shell_correlation_fast(vol1, vol2, mask)
+        >>> freq = numpy.arange(len(fsc))/float(min(vol1.shape))
+    
+    :Parameters:
+    
+    img1 : array
+           First volume or image
+    img2 : array
+           Second volume or image
+    mask : array, optional
+           Real space mask applied to both maps
+    randomize_shell : int
+                      Randomize phases beyond this shell to correct for the mask, 0 disables
+    full_output : bool
+                  Return the differential phase residual and number of voxels for each shell
+    batch_size : int
+                 Number of planes transformed together
+    rng : RandomState, optional
+          Random number generator for the phase randomization
+    
+    :Returns:
+    
+    fsc : array
+          Correlation for each shell, from zero to the Nyquist frequency of the smallest dimension
+    dph : array, optional
+          Differential phase residual in degrees for each shell
+    voxels : array, optional
+             Number of Fourier voxels in each shell
+    '''
+    
+    if img1.shape != img2.shape: raise ValueError, "Shape of both arrays must match"
+    if img1.ndim not in (2,3): raise ValueError, "Must be either 2 or 3D array"
+    if mask is not None and mask.shape != img1.shape: raise ValueError, "Shape of mask must match the maps"
+    shape = img1.shape
+    index, count = fsc_shell_index(shape)
+    fimg1 = numpy.empty(index.shape, dtype=numpy.complex64)
+    fimg2 = numpy.empty(index.shape, dtype=numpy.complex64)
+    if mask is not None: mask = numpy.asarray(mask, dtype=numpy.float32)
+    _rfftn_inplace(img1, fimg1, mask, batch_size)
+    _rfftn_inplace(img2, fimg2, mask, batch_size)
+    sums = _fsc_accumulate(fimg1, fimg2, shape, index, count, full_output, batch_size)
+    fsc = _fsc_from_sums(sums)
+    if randomize_shell > 0 and mask is not None and randomize_shell < count:
+        if rng is None: rng = numpy.random.RandomState(0)
+        for img, fimg in ((img1, fimg1), (img2, fimg2)):
+            _rfftn_inplace(img, fimg, None, batch_size)
+            _randomize_phases_inplace(fimg, index, shape, randomize_shell, rng, batch_size)
+            _rfftn_inplace(_irfftn_inplace(fimg, shape, batch_size), fimg, mask, batch_size)
+        fscn = _fsc_from_sums(_fsc_accumulate(fimg1, fimg2, shape, index, count, False, batch_size))
+        fscn = fscn[randomize_shell:]
+        fsc[randomize_shell:] = (fsc[randomize_shell:]-fscn)/numpy.maximum(1.0-fscn, 1e-6)
+    if not full_output: return fsc
+    dph = numpy.degrees(numpy.sqrt(numpy.divide(sums[4], numpy.maximum(sums[5], 1e-20))))
+    return fsc, dph, sums[3]
+
+def randomize_phases(img, shell, batch_size=16, rng=None):
+    ''' Randomize the phases of an image or volume beyond a Fourier shell
+    
+    :Parameters:
+    
+    img : array
+          Volume or image
+    shell : int
+            First shell (see :py:func:`fsc_shell_index`) with random phases
+    batch_size : int
+                 Number of planes transformed together
+    rng : RandomState, optional
+          Random number generator
+    
+    :Returns:
+    
+    out : array
+          Volume or image (float32) with random phases beyond the shell
+    '''
+    
+    if rng is None: rng = numpy.random.RandomState(0)
+    index = fsc_shell_index(img.shape)[0]
+    fimg = _rfftn_inplace(img, numpy.empty(index.shape, dtype=numpy.complex64), None, batch_size)
+    _randomize_phases_inplace(fimg, index, img.shape, shell, rng, batch_size)
+    return _irfftn_inplace(fimg, img.shape, batch_size)
+
+def _randomize_phases_inplace(fimg, index, shape, shell, rng, batch_size=16):
+    ''' Randomize the phases of a real FFT beyond a Fourier shell
+    
+    The planes of the last axis that hold their own conjugates, zero and
+    (for an even size) Nyquist, take their phases from the FFT of real noise,
+    so the randomized transform stays conjugate symmetric and only the
+    phases change.
+    
+    :Parameters:
+    
+    fimg : array
+           Complex64 buffer in the layout of numpy.fft.rfftn, modified in place
+    index : array
+            Shell index of each coefficient
+    shape : tuple
+            Shape of the real space image or volume
+    shell : int
+            First shell with random phases
+    rng : RandomState
+          Random number generator
+    batch_size : int
+                 Number of planes processed together
+    
+    :Returns:
+    
+    fimg : array
+           Complex64 buffer
+    '''
+    
+    last = fimg.shape[-1]-1 if (shape[-1]%2) == 0 else fimg.shape[-1]
+    for plane in ((0, last) if last != fimg.shape[-1] and last > 0 else (0, )):
+        sel = index[..., plane] >= shell
+        if not numpy.any(sel): continue
+        phase = numpy.fft.fftn(rng.standard_normal(sel.shape))
+        phase /= numpy.maximum(numpy.abs(phase), 1e-20)
+        fimg[..., plane][sel] *= phase[sel].astype(numpy.complex64)
+    for beg in xrange(0, fimg.shape[0], batch_size):
+        end = min(beg+batch_size, fimg.shape[0])
+        sel = index[beg:end, ..., 1:last] >= shell
+        slab = fimg[beg:end, ..., 1:last]
+        slab[sel] *= numpy.exp(1j*rng.uniform(0, 2*numpy.pi, numpy.sum(sel))).astype(numpy.complex64)
+    return fimg
+
+def _fsc_from_sums(sums):
+    ''' Normalize the cross power of each shell
+    
+    :Parameters:
+    
+    sums : array
+           Shell sums from :py:func:`_fsc_accumulate`
+    
+    :Returns:
+    
+    fsc : array
+          Correlation for each shell
+    '''
+    
+    den = numpy.sqrt(sums[1]*sums[2])
+    return numpy.divide(sums[0], numpy.where(den > 0, den, 1.0))
+
 def sum_by_group(values, groups):
     ''' Sum values by group labels
     
@@ -0,0 +1,656 @@
+''' Projection matching against a set of reference projections
+
+This module performs multi-reference alignment in-process, replacing the
+`AP SH`/`AP REF` round-trips through a SPIDER session. The reference
+projections are converted once into normalized polar Fourier rings, then
+every experimental projection is scored against all references at once
+using a batched FFT rotational cross-correlation. The translation is
+found by a 2D FFT cross-correlation against the best rotated reference
+and the rotational and translational searches are alternated.
+
+The alignment parameters follow the SPIDER convention used by `RT SQ`
+(rotate then shift), i.e. the aligned projection is given by
+
+.. sourcecode:: py
+
+    aligned = rotate_shift(img, psi, tx, ty)
+
+and it matches the reference, or the mirror of the reference when
+the mirror flag is set.
+
+.. beg-dev
+
+The polar transform is a sparse bilinear interpolation matrix that is
+cached for each image shape and ring selection, so a whole batch of
+images is resampled with a single sparse matrix product.
+
+.. end-dev
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from ..parallel import process_queue
+from ..util import lazy_import
+import ndimage_utility
+import logging
+import numpy
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+scipy = lazy_import.lazy_module('scipy', 'sparse', 'ndimage')
+
+_polar_cache = {}
+
+class PolarGrid(object):
+    ''' Sparse bilinear sampling of an image on polar rings
+    '''
+
+    def __init__(self, shape, first_ring=1, ring_last=0, ring_step=1):
+        ''' Create a polar sampling grid for images of the given shape
+
+        :Parameters:
+
+            shape : tuple
+                    Number of rows and columns in the image
+            first_ring : int
+                         First polar ring to analyze
+            ring_last : int
+                        Last polar ring to analyze; if this value is zero or too large,
+                        then it is chosen to be the largest ring inside the image
+            ring_step : int
+                        Polar ring step size
+        '''
+
+        ny, nx = shape
+        cy, cx = ny/2, nx/2
+        max_ring = min(nx-cx, ny-cy)-2
+        if ring_last <= 0 or ring_last > max_ring: ring_last = max_ring
+        if first_ring > ring_last: raise ValueError, "First ring %d exceeds last ring %d"%(first_ring, ring_last)
+        self.shape = (ny, nx)
+        self.radii = numpy.arange(first_ring, ring_last+1, max(1, ring_step), dtype=numpy.float32)
+        self.nphi = angular_samples(ring_last)
+        phi = numpy.arange(self.nphi)*(2*numpy.pi/self.nphi)
+        x = (cx + numpy.cos(phi)[:, numpy.newaxis]*self.radii[numpy.newaxis, :]).ravel()
+        y = (cy + numpy.sin(phi)[:, numpy.newaxis]*self.radii[numpy.newaxis, :]).ravel()
+        x0 = numpy.floor(x).astype(numpy.int)
+        y0 = numpy.floor(y).astype(numpy.int)
+        fx = (x-x0).astype(numpy.float32)
+        fy = (y-y0).astype(numpy.float32)
+        rows = numpy.tile(numpy.arange(len(x)), 4)
+        self.corner_y = numpy.concatenate((y0, y0, y0+1, y0+1))
+        self.corner_x = numpy.concatenate((x0, x0+1, x0, x0+1))
+        self.corner_weight = numpy.concatenate(((1-fx)*(1-fy), fx*(1-fy), (1-fx)*fy, fx*fy))
+        self.matrix = scipy.sparse.csr_matrix((self.corner_weight, (rows, self.corner_y*nx+self.corner_x)), shape=(len(x), ny*nx), dtype=numpy.float32)
+        self.weight = numpy.sqrt(self.radii)
+        self.mirror_index = (self.nphi/2 - numpy.arange(self.nphi)) % self.nphi
+
+    def transform(self, imgs):
+        ''' Resample a stack of images on the polar grid
+
+        :Parameters:
+
+            imgs : array
+                   Stack of images (n, rows, columns)
+
+        :Returns:
+
+            polar : array
+                    Stack of polar images (n, angles, rings)
+        '''
+
+        imgs = numpy.asarray(imgs, dtype=numpy.float32)
+        if imgs.ndim == 2: imgs = imgs[numpy.newaxis]
+        polar = self.matrix.dot(imgs.reshape((imgs.shape[0], -1)).T).T
+        return numpy.ascontiguousarray(polar, dtype=numpy.float32).reshape((imgs.shape[0], self.nphi, len(self.radii)))
+
+    def transform_shifted(self, imgs, shifts):
+        ''' Resample a stack of images on the polar grid after each integer translation
+
+        The translations are folded into the sampling coordinates (with the
+        periodic boundary of `numpy.roll`), so every translation of the stack
+        is resampled by a single sparse matrix product.
+
+        :Parameters:
+
+            imgs : array
+                   Stack of images (n, rows, columns)
+            shifts : array
+                     Integer translations (k, 2) in (y, x), the image is shifted by minus each translation
+
+        :Returns:
+
+            polar : array
+                    Stack of polar images (k*n, angles, rings), ordered by translation
+        '''
+
+        imgs = numpy.asarray(imgs, dtype=numpy.float32)
+        if imgs.ndim == 2: imgs = imgs[numpy.newaxis]
+        ny, nx = self.shape
+        shifts = numpy.asarray(shifts, dtype=numpy.int)
+        total = len(self.corner_weight)/4
+        y = (self.corner_y[numpy.newaxis, :]+shifts[:, 0, numpy.newaxis]) % ny
+        x = (self.corner_x[numpy.newaxis, :]+shifts[:, 1, numpy.newaxis]) % nx
+        rows = numpy.tile(numpy.arange(total), 4)[numpy.newaxis, :] + (numpy.arange(len(shifts))*total)[:, numpy.newaxis]
+        matrix = scipy.sparse.csr_matrix((numpy.tile(self.corner_weight, len(shifts)), (rows.ravel(), (y*nx+x).ravel())), shape=(len(shifts)*total, ny*nx), dtype=numpy.float32)
+        polar = matrix.dot(imgs.reshape((imgs.shape[0], -1)).T).reshape((len(shifts), total, imgs.shape[0]))
+        return numpy.ascontiguousarray(polar.transpose(0, 2, 1), dtype=numpy.float32).reshape((len(shifts)*imgs.shape[0], self.nphi, len(self.radii)))
+
+    def fourier_rings(self, polar, mirror=False):
+        ''' Normalize the polar images and transform each ring into Fourier space
+
+        Each ring has its mean removed and the full set of rings is scaled to unit
+        norm (weighted by the radius) so that the rotational cross-correlation
+        is bounded between -1 and 1.
+
+        :Parameters:
+
+            polar : array
+                    Stack of polar images (n, angles, rings)
+            mirror : bool
+                     Transform the mirror of the image (reflect the x-axis)
+
+        :Returns:
+
+            rings : array
+                    Stack of normalized Fourier rings (n, angles/2+1, rings)
+        '''
+
+        if mirror: polar = polar[:, self.mirror_index, :]
+        polar = polar - polar.mean(axis=1)[:, numpy.newaxis, :]
+        polar *= self.weight
+        norm = numpy.sqrt(numpy.sum(numpy.square(polar.reshape((polar.shape[0], -1))), axis=1))
+        norm[norm == 0] = 1.0
+        polar /= norm[:, numpy.newaxis, numpy.newaxis]
+        return numpy.fft.rfft(polar, axis=1).astype(numpy.complex64)
+
+def polar_grid(shape, first_ring=1, ring_last=0, ring_step=1):
+    ''' Get a cached polar grid for the given image shape and rings
+
+    :Parameters:
+
+        shape : tuple
+                Number of rows and columns in the image
+        first_ring : int
+                     First polar ring to analyze
+        ring_last : int
+                    Last polar ring to analyze
+        ring_step : int
+                    Polar ring step size
+
+    :Returns:
+
+        grid : PolarGrid
+               Polar sampling grid
+    '''
+
+    key = (tuple(shape), int(first_ring), int(ring_last), int(ring_step))
+    if key not in _polar_cache:
+        _polar_cache[key] = PolarGrid(shape, *key[1:])
+    return _polar_cache[key]
+
+def angular_samples(radius):
+    ''' Number of samples along the largest ring, rounded up to
+    a power of two
+
+    :Parameters:
+
+        radius : int
+                 Radius of the largest ring
+
+    :Returns:
+
+        nphi : int
+               Number of angular samples
+    '''
+
+    return int(2**numpy.ceil(numpy.log2(max(8, 2*numpy.pi*radius))))
+
+def rotate_shift(img, psi, tx=0.0, ty=0.0, out=None):
+    ''' Rotate then shift an image following the SPIDER `RT SQ` convention
+    using bilinear interpolation
+
+    :Parameters:
+
+        img : array
+              Image
+        psi : float
+              In-plane rotation in degrees
+        tx : float
+             Translation in the x-direction
+        ty : float
+             Translation in the y-direction
+        out : array, optional
+              Output image
+
+    :Returns:
+
+        out : array
+              Rotated and shifted image
+    '''
+
+    ny, nx = img.shape
+    cy, cx = ny/2, nx/2
+    y, x = numpy.mgrid[0:ny, 0:nx].astype(numpy.float32)
+    x -= cx+tx
+    y -= cy+ty
+    cod, sid = numpy.cos(numpy.deg2rad(psi)), numpy.sin(numpy.deg2rad(psi))
+    coords = numpy.asarray((x*sid + y*cod + cy, x*cod - y*sid + cx))
+    if out is None: out = numpy.empty_like(img)
+    scipy.ndimage.map_coordinates(img, coords, order=1, mode='wrap', output=out)
+    return out
+
+def prepare_references(refs, first_ring=1, ring_last=0, ring_step=1, **extra):
+    ''' Convert the reference projections into normalized polar Fourier rings
+
+    This should be done once for each set of references and shared among every
+    experimental projection.
+
+    :Parameters:
+
+        refs : array
+               Stack of reference projections (n, rows, columns)
+        first_ring : int
+                     First polar ring to analyze
+        ring_last : int
+                    Last polar ring to analyze
+        ring_step : int
+                    Polar ring step size
+        extra : dict
+                Unused keyword arguments
+
+    :Returns:
+
+        grid : PolarGrid
+               Polar sampling grid
+        frefs : array
+                Fourier rings of the references (n, angles/2+1, rings)
+    '''
+
+    refs = numpy.asarray(refs, dtype=numpy.float32)
+    grid = polar_grid(refs.shape[1:], first_ring, ring_last, ring_step)
+    return grid, grid.fourier_rings(grid.transform(refs))
+
+def rotational_correlation(frefs, fimgs, nphi):
+    ''' Cross-correlate every image with every reference over all in-plane rotations
+
+    :Parameters:
+
+        frefs : array
+                Fourier rings of the references (m, angles/2+1, rings)
+        fimgs : array
+                Fourier rings of the images (n, angles/2+1, rings)
+        nphi : int
+               Number of angular samples
+
+    :Returns:
+
+        cc : array
+             Cross-correlation (n, m, angles), where cc[i, j, k] is the score of image i
+             against reference j rotated by 2*pi*k/nphi
+    '''
+
+    prod = numpy.matmul(frefs.transpose(1, 0, 2), fimgs.conj().transpose(1, 2, 0))
+    return numpy.fft.irfft(prod.transpose(2, 1, 0), n=nphi, axis=2)
+
+def _best_rotation(cc, nphi):
+    ''' Find the best reference and in-plane rotation for each image
+
+    The rotation is refined to sub-sample accuracy using a parabolic fit.
+
+    :Parameters:
+
+        cc : array
+             Cross-correlation (n, m, angles)
+        nphi : int
+             Number of angular samples
+
+    :Returns:
+
+        ref : array
+              Index of the best reference
+        alpha : array
+                Best in-plane rotation in radians
+        peak : array
+               Best cross-correlation
+    '''
+
+    n = cc.shape[0]
+    idx = cc.reshape((n, -1)).argmax(axis=1)
+    ref, k = idx / nphi, idx % nphi
+    rows = numpy.arange(n)
+    peak = cc[rows, ref, k]
+    left, right = cc[rows, ref, (k-1) % nphi], cc[rows, ref, (k+1) % nphi]
+    denom = left - 2*peak + right
+    offset = numpy.zeros(n)
+    sel = denom < 0
+    offset[sel] = 0.5*(left[sel]-right[sel])/denom[sel]
+    return ref, (k+offset)*(2*numpy.pi/nphi), peak
+
+def _translation_grid(trans_range, trans_step):
+    ''' List the translations tested in the exhaustive search
+
+    :Parameters:
+
+        trans_range : int
+                      Maximum allowed translation
+        trans_step : int
+                     Translation step size
+
+    :Returns:
+
+        shifts : array
+                 Integer translations (n, 2) in (y, x)
+    '''
+
+    trans_step = max(1, int(trans_step))
+    offsets = numpy.arange(-(trans_range/trans_step)*trans_step, trans_range+1, trans_step)
+    y, x = numpy.meshgrid(offsets, offsets, indexing='ij')
+    return numpy.vstack((y.ravel(), x.ravel())).T
+
+def _shift_images(fimgs, shifts, shape):
+    ''' Shift each image by minus its (sub-pixel) translation in Fourier space
+
+    :Parameters:
+
+        fimgs : array
+                Stack of Fourier transformed images (n, rows, columns/2+1)
+        shifts : array
+                 Translations (n, 2) in (y, x)
+        shape : tuple
+                Number of rows and columns in the image
+
+    :Returns:
+
+        out : array
+              Stack of shifted images (n, rows, columns)
+    '''
+
+    ky = numpy.fft.fftfreq(shape[0])[numpy.newaxis, :, numpy.newaxis]
+    kx = numpy.fft.rfftfreq(shape[1])[numpy.newaxis, numpy.newaxis, :]
+    phase = numpy.exp(2j*numpy.pi*(ky*shifts[:, 0, numpy.newaxis, numpy.newaxis]+kx*shifts[:, 1, numpy.newaxis, numpy.newaxis]))
+    return numpy.fft.irfft2(fimgs*phase, s=shape).astype(numpy.float32)
+
+def _parabolic_peak(cc, idx, axis):
+    ''' Refine the location of a peak to sub-pixel accuracy along one axis
+
+    :Parameters:
+
+        cc : array
+             Stack of cross-correlation maps (n, rows, columns)
+        idx : tuple
+              Integer location of the peak (rows, y, x)
+        axis : int
+               Axis to refine, 1 for y and 2 for x
+
+    :Returns:
+
+        offset : array
+                 Sub-pixel offset of the peak along the axis
+    '''
+
+    n = cc.shape[axis]
+    lo, hi = list(idx), list(idx)
+    lo[axis] = (idx[axis]-1) % n
+    hi[axis] = (idx[axis]+1) % n
+    left, peak, right = cc[tuple(lo)], cc[idx], cc[tuple(hi)]
+    denom = left - 2*peak + right
+    offset = numpy.zeros(len(peak))
+    sel = denom < 0
+    offset[sel] = 0.5*(left[sel]-right[sel])/denom[sel]
+    return numpy.clip(offset, -0.5, 0.5)
+
+def _search_references(frefs, fimgs, nphi, cc_batch):
+    ''' Find the best reference and in-plane rotation for each image, correlating
+    a block of references at a time
+
+    The cross-correlation of every image with every reference over all rotations
+    does not fit in memory for a large set of references, so only `cc_batch`
+    values are computed at once. A reference replaces the current best only if its
+    score is strictly greater, so ties go to the lowest reference index as when all
+    references are scored together.
+
+    :Parameters:
+
+        frefs : array
+                Fourier rings of the references (m, angles/2+1, rings)
+        fimgs : array
+                Fourier rings of the images (n, angles/2+1, rings)
+        nphi : int
+               Number of angular samples
+        cc_batch : int
+                   Maximum number of cross-correlation values (images x references x angles)
+                   computed together
+
+    :Returns:
+
+        ref : array
+              Index of the best reference
+        alpha : array
+                Best in-plane rotation in radians
+        peak : array
+               Best cross-correlation
+    '''
+
+    ref_batch = max(1, int(cc_batch/(len(fimgs)*nphi)))
+    ref, alpha, peak = _best_rotation(rotational_correlation(frefs[:ref_batch], fimgs, nphi), nphi)
+    for beg in xrange(ref_batch, len(frefs), ref_batch):
+        cur = _best_rotation(rotational_correlation(frefs[beg:beg+ref_batch], fimgs, nphi), nphi)
+        sel = cur[2] > peak
+        ref[sel], alpha[sel], peak[sel] = cur[0][sel]+beg, cur[1][sel], cur[2][sel]
+    return ref, alpha, peak
+
+def _rotation_search(grid, frefs, polar, test_mirror, cc_batch):
+    ''' Find the best reference, rotation and mirror for a stack of polar images
+
+    :Parameters:
+
+        grid : PolarGrid
+               Polar sampling grid
+        frefs : array
+                Fourier rings of the references
+        polar : array
+                Stack of polar images
+        test_mirror : bool
+                      If true, test the mirror position of the projection
+        cc_batch : int
+                   Maximum number of cross-correlation values computed together, see
+                   :py:func:`_search_references`
+
+    :Returns:
+
+        ref : array
+              Index of the best reference
+        alpha : array
+                Best in-plane rotation in radians
+        peak : array
+               Best cross-correlation
+        mirror : array
+                 True if the mirror position is best
+    '''
+
+    ref, alpha, peak = _search_references(frefs, grid.fourier_rings(polar), grid.nphi, cc_batch)
+    mirror = numpy.zeros(len(ref), dtype=numpy.bool)
+    if test_mirror:
+        mref, malpha, mpeak = _search_references(frefs, grid.fourier_rings(polar, True), grid.nphi, cc_batch)
+        mirror = mpeak > peak
+        ref[mirror], alpha[mirror], peak[mirror] = mref[mirror], malpha[mirror], mpeak[mirror]
+    return ref, alpha, peak, mirror
+
+def align_images(imgs, refs, grid, frefs, trans_range=0, trans_step=1, test_mirror=True, iterations=2, shift_batch=512, cc_batch=8388608, **extra):
+    ''' Align a batch of images to the prepared references
+
+    Like `AP SH`, every translation on the grid defined by `trans_range` and
+    `trans_step` is tested exhaustively: the translations are folded into the
+    polar sampling (see :py:meth:`PolarGrid.transform_shifted`), so the batch is
+    resampled once for several translations together. The best translation is then refined
+    to sub-pixel accuracy by cross-correlating the image with the rotated
+    reference, alternating with the rotational search.
+
+    :Parameters:
+
+        imgs : array
+               Stack of experimental images (n, rows, columns)
+        refs : array
+               Stack of reference projections (m, rows, columns)
+        grid : PolarGrid
+               Polar sampling grid, see :py:func:`prepare_references`
+        frefs : array
+                Fourier rings of the references, see :py:func:`prepare_references`
+        trans_range : int
+                      Maximum allowed translation
+        trans_step : int
+                     Translation step size
+        test_mirror : bool
+                      If true, test the mirror position of the projection
+        iterations : int
+                     Number of times to refine the translation and rotation
+        shift_batch : int
+                      Maximum number of translated images resampled together in the exhaustive search
+        cc_batch : int
+                   Maximum number of cross-correlation values (images x references x angles)
+                   computed together in the rotational search, the references are split into
+                   blocks to stay under this limit (8388608 values is 64 MB)
+        extra : dict
+                Unused keyword arguments
+
+    :Returns:
+
+        vals : array
+               Alignment for each image (n, 6): reference index, psi, tx, ty, cross-correlation, mirror
+    '''
+
+    imgs = numpy.asarray(imgs, dtype=numpy.float32)
+    if imgs.ndim == 2: imgs = imgs[numpy.newaxis]
+    n, shape = imgs.shape[0], imgs.shape[1:]
+    trans_range = max(0, min(int(trans_range), min(shape)/2-1))
+    shifts = numpy.zeros((n, 2))
+    ref, alpha, peak, mirror = None, None, None, None
+    trans = _translation_grid(trans_range, trans_step)
+    chunk = max(1, shift_batch/n)
+    for beg in xrange(0, len(trans), chunk):
+        cand = trans[beg:beg+chunk]
+        polar = grid.transform_shifted(imgs, cand)
+        for j in xrange(len(cand)):
+            cur = _rotation_search(grid, frefs, polar[j*n:(j+1)*n], test_mirror, cc_batch)
+            if ref is None:
+                ref, alpha, peak, mirror = cur
+                continue
+            sel = cur[2] > peak
+            ref[sel], alpha[sel], peak[sel], mirror[sel] = cur[0][sel], cur[1][sel], cur[2][sel], cur[3][sel]
+            shifts[sel] = cand[j]
+    if trans_range > 0 and iterations > 0:
+        fimgs = numpy.fft.rfft2(imgs)
+        rows = numpy.arange(n)
+        tmpl = numpy.empty_like(imgs)
+        for it in xrange(iterations):
+            for i in xrange(n):
+                rotate_shift(refs[ref[i]], numpy.rad2deg(alpha[i]), out=tmpl[i])
+                if mirror[i]: tmpl[i] = ndimage_utility.mirror(tmpl[i])
+            cc = numpy.fft.irfft2(fimgs*numpy.fft.rfft2(tmpl).conj(), s=shape)
+            center = numpy.round(shifts).astype(numpy.int)
+            window = numpy.full(cc.shape, -numpy.inf)
+            for i in xrange(n):
+                y = numpy.arange(center[i, 0]-1, center[i, 0]+2) % shape[0]
+                x = numpy.arange(center[i, 1]-1, center[i, 1]+2) % shape[1]
+                window[i][numpy.ix_(y, x)] = cc[i][numpy.ix_(y, x)]
+            idx = window.reshape((n, -1)).argmax(axis=1)
+            dy, dx = numpy.unravel_index(idx, shape)
+            idx = (rows, dy, dx)
+            dy = numpy.where(dy > shape[0]/2, dy-shape[0], dy) + _parabolic_peak(cc, idx, 1)
+            dx = numpy.where(dx > shape[1]/2, dx-shape[1], dx) + _parabolic_peak(cc, idx, 2)
+            cand = numpy.vstack((numpy.clip(dy, -trans_range, trans_range), numpy.clip(dx, -trans_range, trans_range))).T
+            cur = _rotation_search(grid, frefs, grid.transform(_shift_images(fimgs, cand, shape)), test_mirror, cc_batch)
+            sel = cur[2] > peak
+            if not numpy.any(sel): break
+            ref[sel], alpha[sel], peak[sel], mirror[sel] = cur[0][sel], cur[1][sel], cur[2][sel], cur[3][sel]
+            shifts[sel] = cand[sel]
+    # Convert shift then rotate into rotate then shift (SPIDER convention)
+    angle = numpy.where(mirror, -alpha, alpha)
+    cod, sid = numpy.cos(angle), numpy.sin(angle)
+    vals = numpy.zeros((n, 6))
+    vals[:, 0] = ref
+    vals[:, 1] = numpy.mod(-numpy.rad2deg(angle), 360.0)
+    vals[:, 2] = -(shifts[:, 1]*cod - shifts[:, 0]*sid)
+    vals[:, 3] = -(shifts[:, 1]*sid + shifts[:, 0]*cod)
+    vals[:, 4] = peak
+    vals[:, 5] = mirror
+    return vals
+
+def align_stack(image_iter, refs, thread_count=1, batch_size=64, **extra):
+    ''' Align a set of images to a set of references in parallel
+
+    The references are transformed once in the parent process and shared
+    with the worker processes (copy-on-write after fork).
+
+    :Parameters:
+
+        image_iter : functor
+                     Function that takes a (begin, end) range and returns an iterator
+                     over the corresponding experimental images
+        refs : array
+               Stack of reference projections (m, rows, columns)
+        thread_count : int
+                       Number of worker processes
+        batch_size : int
+                     Number of images aligned together
+        extra : dict
+                Alignment keyword arguments, see :py:func:`align_images`, and
+                `total`, the number of images
+
+    :Returns:
+
+        vals : array
+               Alignment for each image (n, 6): reference index, psi, tx, ty, cross-correlation, mirror
+    '''
+
+    total = extra.pop('total')
+    refs = numpy.asarray(refs, dtype=numpy.float32)
+    grid, frefs = prepare_references(refs, **extra)
+    vals = numpy.zeros((total, 6))
+    for beg, out in process_queue.map_reduce_array(_align_range, thread_count, numpy.arange(total), image_iter, refs, grid, frefs, batch_size, **extra):
+        vals[beg:beg+len(out)] = out
+    return vals
+
+def _align_range(beg, end, data, image_iter, refs, grid, frefs, batch_size, **extra):
+    ''' Align a contiguous range of images (worker)
+
+    :Parameters:
+
+        beg : int
+              Index of first image
+        end : int
+              Index of last image (exclusive)
+        data : array
+               Unused index array
+        image_iter : functor
+                     Function returning an iterator over images in a range
+        refs : array
+               Stack of reference projections
+        grid : PolarGrid
+               Polar sampling grid
+        frefs : array
+                Fourier rings of the references
+        batch_size : int
+                     Number of images aligned together
+        extra : dict
+                Alignment keyword arguments
+
+    :Returns:
+
+        beg : int
+              Index of first image
+        vals : array
+               Alignment for each image in the range
+    '''
+
+    vals = numpy.zeros((end-beg, 6))
+    batch = None
+    offset = 0
+    for i, img in enumerate(image_iter(beg, end)):
+        if batch is None: batch = numpy.zeros((min(batch_size, end-beg),)+img.shape, dtype=numpy.float32)
+        batch[i-offset] = img
+        if (i-offset+1) == len(batch) or (i+1) == (end-beg):
+            vals[offset:i+1] = align_images(batch[:i-offset+1], refs, grid, frefs, **extra)
+            offset = i+1
+    return beg, vals
@@ -5,7 +5,8 @@
 '''
 from ..app import tracing
 from ..parallel import mpi_utility #, process_tasks
-import logging, numpy
+import ndimage_file
+import logging, numpy, threading, Queue, sys
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
@@ -89,6 +90,132 @@ def reproject_mp(reproject_func, vol, rad, ang, out=None, thread_count=0):
     reproject_func(vol.T, out.T, ang.T, rad)
     return out
 
+def iter_reproject_3q(vol, rad, ang, chunk_size=1024, output=None, prefetch=True, **extra):
+    ''' Generate projections of a volume in chunks of bounded size
+    
+    See :py:func:`iter_reproject_mp`.
+    
+    .. sourcecode:: py
+    
+        >>> from arachnid.core.image import reproject
+        >>> for offset, projs in reproject.iter_reproject_3q(vol, rad, ang, chunk_size=512):
+        ...     process(offset, projs) # projs is reused, copy to keep
+    
+    :Parameters:
+    
+    vol : array
+          Volume to project (float32)
+    rad : float
+          Radius of the projection
+    ang : array
+          Euler angles (psi, theta, phi) for each projection
+    chunk_size : int
+                 Maximum number of projections held in a buffer
+    output : str, optional
+             Stack file where each projection is written as it is generated
+    prefetch : bool
+               Generate the next chunk while the current chunk is consumed
+    extra : dict
+            Keyword arguments for the MPI utilities
+    
+    :Returns:
+    
+    offset : int
+             Index of the first projection of the chunk in the angle list
+    projs : array
+            Projections of the chunk (chunk, rows, columns)
+    '''
+    
+    return iter_reproject_mp(_spider_reproject.reproject_3q_omp, vol, rad, ang, chunk_size, output, prefetch, **extra)
+
+def iter_reproject_mp(reproject_func, vol, rad, ang, chunk_size=1024, output=None, prefetch=True, **extra):
+    ''' Generate projections of a volume in chunks of bounded size
+    
+    Peak memory is set by `chunk_size` rather than by the number of views: the
+    projections are generated into two buffers of `chunk_size` images, one filled
+    by a background thread while the other is consumed. The projections yielded
+    are only valid until the next iteration. With MPI, each node generates
+    (and yields) only its share of the angles.
+    
+    :Parameters:
+    
+    reproject_func : function
+                     Projection kernel, reproject_func(vol, out, ang, rad) on Fortran ordered arrays
+    vol : array
+          Volume to project
+    rad : float
+          Radius of the projection
+    ang : array
+          Euler angles (psi, theta, phi) for each projection
+    chunk_size : int
+                 Maximum number of projections held in a buffer
+    output : str, optional
+             Stack file where each projection is written as it is generated
+    prefetch : bool
+               Generate the next chunk while the current chunk is consumed
+    extra : dict
+            Keyword arguments for the MPI utilities
+    
+    :Returns:
+    
+    offset : int
+             Index of the first projection of the chunk in the angle list
+    projs : array
+            Projections of the chunk (chunk, rows, columns)
+    '''
+    
+    if output is not None and mpi_utility.get_size(**extra) > 1: raise ValueError, "Streaming projections to a single stack file is not supported with MPI"
+    vol = mpi_utility.broadcast(vol, **extra)
+    ang = numpy.require(ang, dtype=numpy.float32, requirements='C')
+    slice = mpi_utility.mpi_slice(len(ang), **extra)
+    beg, end = slice.start, slice.stop
+    chunk_size = max(1, min(chunk_size, end-beg))
+    chunks = [(offset, min(offset+chunk_size, end)) for offset in xrange(beg, end, chunk_size)]
+    buffers = [numpy.empty((chunk_size, vol.shape[0], vol.shape[1]), dtype=vol.dtype) for i in xrange(2 if prefetch and len(chunks) > 1 else 1)]
+    
+    def project(offset, last, buf):
+        out = buf[:last-offset]
+        out[:]=0
+        reproject_func(vol.T, out.T, ang[offset:last].T, rad)
+        return out
+    
+    def write(offset, projs):
+        if output is None: return
+        for i, proj in enumerate(projs): ndimage_file.write_image(output, proj, offset+i)
+    
+    if len(buffers) == 1:
+        for offset, last in chunks:
+            projs = project(offset, last, buffers[0])
+            write(offset, projs)
+            yield offset, projs
+        return
+    
+    free, ready = Queue.Queue(), Queue.Queue()
+    for buf in buffers: free.put(buf)
+    
+    def worker():
+        try:
+            for offset, last in chunks:
+                buf = free.get()
+                if buf is None: return
+                ready.put((offset, project(offset, last, buf), buf))
+        except:
+            ready.put((None, sys.exc_info(), None))
+    
+    thread = threading.Thread(target=worker)
+    thread.daemon=True
+    thread.start()
+    try:
+        for i in xrange(len(chunks)):
+            offset, projs, buf = ready.get()
+            if offset is None: raise projs[0], projs[1], projs[2]
+            write(offset, projs)
+            yield offset, projs
+            free.put(buf)
+    finally:
+        free.put(None)
+        thread.join()
+
 """
 def reproject_mp(reproject_func, vol, rad, ang, out=None, thread_count=0):
     '''
@@ -4,6 +4,8 @@
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
 from ..app import tracing
+from ..parallel import openmp
+import multiprocessing.pool
 import logging, numpy
 
 
@@ -42,6 +44,72 @@ def rotate_image(img, ang, tx=0.0, ty=0.0, out=None, scale=1.0):
     _spider_rotate.rotate_image(img.T, out.T, ang, scale, tx, ty)
     return out
 
+def rotate_images(stack, angles, tx=None, ty=None, out=None, threads=0, scale=1.0):
+    ''' Rotate and shift a stack of images, see :py:func:`rotate_image`
+    
+    The stack is rotated by a single call into the compiled module, which splits
+    the images over OpenMP threads without holding the GIL. If the compiled module
+    predates the batch routine, the images are split over a pool of threads that
+    each call :py:func:`rotate_image`.
+    
+    .. sourcecode:: py
+    
+        >>> from arachnid.core.image import rotate
+        >>> out = rotate.rotate_images(stack, align[:, 3], align[:, 4], align[:, 5], threads=8)
+    
+    :Parameters:
+    
+    stack : array
+            Stack of images (n, rows, columns)
+    angles : array
+             In-plane rotation of each image in degrees
+    tx : array, optional
+         Translation of each image in the x-direction
+    ty : array, optional
+         Translation of each image in the y-direction
+    out : array, optional
+          Preallocated output stack, C-contiguous float32
+    threads : int
+              Number of threads, 0 uses the current OpenMP setting (or a single thread)
+    scale : float
+            Scale factor applied to every image
+    
+    :Returns:
+    
+    out : array
+          Stack of rotated and shifted images
+    '''
+    
+    stack = numpy.require(stack, dtype=numpy.float32, requirements='C')
+    if stack.ndim != 3: raise ValueError, "Requires a stack of 2D images, not a %d-D array"%stack.ndim
+    n = len(stack)
+    angles = numpy.require(numpy.broadcast_to(angles, (n, )), dtype=numpy.float32, requirements='C')
+    tx = numpy.require(numpy.broadcast_to(0.0 if tx is None else tx, (n, )), dtype=numpy.float32, requirements='C')
+    ty = numpy.require(numpy.broadcast_to(0.0 if ty is None else ty, (n, )), dtype=numpy.float32, requirements='C')
+    if out is None: out = numpy.empty_like(stack)
+    elif out.shape != stack.shape or out.dtype != numpy.float32 or not out.flags.c_contiguous:
+        raise ValueError, "Requires a C-contiguous float32 output with shape %s"%str(stack.shape)
+    if n == 0: return out
+    if hasattr(_spider_rotate, 'rotate_images'):
+        if threads > 0 and openmp.is_openmp_enabled(): openmp.set_thread_count(threads)
+        _spider_rotate.rotate_images(stack.T, out.T, angles, scale, tx, ty)
+        return out
+    
+    def rotate_range(rng):
+        for i in xrange(rng[0], rng[1]):
+            _spider_rotate.rotate_image(stack[i].T, out[i].T, angles[i], scale, tx[i], ty[i])
+    
+    threads = max(1, min(threads, n))
+    if threads > 1:
+        bounds = numpy.linspace(0, n, threads+1).astype(numpy.int)
+        pool = multiprocessing.pool.ThreadPool(threads)
+        try: pool.map(rotate_range, zip(bounds[:-1], bounds[1:]))
+        finally:
+            pool.close()
+            pool.join()
+    else: rotate_range((0, n))
+    return out
+
 def rotate_euler(ref, ang, out=None):
     '''
     '''
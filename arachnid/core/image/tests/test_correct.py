@@ -0,0 +1,31 @@
+'''
+.. Created on Oct 19, 2026
+.. codeauthor:: robertlanglois
+'''
+from ..ctf import correct
+from .. import preprocess_utility
+from unittest import SkipTest
+import numpy, numpy.testing
+
+def test_filter_stack_rfft():
+    rng = numpy.random.RandomState(0)
+    for shape in [(3, 32, 32), (2, 31, 33), (4, 20, 15), (1, 16, 9)]:
+        stack = rng.randn(*shape).astype(numpy.float32)
+        ctfimg = (rng.randn(shape[1], shape[2]/2+1)+1j*rng.randn(shape[1], shape[2]/2+1)).astype(numpy.complex64)
+        ref = numpy.fft.irfft2(numpy.fft.rfft2(stack)*ctfimg, s=shape[1:])
+        out = correct.filter_stack_rfft(stack, ctfimg)
+        assert out.dtype == numpy.float32
+        numpy.testing.assert_allclose(out, ref, atol=1e-4*numpy.abs(ref).max())
+
+def test_phase_flip_stack():
+    if correct._spider_ctf is None: raise SkipTest, "compiled _spider_ctf module not available"
+    rng = numpy.random.RandomState(0)
+    stack = rng.randn(6, 64, 64).astype(numpy.float32)
+    param = numpy.zeros((len(stack), 18))
+    param[:, -1] = rng.uniform(10000, 30000, len(stack))
+    param[3:, -1] = param[0, -1]
+    ctfparam = dict(apix=2.0, voltage=300.0, cs=2.0, ampcont=0.1)
+    ref = numpy.asarray([preprocess_utility.phaseflip(stack[i].copy(), i, param, **ctfparam) for i in xrange(len(stack))])
+    out = correct.phase_flip_stack(stack, param[:, -1], defocus_bin=0, batch_size=4, **ctfparam)
+    assert out.dtype == numpy.float32
+    numpy.testing.assert_allclose(out, ref, atol=1e-4*numpy.abs(ref).max())
@@ -0,0 +1,70 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: robertlanglois
+'''
+from ..ctf import estimate2d
+import numpy, numpy.testing
+
+def _evalctf(cs, wl, wgh, dfmid1, dfmid2, angast, thetatr, hw, pow, rmin2, rmax2):
+    # Direct port of the EVALCTF loop in ctf.F90
+    n = max(pow.shape)
+    wgh1, wgh2 = numpy.sqrt(1.0-wgh*wgh), wgh
+    sum = sum1 = sum2 = 0.0
+    for m in xrange(n):
+        mm = m-n if m > n/2 else m
+        for ll in xrange(n/2):
+            res2 = (float(ll)/n)**2 + (float(mm)/n)**2
+            if res2 > rmax2 or res2 <= rmin2: continue
+            rad2 = ll*ll + mm*mm
+            if rad2 != 0:
+                ccos = numpy.cos(2.0*(numpy.arctan2(mm, ll)-angast))
+                df = 0.5*(dfmid1+dfmid2+ccos*(dfmid1-dfmid2))
+                hangle2 = rad2*0.5*thetatr*thetatr
+                c1 = 2.0*numpy.pi/wl*hangle2
+                chi = c1*df - c1*cs*hangle2
+                ctfv = -wgh1*numpy.sin(chi)-wgh2*numpy.cos(chi)
+            else: ctfv = -wgh2
+            expv = numpy.exp(hw*res2) if hw != 0.0 else 1.0
+            sum += pow[m, ll]*ctfv**2*expv
+            sum1 += ctfv**4
+            sum2 += (pow[m, ll]*expv)**2
+    return sum/numpy.sqrt(sum1*sum2)
+
+def test_eval_model_2d_batch():
+    n, apix = 32, 2.0
+    rng = numpy.random.RandomState(1)
+    pow = rng.rand(n, n/2).astype(numpy.float32)
+    wl = 12.26/numpy.sqrt(300e3+0.9785*300e3**2/10.0**6.0)
+    cs, wgh, thetatr = 2.0*10**7.0, 0.1, wl/(apix*n)
+    rmin2, rmax2 = (apix/30.0)**2, (apix/5.0)**2
+    hw = -1.0/rmax2
+    points = estimate2d.prepare_model_2d(pow, thetatr, rmin2, rmax2, hw)
+    params = numpy.asarray([(20000.0, 21000.0, 0.3), (15000.0, 15000.0, 0.0), (30000.0, 25000.0, 1.2)])
+    vals = estimate2d.eval_model_2d_batch(params, points, cs, wl, wgh, block_size=2)
+    for p, val in zip(params, vals):
+        numpy.testing.assert_allclose(val, _evalctf(cs, wl, wgh, p[0], p[1], p[2], thetatr, hw, pow, rmin2, rmax2), rtol=1e-6)
+    best = estimate2d.grid_search_2d(points, params[:, 0], params[:, 1], params[:, 2], cs, wl, wgh)
+    numpy.testing.assert_allclose(best[0], max(estimate2d.eval_model_2d_batch(numpy.asarray([(a, b, c) for c in params[:, 2] for a in params[:, 0] for b in params[:, 1]]), points, cs, wl, wgh)))
+
+def test_grid_search_2d():
+    n, apix, fstep = 32, 2.0, 1000.0
+    rng = numpy.random.RandomState(2)
+    pow = rng.rand(n, n/2).astype(numpy.float32)
+    wl = 12.26/numpy.sqrt(300e3+0.9785*300e3**2/10.0**6.0)
+    cs, wgh, thetatr = 2.0*10**7.0, 0.1, wl/(apix*n)
+    rmin2, rmax2 = (apix/30.0)**2, (apix/5.0)**2
+    hw = -1.0/rmax2
+    i1, i2 = 10, 20
+    # Grid search loop of search_model_2d before eval_model_2d_batch
+    best=(-1e20, None, None, None)
+    for k in xrange(0, 18):
+        for i in xrange(i1, i2+1):
+            for j in xrange(i1, i2+1):
+                df1, df2, ang = fstep*i, fstep*j, numpy.deg2rad(5.0*k)
+                val = estimate2d.eval_model_2d(df1, df2, ang, pow, cs, wl, wgh, thetatr, rmin2, rmax2, hw)
+                if val > best[0]: best=(val, df1, df2, ang)
+    points = estimate2d.prepare_model_2d(pow, thetatr, rmin2, rmax2, hw)
+    defocus = numpy.arange(i1, i2+1)*fstep
+    batch = estimate2d.grid_search_2d(points, defocus, defocus, numpy.deg2rad(numpy.arange(0, 18)*5.0), cs, wl, wgh)
+    numpy.testing.assert_allclose(batch[1:], best[1:])
+    numpy.testing.assert_allclose(batch[0], best[0], rtol=1e-5)
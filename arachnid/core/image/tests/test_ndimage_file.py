@@ -0,0 +1,54 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: robertlanglois
+'''
+from .. import ndimage_file
+import numpy, numpy.testing, os
+
+test_files = ['test_prefetch_01.spi', 'test_prefetch_02.spi']
+
+def _write_stacks(count=7, width=16):
+    stacks = []
+    for k, filename in enumerate(test_files):
+        stack = numpy.random.rand(count, width, width).astype(numpy.float32)+k
+        for i in xrange(count): ndimage_file.write_image(filename, stack[i], i)
+        stacks.append(stack)
+    return stacks
+
+def _cleanup():
+    for filename in test_files:
+        if os.path.exists(filename): os.unlink(filename)
+
+def test_iter_images_prefetch():
+    try:
+        stacks = _write_stacks()
+        for readahead, max_bytes in [(0, 0), (1, 0), (3, 0), (16, 0), (4, 2000)]:
+            imgs = list(ndimage_file.iter_images_prefetch(test_files[0], readahead=readahead, max_bytes=max_bytes))
+            numpy.testing.assert_allclose(numpy.asarray(imgs), stacks[0])
+        index = numpy.asarray([5, 1, 3])
+        imgs = list(ndimage_file.iter_images_prefetch(test_files[0], index, readahead=2))
+        numpy.testing.assert_allclose(numpy.asarray(imgs), stacks[0][index])
+        imgs = list(ndimage_file.iter_images_prefetch(test_files, readahead=4))
+        numpy.testing.assert_allclose(numpy.asarray(imgs), numpy.vstack(stacks))
+    finally: _cleanup()
+
+def test_iter_images_prefetch_reorder():
+    try:
+        stacks = _write_stacks()
+        select = [(test_files[(i*3)%2], (i*5)%7+1) for i in xrange(12)]
+        imgs = list(ndimage_file.iter_images_prefetch(select, readahead=5))
+        expected = [stacks[test_files.index(f)][i-1] for f, i in select]
+        numpy.testing.assert_allclose(numpy.asarray(imgs), numpy.asarray(expected))
+        numpy.testing.assert_allclose(numpy.asarray(imgs), numpy.asarray(list(ndimage_file.iter_images(select))))
+    finally: _cleanup()
+
+def test_iter_images_prefetch_stop():
+    try:
+        stacks = _write_stacks()
+        for i, img in enumerate(ndimage_file.iter_images_prefetch(test_files[0], readahead=2)):
+            if i == 2: break
+        numpy.testing.assert_allclose(img, stacks[0][2])
+        try: list(ndimage_file.iter_images_prefetch([(test_files[0], 1), ('missing_prefetch.spi', 1)]))
+        except (IOError, OSError): pass
+        else: raise AssertionError, "Missing file did not raise an exception"
+    finally: _cleanup()
@@ -202,3 +202,16 @@ def test_interpolate_fs_3d():
         simg=spider_ipfs(img, size=size)
         numpy.testing.assert_allclose(simg, fimg, rtol=1e-2)
         
+
+def test_resample_fft_stack():
+    for width, size in [(32, 16), (33, 16), (32, 15), (31, 20), (16, 24), (15, 22)]:
+        stack = numpy.random.rand(5, width, width).astype(numpy.float32)
+        simg = numpy.asarray([ndimage_interpolate.resample_fft(img, (size, size)) for img in stack])
+        fimg = ndimage_interpolate.resample_fft_stack(stack, (size, size), batch_size=2)
+        numpy.testing.assert_allclose(simg, fimg, rtol=1e-4, atol=1e-5)
+        fimg = ndimage_interpolate.resample_fft_stack(stack, (size, size), batch_size=2, thread_count=2)
+        numpy.testing.assert_allclose(simg, fimg, rtol=1e-4, atol=1e-5)
+    stack = numpy.random.rand(5, 32, 32).astype(numpy.float32)
+    simg = numpy.asarray([ndimage_interpolate.resample_fft(img, 2.0, pad=2) for img in stack])
+    fimg = ndimage_interpolate.resample_fft_stack(stack, 2.0, pad=2, batch_size=3)
+    numpy.testing.assert_allclose(simg, fimg, rtol=1e-4, atol=1e-5)
@@ -0,0 +1,50 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import ndimage_slab
+from .. import ndimage_utility
+import numpy, numpy.testing, scipy.ndimage
+
+full_test=False
+
+def _volume(size=64):
+    rng = numpy.random.RandomState(0)
+    vol = scipy.ndimage.gaussian_filter(rng.rand(size, size, size).astype(numpy.float32), 4)
+    return vol
+
+def test_tight_mask():
+    '''
+    '''
+    
+    vol = _volume(400 if full_test else 64)
+    buffers = {}
+    for ndilate in (0, 2):
+        ref, th1 = ndimage_utility.tight_mask(vol, None, ndilate, 3, 3.0)
+        out, th2 = ndimage_slab.tight_mask(vol, None, ndilate, 3, 3.0, thread_count=3, buffers=buffers)
+        assert th1 == th2
+        assert out.dtype == numpy.float32
+        numpy.testing.assert_allclose(ref, out, atol=1e-6)
+    assert buffers['label'].shape == vol.shape
+
+def test_binary_dilation():
+    '''
+    '''
+    
+    vol = _volume(48) > 0.5
+    elem = scipy.ndimage.generate_binary_structure(3, 2)
+    for iterations in (1, 3):
+        ref = scipy.ndimage.binary_dilation(vol, elem, iterations)
+        out = ndimage_slab.binary_dilation(vol, iterations, thread_count=5)
+        numpy.testing.assert_array_equal(ref, out)
+
+def test_soft_sphere_mask():
+    '''
+    '''
+    
+    ref = ndimage_utility.model_soft_ball(20, (48, 48, 48), 0, 'H', dtype=numpy.float)
+    out = ndimage_slab.soft_sphere_mask((48, 48, 48), 20, 0, 0, thread_count=4)
+    numpy.testing.assert_array_equal(ref, out)
+    ndimage_utility.gaussian_smooth(ref, 5, 2.0, ref)
+    out = ndimage_slab.soft_sphere_mask((48, 48, 48), 20, 5, 2.0, thread_count=4)
+    numpy.testing.assert_allclose(ref, out, atol=1e-6)
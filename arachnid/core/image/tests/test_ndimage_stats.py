@@ -0,0 +1,64 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import ndimage_stats
+from .. import ndimage_file
+import numpy, numpy.testing, os, tempfile, shutil
+
+def test_running_stats_merge():
+    '''
+    '''
+    
+    rng = numpy.random.RandomState(1)
+    stack = rng.randn(37, 16, 16).astype(numpy.float32)*3+100
+    stack[3, 2, 2] = numpy.nan
+    stack[5, 1, 1] = numpy.inf
+    stack[5, 1, 2] = -numpy.inf
+    parts = [ndimage_stats.RunningStats(sample_size=stack.size) for i in xrange(3)]
+    for i, img in enumerate(stack): parts[i%3].add(img)
+    stats = parts[0].merge(parts[1]).merge(parts[2])
+    data = stack[numpy.isfinite(stack)].astype(numpy.float64)
+    assert stats.count == len(data)
+    assert stats.nan == 1 and stats.inf == 2
+    numpy.testing.assert_allclose(stats.mean, data.mean(), rtol=1e-12)
+    numpy.testing.assert_allclose(stats.std, data.std(), rtol=1e-10)
+    assert stats.minimum == data.min() and stats.maximum == data.max()
+    numpy.testing.assert_allclose(stats.quantile([1, 50, 99]), numpy.percentile(data, [1, 50, 99]))
+
+def test_running_stats_sample():
+    '''
+    '''
+    
+    rng = numpy.random.RandomState(2)
+    stats = ndimage_stats.RunningStats(sample_size=1000)
+    for i in xrange(50): stats.add(rng.rand(64, 64))
+    assert len(stats.sample()) <= 1000 and stats.stride > 1
+    numpy.testing.assert_allclose(stats.quantile([10, 50, 90]), [0.1, 0.5, 0.9], atol=0.05)
+
+def test_stack_statistics():
+    '''
+    '''
+    
+    rng = numpy.random.RandomState(3)
+    path = tempfile.mkdtemp()
+    try:
+        filenames = []
+        stacks = []
+        for j in xrange(2):
+            filenames.append(os.path.join(path, 'stack%d.spi'%(j+1)))
+            stacks.append(rng.randn(23+j, 12, 12).astype(numpy.float32))
+            for i, img in enumerate(stacks[-1]): ndimage_file.write_image(filenames[-1], img, i)
+        for worker_count in (1, 3):
+            rows, summary = ndimage_stats.stack_statistics(filenames, worker_count, chunk_size=5, quantiles=(50, ))
+            for filename, stack in zip(filenames, stacks):
+                assert rows[filename].shape == (len(stack), 9)
+                numpy.testing.assert_allclose(rows[filename][:, 2], stack.reshape((len(stack), -1)).mean(axis=1), rtol=1e-5)
+                numpy.testing.assert_allclose(summary[filename].mean, stack.astype(numpy.float64).mean(), rtol=1e-10)
+                numpy.testing.assert_allclose(summary[filename].std, stack.astype(numpy.float64).std(), rtol=1e-10)
+            data = numpy.concatenate([stack.ravel() for stack in stacks]).astype(numpy.float64)
+            assert summary[None].count == len(data)
+            numpy.testing.assert_allclose(summary[None].std, data.std(), rtol=1e-10)
+            numpy.testing.assert_allclose(summary[None].quantile(50), numpy.median(data))
+    finally:
+        shutil.rmtree(path)
@@ -357,3 +357,84 @@ def test_filter_gaussian_lp():
             print "Max norm: ", numpy.max(ndimage_utility.normalize_standard(eman2_utility.em2numpy(f2))-ndimage_utility.normalize_standard(f1))
             raise
 
+
+def test_find_peaks_suppress():
+    '''
+    '''
+    
+    width = 7.0
+    cc = numpy.random.RandomState(0).rand(120, 100)
+    peaks = ndimage_utility.find_peaks_suppress(cc, width, 0)
+    cand = ndimage_utility.find_peaks_fast(cc, width, 0)
+    cand = cand[numpy.argsort(-cand[:, 0], kind='mergesort')]
+    expected = []
+    while len(cand) > 0:
+        expected.append(cand[0])
+        dist = numpy.sqrt(numpy.sum(numpy.square(cand[:, 1:]-cand[0, 1:]), axis=1))
+        cand = cand[dist >= width]
+    numpy.testing.assert_allclose(peaks, numpy.asarray(expected))
+
+def test_fourier_shell_correlation_fast():
+    '''
+    '''
+    
+    rng = numpy.random.RandomState(0)
+    shape = (22, 20, 17)
+    img1 = rng.rand(*shape)
+    img2 = img1+rng.rand(*shape)
+    fimg1 = numpy.fft.fftn(img1)
+    fimg2 = numpy.fft.fftn(img2)
+    dist = numpy.zeros(shape)
+    for axis, size in enumerate(shape):
+        dist = dist + numpy.square(numpy.fft.fftfreq(size)*min(shape)).reshape([-1 if i == axis else 1 for i in xrange(len(shape))])
+    shell = numpy.minimum(numpy.rint(numpy.sqrt(dist)), min(shape)/2+1).astype(numpy.int).ravel()
+    num = numpy.bincount(shell, (fimg1*fimg2.conj()).real.ravel())
+    den = numpy.sqrt(numpy.bincount(shell, numpy.square(numpy.abs(fimg1)).ravel())*numpy.bincount(shell, numpy.square(numpy.abs(fimg2)).ravel()))
+    fsc, dph, voxels = ndimage_utility.fourier_shell_correlation_fast(img1, img2, full_output=True, batch_size=3)
+    numpy.testing.assert_allclose(fsc, (num/den)[:len(fsc)], rtol=1e-4, atol=1e-5)
+    numpy.testing.assert_equal(voxels, numpy.bincount(shell)[:len(fsc)])
+
+def test_rotational_average():
+    '''
+    '''
+    
+    rows, cols = 40, 36
+    i, j = numpy.arange(rows)[:, numpy.newaxis]-rows/2, numpy.arange(cols)[numpy.newaxis, :]-cols/2
+    dist = numpy.sqrt(i*i+j*j)
+    avg = ndimage_utility.rotational_average(numpy.ones((rows, cols))*3.0)
+    assert len(avg) == min(rows, cols)/2+1
+    numpy.testing.assert_allclose(avg, 3.0)
+    avg = ndimage_utility.rotational_average(dist)
+    numpy.testing.assert_allclose(avg[5:-1], numpy.arange(5, len(avg)-1), atol=0.1)
+
+def test_randomize_phases():
+    '''
+    '''
+    
+    rng = numpy.random.RandomState(0)
+    for shape in [(22, 20, 18), (21, 19, 17), (24, 30)]:
+        img = rng.rand(*shape)
+        shell = min(shape)/4
+        out = ndimage_utility.randomize_phases(img, shell, batch_size=5, rng=numpy.random.RandomState(1))
+        fimg = numpy.fft.rfftn(img)
+        fout = numpy.fft.rfftn(out)
+        index = ndimage_utility.fsc_shell_index(shape)[0]
+        numpy.testing.assert_allclose(numpy.abs(fout), numpy.abs(fimg), rtol=1e-3, atol=1e-3)
+        numpy.testing.assert_allclose(fout[index < shell], fimg[index < shell], rtol=1e-3, atol=1e-3)
+        assert numpy.abs(numpy.angle(fout[index >= shell]/fimg[index >= shell])).mean() > 1.0
+
+def test_model_soft_ball():
+    '''
+    '''
+    
+    shape, radius, width = (31, 32), 6.0, 3.0
+    disk = ndimage_utility.model_disk(radius, shape) > 0
+    for edge in 'CGH':
+        for w in (0, -1):
+            numpy.testing.assert_equal(ndimage_utility.model_soft_ball(radius, shape, w, edge), disk)
+        assert numpy.all(numpy.isfinite(ndimage_utility.model_soft_ball(radius, (9, 10, 11), 0, edge)))
+    numpy.testing.assert_equal(ndimage_utility.model_soft_ball(radius, shape, width, 'H'), disk)
+    y, x = numpy.ogrid[:shape[0], :shape[1]]
+    d = numpy.maximum(numpy.sqrt((y-shape[0]/2)**2+(x-shape[1]/2)**2)-radius, 0)
+    numpy.testing.assert_allclose(ndimage_utility.model_soft_ball(radius, shape, width, 'C'), numpy.where(d < width, 0.5*(1.0+numpy.cos(numpy.pi*d/width)), 0.0), atol=1e-6)
+    numpy.testing.assert_allclose(ndimage_utility.model_soft_ball(radius, shape, width, 'G'), numpy.exp(-numpy.square(d/width)), atol=1e-6)
@@ -0,0 +1,61 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: robertlanglois
+'''
+from .. import projection_align, ndimage_utility, rotate
+import numpy, numpy.testing
+
+def _blobs(count, width=64, seed=1):
+    rng = numpy.random.RandomState(seed)
+    y, x = numpy.mgrid[0:width, 0:width]
+    refs = numpy.zeros((count, width, width), dtype=numpy.float32)
+    for i in xrange(count):
+        for k in xrange(6):
+            cy, cx = rng.uniform(width*0.3, width*0.7, 2)
+            sigma = rng.uniform(2, 5)
+            refs[i] += numpy.exp(-((x-cx)**2+(y-cy)**2)/(2*sigma*sigma))*rng.uniform(0.5, 1.5)
+    return refs
+
+def test_rotate_shift_identity():
+    img = _blobs(1)[0]
+    numpy.testing.assert_allclose(projection_align.rotate_shift(img, 0.0), img, atol=1e-5)
+    numpy.testing.assert_allclose(projection_align.rotate_shift(img, 0.0, 3, -2), numpy.roll(numpy.roll(img, -2, axis=0), 3, axis=1), atol=1e-5)
+
+def test_rotate_shift_spider():
+    img = _blobs(1)[0]
+    for psi, tx, ty in [(30.0, 0, 0), (30.0, 3, -2), (-75.5, 1.5, 2.25)]:
+        out = projection_align.rotate_shift(img, psi, tx, ty)
+        expected = rotate.rotate_image(img, psi, tx, ty)
+        numpy.testing.assert_allclose(out[8:-8, 8:-8], expected[8:-8, 8:-8], atol=0.1)
+        assert numpy.corrcoef(out.ravel(), expected.ravel())[0, 1] > 0.999
+
+def test_align_images():
+    refs = _blobs(5)
+    rng = numpy.random.RandomState(2)
+    imgs = numpy.zeros((10,)+refs.shape[1:], dtype=numpy.float32)
+    truth = []
+    for i in xrange(len(imgs)):
+        j, mirror = i%len(refs), i%2
+        psi, (tx, ty) = rng.uniform(0, 360), rng.randint(-4, 5, 2)
+        ref = ndimage_utility.mirror(refs[j]) if mirror else refs[j]
+        imgs[i] = projection_align.rotate_shift(projection_align.rotate_shift(ref, 0.0, -tx, -ty), -psi)
+        truth.append((j, mirror))
+    grid, frefs = projection_align.prepare_references(refs)
+    vals = projection_align.align_images(imgs, refs, grid, frefs, trans_range=6)
+    numpy.testing.assert_equal(vals[:, (0, 5)], numpy.asarray(truth))
+    numpy.testing.assert_allclose(projection_align.align_images(imgs, refs, grid, frefs, trans_range=6, shift_batch=1), vals, rtol=1e-5, atol=1e-5)
+    numpy.testing.assert_allclose(projection_align.align_images(imgs, refs, grid, frefs, trans_range=6, cc_batch=1), vals, rtol=1e-5, atol=1e-5)
+    for img, val in zip(imgs, vals):
+        ref = refs[int(val[0])]
+        if val[5] > 0: ref = ndimage_utility.mirror(ref)
+        aligned = projection_align.rotate_shift(img, val[1], val[2], val[3])
+        assert numpy.corrcoef(aligned.ravel(), ref.ravel())[0, 1] > 0.98
+
+def test_align_stack():
+    refs = _blobs(3)
+    imgs = numpy.asarray([projection_align.rotate_shift(ref, 30.0, 1, 2) for ref in refs])
+    grid, frefs = projection_align.prepare_references(refs)
+    vals = projection_align.align_images(imgs, refs, grid, frefs, trans_range=4)
+    image_iter = lambda beg, end: iter(imgs[beg:end])
+    numpy.testing.assert_allclose(projection_align.align_stack(image_iter, refs, 1, 2, total=len(imgs), trans_range=4), vals)
+    numpy.testing.assert_allclose(projection_align.align_stack(image_iter, refs, 2, 2, total=len(imgs), trans_range=4), vals)
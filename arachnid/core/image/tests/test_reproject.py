@@ -0,0 +1,38 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import reproject
+import numpy, numpy.testing
+
+def _project(vol, out, ang, rad):
+    # Fortran ordered views: vol (x,y,z), out (x,y,n), ang (3,n)
+    out[:] = vol.sum(axis=2)[..., numpy.newaxis]*ang[0]+rad
+
+def test_iter_reproject_mp():
+    '''
+    '''
+    
+    vol = numpy.random.rand(12, 12, 12).astype(numpy.float32)
+    ang = numpy.random.rand(103, 3).astype(numpy.float32)
+    ref = reproject.reproject_mp(_project, vol, 3.0, ang)
+    for prefetch in (False, True):
+        out = numpy.zeros_like(ref)
+        total = 0
+        for offset, projs in reproject.iter_reproject_mp(_project, vol, 3.0, ang, chunk_size=10, prefetch=prefetch):
+            assert projs.shape[0] <= 10
+            out[offset:offset+len(projs)] = projs
+            total += len(projs)
+        assert total == len(ang)
+        numpy.testing.assert_allclose(ref, out)
+
+def test_iter_reproject_mp_close():
+    '''
+    '''
+    
+    vol = numpy.random.rand(8, 8, 8).astype(numpy.float32)
+    ang = numpy.random.rand(50, 3).astype(numpy.float32)
+    gen = reproject.iter_reproject_mp(_project, vol, 3.0, ang, chunk_size=4)
+    offset, projs = gen.next()
+    assert offset == 0
+    gen.close()
@@ -0,0 +1,20 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: robertlanglois
+'''
+from .. import rotate
+import numpy, numpy.testing
+
+def test_rotate_images():
+    stack = numpy.random.rand(9, 32, 30).astype(numpy.float32)
+    angles = numpy.random.uniform(0, 360, len(stack))
+    tx = numpy.random.uniform(-4, 4, len(stack))
+    ty = numpy.random.uniform(-4, 4, len(stack))
+    expected = numpy.asarray([rotate.rotate_image(img, a, x, y) for img, a, x, y in zip(stack, angles, tx, ty)])
+    for threads in (0, 1, 3):
+        out = rotate.rotate_images(stack, angles, tx, ty, threads=threads)
+        numpy.testing.assert_allclose(out, expected, rtol=1e-5, atol=1e-5)
+    out = numpy.zeros_like(stack)
+    res = rotate.rotate_images(stack, angles, out=out, threads=2)
+    numpy.testing.assert_allclose(out, numpy.asarray([rotate.rotate_image(img, a) for img, a in zip(stack, angles)]), rtol=1e-5, atol=1e-5)
+    assert res is out
@@ -154,6 +154,7 @@ def dhr_pca(trn, tst=None, neig=2, level=0.9, centered=False, iter=20):
         _logger.debug("Opt: %g > %g (%d) -- nu: %f -- sum: %f"%(tmp, best_last, (tmp>best_last), nu, totw))
         tmp = nu*wgt[sel]*var
         wgt[sel] -= tmp
+        wgt[numpy.flatnonzero(sel)[numpy.argmax(var)]] = 0.0 # Remove exactly, not up to rounding
     
     if best[1] is None: return None, None
     V = best[1]
@@ -170,3 +171,362 @@ def empirical_variance(feat1, weight=None, out=None):
         feat = feat1*numpy.sqrt(weight[:, numpy.newaxis])
     return core_utility.fastdot_t1(feat, feat, out, 1.0/feat.shape[0])
 
+
+def iter_blocks(data, block_size=4096):
+    ''' Create a re-iterable source of row blocks
+    
+    :Parameters:
+        
+        data : array or function
+               2D array (e.g. a memory mapped feature cache) where each row is a sample
+               or function returning a new iterator over blocks of rows on each call
+        block_size : int
+                     Number of rows in a block
+    
+    :Returns:
+        
+        blocks : function
+                 Function returning a new iterator over blocks of rows on each call
+    '''
+    
+    if callable(data): return data
+    def blocks():
+        for beg in xrange(0, data.shape[0], block_size):
+            yield data[beg:beg+block_size]
+    return blocks
+
+def accumulate_blocks(blocks, accumulate, init, thread_count=1):
+    ''' Accumulate statistics over row blocks in parallel
+    
+    Each thread keeps its own accumulator and takes the next block from the
+    shared iterator, so only `thread_count` accumulators are held in memory.
+    
+    :Parameters:
+        
+        blocks : function
+                 Function returning an iterator over blocks of rows
+        accumulate : function
+                     Function that updates an accumulator with a block: accumulate(acc, offset, block)
+        init : function
+                Function returning a new accumulator
+        thread_count : int
+                       Number of threads
+    
+    :Returns:
+        
+        accs : list
+               Accumulator of each thread
+    '''
+    
+    import threading
+    lock = threading.Lock()
+    it = iter(blocks())
+    offset = [0]
+    def worker(acc):
+        while True:
+            lock.acquire()
+            try:
+                try: block = it.next()
+                except StopIteration: return acc
+                beg = offset[0]
+                offset[0] += block.shape[0]
+            finally: lock.release()
+            accumulate(acc, beg, block)
+    accs = [init() for i in xrange(max(1, thread_count))]
+    if len(accs) == 1: return [worker(accs[0])]
+    import multiprocessing.pool
+    pool = multiprocessing.pool.ThreadPool(len(accs))
+    try: return pool.map(worker, accs)
+    finally:
+        pool.close()
+        pool.join()
+
+def mean_blocks(blocks, thread_count=1):
+    ''' Estimate the mean of each column from blocks of rows
+    
+    :Parameters:
+        
+        blocks : function
+                 Function returning an iterator over blocks of rows, see :py:func:`iter_blocks`
+        thread_count : int
+                       Number of threads accumulating blocks
+    
+    :Returns:
+        
+        mean : array
+               Mean of each column
+    '''
+    
+    def init(): return [0, 0.0]
+    def accumulate(acc, offset, block):
+        acc[0] += block.shape[0]
+        acc[1] += numpy.sum(block, 0, dtype=numpy.float64)
+    accs = accumulate_blocks(blocks, accumulate, init, thread_count)
+    total = sum([acc[0] for acc in accs])
+    if total == 0: raise ValueError, "No rows in the input blocks"
+    return sum([acc[1] for acc in accs])/total
+
+def covariance_blocks(blocks, mean=None, weight=None, thread_count=1):
+    ''' Estimate the covariance matrix from blocks of rows
+    
+    Only the running sums (the covariance of the number of columns) are kept
+    in memory. If the mean is not given, the data is shifted by the mean of
+    the first block to limit the loss of precision.
+    
+    :Parameters:
+        
+        blocks : function
+                 Function returning an iterator over blocks of rows, see :py:func:`iter_blocks`
+        mean : array, optional
+               Mean of each column (the mean is estimated if None), 0 for centered data
+        weight : array, optional
+                 Weight for each row
+        thread_count : int
+                       Number of threads accumulating blocks
+    
+    :Returns:
+        
+        cov : array
+              Covariance matrix (sum over rows divided by number of rows)
+        mean : array
+               Mean of each column
+        total : int
+                Number of rows
+    '''
+    
+    if mean is None: shift = iter(blocks()).next().mean(0).astype(numpy.float64)
+    else: shift = numpy.asarray(mean, dtype=numpy.float64)
+    def init(): return [0, 0.0, 0.0]
+    def accumulate(acc, offset, block):
+        block = numpy.asarray(block, dtype=numpy.float64)-shift
+        acc[0] += block.shape[0]
+        acc[1] += block.sum(0)
+        if weight is not None: acc[2] += numpy.dot(block.T*weight[offset:offset+block.shape[0]], block)
+        else: acc[2] += numpy.dot(block.T, block)
+    accs = accumulate_blocks(blocks, accumulate, init, thread_count)
+    total = sum([acc[0] for acc in accs])
+    if total == 0: raise ValueError, "No rows in the input blocks"
+    cov = accs[0][2]
+    for acc in accs[1:]: cov += acc[2]
+    cov /= total
+    if mean is None:
+        avg = sum([acc[1] for acc in accs])/total
+        cov -= numpy.outer(avg, avg)
+        shift += avg
+    return cov, shift, total
+
+def project_blocks(blocks, eigvecs, mean=None):
+    ''' Project blocks of rows onto a set of Eigen vectors
+    
+    :Parameters:
+        
+        blocks : function
+                 Function returning an iterator over blocks of rows, see :py:func:`iter_blocks`
+        eigvecs : array
+                  2D array where each column is an Eigen vector
+        mean : array, optional
+               Mean subtracted from each row
+    
+    :Returns:
+        
+        feat : array
+               2D array where each row is a projected sample
+    '''
+    
+    feat = []
+    for block in blocks():
+        block = numpy.asarray(block, dtype=eigvecs.dtype)
+        if mean is not None: block = block-mean
+        feat.append(numpy.dot(block, eigvecs))
+    return numpy.vstack(feat)
+
+def pca_incremental(data, tst=None, frac=0.0, block_size=4096, thread_count=1, centered=False):
+    ''' Principal component analysis from blocks of rows, e.g. streamed
+    from a feature cache
+    
+    The covariance matrix is accumulated block by block (see :py:func:`covariance_blocks`),
+    so the samples are never held in memory together. The result agrees with :py:func:`pca_fast`
+    when there are more samples than columns.
+    
+    :Parameters:
+        
+        data : array or function
+               2D array where each row is a sample or function returning an iterator over blocks of rows
+        tst : array or function, optional
+              Samples to project (in the same form as data)
+        frac : float
+               Number of Eigen vectors: frac < 1: fraction of variance, frac >= 1: number of components, 0: all
+        block_size : int
+                     Number of rows in a block
+        thread_count : int
+                       Number of threads accumulating blocks
+        centered : bool
+                   The data has zero mean
+    
+    :Returns:
+        
+        V : array
+            2D array where each column is an Eigen vector
+        d : array
+            Fraction of variance explained by each Eigen vector
+        val : array, optional
+              Projected samples if `tst` is given
+    '''
+    
+    blocks = iter_blocks(data, block_size)
+    C, mean = covariance_blocks(blocks, 0.0 if centered else None, None, thread_count)[:2]
+    d, V = numpy.linalg.eigh(C)
+    d = numpy.where(d < 0, 0, d)
+    tot = d.sum()
+    if tot != 0.0: d /= tot
+    idx = d.argsort()[::-1]
+    d = d[idx]
+    V = V[:, idx]
+    if tst is None: return V, d
+    if frac >= 1: idx = int(frac)
+    elif frac == 0.0: idx = d.shape[0]
+    else: idx = numpy.sum(d.cumsum()<frac)+1
+    return V, d, project_blocks(iter_blocks(tst, block_size), V[:, :idx], None if centered else mean)
+
+def pca_randomized(data, neig, tst=None, oversample=10, power_iter=2, block_size=4096, thread_count=1, centered=False, rng=None):
+    ''' Randomized principal component analysis from blocks of rows
+    
+    Each pass over the blocks keeps only a sketch of the covariance with
+    `neig+oversample` columns, which allows many more columns than samples
+    (e.g. bispectrum features). The leading Eigen vectors and their fraction of
+    variance agree with :py:func:`pca_incremental` up to the accuracy of the
+    randomized range finder, which improves with `power_iter`.
+    
+    :Parameters:
+        
+        data : array or function
+               2D array where each row is a sample or function returning an iterator over blocks of rows
+        neig : int
+               Number of Eigen vectors
+        tst : array or function, optional
+              Samples to project (in the same form as data)
+        oversample : int
+                     Number of extra random vectors in the sketch
+        power_iter : int
+                     Number of power iterations (each is a pass over the blocks)
+        block_size : int
+                     Number of rows in a block
+        thread_count : int
+                       Number of threads accumulating blocks
+        centered : bool
+                   The data has zero mean
+        rng : RandomState, optional
+              Random number generator
+    
+    :Returns:
+        
+        V : array
+            2D array where each column is an Eigen vector
+        d : array
+            Fraction of the total variance explained by each Eigen vector
+        val : array, optional
+              Projected samples if `tst` is given
+    '''
+    
+    if rng is None: rng = numpy.random.RandomState(0)
+    blocks = iter_blocks(data, block_size)
+    mean = 0.0
+    if not centered:
+        mean = mean_blocks(blocks, thread_count)
+    
+    def covariance_product(Q):
+        # Returns C*Q and the trace of C, C = (X-m)^T (X-m)/n
+        def init(): return [0, 0.0, 0.0]
+        def accumulate(acc, offset, block):
+            block = numpy.asarray(block, dtype=numpy.float64)-mean
+            acc[0] += block.shape[0]
+            acc[1] += numpy.dot(block.T, numpy.dot(block, Q))
+            acc[2] += numpy.sum(numpy.square(block))
+        accs = accumulate_blocks(blocks, accumulate, init, thread_count)
+        total = float(sum([acc[0] for acc in accs]))
+        return sum([acc[1] for acc in accs])/total, sum([acc[2] for acc in accs])/total
+    
+    ncol = iter(blocks()).next().shape[1]
+    Q = rng.normal(size=(ncol, min(ncol, neig+oversample)))
+    for i in xrange(max(0, power_iter)+1):
+        Q = numpy.linalg.qr(covariance_product(Q)[0])[0]
+    CQ, trace = covariance_product(Q)
+    d, U = numpy.linalg.eigh(numpy.dot(Q.T, CQ))
+    idx = d.argsort()[::-1][:neig]
+    d = numpy.where(d[idx] < 0, 0, d[idx])
+    if trace != 0.0: d /= trace
+    V = numpy.dot(Q, U[:, idx])
+    if tst is None: return V, d
+    return V, d, project_blocks(iter_blocks(tst, block_size), V, None if centered else mean)
+
+def dhr_pca_incremental(data, tst=None, neig=2, level=0.9, centered=False, iter=20, block_size=4096, thread_count=1):
+    ''' High-dimensional robust PCA (see :py:func:`dhr_pca`) from blocks of rows
+    
+    Each iteration makes two passes over the blocks, one to accumulate the
+    weighted covariance and one to project the samples, so only the
+    covariance matrix and the projected samples are held in memory.
+    
+    :Parameters:
+        
+        data : array or function
+               2D array where each row is a sample or function returning an iterator over blocks of rows
+        tst : array or function, optional
+              Samples to project (in the same form as data), if None, project `data`
+        neig : int
+               Number of Eigen vectors
+        level : float
+                Expected fraction of inliers
+        centered : bool
+                   The data has zero mean
+        iter : int
+               Maximum number of iterations
+        block_size : int
+                     Number of rows in a block
+        thread_count : int
+                       Number of threads accumulating blocks
+    
+    :Returns:
+        
+        eigv : array
+               Fraction of variance explained by each Eigen vector
+        feat : array
+               2D array where each row is a projected sample
+    '''
+    
+    blocks = iter_blocks(data, block_size)
+    mean = None if centered else mean_blocks(blocks, thread_count)
+    C, mean, total = covariance_blocks(blocks, 0.0 if centered else mean, None, thread_count)
+    if centered: mean = None
+    level = int(total*level)
+    best = (0, None, None)
+    wgt = numpy.ones(total)
+    for i in xrange(iter):
+        sel = wgt > 0
+        if i > 0: C = covariance_blocks(blocks, 0.0 if centered else mean, wgt, thread_count)[0]
+        d, V = numpy.linalg.eigh(C)
+        d = numpy.square(d)/C.shape[0] # Match pca_fast applied to the covariance matrix
+        tot = d.sum()
+        if tot != 0.0: d /= tot
+        idx = d.argsort()[::-1]
+        d, V = d[idx], V[:, idx]
+        feat = project_blocks(blocks, V[:, :neig], mean)
+        var = numpy.sum(numpy.square(feat), axis=1)[sel]
+        
+        tmp = 0.0
+        for j in xrange(feat.shape[1]):
+            val = numpy.square(feat[:, j])
+            tmp += numpy.sum(numpy.sort(val)[:level])/len(val)
+        
+        best_last=best[0]
+        if tmp > best[0]: best = (tmp, V, d)
+        totw = numpy.sum(wgt)
+        if var.shape[0] < 10 or totw < 10 or totw < (total*0.1): break
+        nu = numpy.min(1.0/var)
+        _logger.debug("Opt: %g > %g (%d) -- nu: %f -- sum: %f"%(tmp, best_last, (tmp>best_last), nu, totw))
+        wgt[sel] -= nu*wgt[sel]*var
+        wgt[numpy.flatnonzero(sel)[numpy.argmax(var)]] = 0.0 # Remove exactly, not up to rounding
+        wgt[wgt<0]=0
+    
+    if best[1] is None: return None, None
+    feat = project_blocks(iter_blocks(tst, block_size) if tst is not None else blocks, best[1][:, :neig], mean)
+    return best[2], feat
@@ -3,10 +3,13 @@
 .. Created on Apr 22, 2014
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
+from ..util import lazy_import
 import core_utility
 import logging
 import numpy
 
+scipy = lazy_import.lazy_module('scipy', 'spatial')
+
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
@@ -66,3 +69,72 @@ def min_max_euclidiean_dist(samp, batch=10000):
             if val > maxval: maxval = val
     return numpy.sqrt(maxarr.min()), numpy.sqrt(maxval)
 
+def match_points(points, reference, radius):
+    ''' Match each point to the closest unmatched reference point within a radius
+    
+    The points are visited in order and each reference point is matched at most
+    once (ties go to the lowest reference index), which gives the same assignment
+    as scanning every reference point for each point. Candidates are found with a
+    KD-tree, so the cost grows with the number of points in the radius rather than
+    the size of the reference.
+    
+    :Parameters:
+    
+    points : array
+             Points (n, d)
+    reference : array
+                Reference points (m, d)
+    radius : float
+             Points must be closer than this distance to match
+    
+    :Returns:
+    
+    index : array
+            Index of each matched point
+    ref_index : array
+                Index of the matched reference point
+    '''
+    
+    points = numpy.asarray(points)
+    reference = numpy.asarray(reference)
+    index, ref_index = [], []
+    if len(points) == 0 or len(reference) == 0: return numpy.asarray(index, dtype=numpy.int), numpy.asarray(ref_index, dtype=numpy.int)
+    radius2 = radius*radius
+    used = numpy.zeros(len(reference), dtype=numpy.bool)
+    tree = scipy.spatial.cKDTree(reference)
+    for i, cand in enumerate(tree.query_ball_point(points, radius)):
+        if len(cand) == 0: continue
+        cand = numpy.asarray(cand, dtype=numpy.int)
+        cand = cand[~used[cand]]
+        if len(cand) == 0: continue
+        dist = numpy.sum(numpy.square(points[i]-reference[cand]), axis=1)
+        order = numpy.lexsort((cand, dist))
+        if dist[order[0]] < radius2:
+            used[cand[order[0]]] = True
+            index.append(i)
+            ref_index.append(cand[order[0]])
+    return numpy.asarray(index, dtype=numpy.int), numpy.asarray(ref_index, dtype=numpy.int)
+
+def any_within(points, reference, radius):
+    ''' Test whether each point has a reference point closer than a radius
+    
+    :Parameters:
+    
+    points : array
+             Points (n, d)
+    reference : array
+                Reference points (m, d)
+    radius : float
+             Maximum distance (exclusive)
+    
+    :Returns:
+    
+    sel : array
+          True for each point with a reference point within the radius
+    '''
+    
+    points = numpy.asarray(points)
+    reference = numpy.asarray(reference)
+    if len(points) == 0 or len(reference) == 0: return numpy.zeros(len(points), dtype=numpy.bool)
+    idx = scipy.spatial.cKDTree(reference).query(points, 1)[1]
+    return numpy.sum(numpy.square(points-reference[idx]), axis=1) < radius*radius
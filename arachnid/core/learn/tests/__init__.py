@@ -0,0 +1,14 @@
+''' Unit testing for each module in :mod:`arachnid.core.learn`
+
+.. currentmodule:: arachnid.core.learn.tests
+
+.. autosummary::
+    :nosignatures:
+    :toctree: api_generated/
+    :template: api_module.rst
+    
+    test_dimensionality_reduction
+    test_distance
+    test_unary_classification
+
+'''
@@ -0,0 +1,48 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import dimensionality_reduction
+import numpy, numpy.testing
+
+def _samples(rows=200, cols=12, seed=0):
+    rng = numpy.random.RandomState(seed)
+    return numpy.dot(rng.standard_normal((rows, cols)), rng.standard_normal((cols, cols)))
+
+def _assert_projection(val, expected):
+    sign = numpy.sign(numpy.sum(val*expected, axis=0))
+    numpy.testing.assert_allclose(val*sign, expected, rtol=1e-5, atol=1e-6*numpy.abs(expected).max())
+
+def test_pca_incremental():
+    '''
+    '''
+    
+    data = _samples()
+    V, d, val = dimensionality_reduction.pca_fast(data.copy(), data.copy(), 3)
+    for block_size in (7, len(data), 1000):
+        V1, d1, val1 = dimensionality_reduction.pca_incremental(data, data, 3, block_size=block_size, thread_count=2)
+        numpy.testing.assert_allclose(d1, d, rtol=1e-6, atol=1e-12)
+        _assert_projection(val1, val)
+
+def test_pca_randomized():
+    '''
+    '''
+    
+    data = _samples()
+    V, d, val = dimensionality_reduction.pca_fast(data.copy(), data.copy(), 3)
+    for block_size in (7, 1000):
+        V1, d1, val1 = dimensionality_reduction.pca_randomized(data, 3, data, oversample=9, block_size=block_size, thread_count=2)
+        numpy.testing.assert_allclose(d1, d[:3], rtol=1e-6)
+        _assert_projection(val1, val)
+
+def test_dhr_pca_incremental():
+    '''
+    '''
+    
+    data = _samples()
+    data[:10] *= 20
+    eigv, feat = dimensionality_reduction.dhr_pca(data.copy(), None, 2)
+    for block_size in (7, 1000):
+        eigv1, feat1 = dimensionality_reduction.dhr_pca_incremental(data, None, 2, block_size=block_size, thread_count=2)
+        numpy.testing.assert_allclose(eigv1, eigv, rtol=1e-5, atol=1e-12)
+        _assert_projection(feat1, feat)
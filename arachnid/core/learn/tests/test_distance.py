@@ -0,0 +1,77 @@
+'''
+.. Created on Oct 19, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import distance
+import numpy.testing
+
+def _greedy_match(points, reference, radius):
+    ''' Match each point to the closest unmatched reference point by scanning the whole reference
+    '''
+    
+    reference = numpy.asarray(reference, dtype=numpy.float).copy()
+    index, ref_index = [], []
+    if len(reference) == 0: return index, ref_index
+    for i, f in enumerate(numpy.asarray(points, dtype=numpy.float)):
+        dist = numpy.sum(numpy.square(f-reference), axis=1)
+        if dist.min() < radius*radius:
+            index.append(i)
+            ref_index.append(dist.argmin())
+            reference[dist.argmin(), :] = 1e20
+    return index, ref_index
+
+def _greedy_any(points, reference, radius):
+    ''' Test whether each point has a reference point within the radius by scanning the whole reference
+    '''
+    
+    sel = numpy.zeros(len(points), dtype=numpy.bool)
+    for i, f in enumerate(numpy.asarray(points, dtype=numpy.float)):
+        if len(reference) > 0: sel[i] = numpy.sum(numpy.square(f-reference), axis=1).min() < radius*radius
+    return sel
+
+def _point_sets():
+    ''' Random points, points on a lattice (many ties and points exactly at the radius) and empty sets
+    '''
+    
+    rng = numpy.random.RandomState(0)
+    sets = [(rng.rand(300, 2)*500, rng.rand(250, 2)*500, 20.0)]
+    sets.append((rng.randint(0, 12, (200, 2)).astype(numpy.float), rng.randint(0, 12, (150, 2)).astype(numpy.float), 1.0))
+    sets.append((rng.randint(0, 12, (200, 2)).astype(numpy.float), rng.randint(0, 12, (150, 2)).astype(numpy.float), 5.0))
+    sets.append((rng.randint(0, 12, (200, 2)).astype(numpy.float), rng.randint(0, 12, (150, 2)).astype(numpy.float), numpy.sqrt(2.0)))
+    sets.append((numpy.asarray([[0.0, 0.0], [3.0, 4.0], [6.0, 8.0]]), numpy.asarray([[3.0, 4.0], [0.0, 5.0], [5.0, 0.0]]), 5.0))
+    sets.append((numpy.zeros((0, 2)), rng.rand(10, 2), 1.0))
+    sets.append((rng.rand(10, 2), numpy.zeros((0, 2)), 1.0))
+    sets.append((numpy.zeros((0, 2)), numpy.zeros((0, 2)), 1.0))
+    return sets
+
+def test_match_points():
+    '''
+    '''
+    
+    for points, reference, radius in _point_sets():
+        index, ref_index = distance.match_points(points, reference, radius)
+        ref1, ref2 = _greedy_match(points, reference, radius)
+        numpy.testing.assert_equal(index, ref1)
+        numpy.testing.assert_equal(ref_index, ref2)
+
+def test_match_points_ties():
+    '''
+    '''
+    
+    # Every reference point is exactly 1 from both points: nothing lies inside a radius of 1,
+    # otherwise the first point takes the lowest index and the second point the remaining one
+    points = numpy.asarray([[0.0, 0.0], [1.0, 1.0]])
+    reference = numpy.asarray([[0.0, 1.0], [1.0, 0.0]])
+    index, ref_index = distance.match_points(points, reference, 1.0)
+    numpy.testing.assert_equal(index, [])
+    numpy.testing.assert_equal(ref_index, [])
+    index, ref_index = distance.match_points(points, reference, 1.5)
+    numpy.testing.assert_equal(index, [0, 1])
+    numpy.testing.assert_equal(ref_index, [0, 1])
+
+def test_any_within():
+    '''
+    '''
+    
+    for points, reference, radius in _point_sets():
+        numpy.testing.assert_equal(distance.any_within(points, reference, radius), _greedy_any(points, reference, radius))
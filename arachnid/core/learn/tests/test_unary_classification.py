@@ -0,0 +1,38 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import unary_classification
+import numpy, sys, StringIO
+
+def test_robust_rejection_by_group():
+    '''
+    '''
+    
+    rng = numpy.random.RandomState(0)
+    count = 20000
+    data = rng.normal(0.5, 0.1, count)
+    data[rng.rand(count) < 0.02] += 1.0
+    data[:2000] = numpy.round(data[:2000], 2)
+    group = rng.randint(-5, 120, count)
+    group[:4] = 200
+    data[:4] = 0.25
+    group[4:6] = 201
+    group[6] = 202
+    data[7:30] = 0.7
+    group[7:30] = 203
+    data[29] = 3.0
+    groups, center, sigma, index = unary_classification.robust_sigma_by_group(data, group)
+    numpy.testing.assert_equal(groups, numpy.unique(group))
+    numpy.testing.assert_equal(groups[index], group)
+    stdout, sys.stdout = sys.stdout, StringIO.StringIO()
+    try:
+        for i, g in enumerate(groups):
+            gdata = data[group == g]
+            assert center[i] == numpy.median(gdata)
+            numpy.testing.assert_allclose(sigma[i], unary_classification.robust_sigma(gdata), rtol=1e-12, atol=1e-15)
+        sel = unary_classification.robust_rejection_by_group(data, group.astype(numpy.float), 3)
+        for g in groups:
+            numpy.testing.assert_equal(sel[group == g], unary_classification.robust_rejection(data[group == g], 3))
+    finally:
+        sys.stdout = stdout
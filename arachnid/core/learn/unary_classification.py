@@ -7,10 +7,12 @@ all others. Applications include Anomaly detection, outlier detection and novelt
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
 
-import sklearn.covariance as skcov
-import scipy.stats
+from ..util import lazy_import
 import numpy
 
+skcov = lazy_import.lazy_module('sklearn.covariance')
+scipy = lazy_import.lazy_module('scipy', 'stats')
+
 def mahalanobis_with_chi2(feat, prob_reject, ret_dist=False):
     '''Reject outliers using one-class classification based on the mahalanobis distance
     estimate from a robust covariance as calculated by minimum covariance determinant.
@@ -114,6 +116,198 @@ def robust_rejection(data, nsigma=2.67, mdata=None):
     
     return data < m+s*nsigma
 
+def robust_rejection_by_group(data, group, nsigma=2.67):
+    ''' Robust outlier rejection using the MAD score within each group
+    
+    This gives the same selection as :py:func:`robust_rejection` applied to the
+    values of each group, see :py:func:`robust_sigma_by_group`.
+    
+    :Parameters:
+        
+        data : array
+               Sample vector for robust seleciton
+        group : array
+                Group (e.g. view) of each sample
+        nsigma : float
+                 Number of standard deviation cutoff
+    
+    :Returns:
+        
+        sel : array
+              Boolean array of selected points
+    '''
+    
+    data = numpy.asarray(data).ravel()
+    groups, center, sigma, index = robust_sigma_by_group(data, group)
+    return data < (center+sigma*nsigma)[index]
+
+def robust_sigma_by_group(data, group, zero=0):
+    ''' Resistant estimate of the dispersion of each group
+    
+    This gives the same value as :py:func:`robust_sigma` for the values of
+    each group. The values are sorted by group and value once, the medians are
+    read from the middle of each segment and the median absolute deviations are
+    found by a binary search over the two sorted halves of each segment (below
+    and above the median). The Tukey biweight sums are accumulated over all groups
+    with `numpy.bincount`.
+    
+    :Parameters:
+        
+        data : array
+               Vector of quantity for which the dispersion is calculated
+        group : array
+                Group (e.g. view) of each value
+        zero : int
+               If set, the dispersion is calculated w.r.t. 0.0
+               rather than the median of each group
+    
+    :Returns:
+        
+        groups : array
+                 Sorted unique groups
+        center : array
+                 Median of each group (or 0.0 if `zero` is set)
+        sigma : array
+                Dispersion of each group, -1 if the distribution of the group is too weird
+        index : array
+                Index of the group of each value
+    '''
+    
+    eps = 1.0E-20
+    c1 = 0.6745
+    c2 = 0.80
+    c3 = 6.0
+    c4 = 5.0
+    c_err = -1.0
+    min_points = 3
+    
+    data = numpy.asarray(data, dtype=numpy.float).ravel()
+    group = numpy.asarray(group).ravel()
+    if len(data) == 0: return group[:0], numpy.zeros(0), numpy.zeros(0), numpy.zeros(0, dtype=numpy.int)
+    order, groups, start, counts = _group_order(data, group)
+    index = numpy.empty(len(data), dtype=numpy.int)
+    index[order] = numpy.repeat(numpy.arange(len(groups)), counts)
+    sdata = data[order]
+    del order
+    
+    center = numpy.zeros(len(groups)) if zero else (sdata[start+(counts-1)/2] + sdata[start+counts/2]) / 2.0
+    dy = data - center[index]
+    del_y = numpy.abs(dy)
+    below = numpy.bincount(index, dy < 0, len(groups)).astype(numpy.int)
+    mad = (_segment_kth_deviation(sdata, start, counts, center, below, (counts-1)/2) + 
+           _segment_kth_deviation(sdata, start, counts, center, below, counts/2)) / 2.0 / c1
+    del sdata
+    small = mad < eps
+    if numpy.any(small):
+        mad[small] = (numpy.bincount(index, del_y, len(groups)) / counts)[small] / c2
+    valid = mad >= eps
+    
+    u = dy / (c3 * numpy.where(valid, mad, 1.0)[index])
+    uu = u*u
+    q = numpy.logical_and(uu <= 1.0, valid[index])
+    qindex = index[q]
+    uu = uu[q]
+    count = numpy.bincount(qindex, minlength=len(groups))
+    numerator = numpy.bincount(qindex, dy[q]**2.0 * (1.0-uu)**4.0, len(groups))
+    den1 = numpy.bincount(qindex, (1.0-uu) * (1.0-c4*uu), len(groups))
+    sigma = numpy.zeros(len(groups))
+    weird = numpy.logical_and(valid, count < min_points)
+    valid = numpy.logical_and(valid, count >= min_points)
+    siggma = counts[valid] * numerator[valid] / ( den1[valid] * (den1[valid] - 1.0) )
+    sigma[valid] = numpy.sqrt(numpy.where(siggma > 0, siggma, 0.0))
+    sigma[weird] = c_err
+    return groups, center, sigma, index
+
+def _group_order(data, group):
+    ''' Sort values by group, then by value
+    
+    A single sort is performed on the group index plus the value scaled to [0, 0.5].
+    The scaling keeps the order of the values, only values mapped to the same key
+    are sorted again.
+    
+    :Parameters:
+        
+        data : array
+               Values
+        group : array
+                Group of each value
+    
+    :Returns:
+        
+        order : array
+                Indices that sort the values by group, then by value
+        groups : array
+                 Sorted unique groups
+        start : array
+                Index of the first value of each group in the sorted order
+        counts : array
+                 Number of values in each group
+    '''
+    
+    if group.dtype.kind in 'iu' and group.min() >= 0 and group.max() < 2**24: index = group
+    else: index = numpy.unique(group, return_inverse=True)[1]
+    lo, hi = data.min(), data.max()
+    key = index + ((data-lo)/(2.0*(hi-lo)) if hi > lo else 0.0)
+    order = numpy.argsort(key)
+    key = key[order]
+    tie = numpy.flatnonzero(key[1:] == key[:-1])
+    if len(tie) > 0:
+        tie = numpy.union1d(tie, tie+1)
+        order[tie] = order[tie][numpy.lexsort((data[order[tie]], key[tie]))]
+    del key
+    sindex = index[order]
+    start = numpy.hstack(([0], numpy.flatnonzero(sindex[1:] != sindex[:-1])+1))
+    counts = numpy.diff(numpy.hstack((start, [len(data)])))
+    return order, group[order[start]], start, counts
+
+def _segment_kth_deviation(sdata, start, counts, center, below, k):
+    ''' Find the k-th smallest absolute deviation from the center of each sorted segment
+    
+    The absolute deviations of the values below the center (read backwards) and
+    of the remaining values (read forwards) are two sorted sequences, the k-th
+    smallest of their union is found with a binary search over the number taken
+    from the first.
+    
+    :Parameters:
+        
+        sdata : array
+                Values sorted within each segment
+        start : array
+                Index of the first value of each segment
+        counts : array
+                 Number of values in each segment
+        center : array
+                 Center of each segment
+        below : array
+                Number of values less than the center in each segment
+        k : array
+            Rank (from 0) of the deviation in each segment
+    
+    :Returns:
+        
+        val : array
+              k-th smallest absolute deviation of each segment
+    '''
+    
+    last = len(sdata)-1
+    mid = start+below
+    lo = numpy.maximum(0, k+1-(counts-below))
+    hi = numpy.minimum(k+1, below)
+    active = lo < hi
+    while numpy.any(active):
+        i = (lo+hi)/2
+        j = k+1-i
+        low = center - sdata[numpy.clip(mid-1-i, 0, last)]
+        high = sdata[numpy.clip(mid+j-1, 0, last)] - center
+        more = low < high
+        lo = numpy.where(numpy.logical_and(active, more), i+1, lo)
+        hi = numpy.where(numpy.logical_and(active, ~more), i, hi)
+        active = lo < hi
+    j = k+1-lo
+    low = numpy.where(lo > 0, center - sdata[numpy.clip(mid-lo, 0, last)], -numpy.inf)
+    high = numpy.where(j > 0, sdata[numpy.clip(mid+j-1, 0, last)] - center, -numpy.inf)
+    return numpy.maximum(low, high)
+
 def robust_sigma(in_y, zero=0):
     """
    Calculate a resistant estimate of the dispersion of
@@ -464,6 +464,8 @@ def read(filename, columns=None, header=None, ndarray=False, map_ids=None, facto
                     cols.append(header.index(c))
                 except:
                     raise ValueError, "Cannot find column "+str(c)+" in header: "+",".join(header)
+    if ndarray and columns is None and len(first_vals) > 0 and hasattr(format, 'read_array'):
+        return format.read_array(fin, header, first_vals, **extra), header
     factory_bldr = factory.create(header, first_vals, **extra)
     try:
         vals = [factory_bldr(first_vals)] if len(first_vals) > 0 else []
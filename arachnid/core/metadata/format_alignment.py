@@ -185,11 +185,8 @@ def read_alignment(filename, image_file, use_3d=False, align_cols=7, force_list=
                     _logger.info("Detected non-standard SPIDER alignment file with no 2D parameters")
                     param[:, :3] = align[:, :3]
                 else:
-                    for i in xrange(len(align)):
-                        rot, tx, ty = spider_transforms.align_param_2D_to_3D(align[i, 5], align[i, 6], align[i, 7])
-                        param[i, 0] = rot
-                        param[i, 1:3] = align[i, 1:3]
-                        param[i, 4:6] = (tx, ty)
+                    param[:, 0], param[:, 4], param[:, 5] = spider_transforms.align_param_2D_to_3D(align[:, 5], align[:, 6], align[:, 7])
+                    param[:, 1:3] = align[:, 1:3]
             else:
                 _logger.info("Detected non-standard SPIDER alignment file with only angles")
                 param[:, :3] = align[:, :3]
@@ -265,7 +262,9 @@ def read_spider_alignment(filename, header=None, **extra):
             align = format.read(filename, numeric=True, header=h, **extra)
         except: pass
         else: 
-            if len(align) == 0 or align[0]._fields[0]=='epsi':
+            if extra.get('ndarray'):
+                if align[1][0]=='epsi': break
+            elif len(align) == 0 or align[0]._fields[0]=='epsi':
                 break
     if align is None:
         align = format.read(filename, numeric=True, header=header, **extra)
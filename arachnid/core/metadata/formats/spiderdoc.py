@@ -23,6 +23,7 @@ It supports the following attributes:
 from .. import format_utility
 from ..spider_utility import spider_header_vars
 import logging
+import numpy
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.INFO)
@@ -198,6 +199,52 @@ def reader(filename, header=[], numeric=False, columns=None, **extra):
     finally:
         fin.close()
 
+def read_array(filename, header, first_vals, **extra):
+    '''Read the remaining rows of a numeric spider document into an array
+
+    The rows are parsed in a single pass by numpy rather than line by line, which
+    gives the same values as :py:func:`reader` with `numeric=True`.
+
+    .. sourcecode:: py
+
+        >>> fin = open("data001.spi", 'r')
+        >>> header, first_vals = read_header(fin, ["id", "x", "y"], numeric=True)
+        >>> read_array(fin, header, first_vals)
+        array([[   1.,  572.,  228.],
+               [   2.,  738.,  144.],
+               [   3.,  810.,  298.]])
+
+    :Parameters:
+
+    filename : str or stream
+               Input filename or input stream (positioned after the first row)
+    header : list
+             List of strings describing each column
+    first_vals : list
+                 Numeric values of the first row
+    extra : dict
+            Unused keyword arguments
+
+    :Returns:
+
+    vals : array
+           2D array of values, one row for each row in the document
+    '''
+
+    fin = open(filename, 'r') if isinstance(filename, str) else filename
+    try: lines = fin.read().splitlines()
+    finally: fin.close()
+    lines = [line for line in lines if line.strip() != "" and line.lstrip()[0] != ';']
+    width = len(lines[0].split()) if len(lines) > 0 else len(header)+2
+    vals = numpy.fromstring(" ".join(lines), sep=' ') if len(lines) > 0 else numpy.zeros(0)
+    if vals.size == len(lines)*width and width > 1 and len(header) in (width-2, width-1):
+        vals = vals.reshape((len(lines), width))
+        if numpy.all(vals[:, 1] == width-2):
+            vals = vals[:, 2:] if len(header) == width-2 else numpy.delete(vals, 1, axis=1)
+            return numpy.vstack((numpy.asarray(first_vals, dtype=vals.dtype)[numpy.newaxis], vals))
+    # Rows differ in length or are not numeric, parse them line by line
+    return numpy.asarray([first_vals]+[parse_line(line.strip(), True, hlen=len(header)) for line in lines], dtype=numpy.float)
+
 def parse_line(line, numeric=False, columns=None, hlen=None):
     ''' Parse a line of values in the CSV format
     
@@ -0,0 +1,40 @@
+'''
+.. Created on Oct 19, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import format
+import numpy, tempfile, shutil, os
+
+def test_read_ndarray():
+    '''
+    '''
+    
+    path = tempfile.mkdtemp()
+    try:
+        rng = numpy.random.RandomState(0)
+        vals = rng.rand(50, 5)*100
+        vals[:, 0] = numpy.arange(1, 51)
+        filename = os.path.join(path, 'align.dat')
+        format.write(filename, vals, header="id,theta,phi,psi,cc".split(','))
+        ref = numpy.asarray(format.read(filename, numeric=True))
+        out, header = format.read(filename, ndarray=True)
+        assert header == "id,theta,phi,psi,cc".split(',')
+        assert out.shape == ref.shape
+        numpy.testing.assert_allclose(ref, out)
+        
+        filename = os.path.join(path, 'angles.dat')
+        format.write(filename, vals[:, 1:], header="theta,phi,psi,cc".split(','))
+        ref = numpy.asarray(format.read(filename, numeric=True))
+        out, header = format.read(filename, ndarray=True)
+        assert header[0] == 'id'
+        numpy.testing.assert_allclose(ref, out)
+        
+        # A row with a different number of values is parsed line by line
+        fout = open(filename, 'a')
+        fout.write("51 3 1.0 2.0 3.0\n")
+        fout.close()
+        try: format.read(filename, ndarray=True)
+        except format.format_utility.ParseFormatError: pass
+        else: assert False, "expected a parse error"
+    finally:
+        shutil.rmtree(path)
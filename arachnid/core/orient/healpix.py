@@ -269,6 +269,13 @@ def pix2mirror(resolution, pix, scheme='ring', out=None):
     #resolution, theta, phi=None, scheme='ring', half=False, deg=False, out=None
     resolution = pow(2, resolution)
     if scheme not in ('nest', 'ring'): raise ValueError, "scheme must be nest or ring"
+    if hasattr(pix, '__iter__') and scheme == 'ring':
+        theta, phi = pix2ang_ring_array(int(resolution), pix)
+        theta, phi = euler_rad_array(theta, phi, True)
+        mpix = ang2pix_ring_array(int(resolution), theta, phi)
+        if out is None: return mpix
+        out[:] = mpix
+        return out
     _pix2ang = getattr(_healpix, 'pix2ang_%s'%scheme)
     _ang2pix = getattr(_healpix, 'ang2pix_%s'%scheme)
     if hasattr(pix, '__iter__'):
@@ -310,6 +317,12 @@ def pix2ang(resolution, pix, scheme='ring', half=False, out=None):
     
     resolution = pow(2, resolution)
     if scheme not in ('nest', 'ring'): raise ValueError, "scheme must be nest or ring"
+    if hasattr(pix, '__iter__') and scheme == 'ring':
+        theta, phi = pix2ang_ring_array(int(resolution), pix)
+        if out is None: out = numpy.zeros((len(theta), 2))
+        out[:, 0] = theta
+        out[:, 1] = phi
+        return out
     _pix2ang = getattr(_healpix, 'pix2ang_%s'%scheme)
     if hasattr(pix, '__iter__'):
         if out is None: out = numpy.zeros((len(pix), 2))
@@ -452,6 +465,15 @@ def ang2pix(resolution, theta, phi=None, scheme='ring', half=False, deg=False, o
     if hasattr(theta, '__iter__'):
         if phi is not None and not hasattr(phi, '__iter__'): 
             raise ValueError, "phi must be None or array when theta is an array"
+        if scheme == 'ring':
+            if phi is None:
+                theta = numpy.asarray(theta, dtype=numpy.float64)
+                theta, phi = theta[:, 0], theta[:, 1]
+            theta, phi = euler_rad_array(theta, phi, half, deg)
+            pix = ang2pix_ring_array(int(resolution), theta, phi)
+            if out is None: return pix
+            out[:] = pix
+            return out
         if hasattr(phi, '__iter__'): theta = zip(theta, phi)
         _ang2pix = getattr(_healpix, 'ang2pix_%s'%scheme)
         if out is None: out = numpy.zeros(len(theta), dtype=numpy.long)
@@ -483,6 +505,168 @@ def ang2pix(resolution, theta, phi=None, scheme='ring', half=False, deg=False, o
         if phi < 0: raise ValueError, "Invalid phi: %f, must be greater than 0"%phi
         return _ang2pix(int(resolution), float(theta), float(phi))
 
+def euler_rad_array(theta, phi, half=False, deg=False):
+    ''' Ensure arrays of Euler angles fall in the accepted healpix range
+    
+    This is the array form of :py:func:`healpix_euler_rad` and
+    :py:func:`healpix_half_sphere_euler_rad`.
+    
+    :Parameters:
+        
+        theta : array
+                Euler angle theta (colatitude)
+        phi : array
+              Euler angle phi (longitude)
+        half : bool
+               Convert Euler angles to half volume
+        deg : bool
+              Angles in degrees
+    
+    :Returns:
+        
+        theta : array
+                Theta between 0 and PI (PI/2 if half) in radians
+        phi : array
+                PHI between 0 and 2PI in radians
+    '''
+    
+    twopi = numpy.pi*2
+    theta = numpy.array(theta, dtype=numpy.float64)
+    phi = numpy.array(phi, dtype=numpy.float64)
+    if deg:
+        numpy.deg2rad(theta, theta)
+        numpy.deg2rad(phi, phi)
+    if numpy.any(theta < 0): raise ValueError, "Invalid theta: %f, must be greater than 0"%theta.min()
+    phi[phi < 0] += twopi
+    if half:
+        sel = numpy.logical_and(theta <= numpy.pi, theta > numpy.pi/2)
+        theta[sel] = twopi-theta[sel]
+    else:
+        sel = theta > numpy.pi
+        theta[sel] -= numpy.pi/2
+    phi[sel] += numpy.pi
+    phi[numpy.logical_and(sel, phi > twopi)] -= twopi
+    if half: theta[theta > numpy.pi] -= numpy.pi
+    if numpy.any(theta > numpy.pi): raise ValueError, "Invalid theta: %f, must be less than PI"%theta.max()
+    if numpy.any(theta < 0): raise ValueError, "Invalid theta: %f, must be greater than 0"%theta.min()
+    if numpy.any(phi > twopi): raise ValueError, "Invalid phi: %f, must be less than PI"%phi.max()
+    if numpy.any(phi < 0): raise ValueError, "Invalid phi: %f, must be greater than 0"%phi.min()
+    return theta, phi
 
+def ang2pix_ring_array(nside, theta, phi):
+    ''' Convert arrays of Euler angles to pixels in the ring scheme
+    
+    This follows ang2pix_ring of the HEALPix C library, evaluated over
+    all the angles at once.
+    
+    :Parameters:
+        
+        nside : int
+                Number of pixels along the side of a base pixel
+        theta : array
+                Euler angle theta (colatitude) in radians, between 0 and PI
+        phi : array
+              Euler angle phi (longitude) in radians
+    
+    :Returns:
+        
+        pix : array
+              Pixel for each pair of angles
+    '''
+    
+    theta = numpy.asarray(theta, dtype=numpy.float64)
+    phi = numpy.asarray(phi, dtype=numpy.float64)
+    nl4 = 4*nside
+    ncap = 2*nside*(nside-1)
+    npix = 12*nside*nside
+    z = numpy.cos(theta)
+    za = numpy.abs(z)
+    phi = phi.copy()
+    phi[phi >= 2*numpy.pi] -= 2*numpy.pi
+    phi[phi < 0] += 2*numpy.pi
+    tt = phi / (0.5*numpy.pi)
+    pix = numpy.empty(len(theta), dtype=numpy.int64)
+    
+    sel = numpy.nonzero(za <= 2.0/3.0)[0]
+    if len(sel) > 0:
+        t, zs = tt[sel], z[sel]
+        jp = numpy.floor(nside*(0.5 + t - zs*0.75)).astype(numpy.int64)
+        jm = numpy.floor(nside*(0.5 + t + zs*0.75)).astype(numpy.int64)
+        ir = nside + 1 + jp - jm
+        kshift = 1 - numpy.mod(ir, 2)
+        ip = (jp + jm - nside + kshift + 1) // 2 + 1
+        ip[ip > nl4] -= nl4
+        pix[sel] = ncap + nl4*(ir-1) + ip - 1
+    
+    sel = numpy.nonzero(za > 2.0/3.0)[0]
+    if len(sel) > 0:
+        t = tt[sel]
+        tp = t - numpy.floor(t)
+        tmp = numpy.sqrt(3.0*(1.0 - za[sel]))
+        jp = numpy.floor(nside * tp * tmp).astype(numpy.int64)
+        jm = numpy.floor(nside * (1.0 - tp) * tmp).astype(numpy.int64)
+        ir = jp + jm + 1
+        ip = numpy.floor(t * ir).astype(numpy.int64) + 1
+        wrap = ip > 4*ir
+        ip[wrap] -= 4*ir[wrap]
+        pix[sel] = numpy.where(z[sel] <= 0, npix - 2*ir*(ir+1) + ip, 2*ir*(ir-1) + ip) - 1
+    return pix
 
-
+def pix2ang_ring_array(nside, pix):
+    ''' Convert an array of pixels in the ring scheme to Euler angles
+    
+    This follows pix2ang_ring of the HEALPix C library, evaluated over
+    all the pixels at once.
+    
+    :Parameters:
+        
+        nside : int
+                Number of pixels along the side of a base pixel
+        pix : array
+              Array of pixels
+    
+    :Returns:
+        
+        theta : array
+                Euler angle theta (colatitude) in radians
+        phi : array
+              Euler angle phi (longitude) in radians
+    '''
+    
+    ipix1 = numpy.asarray(pix, dtype=numpy.int64).ravel()+1
+    npix = 12*nside*nside
+    if numpy.any(ipix1 < 1) or numpy.any(ipix1 > npix): raise ValueError, "Pixel out of range: 0 <= pix < %d"%npix
+    nl2 = 2*nside
+    nl4 = 4*nside
+    ncap = 2*nside*(nside-1)
+    fact1 = 1.5*nside
+    fact2 = 3.0*nside*nside
+    theta = numpy.empty(len(ipix1))
+    phi = numpy.empty(len(ipix1))
+    
+    sel = numpy.nonzero(ipix1 <= ncap)[0]
+    if len(sel) > 0:
+        hip = ipix1[sel]/2.0
+        iring = numpy.floor(numpy.sqrt(hip - numpy.sqrt(numpy.floor(hip)))).astype(numpy.int64) + 1
+        iphi = ipix1[sel] - 2*iring*(iring - 1)
+        theta[sel] = numpy.arccos(1.0 - iring*iring / fact2)
+        phi[sel] = (iphi - 0.5) * numpy.pi/(2.0*iring)
+    
+    sel = numpy.nonzero(numpy.logical_and(ipix1 > ncap, ipix1 <= nl2*(5*nside+1)))[0]
+    if len(sel) > 0:
+        ip = ipix1[sel] - ncap - 1
+        iring = ip // nl4 + nside
+        iphi = numpy.mod(ip, nl4) + 1
+        fodd = 0.5 * (1 + numpy.mod(iring+nside, 2))
+        theta[sel] = numpy.arccos((nl2 - iring) / fact1)
+        phi[sel] = (iphi - fodd) * numpy.pi/(2.0*nside)
+    
+    sel = numpy.nonzero(ipix1 > nl2*(5*nside+1))[0]
+    if len(sel) > 0:
+        ip = npix - ipix1[sel] + 1
+        hip = ip/2.0
+        iring = numpy.floor(numpy.sqrt(hip - numpy.sqrt(numpy.floor(hip)))).astype(numpy.int64) + 1
+        iphi = 4*iring + 1 - (ip - 2*iring*(iring-1))
+        theta[sel] = numpy.arccos(-1.0 + iring*iring / fact2)
+        phi[sel] = (iphi - 0.5) * numpy.pi/(2.0*iring)
+    return theta, phi
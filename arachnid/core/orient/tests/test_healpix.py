@@ -0,0 +1,52 @@
+'''
+.. Created on Oct 19, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import healpix
+from unittest import SkipTest
+import numpy.testing
+
+def _angles():
+    ''' Random angles in radians along with the edges of the healpix range
+    '''
+    
+    rng = numpy.random.RandomState(0)
+    theta = numpy.concatenate(([0.0, numpy.pi/2, numpy.pi, numpy.pi, 0.0], rng.uniform(0.0, numpy.pi, 500)))
+    phi = numpy.concatenate(([0.0, numpy.pi, 0.0, 2*numpy.pi, -numpy.pi/3], rng.uniform(-numpy.pi, 2*numpy.pi, 500)))
+    return theta, phi
+
+def test_euler_rad_array():
+    '''
+    '''
+    
+    theta, phi = _angles()
+    for half, euler_rad in ((False, healpix.healpix_euler_rad), (True, healpix.healpix_half_sphere_euler_rad)):
+        out = numpy.column_stack(healpix.euler_rad_array(theta, phi, half))
+        ref = numpy.asarray([euler_rad((t, p)) for t, p in zip(theta, phi)])
+        numpy.testing.assert_array_equal(ref, out)
+
+def test_ang2pix_array_invalid():
+    '''
+    '''
+    
+    for theta, phi in (([0.5, -0.1], [0.5, 0.5]), ([0.5, 0.5], [0.5, 7.0])):
+        for half in (False, True):
+            try: healpix.ang2pix(2, theta, phi, half=half)
+            except ValueError: pass
+            else: assert False, "expected ValueError for theta=%s phi=%s"%(str(theta), str(phi))
+
+def test_ring_array():
+    '''
+    '''
+    
+    if getattr(healpix, '_healpix', None) is None: raise SkipTest, "compiled _healpix module not available"
+    theta, phi = _angles()
+    for resolution in (1, 3, 5):
+        for half in (False, True):
+            ref = [healpix.ang2pix(resolution, float(t), float(p), half=half) for t, p in zip(theta, phi)]
+            numpy.testing.assert_array_equal(ref, healpix.ang2pix(resolution, theta, phi, half=half))
+        pix = numpy.arange(healpix.res2npix(resolution))
+        ref = numpy.asarray([healpix.pix2ang(resolution, int(p)) for p in pix])
+        numpy.testing.assert_allclose(ref, healpix.pix2ang(resolution, pix))
+        ref = [healpix.pix2mirror(resolution, int(p)) for p in pix]
+        numpy.testing.assert_array_equal(ref, healpix.pix2mirror(resolution, pix))
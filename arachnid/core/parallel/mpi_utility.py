@@ -227,6 +227,29 @@ def broadcast(data, comm=None, **extra):
         data = comm.bcast(data)
     return data
 
+def gather_object(data, comm=None, **extra):
+    ''' Gather a Python object from every node to the root
+    
+    :Parameters:
+    
+    data : object
+           Python object to send to the root
+    comm : mpi4py.MPI.Intracomm
+           MPI communications object
+    extra : dict
+            Unused keyword arguments
+            
+    :Returns:
+    
+    data : list
+           List of objects, one for each node, on the root and None 
+           on the other nodes
+    '''
+    
+    if comm is not None:
+        return comm.gather(data, root=0)
+    return [data]
+
 def block_reduce(data, comm=None, batch_size=100000, **extra):
     ''' Reduce data array to the root node
     
@@ -6,6 +6,7 @@ utilization with a queue.
 .. Created on Oct 16, 2010
 .. codeauthor:: Robert Langlois <rl2528@columbia.edu>
 '''
+from ..app import tracing
 import multiprocessing
 import logging, sys, traceback, numpy
 import functools
@@ -470,11 +471,14 @@ def worker_all(qin, qout, worker_callback, init_process=None, **extra):
                        Initalize the parameters for the child process
         ignore_error : bool
                        Ignore error and continue
+        log_queue : multiprocessing.Queue, optional
+                    Send log records to this queue of the parent log listener
         extra : dict
                 Unused keyword arguments
     '''
 
     try:
+        if extra.get('log_queue') is not None: tracing.configure_mp_logging(**extra)
         if init_process is not None: extra.update(init_process(**extra))
         while True:
             try:
@@ -484,6 +488,7 @@ def worker_all(qin, qout, worker_callback, init_process=None, **extra):
                 if hasattr(qin, "task_done"):  qin.task_done()
                 break
             index, val = val
+            tracing.set_log_context(file_index=index)
             outval = worker_callback(val, **extra)
             qout.put((index, outval))
             if hasattr(qin, "task_done"): qin.task_done()
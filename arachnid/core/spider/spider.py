@@ -1021,7 +1021,7 @@ class Session(spider_session.Session):
         args = []
         if filter_type < 7: args.append( spider_tuple(filter_radius) )
         if filter_type in (5, 6): args.append( spider_tuple(temperature) )
-        if filter_type in (7, 8): args.append( spider_tuple(pass_band, stop_band) )
+        if filter_type in (7, 8, 9, 10): args.append( spider_tuple(pass_band, stop_band) )
         return spider_session.spider_command_fifo(self, 'fq', inputfile, outputfile, "Applying the Filter to the image or volume", spider_tuple(filter_type), *args)
     
     def fs(self, inputfile, **extra):
@@ -8,4 +8,5 @@
     :template: api_module.rst
     
     fitting
+    lazy_import
 '''
\ No newline at end of file
@@ -0,0 +1,219 @@
+''' Defer the import of heavy optional dependencies
+
+Every `ara-*` and `sp-*` script imports the image, learning and GUI libraries
+at start up even when a particular run never touches most of them (e.g. the
+SciPy signal processing packages, scikit-learn or EMAN2). This module provides
+a module proxy that only imports the underlying module on first attribute
+access.
+
+.. beg-dev
+
+A lazy module is created at the top of a module in place of the regular
+import statement:
+
+.. sourcecode:: py
+
+    from ..util import lazy_import
+    scipy = lazy_import.lazy_module('scipy', 'fftpack', 'ndimage.filters')
+    skcov = lazy_import.lazy_module('sklearn.covariance')
+    EMAN2 = lazy_import.lazy_module('EMAN2', optional=True)
+
+    def gaussian(img):
+        return scipy.ndimage.filters.gaussian_filter(img, 2.0)
+
+    if lazy_import.is_available(EMAN2): ...
+
+Optional modules that fail to import are reported through
+:py:func:`arachnid.core.app.tracing.log_import_error`, and any attribute
+access afterwards raises an ImportError.
+
+The time spent resolving each lazy module, and each of its submodules, is
+recorded and can be retrieved with :py:func:`load_times`, see `ara-startupbench`.
+
+.. end-dev
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+import logging
+import sys
+import time
+import types
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+_load_times = {}
+
+class LazyModule(types.ModuleType):
+    ''' Module proxy that imports the target module on first attribute access
+    '''
+
+    def __init__(self, name, submodules=(), optional=False, message=None):
+        ''' Create a proxy for the given module
+
+        :Parameters:
+
+            name : str
+                   Absolute name of the module
+            submodules : tuple
+                         Submodules of `name` to import along with the module
+            optional : bool
+                       If True, log the import error rather than raise it
+                       during :py:func:`is_available`
+            message : str, optional
+                      Message to log when an optional module fails to import
+        '''
+
+        types.ModuleType.__init__(self, name)
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_submodules'] = tuple(submodules)
+        self.__dict__['_lazy_optional'] = optional
+        self.__dict__['_lazy_message'] = message if message is not None else "Failed to load %s module"%name
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_error'] = None
+
+    def _lazy_load(self):
+        ''' Import the target module and replace the proxy namespace
+
+        :Returns:
+
+            module : module
+                     Target module
+        '''
+
+        module = self.__dict__['_lazy_module']
+        if module is not None: return module
+        error = self.__dict__['_lazy_error']
+        if error is not None: raise ImportError, error
+        name = self.__dict__['_lazy_name']
+        try:
+            for fullname in [name]+[name+"."+sub for sub in self.__dict__['_lazy_submodules']]:
+                beg = time.time()
+                try: __import__(fullname)
+                finally: _load_times[fullname] = _load_times.get(fullname, 0.0)+time.time()-beg
+        except:
+            if not self.__dict__['_lazy_optional']: raise
+            from ..app import tracing
+            exc = sys.exc_info()[1]
+            self.__dict__['_lazy_error'] = "%s: %s"%(self.__dict__['_lazy_message'], str(exc))
+            tracing.log_import_error(self.__dict__['_lazy_message'], _logger)
+            raise ImportError, self.__dict__['_lazy_error']
+        module = sys.modules[name]
+        self.__dict__.update(module.__dict__)
+        self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, key):
+        ''' Import the module and return the requested attribute
+
+        :Parameters:
+
+            key : str
+                  Name of the attribute
+
+        :Returns:
+
+            val : object
+                  Attribute of the target module
+        '''
+
+        return getattr(self._lazy_load(), key)
+
+    def __setattr__(self, key, val):
+        ''' Set the attribute on the target module
+
+        :Parameters:
+
+            key : str
+                  Name of the attribute
+            val : object
+                  Value of the attribute
+        '''
+
+        setattr(self._lazy_load(), key, val)
+        self.__dict__[key]=val
+
+    def __repr__(self):
+        ''' String representation of the proxy
+
+        :Returns:
+
+            val : str
+                  String representation
+        '''
+
+        if self.__dict__['_lazy_module'] is not None: return repr(self.__dict__['_lazy_module'])
+        return "<lazy module '%s'>"%self.__dict__['_lazy_name']
+
+def lazy_module(name, *submodules, **extra):
+    ''' Create a proxy that imports the module on first use
+
+    :Parameters:
+
+        name : str
+               Absolute name of the module, e.g. `scipy.ndimage`
+        submodules : list
+                     Submodules to import along with the package, e.g. `fftpack`, `ndimage.filters`
+        extra : dict
+                Keyword arguments passed to :py:class:`LazyModule`: `optional` and `message`
+
+    :Returns:
+
+        module : LazyModule
+                 Module proxy
+    '''
+
+    return LazyModule(name, submodules, **extra)
+
+def is_available(*modules):
+    ''' Test if every module can be imported, importing it if
+    necessary
+
+    :Parameters:
+
+        modules : list
+                  Lazy modules (or regular modules) to test
+
+    :Returns:
+
+        out : bool
+              True if all the modules were imported
+    '''
+
+    for module in modules:
+        if module is None: return False
+        if not isinstance(module, LazyModule): continue
+        try: module._lazy_load()
+        except ImportError: return False
+    return True
+
+def is_loaded(module):
+    ''' Test if the module has already been imported without importing it
+
+    :Parameters:
+
+        module : LazyModule
+                 Lazy module (or regular module) to test
+
+    :Returns:
+
+        out : bool
+              True if the target module has been imported
+    '''
+
+    if module is None: return False
+    if not isinstance(module, LazyModule): return True
+    if module.__dict__['_lazy_module'] is not None: return True
+    return module.__dict__['_lazy_error'] is None and module.__dict__['_lazy_name'] in sys.modules
+
+def load_times():
+    ''' Get the time spent importing each lazy module and submodule
+
+    :Returns:
+
+        times : dict
+                Mapping between module name (e.g. `scipy` or `scipy.stats`) and import time in seconds
+    '''
+
+    return dict(_load_times)
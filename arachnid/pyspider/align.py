@@ -78,6 +78,10 @@ Useful Options
 .. option:: --use-flip <BOOL>
     
     Use the phase flipped stack for alignment (Default: False)
+
+.. option:: --native-align <BOOL>
+    
+    Use the in-process projection matching engine rather than AP SH/AP REF on the phase flipped stack (Default: False)
     
 .. option:: --prep-thread <INT>
     
@@ -182,6 +186,7 @@ from ..core.metadata import spider_params, format, format_utility
 from ..core.orient import spider_transforms
 from ..core.parallel import mpi_utility, parallel_utility
 from ..core.spider import spider
+from ..core.image import ndimage_file, projection_align, reproject
 import reconstruct, prepare_volume, create_align
 import logging, numpy, scipy
 
@@ -296,7 +301,7 @@ def write_alignment(output, alignvals, apix=None, defocus_old=None):
     else: tmp = alignvals
     format.write(output, tmp, header=header.split(','), format=format.spiderdoc)
 
-def align_to_reference(spi, align, curr_slice, reference, use_flip, use_apsh, shuffle_angles=False, **extra):
+def align_to_reference(spi, align, curr_slice, reference, use_flip, use_apsh, shuffle_angles=False, native_align=False, **extra):
     ''' Align a set of projections to the given reference
     
     :Parameters:
@@ -315,6 +320,8 @@ def align_to_reference(spi, align, curr_slice, reference, use_flip, use_apsh, sh
                Set true to use AP SH rather than the faster, yet less accurate AP REF
     shuffle_angles : bool
                      Shuffle the angular distribution
+    native_align : bool
+                   Use the in-process projection matching engine on the CTF-corrected stack
     extra : dict
             Unused keyword arguments
     '''
@@ -361,7 +368,11 @@ def align_to_reference(spi, align, curr_slice, reference, use_flip, use_apsh, sh
         angle_off = parallel_utility.partition_offsets(angle_num, int(numpy.ceil(float(angle_num)/max_ref_proj)))
         angles = numpy.asarray(format.read(spi.replace_ext(angle_doc), numeric=True, header="id,psi,theta,phi".split(',')))
         #spi.spider_results(True, False)
-        if use_flip:
+        if use_flip and native_align:
+            if mpi_utility.is_root(**extra): _logger.info("Native alignment on CTF-corrected stacks - started")
+            align_projections_native(spi, align[curr_slice], reference, angles, angle_off, **extra)
+            if mpi_utility.is_root(**extra): _logger.info("Native alignment on CTF-corrected stacks - finished")
+        elif use_flip:
             if mpi_utility.is_root(**extra): _logger.info("Alignment on CTF-corrected stacks - started")
             align_projections(spi, ap_sel, None, align[curr_slice], reference, angles, angle_doc, angle_off, **extra)
             if mpi_utility.is_root(**extra): _logger.info("Alignment on CTF-corrected stacks - finished")
@@ -560,6 +571,70 @@ def align_projections(spi, ap_sel, inputselect, align, reference, angles, angle_
             align[i, 14]=val[0] if len(val)>0 else -1
         _logger.info("Testing best reference(%d): %d - %s"%(int(align[0, 4]), int(align[0, 14]), str(inputselect)))
 
+def align_projections_native(spi, align, reference, angles, angle_rng, input_stack, pj_radius=-1, pixel_diameter=None, ring_last=0, angle_range=0, thread_count=0, **extra):
+    ''' Align a set of projections to the given reference without SPIDER
+    
+    The reference projections are generated with the `PJ 3Q` kernel and matched
+    in-process by :py:func:`arachnid.core.image.projection_align.align_stack`.
+    The Euler angle restriction of `AP SH` is not supported and the previous
+    in-plane alignment is not applied; the translation is searched over the
+    full `trans-range`.
+    
+    :Parameters:
+    
+    spi : spider.Session
+          Current SPIDER session
+    align : array
+            Output array of alignment values
+    reference : str or spider_var
+                Input filename for reference used in alignment
+    angles : array
+             List of Euler angles (id, psi, theta, phi)
+    angle_rng : array
+                Offsets for Euler angle list
+    input_stack : str
+                  Input filename for projection stack
+    pj_radius : int
+                Radius of sphere to compute projection, if less than one use 0.69 times the diameter of the object in pixels
+    pixel_diameter : int
+                     Diameter of the object in pixels
+    ring_last : int
+                Last polar ring to analyze; if this value is zero, then it is chosen to be the radius of the particle in pixels
+    angle_range : float
+                  Maximum allowed deviation of the Euler angles (unsupported)
+    thread_count : int
+                   Number of worker processes
+    extra : dict
+            Unused keyword arguments
+    '''
+    
+    if angle_range > 0: _logger.warn("Native alignment does not restrict the Euler angles, --angle-range ignored")
+    spi.flush()
+    vol = ndimage_file.read_image(spi.replace_ext(reference)).astype(numpy.float32)
+    if pj_radius is None or pj_radius < 1: pj_radius = 0.69 * pixel_diameter
+    if ring_last <= 0: ring_last = pixel_diameter/2
+    input_file = spi.replace_ext(input_stack)
+    image_iter = lambda beg, end: ndimage_file.iter_images(input_file, numpy.arange(beg, end))
+    ref_offset = 0
+    for i in xrange(1, angle_rng.shape[0]):
+        ang = angles[angle_rng[i-1]:angle_rng[i], 1:].astype(numpy.float32)
+        _logger.debug("Generating reference projections: %d-%d"%(i, angle_rng.shape[0]))
+        refs = reproject.reproject_3q(vol, pj_radius, ang, thread_count=thread_count, **extra)
+        _logger.debug("Aligning particle projections")
+        vals = projection_align.align_stack(image_iter, refs, thread_count=thread_count, total=len(align), ring_last=ring_last, **extra)
+        _logger.debug("Aligning particle projections - finished")
+        sel = vals[:, 4] > numpy.abs(align[:, 10])
+        ref = vals[sel, 0].astype(numpy.int)
+        mirror = vals[sel, 5] > 0
+        align[sel, 0] = ang[ref, 0]
+        align[sel, 1] = numpy.where(mirror, 180.0-ang[ref, 1], ang[ref, 1])
+        align[sel, 2] = numpy.where(mirror, numpy.mod(ang[ref, 2]+180.0, 360.0), ang[ref, 2])
+        align[sel, 3] = ref + 1 + ref_offset
+        align[sel, 5:8] = vals[sel, 1:4]
+        align[sel, 10] = vals[sel, 4]
+        align[sel, 11:14] = vals[sel, 1:4]
+        ref_offset += len(ang)
+
 def fast_projection_search_test(input_file, inputselect, reference_file, align_file, angle_doc, best, ref_offset, **extra):
     '''ang_diff
     '''
@@ -687,6 +762,7 @@ def setup_options(parser, pgroup=None, main_option=False):
     group.add_option("",   use_flip=False,         help="Use the phase flipped stack for alignment")
     group.add_option("",   defocus_groups=0,       help="Reorganize into defocus groups")
     group.add_option("",   fast_align_test=False,  help="Test the fast alignment algorithm")
+    group.add_option("",   native_align=False,     help="Use the in-process projection matching engine rather than AP SH/AP REF on the phase flipped stack")
     
     pgroup.add_option_group(group)
     
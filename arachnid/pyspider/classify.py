@@ -72,6 +72,10 @@ Useful Options
 
     Remove low cross-correlation particles whose cross-correlation score is less than cc_nstd times the standard deviation outside the mean
 
+.. option:: --reject-by-view <BOOL>
+
+    Remove the cross-correlation outliers (`--cc-nstd`) within each view, using the median and robust standard deviation of that view, rather than over all projections. This is a different rejection rule and selects a different set of particles; it is not a faster version of the default (used when `--threshold-by-view` is set True)
+
 Advanced Options
 ================
 
@@ -126,13 +130,13 @@ def process(filename, output, **extra):
     
     if spider_utility.is_spider_filename(filename):
         output = spider_utility.spider_filename(output, filename)
-    align = numpy.asarray(format.read(filename, numeric=True))
+    align = format.read(filename, ndarray=True)[0]
     sel = classify_projections(align, **extra)
     if sel is not None:
         format.write(output, numpy.argwhere(sel)+1, header=['id'])
     return filename
 
-def classify_projections(alignvals, threshold_type=('None', 'Auto', 'CC', 'Total'), cc_threshold=0.0, cc_total=0.9, threshold_by_view=False, view_resolution=1, threshold_bins=0, keep_low_cc=False, cull_overrep=False, cc_nstd=3, **extra):
+def classify_projections(alignvals, threshold_type=('None', 'Auto', 'CC', 'Total'), cc_threshold=0.0, cc_total=0.9, threshold_by_view=False, view_resolution=1, threshold_bins=0, keep_low_cc=False, cull_overrep=False, cc_nstd=3, reject_by_view=False, **extra):
     '''Classify projections based on alignment parameters
     
     :Parameters:
@@ -157,6 +161,8 @@ def classify_projections(alignvals, threshold_type=('None', 'Auto', 'CC', 'Total
                        Set to True if you want to ensure each view has roughly the same number of particles (used when `--threshold-by-view` is set True)
         cc_nstd : int
                   Remove low cross-correlation particles whose cross-correlation score is less than cc_nstd times the standard deviation outside the mean
+        reject_by_view : bool
+                         Remove the cross-correlation outliers within each view rather than over all projections (used when `--threshold-by-view` is set True)
         extra : dict
                 Unused keyword arguments
     
@@ -169,7 +175,7 @@ def classify_projections(alignvals, threshold_type=('None', 'Auto', 'CC', 'Total
     
     if threshold_type == 0: return None
     if threshold_by_view:
-        return classify_projections_by_view(alignvals, threshold_type, cc_threshold, cc_total, view_resolution, threshold_bins, keep_low_cc, cull_overrep, cc_nstd)
+        return classify_projections_by_view(alignvals, threshold_type, cc_threshold, cc_total, view_resolution, threshold_bins, keep_low_cc, cull_overrep, cc_nstd, reject_by_view)
     else:
         return classify_projections_overall(alignvals, threshold_type, cc_threshold, cc_total, threshold_bins, keep_low_cc, cc_nstd)
 
@@ -214,7 +220,7 @@ def classify_projections_overall(alignvals, threshold_type=('None', 'Auto', 'CC'
     _logger.info("Overall Threshold: %f -> %d of %d"%(cc_threshold, numpy.sum(sel), len(alignvals)))
     return sel
 
-def classify_projections_by_view(alignvals, threshold_type=('None', 'Auto', 'CC', 'Total'), cc_threshold=0.0, cc_total=0.9, view_resolution=1, threshold_bins=0, keep_low_cc=False, cull_overrep=False, cc_nstd=3, **extra):
+def classify_projections_by_view(alignvals, threshold_type=('None', 'Auto', 'CC', 'Total'), cc_threshold=0.0, cc_total=0.9, view_resolution=1, threshold_bins=0, keep_low_cc=False, cull_overrep=False, cc_nstd=3, reject_by_view=False, **extra):
     ''' Classify projections based on alignment parameters by view
     
     :Parameters:
@@ -237,6 +243,8 @@ def classify_projections_by_view(alignvals, threshold_type=('None', 'Auto', 'CC'
                        Set to True if you want to ensure each view has roughly the same number of particles (used when `--threshold-by-view` is set True)
         cc_nstd : int
                   Remove low cross-correlation particles whose cross-correlation score is less than cc_nstd times the standard deviation outside the mean
+        reject_by_view : bool
+                         Remove the cross-correlation outliers within each view rather than over all projections
         extra : dict
                 Unused keyword arguments
     
@@ -248,32 +256,69 @@ def classify_projections_by_view(alignvals, threshold_type=('None', 'Auto', 'CC'
       
     
     if threshold_type == 0: return None
-    cmp = numpy.less if keep_low_cc else numpy.greater
-    sel = unary_classification.robust_rejection(alignvals[:, 10], cc_nstd) if cc_nstd > 0 else numpy.ones(alignvals.shape[0], dtype=numpy.bool)
     view = healpix.ang2pix(view_resolution, numpy.deg2rad(alignvals[:, 1:3]))
-    views = numpy.unique(view)
-    _logger.error("# views: %d -- %s"%(len(views), str(view[:5])))
-    maximum_views = 0
-    if cull_overrep:
-        vhist = numpy.histogram(view, len(views)+1)[0]
-        _logger.error("hist: %s"%str(vhist))
-        maximum_views = numpy.mean(vhist[vhist>0])
-    for v in views:
-        vsel = numpy.logical_and(sel, v==view)
-        _logger.error("View: %d -- %d, %d, %d"%(v, numpy.sum(sel), numpy.sum(v==view), alignvals.shape[0]))
-        vidx = numpy.argwhere(vsel).squeeze()
-        cc = alignvals[vidx, 10]
-        if cc.shape[0] == 0: continue
-        if threshold_type == 1:
-            cc_threshold = unary_classification.otsu(cc, threshold_bins)
-        elif threshold_type == 3:
-            cc_threshold = threshold_from_total(cc, cc_total, keep_low_cc)
-        if maximum_views > 0:
-            cc_threshold = threshold_max(cc, cc_threshold, maximum_views, keep_low_cc)
-        csel = cmp(alignvals[:, 10], cc_threshold)
-        vsel = numpy.logical_and(vsel, csel)
-        sel[numpy.argwhere(numpy.logical_not(vsel)).squeeze()] = 0
-        _logger.info("View: %d -> Kept %d of %d"%(v, numpy.sum(sel[vidx]), cc.shape[0]))
+    if cc_nstd <= 0: sel = numpy.ones(alignvals.shape[0], dtype=numpy.bool)
+    elif reject_by_view: sel = unary_classification.robust_rejection_by_group(alignvals[:, 10], view, cc_nstd)
+    else: sel = unary_classification.robust_rejection(alignvals[:, 10], cc_nstd)
+    return select_by_view(alignvals[:, 10], view, sel, threshold_type, cc_threshold, cc_total, threshold_bins, keep_low_cc, cull_overrep)
+
+def select_by_view(cc, view, sel, threshold_type=1, cc_threshold=0.0, cc_total=0.9, threshold_bins=0, keep_low_cc=False, cull_overrep=False):
+    ''' Threshold the cross-correlation of the projections in each view
+    
+    The selected projections are sorted by view once and each view is thresholded
+    over its contiguous segment, so the cost does not grow with the number of views.
+    
+    :Parameters:
+        
+        cc : numpy.ndarray
+             Cross-correlation of each projection
+        view : numpy.ndarray
+               View (e.g. healpix pixel) of each projection
+        sel : numpy.ndarray
+              Boolean array of projections to consider, updated in place
+        threshold_type : int
+                         Type of thresholding to perform: 1 = Auto, 2 = CC, 3 = Total
+        cc_threshold : float
+                       Cross-correlation threshold value (used with `--threshold-type CC`)
+        cc_total: float
+                  Total number of high cross-correlation projections to keep, if < 1.0, assumes a fraction, otherwise total number (used with `--threshold-type Total`)
+        threshold_bins : int
+                         Number of bins to use in Otzu's method: 0 = SQRT(total), -1 = total/16, otherwise use the number given (used with `--threshold-type Auto`)
+        keep_low_cc : bool
+                      Set to True if you want to keep the low cross-correlation particles instead
+        cull_overrep : bool
+                       Set to True if you want to ensure each view has no more than the average number of particles per view
+    
+    :Returns:
+        
+        selected : numpy.ndarray
+                   Boolean array of selected projections
+    '''
+    
+    cmp = numpy.less if keep_low_cc else numpy.greater
+    maximum_views = int(numpy.mean(numpy.unique(view, return_counts=True)[1])) if cull_overrep and len(view) > 0 else 0
+    order = numpy.flatnonzero(sel)
+    order = order[numpy.argsort(view[order], kind='mergesort')]
+    views, start, counts = numpy.unique(view[order], return_index=True, return_counts=True)
+    _logger.info("Thresholding %d projections in %d views"%(len(order), len(views)))
+    cc = cc[order]
+    if threshold_type == 2 and maximum_views == 0:
+        keep = cmp(cc, cc_threshold)
+    else:
+        keep = numpy.zeros(len(order), dtype=numpy.bool)
+        for v, beg, end in zip(views, start, start+counts):
+            vcc = cc[beg:end]
+            threshold = cc_threshold
+            if threshold_type == 1:
+                threshold = unary_classification.otsu(vcc, threshold_bins)
+            elif threshold_type == 3:
+                threshold = threshold_from_total(vcc, cc_total, keep_low_cc)
+            if maximum_views > 0:
+                threshold = threshold_max(vcc, threshold, maximum_views, keep_low_cc)
+            keep[beg:end] = cmp(vcc, threshold)
+            _logger.debug("View: %d -> Kept %d of %d"%(v, numpy.sum(keep[beg:end]), end-beg))
+    sel[:] = False
+    sel[order[keep]] = True
     return sel
 
 def threshold_max(data, threshold, max_num, reverse=False):
@@ -299,13 +344,10 @@ def threshold_max(data, threshold, max_num, reverse=False):
     
     idx = numpy.argsort(data)
     if not reverse: idx = idx[::-1]
-    threshold = numpy.searchsorted(data[idx], threshold)
-    if threshold > max_num: threshold = max_num
-    try:
-        return data[idx[threshold]]
-    except:
-        _logger.error("%d > %d -> %d"%(threshold, idx.shape[0], max_num))
-        raise
+    if max_num >= idx.shape[0]: return threshold
+    cmp = numpy.less if reverse else numpy.greater
+    if numpy.sum(cmp(data, threshold)) <= max_num: return threshold
+    return data[idx[max_num]]
 
 def threshold_from_total(data, total, reverse=False):
     ''' Find the threshold given the total number of elements kept.
@@ -362,6 +404,7 @@ def setup_options(parser, pgroup=None, main_option=False):
         group.add_option("",   keep_low_cc=False,       help="Set to True if you want to keep the low cross-correlation particles instead")
         group.add_option("",   cull_overrep=False,      help="Set to True if you want to ensure each view has roughly the same number of particles (used when `--threshold-by-view` is set True)")
         group.add_option("",   cc_nstd=3,               help="Remove low cross-correlation particles whose cross-correlation score is less than cc_nstd times the standard deviation outside the mean")
+        group.add_option("",   reject_by_view=False,    help="Remove the cross-correlation outliers (`--cc-nstd`) within each view rather than over all projections (used when `--threshold-by-view` is set True)")
         pgroup.add_option_group(group)
         
     if main_option:
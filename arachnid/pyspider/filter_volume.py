@@ -59,7 +59,7 @@ Low-pass Filter Options
 
 .. option:: --filter-type <INT>
 
-    Type of low-pass filter to use with resolution: [1] Fermi(SP, fermi_temp) [2] Butterworth (SP-bp_pass, SP+bp_stop) [3] Gaussian (SP)
+    Type of low-pass filter to use with resolution: [1] Fermi(SP, fermi_temp) [2] Butterworth (SP-bp_pass, SP+bp_stop) [3] Gaussian (SP) [5] Raised cosine (SP-bp_pass, SP+bp_stop)
 
 .. option:: --fermi-temp <FLOAT>
 
@@ -73,6 +73,9 @@ Low-pass Filter Options
 
     Offset for stop band of the butterworth lowpass filter (sp+bw_stop)
 
+.. option:: --native-filter
+    
+    Filter in-process with the compiled SPIDER kernels rather than running SPIDER (the Fermi filter always uses SPIDER)
 
 High-pass Filter Options
 ========================
@@ -83,7 +86,7 @@ High-pass Filter Options
 
 .. option:: --hp-type <INT>
 
-    Type of high-pass filter to use with resolution: [0] None [1] Fermi(hp_radius, fermi_temp) [2] Butterworth (hp_radius-bp_pass, hp_radius+bp_stop) [3] Gaussian (hp_radius)
+    Type of high-pass filter to use with resolution: [0] None [1] Fermi(hp_radius, fermi_temp) [2] Butterworth (hp_radius-bp_pass, hp_radius+bp_stop) [3] Gaussian (hp_radius) [4] Raised cosine (hp_radius-bp_pass, hp_radius+bp_stop)
 
 .. option:: --hp-bw_pass <FLOAT>
 
@@ -113,7 +116,8 @@ This is not a complete list of options available to this script, for additional
 from ..core.app import program
 from ..core.metadata import spider_params, spider_utility
 from ..core.spider import spider
-import logging, os
+from ..core.image import ndimage_file, ndimage_filter
+import logging, os, numpy
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
@@ -177,19 +181,24 @@ def ensure_pixel_size(spi, filename, **extra):
         _logger.warn("Changing pixel size: %f (%f/%f) | %f -> %f"%(bin_factor, extra['window'], w, extra['apix'], params['apix']))
     return params
 
-def filter_volume_lowpass(filename, spi, sp, filter_type=2, fermi_temp=0.0025, bw_pass=0.05, bw_stop=0.05, reg=0.006, outputfile=None, **extra):
+def filter_volume_lowpass(filename, spi, sp, filter_type=2, fermi_temp=0.0025, bw_pass=0.05, bw_stop=0.05, reg=0.006, native_filter=False, outputfile=None, **extra):
     ''' Low-pass filter the specified volume
     
+    The Gaussian, Butterworth and raised cosine filters are applied with SPIDER
+    unless `native_filter` is set, then they are applied in-process with the SPIDER
+    kernels in :py:mod:`ndimage_filter <arachnid.core.image.ndimage_filter>`. A volume
+    given as an array is always filtered in-process.
+    
     :Parameters:
     
-    filename : str
-               Filename of the input volume
+    filename : str or array
+               Filename of the input volume or the volume (then the filtered volume is returned)
     spi : spider.Session
           Current SPIDER session
     sp : float
          Spatial frequency to filter volume
     filter_type : int
-                  Type of low-pass filter to use with resolution: [1] Fermi(SP, fermi_temp) [2] Butterworth (SP-bp_pass, SP+bp_stop) [3] Gaussian (SP)
+                  Type of low-pass filter to use with resolution: [1] Fermi(SP, fermi_temp) [2] Butterworth (SP-bp_pass, SP+bp_stop) [3] Gaussian (SP) [5] Raised cosine (SP-bp_pass, SP+bp_stop)
     fermi_temp : float
                  Fall off for Fermi filter (both high pass and low pass)
     bw_pass : float
@@ -198,6 +207,8 @@ def filter_volume_lowpass(filename, spi, sp, filter_type=2, fermi_temp=0.0025, b
               Offset for stop band of the butterworth lowpass filter (sp+bw_stop)
     reg : float
           Regularization for total variance denoising
+    native_filter : bool
+                    Filter in-process with the compiled SPIDER kernels rather than running SPIDER
     outputfile : str
                  Output filename for filtered volume
     extra : dict
@@ -222,6 +233,9 @@ def filter_volume_lowpass(filename, spi, sp, filter_type=2, fermi_temp=0.0025, b
         ndimage_file.write_image(spi.replace_ext(outputfile), img)
         return outputfile
     
+    if not use_spider(native_filter, filename, outputfile) and filter_type != 1:
+        _logger.info("Filtering in-process with %f, %d"%(sp, filter_type))
+        return write_volume(filter_lowpass(read_volume(filename, spi), sp, filter_type, bw_pass, bw_stop), filename, outputfile, spi)
     if filename == outputfile: filename = spi.cp(filename)
     _logger.info("Filtering with %f, %d"%(sp, filter_type))
     if sp > 0.08:
@@ -230,11 +244,11 @@ def filter_volume_lowpass(filename, spi, sp, filter_type=2, fermi_temp=0.0025, b
             if rad > 0.45: rad = 0.45
             outputfile = spi.fq(filename, spi.FERMI_LP, filter_radius=rad, temperature=fermi_temp, outputfile=outputfile)
         elif filter_type==2:
-            pass_band = sp-bw_pass
-            stop_band = sp+bw_stop
-            if pass_band > 0.35: pass_band = 0.4
-            if stop_band > 0.4: stop_band = 0.45
+            pass_band, stop_band = filter_bands(sp, bw_pass, bw_stop)
             outputfile = spi.fq(filename, spi.BUTER_LP, pass_band=pass_band, stop_band=stop_band, outputfile=outputfile)
+        elif filter_type==5:
+            pass_band, stop_band = filter_bands(sp, bw_pass, bw_stop)
+            outputfile = spi.fq(filename, spi.RCOS_LP, pass_band=pass_band, stop_band=stop_band, outputfile=outputfile)
         elif filter_type != 3: outputfile=filename
     else:
         _logger.warn("Spatial frequency %f exceeds the safe value, switching to Gaussian filter: %d"%(sp, filter_type))
@@ -244,19 +258,22 @@ def filter_volume_lowpass(filename, spi, sp, filter_type=2, fermi_temp=0.0025, b
         outputfile = spi.fq(filename, spi.GAUS_LP, filter_radius=sp, outputfile=outputfile)
     return outputfile
 
-def filter_volume_highpass(filename, spi, hp_radius=0, hp_type=0, hp_bw_pass=0.05, hp_bw_stop=0.05, hp_temp=0.0025, apix=None, outputfile=None, **extra):
+def filter_volume_highpass(filename, spi, hp_radius=0, hp_type=0, hp_bw_pass=0.05, hp_bw_stop=0.05, hp_temp=0.0025, apix=None, outputfile=None, native_filter=False, **extra):
     ''' High-pass filter the specified volume
     
+    The Gaussian, Butterworth and raised cosine filters are applied in-process
+    when `native_filter` is set (see :py:func:`filter_volume_lowpass`).
+    
     :Parameters:
     
-    filename : str
-               Filename of the input volume
+    filename : str or array
+               Filename of the input volume or the volume (then the filtered volume is returned)
     spi : spider.Session
           Current SPIDER session
     hp_radius : float
                 The spatial frequency to high-pass filter (if > 0.5, then assume its resolution and calculate spatial frequency, if 0 the filter is disabled)
     hp_type : int
-              Type of high-pass filter to use with resolution: [0] None [1] Fermi(hp_radius, fermi_temp) [2] Butterworth (hp_radius-bp_pass, hp_radius+bp_stop) [3] Gaussian (hp_radius)
+              Type of high-pass filter to use with resolution: [0] None [1] Fermi(hp_radius, fermi_temp) [2] Butterworth (hp_radius-bp_pass, hp_radius+bp_stop) [3] Gaussian (hp_radius) [4] Raised cosine (hp_radius-bp_pass, hp_radius+bp_stop)
     hp_bw_pass : float
                  Offset for the pass band of the butterworth highpass filter (hp_radius-bw_pass)
     hp_bw_stop : float
@@ -267,6 +284,8 @@ def filter_volume_highpass(filename, spi, hp_radius=0, hp_type=0, hp_bw_pass=0.0
            Pixel size
     outputfile : str
                  Output filename for filtered volume
+    native_filter : bool
+                    Filter in-process with the compiled SPIDER kernels rather than running SPIDER
     extra : dict
             Unused keyword arguments
     
@@ -276,9 +295,11 @@ def filter_volume_highpass(filename, spi, hp_radius=0, hp_type=0, hp_bw_pass=0.0
                  Output filename for filtered volume
     '''
     
-    if hp_radius == 0: return filename
-    if filename == outputfile: filename = spi.cp(filename)
+    if hp_radius == 0 or hp_type not in (1, 2, 3, 4): return filename
     if hp_radius > 0.5: hp_radius = apix / hp_radius
+    if not use_spider(native_filter, filename, outputfile) and hp_type != 1:
+        return write_volume(filter_highpass(read_volume(filename, spi), hp_radius, hp_type, hp_bw_pass, hp_bw_stop), filename, outputfile, spi)
+    if filename == outputfile: filename = spi.cp(filename)
     if hp_type == 1:
         outputfile = spi.fq(filename, spi.FERMI_HP, filter_radius=hp_radius, temperature=hp_temp, outputfile=outputfile)
     elif hp_type == 2:
@@ -289,9 +310,182 @@ def filter_volume_highpass(filename, spi, hp_radius=0, hp_type=0, hp_bw_pass=0.0
         outputfile = spi.fq(filename, spi.BUTER_HP, pass_band=pass_band, stop_band=stop_band, outputfile=outputfile)
     elif hp_type == 3:
         outputfile = spi.fq(filename, spi.GAUS_HP, filter_radius=hp_radius, outputfile=outputfile)
+    elif hp_type == 4:
+        pass_band, stop_band = filter_bands(hp_radius, hp_bw_pass, hp_bw_stop)
+        outputfile = spi.fq(filename, spi.RCOS_HP, pass_band=pass_band, stop_band=stop_band, outputfile=outputfile)
     else: return filename
     return outputfile
 
+def filter_lowpass(vol, sp, filter_type=2, bw_pass=0.05, bw_stop=0.05, **extra):
+    ''' Low-pass filter a volume in-process with the same filters as :py:func:`filter_volume_lowpass`
+    
+    :Parameters:
+    
+    vol : array
+          Volume (or image)
+    sp : float
+         Spatial frequency to filter volume
+    filter_type : int
+                  Type of low-pass filter: [2] Butterworth (SP-bp_pass, SP+bp_stop) [3] Gaussian (SP) [5] Raised cosine (SP-bp_pass, SP+bp_stop)
+    bw_pass : float
+              Offset for pass band (sp-bw_pass)
+    bw_stop : float
+              Offset for stop band (sp+bw_stop)
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    out : array
+          Filtered float32 volume
+    '''
+    
+    if sp <= 0.08:
+        _logger.warn("Spatial frequency %f exceeds the safe value, switching to Gaussian filter: %d"%(sp, filter_type))
+        filter_type = 3
+    if filter_type == 2:
+        pass_band, stop_band = filter_bands(sp, bw_pass, bw_stop)
+        return ndimage_filter.filter_butterworth_lowpass(vol, pass_band, stop_band)
+    elif filter_type == 5:
+        pass_band, stop_band = filter_bands(sp, bw_pass, bw_stop)
+        return ndimage_filter.filter_raised_cosine_lowpass(vol, pass_band, stop_band)
+    elif filter_type == 3:
+        return ndimage_filter.filter_gaussian_lowpass(vol, sp)
+    elif filter_type == 1: raise ValueError, "The Fermi filter requires SPIDER"
+    return numpy.asarray(vol, dtype=numpy.float32)
+
+def filter_highpass(vol, hp_radius, hp_type=3, hp_bw_pass=0.05, hp_bw_stop=0.05, **extra):
+    ''' High-pass filter a volume in-process with the same filters as :py:func:`filter_volume_highpass`
+    
+    :Parameters:
+    
+    vol : array
+          Volume (or image)
+    hp_radius : float
+                The spatial frequency to high-pass filter
+    hp_type : int
+              Type of high-pass filter: [2] Butterworth (hp_radius-bp_pass, hp_radius+bp_stop) [3] Gaussian (hp_radius) [4] Raised cosine (hp_radius-bp_pass, hp_radius+bp_stop)
+    hp_bw_pass : float
+                 Offset for the pass band (hp_radius-bw_pass)
+    hp_bw_stop : float
+                 Offset for the stop band (hp_radius+bw_stop)
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    out : array
+          Filtered float32 volume
+    '''
+    
+    if hp_type == 2:
+        pass_band, stop_band = filter_bands(hp_radius, hp_bw_pass, hp_bw_stop)
+        return ndimage_filter.filter_butterworth_highpass(vol, pass_band, stop_band)
+    elif hp_type == 4:
+        pass_band, stop_band = filter_bands(hp_radius, hp_bw_pass, hp_bw_stop)
+        return ndimage_filter.filter_raised_cosine_highpass(vol, pass_band, stop_band)
+    elif hp_type == 3:
+        return ndimage_filter.filter_gaussian_highpass(vol, hp_radius)
+    elif hp_type == 1: raise ValueError, "The Fermi filter requires SPIDER"
+    return numpy.asarray(vol, dtype=numpy.float32)
+
+def filter_bands(sp, bw_pass, bw_stop):
+    ''' Pass and stop bands of a Butterworth or raised cosine filter
+    
+    :Parameters:
+    
+    sp : float
+         Spatial frequency of the filter
+    bw_pass : float
+              Offset for pass band (sp-bw_pass)
+    bw_stop : float
+              Offset for stop band (sp+bw_stop)
+    
+    :Returns:
+    
+    pass_band : float
+                Pass band
+    stop_band : float
+                Stop band
+    '''
+    
+    pass_band = sp-bw_pass
+    stop_band = sp+bw_stop
+    if pass_band > 0.35: pass_band = 0.4
+    if stop_band > 0.4: stop_band = 0.45
+    return pass_band, stop_band
+
+def use_spider(native, filename, outputfile):
+    ''' Test if a volume operation must run in SPIDER
+    
+    :Parameters:
+    
+    native : bool
+             The in-process operation was requested
+    filename : str or array
+               Input volume
+    outputfile : str
+                 Output filename, None for a SPIDER incore file
+    
+    :Returns:
+    
+    spider : bool
+             True if the operation must run in SPIDER
+    '''
+    
+    if isinstance(filename, numpy.ndarray):
+        if ndimage_filter._spider_filter is None: raise ImportError, "Filtering an array requires the compiled _spider_filter module"
+        return False
+    if not native or outputfile is None: return True
+    if ndimage_filter._spider_filter is None:
+        _logger.warn("The compiled _spider_filter module is not available - falling back to SPIDER")
+        return True
+    return False
+
+def read_volume(filename, spi=None):
+    ''' Read a volume (if not already in memory) as float32
+    
+    :Parameters:
+    
+    filename : str or array
+               Filename of the volume or the volume
+    spi : spider.Session, optional
+          Current SPIDER session, adds the data extension
+    
+    :Returns:
+    
+    vol : array
+          Volume
+    '''
+    
+    if isinstance(filename, numpy.ndarray): return numpy.asarray(filename, dtype=numpy.float32)
+    if spi is not None: filename = spi.replace_ext(filename)
+    return numpy.asarray(ndimage_file.read_image(filename), dtype=numpy.float32)
+
+def write_volume(vol, filename, outputfile, spi=None):
+    ''' Write a volume processed in-process unless the input was in memory
+    
+    :Parameters:
+    
+    vol : array
+          Processed volume
+    filename : str or array
+               Input filename or volume
+    outputfile : str
+                 Output filename
+    spi : spider.Session, optional
+          Current SPIDER session, adds the data extension
+    
+    :Returns:
+    
+    outputfile : str or array
+                 Output filename or processed volume if the input was an array
+    '''
+    
+    if isinstance(filename, numpy.ndarray): return vol
+    ndimage_file.write_image(spi.replace_ext(outputfile) if spi is not None else outputfile, vol)
+    return outputfile
+
 def initialize(files, param):
     # Initialize global parameters for the script
     
@@ -90,6 +90,10 @@ Adaptive Tight Mask Options
 
     Resolution to pre-filter the volume before creating a tight mask (if 0, skip)
 
+.. option:: --native-mask
+
+    Mask in-process rather than with SPIDER
+
 Other Options
 =============
 
@@ -106,10 +110,10 @@ This is not a complete list of options available to this script, for additional
 '''
 from ..core.app import program
 from ..core.metadata import spider_params, spider_utility, format_utility
-from ..core.image import ndimage_utility, ndimage_file
+from ..core.image import ndimage_utility, ndimage_file, ndimage_filter
 from ..core.spider import spider, spider_file
 import filter_volume
-import logging, os
+import logging, os, numpy
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
@@ -141,13 +145,18 @@ def process(filename, output, **extra):
     mask_volume(filename1, output, mask_output=format_utility.add_prefix(output, "mask_"), **extra)
     return filename
 
-def mask_volume(filename, outputfile, spi, volume_mask='N', prefix=None, **extra):
+def mask_volume(filename, outputfile, spi, volume_mask='N', prefix=None, native_mask=False, **extra):
     ''' Mask a volume
     
+    The spherical masks, existing masks and the pre-filter of the adaptive tight
+    mask are applied with SPIDER unless `native_mask` is set. A volume given as an
+    array is always masked in-process.
+    
     :Parameters:
         
-        filename : str
-                   Filename of the input volume
+        filename : str or array
+                   Filename of the input volume or the volume (then the masked volume is returned,
+                   for spherical masks, no mask or an existing mask)
         outputfile : str
                      Filename for output masked volume
         spi : spider.Session
@@ -156,6 +165,8 @@ def mask_volume(filename, outputfile, spi, volume_mask='N', prefix=None, **extra
                       Set the type of mask: C for cosine and G for Gaussian and N for no mask and A for adaptive tight mask or a filename for external mask, F for solvent flattening, S to smooth
         prefix : str
                  Prefix for the mask output file
+        native_mask : bool
+                      Mask in-process rather than with SPIDER
         extra : dict
                 Unused keyword arguments
     
@@ -165,35 +176,88 @@ def mask_volume(filename, outputfile, spi, volume_mask='N', prefix=None, **extra
                      Filename for masked volume
     '''
     
-    if prefix is not None: outputfile = format_utility.add_prefix(outputfile, prefix)
+    if prefix is not None and outputfile is not None: outputfile = format_utility.add_prefix(outputfile, prefix)
     mask_type = volume_mask
     if mask_type.find(os.sep) != -1: mask_type = os.path.basename(mask_type)
     mask_type = mask_type.upper()
+    if isinstance(filename, numpy.ndarray):
+        if mask_type in ('C', 'G'): return spherical_mask(filename, outputfile, spi, mask_type, **extra)
+        elif mask_type in ('N', ''): return filename
+        elif mask_type in ('A', 'F', 'S'): raise ValueError, "Mask type %s requires a volume file not an array"%mask_type
+        return filename*filter_volume.read_volume(volume_mask)
     _logger.debug("Masking(%s): (%s) %s -> %s"%(mask_type, volume_mask, filename, outputfile))
     if mask_type == 'F':
         flatten(spi, spider.nonspi_file(spi, filename, outputfile), spi.replace_ext(outputfile), **extra)
     elif mask_type == 'A':
-        tightmask(spi, spider.nonspi_file(spi, filename, outputfile), spi.replace_ext(outputfile), **extra)
+        tightmask(spi, spider.nonspi_file(spi, filename, outputfile), spi.replace_ext(outputfile), native_mask=native_mask, **extra)
     elif mask_type == 'S':
         smooth(spi, spider.nonspi_file(spi, filename, outputfile), spi.replace_ext(outputfile), **extra)
     elif mask_type in ('C', 'G'):
-        spherical_mask(filename, outputfile, spi, mask_type, **extra)
+        spherical_mask(filename, outputfile, spi, mask_type, native_mask=native_mask, **extra)
     elif mask_type == 'N':
-        if outputfile != filename: spi.cp(filename, outputfile)
+        if outputfile != filename:
+            if native_mask and outputfile is not None: filter_volume.write_volume(filter_volume.read_volume(filename, spi), filename, outputfile, spi)
+            else: spi.cp(filename, outputfile)
     elif mask_type != "":
-        width = spi.fi_h(filename, ('NSAM', ))[0]
-        volume_mask = spider.copy_safe(spi, volume_mask, width)
-        spi.mu(filename, volume_mask, outputfile=outputfile)
+        mask = filter_volume.read_volume(volume_mask) if native_mask and outputfile is not None else None
+        vol = filter_volume.read_volume(filename, spi) if mask is not None else None
+        if mask is not None and mask.shape == vol.shape:
+            filter_volume.write_volume(vol*mask, filename, outputfile, spi)
+        else:
+            width = spi.fi_h(filename, ('NSAM', ))[0]
+            volume_mask = spider.copy_safe(spi, volume_mask, width)
+            spi.mu(filename, volume_mask, outputfile=outputfile)
     else: return filename
     return outputfile
 
-def spherical_mask(filename, outputfile, spi, volume_mask, mask_edge_width=10, pixel_diameter=None, **extra):
+def applied_mask(spi, shape, volume_mask='N', mask_output=None, mask_edge_width=10, pixel_diameter=None, **extra):
+    ''' Get the mask that :py:func:`mask_volume` applied to a volume
+    
+    :Parameters:
+        
+        spi : spider.Session
+              Current SPIDER session
+        shape : tuple
+                Shape of the masked volume
+        volume_mask : str, infile
+                      Set the type of mask: C for cosine and G for Gaussian and A for adaptive tight mask or a filename for external mask
+        mask_output : str
+                      Output filename for the adaptive tight mask
+        mask_edge_width : int
+                          Set edge with of the mask (for Gaussian this is the half-width)
+        pixel_diameter : int
+                         Diameter of the object in pixels
+        extra : dict
+                Unused keyword arguments
+    
+    :Returns:
+        
+        mask : array
+               Mask applied to the volume
+    '''
+    
+    mask_type = volume_mask
+    if mask_type.find(os.sep) != -1: mask_type = os.path.basename(mask_type)
+    mask_type = mask_type.upper()
+    if mask_type in ('N', '', 'F', 'S'): raise ValueError, "Mask type %s does not multiply the volume by a mask"%mask_type
+    if mask_type in ('C', 'G'):
+        if pixel_diameter is None: raise ValueError, "pixel_diameter must be set with SPIDER params files --param-file"
+        radius = pixel_diameter/2+mask_edge_width/2 if mask_type == 'C' else pixel_diameter/2+mask_edge_width
+        return ndimage_utility.model_soft_ball(radius, shape, mask_edge_width, mask_type)
+    if mask_type == 'A':
+        if mask_output is None: raise ValueError, "Adaptive tight mask requires mask_output"
+        mask = ndimage_file.read_image(spi.replace_ext(mask_output))
+    else: mask = filter_volume.read_volume(volume_mask)
+    if mask.shape != tuple(shape): raise ValueError, "Shape of mask does not match the volume: %s != %s"%(str(mask.shape), str(tuple(shape)))
+    return mask
+
+def spherical_mask(filename, outputfile, spi, volume_mask, mask_edge_width=10, pixel_diameter=None, native_mask=False, **extra):
     ''' Create a masked volume with a spherical mask
     
     :Parameters:
         
-        filename : str
-                   Filename of the input volume
+        filename : str or array
+                   Filename of the input volume or the volume (then the masked volume is returned)
         outputfile : str
                      Filename for output masked volume
         spi : spider.Session
@@ -204,6 +268,8 @@ def spherical_mask(filename, outputfile, spi, volume_mask, mask_edge_width=10, p
                           Set edge with of the mask (for Gaussian this is the half-width)
         pixel_diameter : int
                          Diameter of the object in pixels
+        native_mask : bool
+                      Mask in-process rather than with SPIDER
         extra : dict
                 Unused keyword arguments
     
@@ -213,12 +279,45 @@ def spherical_mask(filename, outputfile, spi, volume_mask, mask_edge_width=10, p
                      Filename for masked volume
     '''
     
-    if filename == outputfile: filename = spi.cp(filename)
     if pixel_diameter is None: raise ValueError, "pixel_diameter must be set with SPIDER params files --param-file"
-    width = spider.image_size(spi, filename)[0]/2+1
     radius = pixel_diameter/2+mask_edge_width/2 if volume_mask == 'C' else pixel_diameter/2+mask_edge_width
+    if native_mask and outputfile is not None or isinstance(filename, numpy.ndarray):
+        vol = filter_volume.read_volume(filename, spi)
+        return filter_volume.write_volume(soft_spherical_mask(vol, radius, mask_edge_width, volume_mask), filename, outputfile, spi)
+    if filename == outputfile: filename = spi.cp(filename)
+    width = spider.image_size(spi, filename)[0]/2+1
     return spi.ma(filename, radius, (width, width, width), volume_mask, 'C', mask_edge_width, outputfile=outputfile)
 
+def soft_spherical_mask(vol, radius, width, edge='C'):
+    ''' Apply a spherical mask with a soft edge in-process, equivalent to
+    SPIDER `MA` with the circumference average as background
+    
+    :Parameters:
+        
+        vol : array
+              Volume (or image)
+        radius : float
+                 Radius where the edge begins
+        width : float
+                Width of the cosine edge (C) or half-width of the Gaussian edge (G)
+        edge : str
+               Type of edge: C or G
+    
+    :Returns:
+        
+        out : array
+              Masked float32 volume
+    '''
+    
+    weight = ndimage_utility.model_soft_ball(radius, vol.shape, width, edge)
+    ring = ndimage_utility.model_soft_ball(radius+0.5, vol.shape, 0, 'D', dtype=numpy.bool)
+    ring &= ~ndimage_utility.model_soft_ball(radius-0.5, vol.shape, 0, 'D', dtype=numpy.bool)
+    background = vol[ring].mean() if numpy.any(ring) else 0.0
+    out = numpy.subtract(vol, background, dtype=numpy.float32)
+    out *= weight
+    out += background
+    return out
+
 def flatten(spi, filename, outputfile, threshold=0.0, apix=None, mask_output=None, **extra):
     ''' Tight mask the input volume and write to outputfile
     
@@ -300,7 +399,7 @@ def smooth(spi, filename, outputfile, ndilate=1, gk_size=3, gk_sigma=3.0, mask_o
     ndimage_file.write_image(outputfile, mask)
     return outputfile
 
-def tightmask(spi, filename, outputfile, threshold='A', ndilate=1, gk_size=3, gk_sigma=3.0, pre_filter=0.0, apix=None, mask_output=None, **extra):
+def tightmask(spi, filename, outputfile, threshold='A', ndilate=1, gk_size=3, gk_sigma=3.0, pre_filter=0.0, apix=None, mask_output=None, native_mask=False, **extra):
     ''' Tight mask the input volume and write to outputfile
     
     :Parameters:
@@ -325,6 +424,8 @@ def tightmask(spi, filename, outputfile, threshold='A', ndilate=1, gk_size=3, gk
                Pixel size
         mask_output : str
                       Output filename for the mask
+        native_mask : bool
+                      Pre-filter in-process rather than with SPIDER
         extra : dict
                 Unused keyword arguments
     
@@ -335,15 +436,18 @@ def tightmask(spi, filename, outputfile, threshold='A', ndilate=1, gk_size=3, gk
                      Output tight masked volume
     '''
     pref_filename=filename
+    img = None
     if pre_filter > 0.0:
         if apix is None and pre_filter > 0.5: raise ValueError, "Filtering requires SPIDER params file --param-file"
-        if apix is None and pre_filter < 0.5:
+        if not filter_volume.use_spider(native_mask, filename, ""):
+            img = ndimage_filter.filter_gaussian_lowpass(filter_volume.read_volume(filename), pre_filter if apix is None and pre_filter < 0.5 else apix/pre_filter)
+        elif apix is None and pre_filter < 0.5:
             pref_filename = spi.fq(filename, spi.GAUS_LP, filter_radius=pre_filter, outputfile=format_utility.add_prefix(mask_output, "prefilt_"))
         else: 
             pref_filename = spi.fq(filename, spi.GAUS_LP, filter_radius=apix/pre_filter, outputfile=format_utility.add_prefix(mask_output, "prefilt_"))
-        pref_filename = spi.replace_ext(pref_filename)
+        if img is None: pref_filename = spi.replace_ext(pref_filename)
     
-    img = ndimage_file.read_image(pref_filename)
+    if img is None: img = ndimage_file.read_image(pref_filename)
     
     mask = None
     if mask_output is not None and os.path.exists(spi.replace_ext(mask_output)):
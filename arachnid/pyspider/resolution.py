@@ -114,6 +114,14 @@ most experiments.
     Factor given here determines the FSCCRIT. Here 3.0 corresponds to the 3 sigma criterion i.e., 3/SQRT(N), 
     where N is number of voxels for a given shell.
 
+.. option:: --native-fsc
+    
+    Estimate the FSC with NumPy rather than SPIDER's `rf 3`, the curve is written to the same document file
+
+.. option:: --res-randomize <float>
+    
+    Native FSC: Resolution beyond which phases are randomized to correct the FSC for the mask, requires a resolution mask (if 0, skip)
+
 Other Options
 =============
 
@@ -129,7 +137,7 @@ This is not a complete list of options available to this script, for additional
 '''
 from ..core.app import program
 from ..core.util.matplotlib_nogui import pylab
-from ..core.image import ndimage_file
+from ..core.image import ndimage_file, ndimage_utility
 from ..core.metadata import format, format_utility, spider_utility, spider_params
 from ..core.util import fitting
 from ..core.spider import spider, spider_file
@@ -174,7 +182,7 @@ def process(filename, output, **extra):
     _logger.info(" - Resolution = %f - between %s and %s --- (0.5) = %.1f | (0.143) = %.1f"%(res, filename[0], filename[1], res1, res2))
     return filename, fsc, apix
 
-def estimate_resolution(filename1, filename2, spi, outputfile, resolution_mask='N', res_edge_width=3, res_threshold='A', res_ndilate=0, res_gk_size=3, res_gk_sigma=5.0, res_filter=0.0, dpi=None, disable_sigmoid=None, disable_scale=None, disable_gs=None, **extra):
+def estimate_resolution(filename1, filename2, spi, outputfile, resolution_mask='N', res_edge_width=3, res_threshold='A', res_ndilate=0, res_gk_size=3, res_gk_sigma=5.0, res_filter=0.0, native_fsc=False, res_randomize=0.0, dpi=None, disable_sigmoid=None, disable_scale=None, disable_gs=None, **extra):
     ''' Estimate the resolution from two half volumes
     
     :Parameters:
@@ -201,6 +209,10 @@ def estimate_resolution(filename1, filename2, spi, outputfile, resolution_mask='
                    Tight mask: Width of the real space Gaussian kernel
     res_filter : float
                  Resolution to pre-filter the volume before creating a tight mask (if 0, skip)
+    native_fsc : bool
+                 Estimate the FSC with NumPy rather than SPIDER's `rf 3` (does not need a SPIDER FSC run)
+    res_randomize : float
+                    Native FSC: Resolution beyond which phases are randomized to correct the FSC for the mask, requires a resolution mask (if 0, skip)
     dpi : int
           Dots per inch for output plot
     disable_sigmoid : bool
@@ -222,6 +234,7 @@ def estimate_resolution(filename1, filename2, spi, outputfile, resolution_mask='
     
     for val in "volume_mask,mask_edge_width,threshold,ndilate,gk_size,gk_sigma,prefix".split(','): 
         if val in extra: del extra[val]
+    if native_fsc and res_randomize > 0 and resolution_mask.upper() in ('N', ''): raise ValueError, "--res-randomize requires a mask, --resolution-mask cannot be N"
     
     extra.update(ensure_pixel_size(spi, filename1, **extra))
     mask_output = format_utility.add_prefix(outputfile, "mask_")
@@ -232,9 +245,27 @@ def estimate_resolution(filename1, filename2, spi, outputfile, resolution_mask='
         res_threshold1, res_threshold2 = res_threshold.split(',')
     else: 
         res_threshold1, res_threshold2 = res_threshold,res_threshold
+    inputs = (filename1, filename2)
     filename1 = mask_volume.mask_volume(filename1, outputfile, spi, resolution_mask, mask_edge_width=res_edge_width, threshold=res_threshold1, ndilate=res_ndilate, gk_size=res_gk_size, gk_sigma=res_gk_sigma, pre_filter=res_filter, prefix='res_mh1_', pixel_diameter=extra['pixel_diameter'], apix=extra['apix'], mask_output=mask_output, window=extra['window'])
     filename2 = mask_volume.mask_volume(filename2, outputfile, spi, resolution_mask, mask_edge_width=res_edge_width, threshold=res_threshold2, ndilate=res_ndilate, gk_size=res_gk_size, gk_sigma=res_gk_sigma, pre_filter=res_filter, prefix='res_mh2_', pixel_diameter=extra['pixel_diameter'], apix=extra['apix'], mask_output=mask_output, window=extra['window'])
-    dum,pres,sp = spi.rf_3(filename1, filename2, outputfile=outputfile, **extra)
+    if native_fsc:
+        randomized, shell = None, 0
+        if res_randomize > 0:
+            randomized = []
+            for i, filename in enumerate(inputs):
+                vol = ndimage_file.read_image(spi.replace_ext(filename))
+                shell = resolution_shell(res_randomize, extra['apix'], min(vol.shape))
+                mask = mask_volume.applied_mask(spi, vol.shape, resolution_mask, mask_output=mask_output, mask_edge_width=res_edge_width, pixel_diameter=extra['pixel_diameter'])
+                vol = ndimage_utility.randomize_phases(vol, shell, rng=numpy.random.RandomState(i))
+                vol *= mask
+                del mask
+                randomize_output = spi.replace_ext(format_utility.add_prefix(outputfile, "rand%d_"%(i+1)))
+                ndimage_file.write_image(randomize_output, vol)
+                del vol
+                randomized.append(randomize_output)
+        sp = estimate_fsc(spi.replace_ext(filename1), spi.replace_ext(filename2), spi.replace_ext(outputfile), randomized=randomized, randomize_shell=shell, **extra)
+    else:
+        dum,pres,sp = spi.rf_3(filename1, filename2, outputfile=outputfile, **extra)
     _logger.debug("Found resolution at spatial frequency: %f"%sp)
     vals = numpy.asarray(format.read(spi.replace_ext(outputfile), numeric=True, header="id,freq,dph,fsc,fscrit,voxels"))
     write_xml(os.path.splitext(outputfile)[0]+'.xml', vals[:, 1], vals[:, 3])
@@ -242,6 +273,68 @@ def estimate_resolution(filename1, filename2, spi, outputfile, resolution_mask='
         plot_fsc(format_utility.add_prefix(outputfile, "plot_"), vals[:, 1], vals[:, 3], extra['apix'], dpi, disable_sigmoid, 0.5, disable_scale, disable_gs)
     return sp, numpy.vstack((vals[:, 1], vals[:, 3])).T, extra['apix']
 
+def estimate_fsc(filename1, filename2, outputfile, noise_factor=3.0, randomized=None, randomize_shell=0, **extra):
+    ''' Estimate the Fourier shell correlation between two masked volumes with NumPy
+    
+    The FSC curve is written as a SPIDER document file with the same columns
+    as `rf 3`.
+    
+    :Parameters:
+    
+    filename1 : str
+                Filename of the first masked volume
+    filename2 : str
+                Filename of the second masked volume
+    outputfile : str
+                 Filename for output FSC document file
+    noise_factor : float
+                   Factor given here determines the FSCCRIT. Here 3.0 corresponds to the 3 sigma criterion i.e., 3/SQRT(N), 
+                   where N is number of voxels for a given shell.
+    randomized : tuple, optional
+                 Filenames of both volumes with phases randomized beyond `randomize_shell` and then multiplied by the mask applied to each half volume
+    randomize_shell : int
+                      First shell with random phases in the `randomized` volumes
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    sp : float
+         Spatial frequency where the FSC falls to 0.5
+    '''
+    
+    vol1 = ndimage_file.read_image(filename1)
+    vol2 = ndimage_file.read_image(filename2)
+    fsc, dph, voxels = ndimage_utility.fourier_shell_correlation_fast(vol1, vol2, full_output=True)
+    freq = numpy.arange(len(fsc))/float(min(vol1.shape))
+    del vol1, vol2
+    if randomized is not None and randomize_shell > 0:
+        fscn = ndimage_utility.fourier_shell_correlation_fast(ndimage_file.read_image(randomized[0]), ndimage_file.read_image(randomized[1]))[randomize_shell:]
+        fsc[randomize_shell:] = (fsc[randomize_shell:]-fscn)/numpy.maximum(1.0-fscn, 1e-6)
+    fscrit = noise_factor/numpy.sqrt(numpy.maximum(voxels/2.0, 1.0))
+    format.write(outputfile, numpy.vstack((freq, dph, fsc, fscrit, voxels)).T, header="freq,dph,fsc,fscrit,voxels".split(','), format=format.spiderdoc)
+    return fitting.fit_linear_interp(numpy.vstack((freq, fsc)).T, 0.5)
+
+def resolution_shell(resolution, apix, window):
+    ''' Convert a resolution to the index of a Fourier shell
+    
+    :Parameters:
+    
+    resolution : float
+                 Resolution in Angstroms
+    apix : float
+           Pixel size
+    window : int
+             Smallest dimension of the volume
+    
+    :Returns:
+    
+    shell : int
+            Index of the Fourier shell
+    '''
+    
+    return int(numpy.ceil(window*apix/resolution))
+
 def write_xml(output, x, y):
     '''
     '''
@@ -506,6 +599,8 @@ def check_options(options, main_option=False):
                 raise OptionValueError, "Requires even number of input files or volume pairs - found %d"%len(options.input_files)
             if not spider_utility.test_valid_spider_input(options.input_files[::2]):
                 raise OptionValueError, "Multiple input files must have numeric suffix, e.g. vol0001.spi"
+    if options.res_randomize > 0 and options.resolution_mask.upper() in ('N', ''):
+        raise OptionValueError, "--res-randomize requires a mask, --resolution-mask cannot be N"
 
 def main():
     #Main entry point for this script
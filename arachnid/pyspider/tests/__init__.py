@@ -0,0 +1,13 @@
+''' Unit testing for each module in :mod:`arachnid.pyspider`
+
+.. currentmodule:: arachnid.pyspider.tests
+
+.. autosummary::
+    :nosignatures:
+    :toctree: api_generated/
+    :template: api_module.rst
+    
+    test_filter_volume
+    test_mask_volume
+
+'''
@@ -0,0 +1,24 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import filter_volume
+from ...core.image import ndimage_filter
+from unittest import SkipTest
+import numpy, numpy.testing
+
+def test_filter_lowpass_gaussian():
+    '''
+    '''
+    
+    if ndimage_filter._spider_filter is None: raise SkipTest, "compiled _spider_filter module not available"
+    width, sigma = 64, 0.1
+    rng = numpy.random.RandomState(0)
+    y, x = numpy.mgrid[0:width, 0:width]
+    img = numpy.zeros((width, width), dtype=numpy.float32)
+    for i in xrange(8):
+        cy, cx = rng.uniform(width*0.3, width*0.7, 2)
+        img += numpy.exp(-((x-cx)**2+(y-cy)**2)/(2*rng.uniform(2, 4)**2))
+    expected = ndimage_filter.gaussian_lowpass(img, sigma)
+    out = filter_volume.filter_lowpass(img, sigma, 3)
+    numpy.testing.assert_allclose(out, expected, atol=1e-3*numpy.abs(expected).max())
@@ -0,0 +1,45 @@
+'''
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import mask_volume
+from ...core.image import ndimage_file
+import numpy, numpy.testing, os, shutil, tempfile
+
+def _volume(shape, seed=0):
+    rng = numpy.random.RandomState(seed)
+    return rng.rand(*shape).astype(numpy.float32)
+
+def test_mask_volume_hard_edge():
+    '''
+    '''
+    
+    shape, pixel_diameter = (40, 40), 20
+    radius = pixel_diameter/2
+    img = _volume(shape)+1.0
+    y, x = numpy.ogrid[0:shape[0], 0:shape[1]]
+    dist = numpy.hypot(y-shape[0]/2, x-shape[1]/2)
+    # Outside the mask is replaced by the average over the circumference
+    background = img[numpy.abs(dist-radius) <= 0.5].mean()
+    expected = numpy.where(dist <= radius, img, background)
+    for edge in 'CG':
+        out = mask_volume.mask_volume(img, None, None, edge, mask_edge_width=0, pixel_diameter=pixel_diameter)
+        numpy.testing.assert_allclose(out, expected, atol=1e-6)
+
+def test_mask_volume_file():
+    '''
+    '''
+    
+    path = tempfile.mkdtemp()
+    try:
+        vol = _volume((12, 13, 14))
+        mask = _volume(vol.shape, 1)
+        filename, maskfile = os.path.join(path, 'vol.spi'), os.path.join(path, 'mask.spi')
+        ndimage_file.write_image(filename, vol)
+        ndimage_file.write_image(maskfile, mask)
+        expected = ndimage_file.read_image(mask_volume.apply_mask(filename, os.path.join(path, 'ref.spi'), maskfile))
+        out = mask_volume.mask_volume(filename, os.path.join(path, 'out.spi'), None, maskfile, native_mask=True)
+        numpy.testing.assert_allclose(ndimage_file.read_image(out), expected, rtol=1e-6)
+        numpy.testing.assert_allclose(mask_volume.mask_volume(vol, None, None, maskfile), expected, rtol=1e-6)
+    finally:
+        shutil.rmtree(path)
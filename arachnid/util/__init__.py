@@ -15,4 +15,6 @@
     image_info
     coverage
     screenmics
+    startup_bench
+    kernel_bench
 '''
\ No newline at end of file
@@ -1,7 +1,12 @@
 ''' Benchmark particle selection
 
 This script (`ara-bench`) is designed to benchmark particle selection against another
-program or human.
+program or human. Picked coordinates are matched to the benchmark coordinates with
+a KD-tree (see :py:func:`arachnid.core.learn.distance.match_points`).
+
+The pickers can also be scored on synthetic micrographs with known particle
+positions using :py:func:`synthetic_benchmark`, or from the command line with
+`ara-kernelbench picking`.
 
 Notes
 =====
@@ -102,6 +107,8 @@ This is not a complete list of options available to this script, for additional
 from ..core.app import program
 from ..core.metadata import format_utility, format, spider_utility
 from ..core.parallel import mpi_utility
+from ..core.learn import distance
+from ..core.image import ndimage_utility
 import os, logging
 import numpy
 
@@ -236,19 +243,99 @@ def find_overlap(coords, benchmark, pixel_radius, bench_mult=1.2, **extra):
     '''
     
     assert(benchmark.shape[1] == 2)
-    benchmark=benchmark.copy()
-    rad = pixel_radius*bench_mult
-    pixel_radius = rad*rad
-    selected = []
-    if len(benchmark) > 0:
-        for i, f in enumerate(coords):
-            dist = f-benchmark
-            numpy.square(dist, dist)
-            dist = numpy.sum(dist, axis=1)
-            if dist.min() < pixel_radius:
-                benchmark[dist.argmin(), :]=(1e20, 1e20)
-                selected.append((i+1, 1))
-    return selected
+    index = distance.match_points(coords, benchmark, pixel_radius*bench_mult)[0]
+    return [(i+1, 1) for i in index]
+
+def synthetic_micrograph(shape, count, pixel_diameter, noise=2.0, rng=None):
+    ''' Generate a micrograph of non-overlapping disks in Gaussian noise
+    
+    :Parameters:
+    
+        shape : tuple
+                Shape of the micrograph
+        count : int
+                Number of particles to place (fewer are placed if the micrograph is full)
+        pixel_diameter : int
+                         Diameter of a particle in pixels
+        noise : float
+                Standard deviation of the noise (the disks have unit height)
+        rng : RandomState, optional
+              Random number generator
+    
+    :Returns:
+    
+        mic : array
+              Micrograph
+        coords : array
+                 Center (x,y) of each particle
+    '''
+    
+    if rng is None: rng = numpy.random.RandomState(0)
+    width = int(pixel_diameter)
+    disk = ndimage_utility.model_disk(width/2, (2*width, 2*width)).astype(numpy.float32)
+    mic = rng.normal(0, noise, shape).astype(numpy.float32)
+    coords = numpy.zeros((0, 2))
+    for i in xrange(count*20):
+        if len(coords) >= count: break
+        xy = numpy.asarray([rng.randint(2*width, shape[1]-2*width), rng.randint(2*width, shape[0]-2*width)])
+        if len(coords) > 0 and distance.any_within(xy[numpy.newaxis], coords, pixel_diameter*1.1)[0]: continue
+        coords = numpy.vstack((coords, xy))
+        mic[xy[1]-width:xy[1]+width, xy[0]-width:xy[0]+width] += disk
+    return mic, coords
+
+def synthetic_benchmark(programs=['autopick', 'lfcpick'], count=300, size=2048, pixel_diameter=48, micrographs=1, noise=2.0, bench_mult=1.2, **extra):
+    ''' Benchmark particle pickers on synthetic micrographs with known particle positions
+    
+    Each picker runs with its default options (the search function of the script is
+    called directly on the micrograph), and the picks are scored against the true
+    positions with :py:func:`find_overlap`.
+    
+    :Parameters:
+    
+        programs : list
+                   Name of each picking script in `arachnid.app`
+        count : int
+                Number of particles in each micrograph
+        size : int
+               Width of each micrograph
+        pixel_diameter : int
+                         Diameter of a particle in pixels
+        micrographs : int
+                      Number of micrographs
+        noise : float
+                Standard deviation of the noise
+        bench_mult : float
+                     Amount of allowed overlap (pixel_radius*bench_mult)
+        extra : dict
+                Options passed to every picker
+    
+    :Returns:
+    
+        results : list
+                  Tuples (program, precision, recall, seconds, particles)
+    '''
+    
+    import importlib, time
+    from ..core.app import program
+    rng = numpy.random.RandomState(0)
+    mics = [synthetic_micrograph((size, size), count, pixel_diameter, noise, rng) for i in xrange(micrographs)]
+    results = []
+    for name in programs:
+        module = importlib.import_module('arachnid.app.'+name)
+        param = vars(program.setup_parser(module, None)[0].get_default_values())
+        param.update(pixel_diameter=pixel_diameter, window=int(pixel_diameter*1.4), bin_factor=1.0, apix=1.0)
+        param['mask'] = ndimage_utility.model_disk(pixel_diameter/2, (param['window'], param['window']))
+        param.update(extra)
+        conf = numpy.zeros(4)
+        elapsed = 0.0
+        for mic, coords in mics:
+            beg = time.time()
+            peaks = numpy.asarray(module.search(mic.copy(), **param)).reshape((-1, 3))
+            elapsed += time.time()-beg
+            overlap = find_overlap(peaks[:, 1:3], coords, pixel_diameter/2, bench_mult)
+            conf += (len(overlap), len(peaks)-len(overlap), 0, len(coords)-len(overlap))
+        results.append((name, precision(*conf), recall(*conf), elapsed, int(conf[0]+conf[3])))
+    return results
 
 def precision(tp, fp, tn, fn):
     ''' Estimate the precision from a confusion matrix
@@ -311,16 +311,13 @@ def scatterEuler3d(fig, angs, cnt, color_map='cool', hide_zero_marker=False, **e
         nhist/=nhist.max()
     
     ax = mplot3d.Axes3D(fig)
-    data = numpy.zeros((len(angs), 3))
-    for i in xrange(len(angs)):
-        if i == 0: print angs[i, :]
-        data[i, :] = spider_transforms.euler_to_vector(*angs[i, :])
-    nonzero = numpy.nonzero(cnt)
-    ax.scatter3D(data[nonzero, 0].ravel(), data[nonzero, 1].ravel(), data[nonzero, 2].ravel(), c=nhist, cmap=cmap)
+    data = numpy.column_stack(spider_transforms.euler_to_vector(angs[:, 0], angs[:, 1]))
+    nonzero = numpy.nonzero(cnt)[0]
+    ax.scatter3D(data[nonzero, 0], data[nonzero, 1], data[nonzero, 2], c=nhist[nonzero], cmap=cmap)
     if not hide_zero_marker:
-        nonzero = numpy.nonzero(cnt==0)
+        nonzero = numpy.nonzero(cnt==0)[0]
         if len(nonzero) > 0:
-            ax.scatter3D(data[nonzero, 0].ravel(), data[nonzero, 1].ravel(), data[nonzero, 2].ravel(), color=cm.gray(0.5), marker='x') # @UndefinedVariable
+            ax.scatter3D(data[nonzero, 0], data[nonzero, 1], data[nonzero, 2], color=cm.gray(0.5), marker='x') # @UndefinedVariable
         
 def chimera_bild(angs, cnt, output, particle_diameter=60.0, particle_center=0.0, radius_frac=1.0, width_frac=0.5, color_map='cool', view_resolution=3, **extra):
     '''Write out angular histogram has a Chimera BILD file
@@ -352,27 +349,56 @@ def chimera_bild(angs, cnt, output, particle_diameter=60.0, particle_center=0.0,
     #double offset = ori_size * pixel_size / 2.;
     cmap = getattr(cm, color_map)
     output = os.path.splitext(output)[0]+'.bild'
-    fout = open(output, 'w')
-    maxcnt = cnt.max()
+    val = cnt/float(cnt.max())
     
     particle_radius = particle_diameter/2.0
     width = width_frac * numpy.pi*particle_radius/healpix.sampling(view_resolution)
+    vec = numpy.column_stack(spider_transforms.euler_to_vector(angs[:, 0], angs[:, 1]))
+    length = particle_radius + radius_frac * particle_radius * val
+    diff = (particle_radius-length)[:, numpy.newaxis]*vec
+    visible = numpy.any(numpy.abs(diff) >= 0.01, axis=1)
+    fout = open(output, 'w')
     try:
-        for i in xrange(len(angs)):
-            val = cnt[i]/float(maxcnt)
-            r, g, b = cmap(val)[:3]
-            fout.write('.color %f %f %f\n'%(r, g, b))
-            
-            v1,v2,v3 = spider_transforms.euler_to_vector(*angs[i, :])
-            length = particle_radius + radius_frac * particle_radius * val;
-            diff = particle_radius-length
-            if abs(diff*v1) < 0.01 and abs(diff*v2) < 0.01 and abs(diff*v3) < 0.01: continue
-            fout.write('.cylinder %f %f %f %f %f %f %d\n'%(particle_radius*v1+particle_center, particle_radius*v2+particle_center, particle_radius*v3+particle_center,
-                                               length*v1+particle_center, length*v2+particle_center, length*v3+particle_center,
-                                               width))
+        write_bild(fout, cmap(val)[:, :3], particle_radius*vec+particle_center, length[:, numpy.newaxis]*vec+particle_center, width, visible)
     finally:
         fout.close()
 
+def write_bild(fout, color, start, end, width, visible=None, block_size=65536):
+    ''' Write a set of colored cylinders to a Chimera BILD file
+    
+    Each cylinder is written as a `.color` line followed by a `.cylinder` line,
+    the lines of a block of cylinders are formatted with a single string
+    operation and written at once.
+    
+    :Parameters:
+        
+        fout : file
+               Output file stream
+        color : array
+                RGB color of each cylinder (n, 3)
+        start : array
+                Start point of each cylinder (n, 3)
+        end : array
+              End point of each cylinder (n, 3)
+        width : float
+                Width of the cylinders
+        visible : array, optional
+                  Write only the color of the cylinders marked False
+        block_size : int
+                     Number of cylinders formatted at a time
+    '''
+    
+    colorfmt = '.color %f %f %f\n'
+    cylfmt = colorfmt+'.cylinder %f %f %f %f %f %f %d\n'
+    if visible is None: visible = numpy.ones(len(color), dtype=numpy.bool)
+    values = numpy.column_stack((color, start, end, numpy.repeat(width, len(color))))
+    mask = numpy.ones(values.shape, dtype=numpy.bool)
+    mask[numpy.logical_not(visible), 3:] = False
+    for beg in xrange(0, len(values), block_size):
+        end = min(beg+block_size, len(values))
+        fmt = "".join(numpy.where(visible[beg:end], cylfmt, colorfmt).tolist())
+        fout.write(fmt%tuple(values[beg:end][mask[beg:end]].tolist()))
+
 def plot_angles(angs, hist, mapargs, color_map='cool', area_mult=1.0, alpha=0.9, hide_zero_marker=False, use_scale=False, label_view=[], **extra):
     ''' Plot the angular histogram using a map projection from basemap
     
@@ -552,15 +578,11 @@ def angular_histogram(angs, view_resolution=3, disable_mirror=False, use_mirror=
     
     
     pix = healpix.ang2pix(view_resolution, numpy.deg2rad(angs))#,  half=not disable_mirror)
-    count1 = numpy.bincount(pix)
-    
-    count = numpy.zeros(total, dtype=numpy.int)
-    sel = numpy.nonzero(count1)[0]
-    count[sel] = count1[sel]
+    count = numpy.bincount(pix, minlength=total).astype(numpy.int)
     pix = numpy.arange(total, dtype=numpy.int)
     
     if not disable_mirror:
-        mpix = healpix.pix2mirror(view_resolution, pix)
+        mpix = healpix.pix2mirror(view_resolution, pix).astype(numpy.int)
         for i in xrange(len(pix)):
             if i == mpix[i]: continue
             count[i] += count[mpix[i]]
@@ -193,21 +193,20 @@ def remap_enum_files(files, mapping_file, strict=False):
     
     mapped = format.read(mapping_file, numeric=True)
     mapped = [tuple(m) for m in mapped]
+    index_map, duplicates = index_mapping(mapped)
     newmapping=[]
     index = len(mapped)+1
-    flag=True
+    unresolved = None
     for filename in files:
-        basename = os.path.basename(filename)
-        if os.path.splitext(basename)[1] == '.bz2': basename = os.path.splitext(basename)[0]
-        found=[]
-        for pair in mapped:
-            mapbase = os.path.basename(pair[0]) #os.path.splitext()[0]
-            if os.path.splitext(mapbase)[1] == '.bz2': mapbase = os.path.splitext(mapbase)[0]
-            if flag:
-                _logger.debug("Example: %s == %s"%(basename, mapbase))
-                flag=False
-            if mapbase.find(basename) != -1 or basename.find(mapbase) != -1:
-                found.append(pair)
+        basename = normalize_basename(filename)
+        if basename in duplicates:
+            found = duplicates[basename]
+        elif basename in index_map:
+            found = [index_map[basename]]
+        else:
+            # Fall back to substring matching for names that differ by a prefix or suffix
+            if unresolved is None: unresolved = [(normalize_basename(pair[0]), pair) for pair in mapped]
+            found = [pair for mapbase, pair in unresolved if mapbase.find(basename) != -1 or basename.find(mapbase) != -1]
         if len(found) == 1:
             pair = found[0]
             newmapping.append((filename, pair[1]))
@@ -217,17 +216,106 @@ def remap_enum_files(files, mapping_file, strict=False):
         elif not strict:
             newmapping.append((filename, index))
             index += 1
-            #_logger.error('Filename not found in mapping: %s'%filename)
-            #raise ValueError, 'Filename not found in mapping: %s'%filename
     if len(newmapping) < len(mapped):
         _logger.warn("New mapping smaller than original: %d < %d"%(len(newmapping), len(mapped)))
     if len(newmapping) > len(mapped):
         _logger.warn("New mapping larger than original: %d > %d"%(len(newmapping), len(mapped)))
     return newmapping
 
+def normalize_basename(filename):
+    ''' Basename of a file without the compression extension (.bz2)
+    
+    :Parameters:
+    
+        filename : str
+                   Filename
+    
+    :Returns:
+    
+        basename : str
+                   Normalized basename
+    '''
+    
+    basename = os.path.basename(filename)
+    if os.path.splitext(basename)[1] == '.bz2': basename = os.path.splitext(basename)[0]
+    return basename
+
+def index_mapping(mapped):
+    ''' Index a mapping by the normalized basename of each filename
+    
+    :Parameters:
+    
+        mapped : list
+                 List of tuples mapping filename to id
+    
+    :Returns:
+    
+        index_map : dict
+                    Map normalized basename to a unique pair
+        duplicates : dict
+                     Map normalized basename to every pair sharing it
+    '''
+    
+    index_map = {}
+    duplicates = {}
+    for pair in mapped:
+        basename = normalize_basename(pair[0])
+        if basename in duplicates:
+            duplicates[basename].append(pair)
+        elif basename in index_map:
+            duplicates[basename] = [index_map.pop(basename), pair]
+        else:
+            index_map[basename] = pair
+    return index_map, duplicates
+
+def list_directories(filenames):
+    ''' Snapshot the entries of each directory holding the given files
+    
+    :Parameters:
+    
+        filenames : list
+                    List of filenames
+    
+    :Returns:
+    
+        entries : dict
+                  Map directory to the set of its entries, None if it cannot be listed
+    '''
+    
+    entries = {}
+    for filename in filenames:
+        path = os.path.dirname(filename)
+        if path in entries: continue
+        try: entries[path] = set(os.listdir(path if path != "" else "."))
+        except OSError: entries[path] = None
+    return entries
+
+def _exists(filename, entries):
+    ''' Test if a file exists using a directory snapshot, see :py:func:`list_directories`
+    
+    :Parameters:
+    
+        filename : str
+                   Filename
+        entries : dict
+                  Map directory to the set of its entries
+    
+    :Returns:
+    
+        flag : bool
+               True if the file is listed in its directory
+    '''
+    
+    listing = entries.get(os.path.dirname(filename))
+    if listing is None: return os.path.lexists(filename)
+    return os.path.basename(filename) in listing
+
 def generate_enum_links(mapped, output, test_image=False):
     ''' Generate a set of enumerated softlinks
     
+    The input and output directories are each listed once rather than testing
+    every file and link with a separate system call.
+    
     :Parameters:
     
         mapped : list
@@ -241,26 +329,34 @@ def generate_enum_links(mapped, output, test_image=False):
     if not os.path.exists(os.path.dirname(output)):
         try: os.makedirs(os.path.dirname(output))
         except: pass
+    entries = list_directories([filename for filename, fid in mapped]+[output])
+    links = entries[os.path.dirname(output)]
+    if links is None: links = set()
     for filename, fid in mapped:
         link = spider_utility.spider_filename(output, fid)
-        if os.path.exists(filename):
-            if os.path.exists(link):
+        linkname = os.path.basename(link)
+        if _exists(filename, entries):
+            source = os.path.abspath(filename)
+            if linkname in links:
                 linkedfilename = os.readlink(link)
-                if os.path.abspath(linkedfilename) != os.path.abspath(filename):
-                    #_logger.warn("Relinking %s because %s does not match original link %s -- this will cause other programs to restart in Arachnid"%(link, filename, linkedfilename))
+                if os.path.abspath(linkedfilename) != source:
                     try:os.unlink(link)
                     except: pass
-            else:
-                os.symlink(os.path.abspath(filename), link)
+                    else: links.discard(linkname)
+            if linkname not in links:
+                os.symlink(source, link)
+                links.add(linkname)
             if test_image and not ndimage_file.is_readable(filename):
                 _logger.warn("Unlinking %s because %s is not a valid image"%(link, filename))
                 try:os.unlink(link)
                 except: pass
+                else: links.discard(linkname)
                 continue
         else:
             _logger.warn("Unlinking %s because %s does not exist"%(link, filename))
             try:os.unlink(link)
             except: pass
+            else: links.discard(linkname)
 
 def rename_mapped_files(mapped, output, test_image=False):
     ''' Generate a set of enumerated softlinks
@@ -42,9 +42,32 @@ These options
     
 .. option:: -s, --stat
     
-    Calculate and displays simple statistics for each image,
-    which include: mean, standard deviation, max, min and
-    number of unique values.
+    Calculate and displays simple statistics for each stack,
+    which include: mean, standard deviation, min, max, number
+    of NaN/Inf values and quantiles. With `--all`, the statistics
+    of each image are also displayed (including the number of 
+    unique values). The stacks are split into ranges of images
+    processed in parallel by `--thread-count` processes.
+
+.. option:: --stat-output <FILENAME>
+    
+    Output filename for a table (e.g. STAR or CSV) with the statistics
+    of each image, the statistics of each stack and all stacks
+    are written to the same filename with the prefix `summary_`
+
+.. option:: --quantiles <LIST>
+    
+    List of percentiles calculated for each image and estimated 
+    for each stack (Default: 1,50,99)
+
+.. option:: --chunk-size <INT>
+    
+    Number of images in each range processed by a worker (Default: 1000)
+
+.. option:: --sample-size <INT>
+    
+    Maximum number of pixel values sampled to estimate the quantiles
+    of a stack (Default: 100000)
     
 .. option:: -f, --force
     
@@ -63,12 +86,15 @@ This is not a complete list of options available to this script, for additional
 '''
 from ..core.app import program
 from ..core.image import ndimage_file
-import logging, os, numpy
+from ..core.image import ndimage_stats
+from ..core.metadata import format, format_utility
+import multiprocessing
+import logging, os
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
-def batch(files, output="", all=False, stat=False, force=False, offset=0, **extra):
+def batch(files, output="", all=False, stat=False, force=False, offset=0, stat_output="", quantiles=[1.0, 50.0, 99.0], thread_count=1, **extra):
     ''' Retrieve information from the header of an image
     
     :Parameters:
@@ -81,10 +107,19 @@ def batch(files, output="", all=False, stat=False, force=False, offset=0, **extr
            Calculate statistics of the image
     force : bool
             If EMAN2 is available, use its image formats (override internal spider and mrc formats)
+    stat_output : str
+                  Output filename for a table with the statistics of each image
+    quantiles : list
+                Percentiles calculated for each image and estimated for each stack
+    thread_count : int
+                   Number of processes used to calculate the statistics, 0 means determine from environment
     extra : dict
             Unused key word arguments
     '''
     
+    if stat:
+        if thread_count < 1: thread_count = multiprocessing.cpu_count()
+        rows, summary = ndimage_stats.stack_statistics(files, thread_count, quantiles=quantiles, count_unique=all, **extra)
     for i, filename in enumerate(files):
         if force and ndimage_file.eman_format.is_avaliable() and ndimage_file.eman_format.is_readable(filename):
             header = ndimage_file.eman_format.read_header(filename)
@@ -98,20 +133,60 @@ def batch(files, output="", all=False, stat=False, force=False, offset=0, **extr
             for key, val in header.iteritems():
                 print key, ": ", val
             if stat:
-                for img in ndimage_file.iter_images(filename):
-                    print "Mean: ", numpy.mean(img)
-                    print "STD: ", numpy.std(img)
-                    print "Max: ", numpy.max(img)
-                    print "Min: ", numpy.min(img)
-                    print "Unique: ", len(numpy.unique(img))
+                for row in rows[filename]:
+                    print "Mean: ", row[2]
+                    print "STD: ", row[3]
+                    print "Max: ", row[5]
+                    print "Min: ", row[4]
+                    print "NaN: ", int(row[6])
+                    print "Inf: ", int(row[7])
+                    print "Unique: ", int(row[8])
         else:
             if i == 0:
                 header_name = dict([(k, k) for k in header.iterkeys()])
                 print '{name:50}  {nx:3} {ny:3} {nz:3} {count:7} {apix:7}'.format(**header_name)
             print '{name:50} {nx:3d} {ny:3d} {nz:3d} {count:7d} {apix:7.2f}'.format(**header)
-       
+    if stat:
+        print '{0:50} {1:>12} {2:>12} {3:>12} {4:>12} {5:>7} {6:>7}'.format('name', 'mean', 'std', 'min', 'max', 'nan', 'inf')
+        for filename in files+[None]:
+            stats = summary[filename]
+            name = os.path.basename(filename) if filename is not None else 'all'
+            print '{0:50} {1:12.5g} {2:12.5g} {3:12.5g} {4:12.5g} {5:7d} {6:7d}'.format(name, stats.mean, stats.std, stats.minimum, stats.maximum, stats.nan, stats.inf)
+        if stat_output != "": write_statistics(stat_output, files, rows, summary, quantiles, all)
     _logger.info("Complete")
 
+def write_statistics(output, files, rows, summary, quantiles, count_unique=False):
+    ''' Write the statistics of each image and each stack to a table
+    
+    :Parameters:
+    
+    output : str
+             Output filename for the statistics of each image, the summary is 
+             written with the prefix `summary_`
+    files : list
+            List of stack filenames
+    rows : dict
+           Statistics of each image mapped to the stack filename
+    summary : dict
+              Statistics of each stack mapped to the filename and of all stacks mapped to None
+    quantiles : list
+                Percentiles calculated for each image
+    count_unique : bool
+                   Per image statistics include the number of unique values
+    '''
+    
+    qheader = ["q%s"%(str(q).replace('.', '_')) for q in quantiles]
+    header = "filename,id,count,mean,std,min,max,nan,inf".split(',')
+    if count_unique: header.append('unique')
+    values = []
+    for filename in files:
+        for row in rows[filename]:
+            values.append([filename, int(row[0]), int(row[1])]+list(row[2:6])+[int(v) for v in row[6:8]]+list(row[8:]))
+    format.write(output, format_utility.create_namedtuple_list(values, "ImageStat", header+qheader), header=header+qheader)
+    header = "filename,count,mean,std,min,max,nan,inf".split(',')
+    values = [[filename if filename is not None else 'all']+ndimage_stats.summary_row(summary[filename], quantiles) for filename in files+[None]]
+    format.write(output, format_utility.create_namedtuple_list(values, "StackStat", header+qheader), header=header+qheader, prefix="summary_")
+
 def setup_options(parser, pgroup=None, main_option=False):
     ''' Add options to OptionParser for application
     
@@ -129,6 +204,10 @@ def setup_options(parser, pgroup=None, main_option=False):
     group = OptionGroup(parser, "Image information", "Retrieve information from the header of an image",  id=__name__)
     group.add_option("-a", all=False,                     help="Show all the information contained in the header. Note the output format changes.")
     group.add_option("-s", stat=False,                    help="Calculate and displays simple statistics for each image, which include: mean, standard deviation, max, min and number of unique values.")
+    group.add_option("", stat_output="",                 help="Output filename for a table (e.g. STAR or CSV) with the statistics of each image, the statistics of each stack are written with the prefix summary_", gui=dict(filetype="save"))
+    group.add_option("", quantiles=[1.0, 50.0, 99.0],    help="List of percentiles calculated for each image and estimated for each stack")
+    group.add_option("", chunk_size=1000,                help="Number of images in each range processed by a worker")
+    group.add_option("", sample_size=100000,             help="Maximum number of pixel values sampled to estimate the quantiles of a stack")
     group.add_option("-n", offset=0,                      help="Read header of given index in stack - 0 mean global header")
     if ndimage_file.eman_format.is_avaliable():
         group.add_option("-f", force=False,               help="Use EMAN2/Sparx formats (if available) instead of internal image formats: SPIDER and MRC")
@@ -150,6 +229,7 @@ def main():
                          $ ara-info image.spi
                       ''',
         supports_MPI = False,
+        supports_OMP = True,
         use_version = False,
     )
 def dependents(): return []
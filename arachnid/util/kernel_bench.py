@@ -0,0 +1,811 @@
+''' Micro-benchmarks for the numerical kernels of Arachnid
+
+This script (`ara-kernelbench`) times a kernel on synthetic data and compares
+it with the code path it replaces, reporting the cost per item of each
+implementation and the largest difference between their results.
+
+Examples
+========
+
+.. sourcecode:: sh
+
+    # List the available benchmarks
+
+    $ ara-kernelbench --list
+
+    # Compare batched phase flipping to the per-particle path
+
+    $ ara-kernelbench phaseflip -c 2000 -s 128
+
+    # Evaluations per second of the 2D CTF astigmatism grid
+
+    $ ara-kernelbench ctfgrid -c 20000 -s 256
+
+    # Peak search on an 8k x 8k correlation map with 5,000 peaks
+
+    $ ara-kernelbench peaks -c 5000 -s 8192 -r 1
+    
+    # Match 100,000 picked coordinates to a benchmark with a KD-tree
+    
+    $ ara-kernelbench overlap -c 100000 -s 48 -r 1
+    
+    # Score autopick and lfcpick on a synthetic 2048 x 2048 micrograph
+    
+    $ ara-kernelbench picking -c 300 -s 2048
+    
+    # Compare the cascaded and exhaustive LFCPick searches on a synthetic 4096 x 4096 micrograph
+    
+    $ ara-kernelbench cascade -c 1200 -s 4096
+    
+    # Threshold 1,000,000 particles by view (768 views, healpix resolution 3)
+    
+    $ ara-kernelbench viewselect -c 1000000 -r 1
+    
+    # spi-classify on 1,000,000 particles (768 views) with and without --reject-by-view
+    
+    $ ara-kernelbench viewreject -c 1000000 -r 1
+    
+    # Read a 1,000,000 row SPIDER alignment document and convert it to 3D parameters
+    
+    $ ara-kernelbench alignread -c 1000000 -r 1
+    
+    # Power spectra and rotational averages of 10 micrographs in memory and in SPIDER
+    
+    $ ara-kernelbench powerspec -c 10 -s 256 --spider-path /guam.raid.cluster.software/spider.21.00/
+    
+    # Low-pass filter and mask four 128^3 volumes in-process and in SPIDER
+    
+    $ ara-kernelbench volfilter -c 4 -s 128 --spider-path /guam.raid.cluster.software/spider.21.00/
+    
+    # Angular histogram and Chimera BILD file of 5,000,000 orientations (healpix resolution 5)
+    
+    $ ara-kernelbench coverage -c 5000000 -r 1
+
+Options
+=======
+
+.. program:: ara-kernelbench
+
+.. option:: --list
+
+    List the available benchmarks
+
+.. option:: -c <int>, --count <int>
+
+    Number of items (e.g. particles) to process
+
+.. option:: -s <int>, --size <int>
+
+    Size of each item (e.g. width of a particle image)
+
+.. option:: -r <int>, --repeat <int>
+
+    Number of times to run each implementation, the best time is reported
+
+.. option:: --spider-path <FILENAME>
+
+    File path to the SPIDER executable (volfilter, powerspec), SPIDER is skipped if not found
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+import logging
+import optparse
+import numpy
+import time
+import sys
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+def best_time(func, repeat=3):
+    ''' Time a function, keeping the fastest run
+
+    :Parameters:
+
+    func : function
+           Function without arguments to time
+    repeat : int
+             Number of times to run the function
+
+    :Returns:
+
+    elapsed : float
+              Fastest run in seconds
+    out : object
+          Return value of the last run
+    '''
+
+    elapsed = None
+    out = None
+    for i in xrange(max(1, repeat)):
+        beg = time.time()
+        out = func()
+        cur = time.time()-beg
+        if elapsed is None or cur < elapsed: elapsed = cur
+    return elapsed, out
+
+def bench_phaseflip(count=1000, size=128, repeat=3, defocus_bin=10.0, **extra):
+    ''' Compare the batched phase flip to the per-particle path
+
+    :Parameters:
+
+    count : int
+            Number of particles
+    size : int
+           Width of a particle image
+    repeat : int
+             Number of times to run each implementation
+    defocus_bin : float
+                  Width of a defocus bin in Angstroems
+    extra : dict
+            Unused keyword arguments
+
+    :Returns:
+
+    results : list
+              List of tuples (name, seconds per item)
+    error : float
+            Largest absolute difference between the implementations
+    '''
+
+    from ..core.image.ctf import correct
+    from ..core.image import preprocess_utility
+    param = dict(cs=2.0, ampcont=0.1, voltage=300.0, apix=1.5)
+    rng = numpy.random.RandomState(0)
+    stack = rng.randn(count, size, size).astype(numpy.float32)
+    align = numpy.zeros((count, 18))
+    align[:, -1] = rng.uniform(10000, 40000, count)
+
+    def per_particle():
+        out = numpy.empty_like(stack)
+        for i in xrange(count): out[i] = preprocess_utility.phaseflip(stack[i], i, align, **param)
+        return out
+    def batched():
+        correct._transfer_function_cache.clear()
+        return correct.phase_flip_stack(stack, align[:, -1], defocus_bin=defocus_bin, **param)
+
+    t0, ref = best_time(per_particle, repeat)
+    t1, out = best_time(batched, repeat)
+    error = numpy.max(numpy.abs(ref-out)) if defocus_bin <= 0 else numpy.nan
+    return [('preprocess_utility.phaseflip', t0/count), ('correct.phase_flip_stack', t1/count)], error
+
+def bench_ctfgrid(count=1000, size=128, repeat=3, **extra):
+    ''' Compare the vectorized astigmatism grid to scoring each point
+
+    :Parameters:
+
+    count : int
+            Number of (df1, df2, angast) candidates
+    size : int
+           Width of the power spectrum
+    repeat : int
+             Number of times to run each implementation
+    extra : dict
+            Unused keyword arguments
+
+    :Returns:
+
+    results : list
+              List of tuples (name, seconds per item)
+    error : float
+            Largest absolute difference between the implementations
+    '''
+
+    from ..core.image.ctf import estimate2d
+    rng = numpy.random.RandomState(0)
+    pow = rng.rand(size, size/2).astype(numpy.float32)
+    wl = 12.26/numpy.sqrt(300e3+0.9785*300e3**2/10.0**6.0)
+    cs, wgh, apix = 2.0*10**7.0, 0.1, 1.5
+    thetatr = wl/(apix*size)
+    rmin2, rmax2 = (apix/30.0)**2, (apix/5.0)**2
+    hw = -1.0/rmax2
+    params = numpy.column_stack((rng.uniform(10000, 40000, count), rng.uniform(10000, 40000, count), rng.uniform(0, numpy.pi/2, count)))
+
+    def batched():
+        points = estimate2d.prepare_model_2d(pow, thetatr, rmin2, rmax2, hw)
+        return estimate2d.eval_model_2d_batch(params, points, cs, wl, wgh)
+    def per_point():
+        return numpy.asarray([estimate2d.eval_model_2d(p[0], p[1], p[2], pow, cs, wl, wgh, thetatr, rmin2, rmax2, hw) for p in params])
+
+    results = []
+    error = numpy.nan
+    t1, out = best_time(batched, repeat)
+    if estimate2d._ctf is not None:
+        t0, ref = best_time(per_point, repeat)
+        results.append(('estimate2d.eval_model_2d', t0/count))
+        error = numpy.max(numpy.abs(ref-out))
+    else: _logger.warn("Compiled _ctf module not available - skipping estimate2d.eval_model_2d")
+    results.append(('estimate2d.eval_model_2d_batch', t1/count))
+    return results, error
+
+def bench_peaks(count=5000, size=8192, repeat=1, **extra):
+    ''' Compare the peak finders to the previous implementation, which always
+    eroded the zero plateaus and suppressed neighbors by zeroing a disc around
+    each maximum in turn, on a synthetic correlation map
+
+    :Parameters:
+
+    count : int
+            Number of peaks in the map
+    size : int
+           Width of the correlation map
+    repeat : int
+             Number of times to run each implementation
+    extra : dict
+            Unused keyword arguments
+
+    :Returns:
+
+    results : list
+              List of tuples (name, seconds per peak)
+    error : float
+            Largest difference between the peaks of the previous implementation and the peak finder with suppression
+    '''
+
+    import scipy.ndimage
+    from ..core.image import ndimage_utility
+    rng = numpy.random.RandomState(0)
+    spacing = max(4, int(size/numpy.sqrt(count)))
+    width = max(3, spacing/4)
+    distance = spacing/2
+    cc = rng.rand(size, size).astype(numpy.float32)*0.1
+    grid = numpy.arange(spacing/2, size-spacing/2, spacing)
+    y, x = [v.ravel()[:count] for v in numpy.meshgrid(grid, grid, indexing='ij')]
+    y += rng.randint(-width/2, width/2+1, len(y))
+    x += rng.randint(-width/2, width/2+1, len(x))
+    cc[y, x] += 1.0+rng.rand(len(y))
+
+    def legacy_candidates():
+        # find_peaks_fast before the separable filter, boolean subtraction written as xor
+        neighborhood = numpy.ones((width, width))
+        peaks = scipy.ndimage.filters.maximum_filter(cc, footprint=neighborhood) == cc
+        peaks ^= scipy.ndimage.morphology.binary_erosion((cc == 0), structure=neighborhood, border_value=1)
+        offsets, = numpy.nonzero(peaks.ravel())
+        x, y = numpy.unravel_index(offsets, cc.shape)
+        sel = numpy.logical_and(numpy.logical_and(x >= width, x <= cc.shape[0]-width), numpy.logical_and(y >= width, y <= cc.shape[1]-width))
+        offsets = offsets[sel]
+        y, x = numpy.unravel_index(offsets, cc.shape)
+        return numpy.vstack((cc.ravel()[offsets], x, y)).T
+
+    def legacy():
+        cand = legacy_candidates()
+        cand = cand[numpy.argsort(-cand[:, 0], kind='mergesort')]
+        peaks = []
+        while len(cand) > 0:
+            peaks.append(cand[0].copy())
+            cand = cand[numpy.sum(numpy.square(cand[:, 1:]-cand[0, 1:]), axis=1) >= distance*distance]
+        return numpy.asarray(peaks)
+
+    t0, ref = best_time(legacy_candidates, repeat)
+    t1, peaks = best_time(lambda: ndimage_utility.find_peaks_fast(cc, width, 0), repeat)
+    t2, ref = best_time(legacy, repeat)
+    t3, peaks = best_time(lambda: ndimage_utility.find_peaks_suppress(cc, width, 0, distance), repeat)
+    error = numpy.abs(ref-peaks).max() if ref.shape == peaks.shape else numpy.inf
+    return [('previous find_peaks_fast', t0/len(y)), ('ndimage_utility.find_peaks_fast', t1/len(y)), ('previous find_peaks_fast and disc suppression', t2/len(y)), ('ndimage_utility.find_peaks_suppress', t3/len(y))], error
+
+def bench_overlap(count=1000, size=128, repeat=3, **extra):
+    ''' Compare the KD-tree coordinate matching to the pairwise distance scan
+    
+    :Parameters:
+    
+    count : int
+            Number of picked coordinates (and of reference coordinates)
+    size : int
+           Diameter of a particle in pixels
+    repeat : int
+             Number of times to run each implementation
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per coordinate)
+    error : float
+            Number of coordinates matched differently by the implementations
+    '''
+    
+    from ..core.learn import distance
+    rng = numpy.random.RandomState(0)
+    width = size*numpy.sqrt(count)*2
+    benchmark = rng.uniform(0, width, (count, 2))
+    coords = benchmark + rng.normal(0, size/4.0, benchmark.shape)
+    radius = size/2.0
+    
+    def legacy():
+        bench = benchmark.copy()
+        index = []
+        for i, f in enumerate(coords):
+            dist = f-bench
+            dist = numpy.sum(dist*dist, axis=1)
+            j = dist.argmin()
+            if dist[j] < radius*radius:
+                bench[j] = numpy.inf
+                index.append(i)
+        return numpy.asarray(index)
+    
+    t0, ref = best_time(legacy, repeat)
+    t1, out = best_time(lambda: distance.match_points(coords, benchmark, radius)[0], repeat)
+    return [('pairwise distance scan', t0/count), ('distance.match_points', t1/count)], len(set(ref.tolist()) ^ set(out.tolist()))
+
+def bench_picking(count=1000, size=128, repeat=1, pixel_diameter=48, **extra):
+    ''' Time the particle pickers on a synthetic micrograph and score their picks
+    
+    The precision and recall of each picker are logged.
+    
+    :Parameters:
+    
+    count : int
+            Number of particles in the micrograph
+    size : int
+           Width of the micrograph (at least 8 particle diameters)
+    repeat : int
+             Unused, each picker runs once
+    pixel_diameter : int
+                     Diameter of a particle in pixels
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per particle)
+    error : float
+            Not a number, the implementations are not compared
+    '''
+    
+    from . import bench
+    size = max(size, pixel_diameter*8)
+    results = []
+    for name, prec, rec, elapsed, total in bench.synthetic_benchmark(count=count, size=size, pixel_diameter=pixel_diameter):
+        _logger.info("%s: precision=%f recall=%f"%(name, prec, rec))
+        results.append(('%s.search'%name, elapsed/max(1, total)))
+    return results, numpy.nan
+
+def bench_cascade(count=1000, size=128, repeat=1, pixel_diameter=48, cascade_factor=4, **extra):
+    ''' Compare the coarse-to-fine LFCPick search to the exhaustive search on a
+    synthetic micrograph
+    
+    The precision and recall of the `count` highest peaks of each search are logged.
+    
+    :Parameters:
+    
+    count : int
+            Number of particles in the micrograph
+    size : int
+           Width of the micrograph (at least 8 particle diameters)
+    repeat : int
+             Number of times to run each implementation
+    pixel_diameter : int
+                     Diameter of a particle in pixels
+    cascade_factor : int
+                     Decimation factor of the coarse search
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per particle)
+    error : float
+            Number of particles found by the exhaustive search but missed by the cascade
+    '''
+    
+    from . import bench
+    from ..app import lfcpick
+    from ..core.image import ndimage_utility
+    from ..core.learn import distance
+    size = max(size, pixel_diameter*8)
+    mic, coords = bench.synthetic_micrograph((size, size), count, pixel_diameter, 2.0, numpy.random.RandomState(0))
+    window = int(pixel_diameter*1.4)
+    param = dict(pixel_diameter=pixel_diameter, window=window, overlap_mult=1.0, fwidth=-1.0, template="", disk_mult=0.6, limit=len(coords))
+    param['mask'] = ndimage_utility.model_disk(pixel_diameter/2, (window, window))
+    found = []
+    results = []
+    for name, factor in (('lfcpick.search', 0), ('lfcpick.search (cascade %d)'%cascade_factor, cascade_factor)):
+        elapsed, peaks = best_time(lambda: lfcpick.search(mic.copy(), cascade_factor=factor, **param), repeat)
+        matched = distance.match_points(peaks[:, 1:3], coords, pixel_diameter/2*1.2)[1]
+        conf = (len(matched), len(peaks)-len(matched), 0, len(coords)-len(matched))
+        _logger.info("%s: precision=%f recall=%f"%(name, bench.precision(*conf), bench.recall(*conf)))
+        found.append(set(matched.tolist()))
+        results.append((name, elapsed/len(coords)))
+    return results, len(found[0]-found[1])
+
+def bench_viewselect(count=1000, size=128, repeat=3, view_resolution=3, **extra):
+    ''' Compare the grouped view thresholding to a pass over the particles per view
+    
+    :Parameters:
+    
+    count : int
+            Number of particles
+    size : int
+           Unused
+    repeat : int
+             Number of times to run each implementation
+    view_resolution : int
+                      Healpix resolution of the views (12*4**resolution views)
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per particle)
+    error : float
+            Number of particles selected differently by the implementations
+    '''
+    
+    from ..pyspider import classify
+    from ..core.learn import unary_classification
+    rng = numpy.random.RandomState(0)
+    view = rng.randint(0, 12*4**view_resolution, count)
+    cc = rng.normal(0.5, 0.1, count)+rng.rand(count)*(view%7)*0.01
+    
+    def legacy():
+        sel = numpy.ones(count, dtype=numpy.bool)
+        for v in numpy.unique(view):
+            vidx = numpy.argwhere(numpy.logical_and(sel, v==view)).squeeze()
+            vcc = cc[vidx]
+            if vcc.ndim == 0 or vcc.shape[0] == 0: continue
+            csel = numpy.greater(cc, unary_classification.otsu(vcc, 0))
+            sel[vidx] = numpy.logical_and(sel[vidx], csel[vidx])
+        return sel
+    
+    t0, ref = best_time(legacy, repeat)
+    t1, out = best_time(lambda: classify.select_by_view(cc, view, numpy.ones(count, dtype=numpy.bool), 1), repeat)
+    return [('per-view boolean masks', t0/count), ('classify.select_by_view', t1/count)], numpy.sum(ref != out)
+
+def bench_powerspec(count=10, size=256, repeat=1, spider_path="", **extra):
+    ''' Compare the in-memory power spectra pipeline of spi-defocus to the SPIDER session path
+    
+    Each micrograph is windowed into a periodogram, dedusted and rotationally
+    averaged; the power spectra and rotational average are written to disk.
+    
+    :Parameters:
+    
+    count : int
+            Number of micrographs
+    size : int
+           Window size of the periodogram (the micrograph is 8 windows wide)
+    repeat : int
+             Number of times to run each implementation
+    spider_path : str
+                  File path to the SPIDER executable, SPIDER is skipped if not found
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per micrograph)
+    error : float
+            Largest relative difference between the rotational averages or not a number if SPIDER was skipped
+    '''
+    
+    from ..pyspider import defocus
+    from ..core.image import ndimage_file
+    from ..core.spider import spider
+    import tempfile, shutil, os
+    rng = numpy.random.RandomState(0)
+    tmp = tempfile.mkdtemp()
+    param = dict(window_size=size, pad=2, x_overlap=50, offset=50, bin_factor=1, output_mic="", apix=1.0)
+    try:
+        files = [os.path.join(tmp, 'mic_%d.dat'%i) for i in xrange(count)]
+        for filename in files: ndimage_file.write_image(filename, rng.normal(0, 1, (size*8, size*8)).astype(numpy.float32))
+        
+        def run(spi, native):
+            roo = []
+            for filename in files:
+                base = os.path.join(tmp, ('nat_' if native else 'spi_')+os.path.basename(filename))
+                output_pow, output_roo = base.replace('mic', 'pow'), base.replace('mic', 'roo')
+                power_spec, powm = defocus.create_powerspectra(filename, spi, output_pow=output_pow, native_powerspec=native, **param)
+                roo.append(defocus.rotational_average(power_spec, spi, output_roo)[:, 1])
+                if native: defocus.write_powerspectra(output_pow, powm, False, param['apix'])
+            return roo
+        
+        t1, out = best_time(lambda: run(None, True), repeat)
+        results = [('defocus native power spectra', t1/count)]
+        if spider_path == "" or spider.determine_spider(spider_path) == "":
+            _logger.warn("SPIDER not found (--spider-path) - skipping the SPIDER comparison")
+            return results, numpy.nan
+        spi = spider.open_session(files, spider_path=spider_path, data_ext='dat')
+        t0, ref = best_time(lambda: run(spi, False), repeat)
+        spi.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    error = max([numpy.max(numpy.abs(a[:len(b)]-b[:len(a)])/numpy.abs(a[:len(b)]).max()) for a, b in zip(ref, out)])
+    return [('defocus SPIDER CP/DU/RO/LI D', t0/count)]+results, error
+
+def bench_viewreject(count=1000000, size=128, repeat=3, view_resolution=3, **extra):
+    ''' Compare spi-classify with the outliers of each view removed (--reject-by-view)
+    to the existing path, which removes the outliers over all projections
+    
+    :Parameters:
+    
+    count : int
+            Number of particles
+    size : int
+           Unused
+    repeat : int
+             Number of times to run each implementation
+    view_resolution : int
+                      Healpix resolution of the views (12*4**resolution views)
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per particle)
+    error : float
+            Number of particles selected differently, the two paths remove
+            outliers over different populations so this is not expected to be zero
+    '''
+    
+    from ..pyspider import classify
+    rng = numpy.random.RandomState(0)
+    align = numpy.zeros((count, 18))
+    align[:, 1] = numpy.rad2deg(numpy.arccos(rng.uniform(-1.0, 1.0, count)))
+    align[:, 2] = rng.uniform(0.0, 360.0, count)
+    align[:, 10] = rng.normal(0.5, 0.1, count)+rng.rand(count)*(numpy.floor(align[:, 1]/10.0)%7)*0.01
+    align[rng.rand(count) < 0.01, 10] += 0.5
+    
+    t0, ref = best_time(lambda: classify.classify_projections_by_view(align, 1, view_resolution=view_resolution, reject_by_view=False), repeat)
+    t1, out = best_time(lambda: classify.classify_projections_by_view(align, 1, view_resolution=view_resolution, reject_by_view=True), repeat)
+    return [('classify.classify_projections_by_view', t0/count), ('classify.classify_projections_by_view --reject-by-view', t1/count)], numpy.sum(ref != out)
+
+def bench_alignread(count=1000000, size=128, repeat=1, **extra):
+    ''' Compare reading a SPIDER alignment document row by row (namedtuples) to the
+    single pass array read, and the per-row 2D to 3D alignment conversion to the
+    vectorized conversion used by read_alignment
+    
+    :Parameters:
+    
+    count : int
+            Number of particles (rows in the document)
+    size : int
+           Unused
+    repeat : int
+             Number of times to run each implementation
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per particle)
+    error : float
+            Largest absolute difference between the values read or converted
+    '''
+    
+    from ..core.metadata import format
+    from ..core.orient import spider_transforms
+    import tempfile, shutil, os
+    rng = numpy.random.RandomState(0)
+    align = rng.rand(count, 18)*100
+    align[:, 4] = numpy.arange(1, count+1)
+    header = "epsi,theta,phi,ref_num,id,psi,tx,ty,nproj,ang_diff,cc_rot,spsi,sx,sy,mirror,micrograph,stack_id,defocus".split(',')
+    tmp = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp, 'align.dat')
+        format.write(filename, align, header=header)
+        t0, ref = best_time(lambda: numpy.asarray(format.read(filename, numeric=True)), repeat)
+        t1, out = best_time(lambda: format.read(filename, ndarray=True)[0], repeat)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    
+    def convert_rows(align):
+        param = numpy.zeros((len(align), 3))
+        for i in xrange(len(align)):
+            param[i] = spider_transforms.align_param_2D_to_3D(align[i, 5], align[i, 6], align[i, 7])
+        return param
+    t2, ref3d = best_time(lambda: convert_rows(out), repeat)
+    t3, out3d = best_time(lambda: numpy.column_stack(spider_transforms.align_param_2D_to_3D(out[:, 5], out[:, 6], out[:, 7])), repeat)
+    error = max(numpy.max(numpy.abs(ref-out)), numpy.max(numpy.abs(ref3d-out3d)))
+    return [('format.read namedtuple', t0/count), ('format.read ndarray', t1/count),
+            ('align_param_2D_to_3D per row', t2/count), ('align_param_2D_to_3D vectorized', t3/count)], error
+
+def bench_volfilter(count=4, size=128, repeat=1, spider_path="", **extra):
+    ''' Compare the in-process volume low-pass filter and spherical mask to SPIDER
+    
+    :Parameters:
+    
+    count : int
+            Number of volumes to filter and mask
+    size : int
+           Width of each volume
+    repeat : int
+             Number of times to run each implementation
+    spider_path : str
+                  File path to the SPIDER executable, SPIDER is skipped if not found
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per volume)
+    error : float
+            Largest difference between the implementations or not a number if SPIDER was skipped
+    '''
+    
+    from ..pyspider import filter_volume, mask_volume
+    from ..core.image import ndimage_file
+    from ..core.spider import spider
+    import tempfile, shutil, os
+    rng = numpy.random.RandomState(0)
+    vols = [rng.rand(size, size, size).astype(numpy.float32) for i in xrange(count)]
+    sp, param = 0.15, dict(pixel_diameter=size/2, mask_edge_width=size/16)
+    
+    def native():
+        return [mask_volume.mask_volume(filter_volume.filter_volume_lowpass(vol, None, sp, filter_type=2), None, None, 'C', **param) for vol in vols]
+    
+    t1, out = best_time(native, repeat)
+    results = [('filter_volume+mask_volume (numpy)', t1/count)]
+    if spider_path == "" or spider.determine_spider(spider_path) == "":
+        _logger.warn("SPIDER not found (--spider-path) - skipping the SPIDER comparison")
+        return results, numpy.nan
+    tmp = tempfile.mkdtemp()
+    try:
+        files = [os.path.join(tmp, 'vol_%d.dat'%i) for i in xrange(count)]
+        for filename, vol in zip(files, vols): ndimage_file.write_image(filename, vol)
+        spi = spider.open_session(files, spider_path=spider_path, data_ext='dat')
+        
+        def spider_path_():
+            for filename in files:
+                output = os.path.join(tmp, 'out_'+os.path.basename(filename))
+                filter_volume.filter_volume_lowpass(filename, spi, sp, filter_type=2, outputfile=output)
+                mask_volume.mask_volume(output, output, spi, 'C', **param)
+            return [ndimage_file.read_image(os.path.join(tmp, 'out_'+os.path.basename(filename))) for filename in files]
+        
+        t0, ref = best_time(spider_path_, repeat)
+        spi.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    error = max([numpy.max(numpy.abs(a-b)) for a, b in zip(ref, out)])
+    return [('SPIDER FQ+MA', t0/count)]+results, error
+
+def bench_coverage(count=1000, size=128, repeat=1, view_resolution=5, **extra):
+    ''' Compare the vectorized angular histogram and BILD writer of ara-coverage to per-item loops
+    
+    :Parameters:
+    
+    count : int
+            Number of orientations
+    size : int
+           Unused
+    repeat : int
+             Number of times to run each implementation
+    view_resolution : int
+                      Healpix resolution of the views (12*4**resolution views)
+    extra : dict
+            Unused keyword arguments
+    
+    :Returns:
+    
+    results : list
+              List of tuples (name, seconds per orientation)
+    error : float
+            Largest difference between the view counts plus the number of BILD lines that differ
+    '''
+    
+    from . import coverage
+    from ..core.orient import healpix, spider_transforms
+    import matplotlib.cm as cm
+    import tempfile, shutil, os
+    rng = numpy.random.RandomState(0)
+    angs = numpy.column_stack((rng.rand(count)*180.0, rng.rand(count)*360.0))
+    param = dict(particle_diameter=60.0, particle_center=0.0, radius_frac=1.0, width_frac=0.5, view_resolution=view_resolution)
+    tmp = tempfile.mkdtemp()
+    
+    def legacy():
+        total = healpix.res2npix(view_resolution)
+        pix = numpy.zeros(len(angs), dtype=numpy.int)
+        for i in xrange(len(angs)):
+            pix[i] = healpix.ang2pix(view_resolution, numpy.deg2rad(angs[i, 0]), numpy.deg2rad(angs[i, 1]))
+        count = numpy.bincount(pix, minlength=total)
+        vpix = numpy.arange(total, dtype=numpy.int)
+        mpix = [healpix.pix2mirror(view_resolution, int(i)) for i in vpix]
+        for i in xrange(len(vpix)):
+            if i == mpix[i]: continue
+            count[i] += count[mpix[i]]
+            count[mpix[i]]=count[i]
+        vangs = numpy.asarray([numpy.rad2deg(healpix.pix2ang(view_resolution, int(i))) for i in vpix])
+        particle_radius = param['particle_diameter']/2.0
+        width = param['width_frac'] * numpy.pi*particle_radius/healpix.sampling(view_resolution)
+        fout = open(os.path.join(tmp, 'legacy.bild'), 'w')
+        maxcnt = count.max()
+        for i in xrange(len(vangs)):
+            val = count[i]/float(maxcnt)
+            r, g, b = cm.cool(val)[:3]
+            fout.write('.color %f %f %f\n'%(r, g, b))
+            v1,v2,v3 = spider_transforms.euler_to_vector(*vangs[i, :])
+            length = particle_radius + particle_radius * val;
+            diff = particle_radius-length
+            if abs(diff*v1) < 0.01 and abs(diff*v2) < 0.01 and abs(diff*v3) < 0.01: continue
+            fout.write('.cylinder %f %f %f %f %f %f %d\n'%(particle_radius*v1, particle_radius*v2, particle_radius*v3, length*v1, length*v2, length*v3, width))
+        fout.close()
+        return count
+    
+    def vectorized():
+        vangs, count = coverage.angular_histogram(angs, view_resolution)
+        coverage.chimera_bild(vangs, count, os.path.join(tmp, 'vectorized.bild'), **param)
+        return count
+    
+    try:
+        t0, ref = best_time(legacy, repeat)
+        t1, out = best_time(vectorized, repeat)
+        lines0 = open(os.path.join(tmp, 'legacy.bild')).readlines()
+        lines1 = open(os.path.join(tmp, 'vectorized.bild')).readlines()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    error = numpy.max(numpy.abs(ref-out)) + sum([a != b for a, b in zip(lines0, lines1)]) + abs(len(lines0)-len(lines1))
+    return [('per-orientation ang2pix, per-view BILD lines', t0/count), ('coverage histogram+chimera_bild', t1/count)], error
+
+def benchmarks():
+    ''' List the available benchmarks
+
+    :Returns:
+
+    names : list
+            Sorted list of benchmark names
+    '''
+
+    return sorted([name[6:] for name in globals().keys() if name.startswith('bench_')])
+
+def format_report(name, results, error):
+    ''' Format the results of a benchmark as a table
+
+    :Parameters:
+
+    name : str
+           Name of the benchmark
+    results : list
+              List of tuples (name, seconds per item)
+    error : float
+            Largest difference between the implementations
+
+    :Returns:
+
+    report : str
+             Formatted report
+    '''
+
+    lines = ['{0:45} {1:>14} {2:>14} {3:>9}'.format(name, 'us/item', 'items/s', 'speedup')]
+    base = results[0][1]
+    for impl, val in results:
+        lines.append('{0:45} {1:14.2f} {2:14.1f} {3:9.2f}'.format(impl, val*1e6, 1.0/val if val > 0 else numpy.inf, base/val if val > 0 else numpy.inf))
+    if not numpy.isnan(error): lines.append('difference: %g'%error)
+    return "\n".join(lines)
+
+def main():
+    ''' Main entry point for the script
+    '''
+
+    parser = optparse.OptionParser(usage="%prog [benchmark1 benchmark2 ...]", description="Time the numerical kernels of Arachnid")
+    parser.add_option("", "--list", action="store_true", default=False, help="List the available benchmarks")
+    parser.add_option("-c", "--count", type="int", default=1000, help="Number of items (e.g. particles) to process")
+    parser.add_option("-s", "--size", type="int", default=128, help="Size of each item (e.g. width of a particle image)")
+    parser.add_option("-r", "--repeat", type="int", default=3, help="Number of times to run each implementation, the best time is reported")
+    parser.add_option("", "--defocus-bin", type="float", default=10.0, help="Width of a defocus bin in Angstroems (phaseflip), 0 compares exact defocus values")
+    parser.add_option("", "--spider-path", default="", help="File path to the SPIDER executable (volfilter, powerspec), SPIDER is skipped if not found")
+    options, args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    if options.list:
+        print "\n".join(benchmarks())
+        return
+    names = args if len(args) > 0 else benchmarks()
+    for name in names:
+        func = globals().get('bench_'+name)
+        if func is None:
+            _logger.error("Unknown benchmark: %s - expected one of %s"%(name, ", ".join(benchmarks())))
+            sys.exit(1)
+        try:
+            results, error = func(**vars(options))
+        except Exception, e:
+            _logger.error("Benchmark %s failed: %s"%(name, str(e)))
+            continue
+        print format_report(name, results, error)
+
+if __name__ == "__main__": main()
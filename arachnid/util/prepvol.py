@@ -66,6 +66,13 @@ Preparation Options
 .. option:: --weight <float>
     
     Weight for total variance denosing
+
+.. option:: --inplace
+    
+    Prepare the volume in single precision (float32) reusing the scratch
+    volumes between steps and volumes, the adaptive and spherical masks are 
+    thresholded, dilated and smoothed on slabs of the volume processed by 
+    `--thread-count` threads
     
 Mask Options
 ============
@@ -151,6 +158,7 @@ from ..core.image import ndimage_file
 from ..core.image import ndimage_utility
 from ..core.image import ndimage_interpolate
 from ..core.image import ndimage_filter
+from ..core.image import ndimage_slab
 try:
     from skimage.filter import denoise_tv_chambolle as tv_denoise  #@UnresolvedImport
     tv_denoise;
@@ -159,11 +167,14 @@ except:
 import logging
 import numpy
 import os
+import resource
 
 _logger = logging.getLogger(__name__)
 _logger.setLevel(logging.DEBUG)
 
-def process(filename, output, apix, resolution, window, id_len=0, diameter=False, cur_apix=0, mask_type='None', weight=0, **extra):
+_buffers = {}
+
+def process(filename, output, apix, resolution, window, id_len=0, diameter=False, cur_apix=0, mask_type='None', weight=0, inplace=False, **extra):
     '''Concatenate files and write to a single output file
         
     :Parameters:
@@ -188,6 +199,8 @@ def process(filename, output, apix, resolution, window, id_len=0, diameter=False
                     Type of masking to perform
         weight : float
                  Regularization parameter for total variance denoising
+        inplace : bool
+                  Prepare the volume in float32 reusing scratch volumes, see :py:func:`prepare_inplace`
         extra : dict
                 Unused key word arguments
                 
@@ -205,6 +218,16 @@ def process(filename, output, apix, resolution, window, id_len=0, diameter=False
     if cur_apix == 0: cur_apix = header['apix']
     _logger.debug("Got pixel size: %f"%cur_apix)
     if cur_apix == 0: raise ValueError, "Pixel size not found in volume header! Use --cur-apix to set current pixel size"
+    if inplace:
+        vol, mask, apix = prepare_inplace(vol, cur_apix, apix, resolution, window, weight, mask_type, buffers=_buffers, **extra)
+        if mask is not None: ndimage_file.write_image(format_utility.add_suffix(output, "_mask"), mask, header=dict(apix=apix))
+        ndimage_file.write_image(output, vol, header=dict(apix=apix))
+        _logger.info("Peak memory: %.1f MB"%peak_memory())
+        if diameter:
+            from ..core.image import measure
+            print measure.estimate_diameter(vol, cur_apix)
+            print measure.estimate_shape(vol, cur_apix)
+        return filename
     if resolution > 0:
         _logger.debug("Filtering volume")
         vol = ndimage_filter.filter_gaussian_lowpass(vol, cur_apix/resolution, 2)
@@ -234,13 +257,95 @@ def process(filename, output, apix, resolution, window, id_len=0, diameter=False
         ndimage_file.write_image(format_utility.add_suffix(output, "_mask"), mask, header=dict(apix=apix))
         vol *= mask
     ndimage_file.write_image(output, vol, header=dict(apix=apix))
+    _logger.info("Peak memory: %.1f MB"%peak_memory())
     if diameter:
         from ..core.image import measure
         print measure.estimate_diameter(vol, cur_apix)
         print measure.estimate_shape(vol, cur_apix)
     return filename
 
-def sphere_mask(vol, apix, sphere_radius, sphere_pad=3, sm_size=3, sm_sigma=3.0, **extra):
+def prepare_inplace(vol, cur_apix, apix=0, resolution=0, window=0, weight=0, mask_type='None', thread_count=0, buffers=None, **extra):
+    ''' Filter, resample, denoise, window and mask a volume in single precision
+    
+    Each step writes its result over the volume (or into a new float32 volume
+    when the shape changes), the masks are created in scratch volumes held in `buffers`
+    with the threaded slab operations of :py:mod:`ndimage_slab`.
+        
+    :Parameters:
+    
+        vol : array
+              Input volume
+        cur_apix : float
+                   Pixel size of input volume
+        apix : float
+               Target pixel size
+        resolution : float
+                     Low pass filter
+        window : int
+                 New windows size
+        weight : float
+                 Regularization parameter for total variance denoising
+        mask_type : choice
+                    Type of masking to perform
+        thread_count : int
+                       Number of threads, 0 means use the number of cores
+        buffers : dict, optional
+                  Dictionary of scratch volumes reused between calls
+        extra : dict
+                Options for the mask, see :py:func:`tight_mask` and :py:func:`sphere_mask`
+                
+    :Returns:
+        
+        vol : array
+              Prepared float32 volume
+        mask : array
+               Mask applied to the volume or None
+        apix : float
+               Pixel size of the prepared volume
+    '''
+    
+    vol = numpy.require(vol, dtype=numpy.float32, requirements=['C', 'W'])
+    if resolution > 0:
+        _logger.debug("Filtering volume")
+        ndimage_slab.copy(ndimage_filter.filter_gaussian_lowpass(vol, cur_apix/resolution, 2), vol, thread_count)
+    if apix > 0:
+        _logger.debug("Interpolating volume")
+        vol = ndimage_interpolate.resample_fft_fast(vol, apix/cur_apix)
+    else: apix=cur_apix
+    if weight > 0:
+        vol[:] = tv_denoise(vol, weight=weight, eps=2.e-4, n_iter_max=200)
+    if window > 0:
+        window = int(window)
+        shape = tuple([window for _ in xrange(vol.ndim)])
+        if window > vol.shape[0]:
+            _logger.debug("Increasing window size")
+            vol = ndimage_filter.depad(numpy.pad(vol, (window-vol.shape[0])/2+1, mode='reflect'), shape, numpy.empty(shape, dtype=numpy.float32))
+        elif window < vol.shape[0]:
+            _logger.debug("Decreasing window size")
+            vol = ndimage_filter.depad_image(vol, shape, numpy.empty(shape, dtype=numpy.float32))
+    mask = None
+    if mask_type != 'None':
+        if mask_type == 'Adaptive':
+            mask = tight_mask(vol, thread_count=thread_count, buffers=buffers, **extra)
+        elif mask_type == 'Sphere':
+            mask = sphere_mask(vol, apix, thread_count=thread_count, buffers=buffers, **extra)
+        else:
+            mask = numpy.require(ndimage_file.read_image(extra['mask_file']), dtype=numpy.float32)
+        numpy.multiply(vol, mask, vol)
+    return vol, mask, apix
+
+def peak_memory():
+    ''' Get the peak resident memory of the process
+    
+    :Returns:
+        
+        size : float
+               Peak resident memory in MB
+    '''
+    
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+
+def sphere_mask(vol, apix, sphere_radius, sphere_pad=3, sm_size=3, sm_sigma=3.0, thread_count=0, buffers=None, **extra):
     ''' Generate a tight mask for the given volume
         
     :Parameters:
@@ -257,6 +362,10 @@ def sphere_mask(vol, apix, sphere_radius, sphere_pad=3, sm_size=3, sm_sigma=3.0,
                   Size of the real space Gaussian kernel (must be odd!)
         sm_sigma : float
                    Width of the real space Gaussian kernel
+        thread_count : int
+                       Number of threads used when `buffers` is set
+        buffers : dict, optional
+                  Create a float32 mask in these scratch volumes with threaded slab operations
         extra : dict
                 Unused key word arguments
     :Returns:
@@ -271,13 +380,15 @@ def sphere_mask(vol, apix, sphere_radius, sphere_pad=3, sm_size=3, sm_sigma=3.0,
         sphere_radius=int(measure.estimate_diameter(vol, 1.0))
         _logger.info("Estimated radius to be %d"%sphere_radius)
     
-    mask = ndimage_utility.model_ball(vol.shape, sphere_radius+sphere_pad, dtype=numpy.float)
+    if sm_size > 0 and (sm_size%2) == 0: sm_size += 1
+    if buffers is not None:
+        return ndimage_slab.soft_sphere_mask(vol.shape, sphere_radius+sphere_pad, sm_size, sm_sigma, ndimage_slab.scratch(buffers, 'mask', vol.shape), thread_count, buffers)
+    mask = ndimage_utility.model_soft_ball(sphere_radius+sphere_pad, vol.shape, 0, 'H', dtype=numpy.float)
     if sm_size > 0 and sm_sigma > 0:
-        if (sm_size%2) == 0: sm_size += 1
         ndimage_utility.gaussian_smooth(mask, sm_size, sm_sigma, mask)
     return mask
 
-def tight_mask(vol, threshold=None, ndilate=0, sm_size=3, sm_sigma=3.0, disable_filter=False, **extra):
+def tight_mask(vol, threshold=None, ndilate=0, sm_size=3, sm_sigma=3.0, disable_filter=False, thread_count=0, buffers=None, **extra):
     ''' Generate a tight mask for the given volume
         
     :Parameters:
@@ -294,6 +405,10 @@ def tight_mask(vol, threshold=None, ndilate=0, sm_size=3, sm_sigma=3.0, disable_
                    Width of the real space Gaussian kernel
         disable_prefilter : bool
                             Disable pre filtering
+        thread_count : int
+                       Number of threads used when `buffers` is set
+        buffers : dict, optional
+                  Create a float32 mask in these scratch volumes with threaded slab operations
         extra : dict
                 Unused key word arguments
     :Returns:
@@ -305,6 +420,14 @@ def tight_mask(vol, threshold=None, ndilate=0, sm_size=3, sm_sigma=3.0, disable_
     if sm_size > 0 and (sm_size%2) == 0: sm_size += 1
     try: threshold=float(threshold)
     except: threshold=None
+    if buffers is not None:
+        if not disable_filter:
+            fvol = ndimage_slab.scratch(buffers, 'prefilter', vol.shape)
+            fvol[:] = tv_denoise(vol, weight=10, eps=2.e-4, n_iter_max=200)
+        else: fvol = vol
+        mask, th = ndimage_slab.tight_mask(fvol, threshold, ndilate, sm_size, sm_sigma, ndimage_slab.scratch(buffers, 'mask', vol.shape), thread_count, buffers)
+        _logger.info("Determined threshold=%f"%th)
+        return mask
     if not disable_filter:
         fvol = tv_denoise(vol, weight=10, eps=2.e-4, n_iter_max=200)
     else: fvol = vol
@@ -358,6 +481,7 @@ def setup_options(parser, pgroup=None, main_option=False):
     group.add_option("", window=0.0,            help="Trim or pad volume to given window size")
     group.add_option("", weight=0.0,            help="Weight for total variance denosing")
     group.add_option("", diameter=False,        help="Measure diameter of object")
+    group.add_option("", inplace=False,         help="Prepare the volume in float32 reusing scratch volumes, masks are created with threaded slab operations")
     #group.add_option("", center=('None', 'Mass'),          help="Center volume using specified algorithm")
     mgroup = OptionGroup(parser, "Mask", "Options to control volume masking",  id=__name__)
     mgroup.add_option("", mask_type=('None', 'Adaptive', 'Sphere', 'File'), help="Type of masking")
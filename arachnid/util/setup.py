@@ -13,4 +13,6 @@ console_scripts = [
  'screenmics = arachnid.util.screenmics:main',
  'delete = arachnid.util.delete:main',
  'prepvol = arachnid.util.prepvol:main',
+ 'startupbench = arachnid.util.startup_bench:main',
+ 'kernelbench = arachnid.util.kernel_bench:main',
 ]
\ No newline at end of file
@@ -0,0 +1,196 @@
+''' Measure the start up cost of Arachnid scripts
+
+This script (`ara-startupbench`) imports each script module in a fresh Python
+interpreter and reports the time spent importing it along with the most
+expensive modules it pulls in. It is intended to track the overhead paid
+by every short `ara-*` or `sp-*` invocation.
+
+Examples
+========
+
+.. sourcecode:: sh
+
+    # Measure every installed script
+
+    $ ara-startupbench
+
+    # Measure a single module, 5 repeats, and show the cost of the deferred imports
+
+    $ ara-startupbench arachnid.app.autopick -r 5 --resolve
+
+Options
+=======
+
+.. program:: ara-startupbench
+
+.. option:: -r <int>, --repeat <int>
+
+    Number of times to import each module, the best time is reported
+
+.. option:: -n <int>, --top <int>
+
+    Number of most expensive imports to list for each module
+
+.. option:: --resolve
+
+    Import every lazy module after the script module is loaded to
+    report the cost that was deferred
+
+.. Created on Oct 18, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+import logging
+import subprocess
+import optparse
+import json
+import sys
+
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.DEBUG)
+
+_import_script = r'''
+import sys, time, json, __builtin__
+_import = __builtin__.__import__
+_times = {}
+def _timed_import(name, globals=None, locals=None, fromlist=None, level=-1):
+    package = ''
+    if globals is not None:
+        package = globals.get('__package__') or ''
+        if not package and '__path__' not in globals: package = globals.get('__name__', '').rpartition('.')[0]
+    if level > 1: package = package.rsplit('.', level-1)[0]
+    fullname = package+'.'+name if package else name
+    if name in sys.modules or fullname in sys.modules: return _import(name, globals, locals, fromlist, level)
+    beg = time.time()
+    try: return _import(name, globals, locals, fromlist, level)
+    finally:
+        if sys.modules.get(fullname) is None: fullname = name
+        _times.setdefault(fullname, time.time()-beg)
+__builtin__.__import__ = _timed_import
+beg = time.time()
+__import__(sys.argv[1])
+total = time.time()-beg
+__builtin__.__import__ = _import
+lazy = {}
+if sys.argv[2] == '1':
+    from arachnid.core.util import lazy_import
+    for mod in list(sys.modules.values()):
+        if mod is None or not getattr(mod, '__name__', '').startswith('arachnid'): continue
+        for val in list(vars(mod).values()):
+            if isinstance(val, lazy_import.LazyModule): lazy_import.is_available(val)
+    lazy = lazy_import.load_times()
+sys.stdout.write(json.dumps(dict(total=total, count=len([m for m in sys.modules.values() if m is not None]), imports=_times, lazy=lazy)))
+'''
+
+def script_modules():
+    ''' List the modules of every installed script
+
+    :Returns:
+
+        modules : list
+                  List of module names
+    '''
+
+    import arachnid.setup
+    modules = []
+    for script in arachnid.setup.app.setup.console_scripts+arachnid.setup.util.setup.console_scripts+arachnid.setup.pyspider.setup.console_scripts:
+        module = script.split('=')[1].split(':')[0].strip()
+        if module not in modules: modules.append(module)
+    return modules
+
+def measure_import(module, resolve=False):
+    ''' Import a module in a fresh interpreter and measure the cost
+
+    :Parameters:
+
+        module : str
+                 Absolute name of the module to import
+        resolve : bool
+                  Import every lazy module after the module is loaded
+
+    :Returns:
+
+        stats : dict
+                Total import time (`total`), number of loaded modules (`count`),
+                time for each import statement (`imports`) and time for each
+                lazy module (`lazy`)
+    '''
+
+    proc = subprocess.Popen([sys.executable, '-c', _import_script, module, '1' if resolve else '0'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise ImportError, "Failed to import %s: %s"%(module, err.strip().splitlines()[-1] if err.strip() else "unknown error")
+    return json.loads(out)
+
+def benchmark(modules, repeat=3, resolve=False):
+    ''' Measure the start up cost of each module
+
+    :Parameters:
+
+        modules : list
+                  List of module names
+        repeat : int
+                 Number of times to import each module, the fastest import is kept
+        resolve : bool
+                  Import every lazy module after the module is loaded
+
+    :Returns:
+
+        results : list
+                  List of tuples (module, stats), see :py:func:`measure_import`
+    '''
+
+    results = []
+    for module in modules:
+        best = None
+        try:
+            for i in xrange(max(1, repeat)):
+                stats = measure_import(module, resolve)
+                if best is None or stats['total'] < best['total']: best = stats
+        except ImportError, e:
+            _logger.error(str(e))
+            continue
+        results.append((module, best))
+    return results
+
+def format_report(results, top=5):
+    ''' Format the benchmark results as a table
+
+    :Parameters:
+
+        results : list
+                  List of tuples (module, stats), see :py:func:`benchmark`
+        top : int
+              Number of most expensive imports to list for each module
+
+    :Returns:
+
+        report : str
+                 Formatted report
+    '''
+
+    lines = ['{0:45} {1:>10} {2:>8}'.format('module', 'time(s)', 'modules')]
+    for module, stats in sorted(results, key=lambda r: -r[1]['total']):
+        lines.append('{0:45} {1:10.3f} {2:8d}'.format(module, stats['total'], stats['count']))
+        imports = sorted(stats['imports'].items(), key=lambda v: -v[1])
+        for name, val in [v for v in imports if v[0] != module][:top]:
+            lines.append('    {0:41} {1:10.3f}'.format(name, val))
+        if len(stats['lazy']) > 0:
+            lines.append('    deferred:')
+            for name, val in sorted(stats['lazy'].items(), key=lambda v: -v[1]):
+                lines.append('    {0:41} {1:10.3f}'.format(name, val))
+    return "\n".join(lines)
+
+def main():
+    ''' Main entry point for the script
+    '''
+
+    parser = optparse.OptionParser(usage="%prog [module1 module2 ...]", description="Measure the import cost of Arachnid scripts")
+    parser.add_option("-r", "--repeat", type="int", default=3, help="Number of times to import each module, the best time is reported")
+    parser.add_option("-n", "--top", type="int", default=5, help="Number of most expensive imports to list for each module")
+    parser.add_option("", "--resolve", action="store_true", default=False, help="Import every lazy module after the script module is loaded")
+    options, args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    modules = args if len(args) > 0 else script_modules()
+    print format_report(benchmark(modules, options.repeat, options.resolve), options.top)
+
+if __name__ == "__main__": main()
@@ -0,0 +1,63 @@
+'''
+.. Created on Oct 19, 2026
+.. codeauthor:: Robert Langlois <rl2528@columbia.edu>
+'''
+from .. import enumerate_filenames
+from ...core.metadata import format
+import os, shutil, tempfile
+
+def _write_mapping(path, mapped):
+    mapping_file = os.path.join(path, 'mapping.csv')
+    format.write(mapping_file, mapped, header="filename,id".split(','))
+    return mapping_file
+
+def test_remap_enum_files_exact_match():
+    '''
+    '''
+    
+    path = tempfile.mkdtemp()
+    try:
+        # mic_1.tif is also a substring of pre_mic_1.tif, the exact name must win
+        mapping_file = _write_mapping(path, [('/old/pre_mic_1.tif', 1), ('/old/mic_1.tif', 2), ('/old/mic_3.tif', 3)])
+        files = ['/new/mic_1.tif', '/new/pre_mic_1.tif.bz2', '/new/run_mic_3.tif', '/new/mic_4.tif']
+        mapped = enumerate_filenames.remap_enum_files(files, mapping_file)
+        assert mapped == [('/new/mic_1.tif', 2), ('/new/pre_mic_1.tif.bz2', 1), ('/new/run_mic_3.tif', 3), ('/new/mic_4.tif', 4)]
+        mapped = enumerate_filenames.remap_enum_files(files, mapping_file, strict=True)
+        assert mapped == [('/new/mic_1.tif', 2), ('/new/pre_mic_1.tif.bz2', 1), ('/new/run_mic_3.tif', 3)]
+    finally:
+        shutil.rmtree(path)
+
+def test_remap_enum_files_duplicate():
+    '''
+    '''
+    
+    path = tempfile.mkdtemp()
+    try:
+        mapping_file = _write_mapping(path, [('/old/a/mic_1.tif', 1), ('/old/b/mic_1.tif', 2)])
+        try: enumerate_filenames.remap_enum_files(['/new/mic_1.tif'], mapping_file)
+        except ValueError: pass
+        else: assert False, "expected a duplicate mapping error"
+    finally:
+        shutil.rmtree(path)
+
+def test_generate_enum_links():
+    '''
+    '''
+    
+    path = tempfile.mkdtemp()
+    try:
+        source = [os.path.join(path, 'raw_%s.dat'%name) for name in ('a', 'b')]
+        for filename in source: open(filename, 'w').close()
+        output = os.path.join(path, 'links', 'mic_0000.dat')
+        os.makedirs(os.path.dirname(output))
+        # Links from an earlier run: one points to the wrong file, one to a file that is gone
+        os.symlink(source[1], os.path.join(path, 'links', 'mic_0001.dat'))
+        os.symlink(os.path.join(path, 'raw_c.dat'), os.path.join(path, 'links', 'mic_0003.dat'))
+        mapped = [(source[0], 1), (source[1], 2), (os.path.join(path, 'raw_c.dat'), 3)]
+        enumerate_filenames.generate_enum_links(mapped, output)
+        assert os.readlink(os.path.join(path, 'links', 'mic_0001.dat')) == source[0]
+        assert os.readlink(os.path.join(path, 'links', 'mic_0002.dat')) == source[1]
+        assert not os.path.lexists(os.path.join(path, 'links', 'mic_0003.dat'))
+        assert sorted(os.listdir(os.path.join(path, 'links'))) == ['mic_0001.dat', 'mic_0002.dat']
+    finally:
+        shutil.rmtree(path)